@@ -1,13 +1,22 @@
 # app.py
+import sys
 from core.llm_engine import LLMEngine
 from core.memory import Memory
-from core.emotion import EmotionState
 from interfaces.chat_ui import start_chat_ui
+from interfaces.voice import start_voice_ui
+from interfaces.avatar import start_avatar_server
 
 # Initialize core systems
-memory = Memory()
-emotion = EmotionState()
+memory = Memory(ml_worker="--ml-worker" in sys.argv)
+# One mood for the whole app: memory updates it, the avatar and mood events read it.
+emotion = memory.emotion
 llm = LLMEngine(memory=memory, emotion=emotion)
 
 # Launch interface
-start_chat_ui(llm)
+if __name__ == "__main__":
+    if "--avatar" in sys.argv:
+        start_avatar_server(emotion)
+    if "--voice" in sys.argv:
+        start_voice_ui(llm)
+    else:
+        start_chat_ui(llm)
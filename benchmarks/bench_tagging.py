@@ -0,0 +1,80 @@
+# benchmarks/bench_tagging.py
+"""
+Latency benchmark for the capture-time tagging path.
+
+Compares the full en_core_web_sm pipeline against the trimmed one TaggingEngine
+loads, and the cold path against the per-content cache. Messages come from the
+user turns in data/memory.db, or a small built-in sample when that is empty.
+
+    python -m benchmarks.bench_tagging --messages 500
+"""
+import os
+import sys
+import time
+import argparse
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import spacy
+from core.memory_storage import MemoryStorage, db_path
+from core.memory_tags import TaggingEngine, TAGGING_EXCLUDE, nlp as trimmed_nlp
+
+SAMPLE = [
+    "I miss you so much today, the rain makes everything feel heavier",
+    "We went to the sea with Anna and it felt like a dream",
+    "Honestly I'm nervous about the interview in Berlin next week",
+    "Thank you for remembering my sister's birthday, that meant a lot",
+    "I keep looking at the stars and thinking about what we could build together",
+    "Work was exhausting but I finally finished the project I told you about",
+]
+
+def load_messages(limit):
+    storage = MemoryStorage(db_path)
+    rows = [m["content"] for m in storage.load_memories(limit=limit * 2) if m["role"] == "user"]
+    rows = [r for r in rows if r and len(r.split()) > 5][:limit]
+    if not rows:
+        rows = SAMPLE
+    return (rows * (limit // len(rows) + 1))[:limit]
+
+def timed(fn, messages):
+    latencies = []
+    start = time.perf_counter()
+    for message in messages:
+        t0 = time.perf_counter()
+        fn(message)
+        latencies.append((time.perf_counter() - t0) * 1000)
+    total = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "p50_ms": statistics.median(latencies),
+        "p95_ms": latencies[int(0.95 * (len(latencies) - 1))],
+        "msgs_per_s": len(messages) / total,
+    }
+
+def report(name, stats):
+    print(f"{name:<28} p50 {stats['p50_ms']:7.2f} ms   p95 {stats['p95_ms']:7.2f} ms   {stats['msgs_per_s']:8.1f} msg/s")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=300)
+    args = parser.parse_args()
+
+    messages = load_messages(args.messages)
+    unique = list(dict.fromkeys(messages))
+    print(f"{len(messages)} messages ({len(unique)} unique); trimmed pipeline excludes {TAGGING_EXCLUDE}\n")
+
+    full_nlp = spacy.load("en_core_web_sm")
+    report("spaCy full pipeline", timed(lambda m: full_nlp(m.lower()), messages))
+    report("spaCy trimmed pipeline", timed(lambda m: trimmed_nlp(m.lower()), messages))
+
+    engine = TaggingEngine(cache_size=0)
+    report("extract_tags (no cache)", timed(engine.extract_tags, messages))
+
+    engine = TaggingEngine(cache_size=len(unique))
+    for message in unique:
+        engine.extract_tags(message)
+    report("extract_tags (warm cache)", timed(engine.extract_tags, messages))
+
+if __name__ == "__main__":
+    main()
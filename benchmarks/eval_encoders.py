@@ -0,0 +1,114 @@
+# benchmarks/eval_encoders.py
+"""
+Compares the sentence-encoder backends against the float32 torch baseline.
+
+For each backend it reports batch throughput (texts/s), single-text latency
+(p50/p95) and recall@k: the overlap between the backend's k nearest neighbours
+and the baseline's for a set of query texts. The corpus is the episodic store in
+data/memory.db, or a small built-in sample when that is empty.
+
+    python -m benchmarks.eval_encoders --threads 4 --k 10
+    python -m benchmarks.eval_encoders --backends torch torch-int8
+"""
+import os
+import sys
+import time
+import argparse
+import statistics
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.memory_storage import MemoryStorage, db_path
+from core.encoder_backends import ENCODER_BACKENDS, make_encoder
+
+SAMPLE = [
+    "I miss you so much today, the rain makes everything feel heavier",
+    "We went to the sea with Anna and it felt like a dream",
+    "Honestly I'm nervous about the interview in Berlin next week",
+    "Thank you for remembering my sister's birthday, that meant a lot",
+    "I keep looking at the stars and thinking about what we could build together",
+    "Work was exhausting but I finally finished the project I told you about",
+    "The coffee shop downstairs closed and I feel weirdly sad about it",
+    "My mom called and we laughed for an hour about nothing",
+    "I can't sleep, my head is full of tomorrow",
+    "Spring is finally here, the cherry trees are blooming",
+    "I failed the exam and I don't want to talk about it yet",
+    "Let's plan a trip somewhere warm this winter",
+]
+
+def load_corpus(limit):
+    storage = MemoryStorage(db_path)
+    with storage.read_cursor() as cursor:
+        cursor.execute('SELECT content FROM episodic_memory WHERE content != "" ORDER BY rowid DESC LIMIT ?', (limit,))
+        corpus = list(dict.fromkeys(row[0] for row in cursor.fetchall()))
+    return corpus if len(corpus) >= len(SAMPLE) else SAMPLE
+
+def top_k(embeddings, query_idx, k):
+    scores = embeddings[query_idx] @ embeddings.T
+    scores[np.arange(len(query_idx)), query_idx] = -np.inf
+    k = min(k, embeddings.shape[0] - 1)
+    return np.argpartition(-scores, k - 1, axis=1)[:, :k]
+
+def recall_at_k(baseline_neighbours, candidate_neighbours):
+    hits = [len(set(b) & set(c)) / len(b) for b, c in zip(baseline_neighbours, candidate_neighbours)]
+    return sum(hits) / len(hits)
+
+def evaluate(encoder, corpus, latency_texts, batch_size):
+    encoder.encode(corpus[:batch_size], batch_size=batch_size)  # warm-up
+
+    start = time.perf_counter()
+    embeddings = encoder.encode(corpus, batch_size=batch_size, normalize_embeddings=True)
+    throughput = len(corpus) / (time.perf_counter() - start)
+
+    latencies = []
+    for text in latency_texts:
+        t0 = time.perf_counter()
+        encoder.encode(text)
+        latencies.append((time.perf_counter() - t0) * 1000)
+    latencies.sort()
+    return np.asarray(embeddings, dtype=np.float32), {
+        "texts_per_s": throughput,
+        "p50_ms": statistics.median(latencies),
+        "p95_ms": latencies[int(0.95 * (len(latencies) - 1))],
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backends", nargs="+", choices=ENCODER_BACKENDS, default=list(ENCODER_BACKENDS))
+    parser.add_argument("--model", default="all-MiniLM-L6-v2")
+    parser.add_argument("--threads", type=int, default=None)
+    parser.add_argument("--corpus-size", type=int, default=2000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--batch-size", type=int, default=32)
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus_size)
+    rng = np.random.default_rng(0)
+    query_idx = rng.choice(len(corpus), size=min(args.queries, len(corpus)), replace=False)
+    latency_texts = [corpus[i] for i in query_idx[:100]]
+    print(f"{len(corpus)} texts, {len(query_idx)} queries, k={args.k}, threads={args.threads or 'default'}\n")
+
+    baseline_embeddings, baseline_stats = evaluate(make_encoder("torch", args.model, args.threads),
+                                                   corpus, latency_texts, args.batch_size)
+    baseline_neighbours = top_k(baseline_embeddings, query_idx, args.k)
+
+    print(f"{'backend':<12} {'texts/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'recall@k':>9} {'cos':>6}")
+    for backend in args.backends:
+        if backend == "torch":
+            embeddings, stats = baseline_embeddings, baseline_stats
+        else:
+            try:
+                encoder = make_encoder(backend, args.model, args.threads)
+            except ImportError as e:
+                print(f"{backend:<12} skipped: {e}")
+                continue
+            embeddings, stats = evaluate(encoder, corpus, latency_texts, args.batch_size)
+        recall = recall_at_k(baseline_neighbours, top_k(embeddings, query_idx, args.k))
+        agreement = float(np.mean(np.sum(embeddings * baseline_embeddings, axis=1)))
+        print(f"{backend:<12} {stats['texts_per_s']:9.1f} {stats['p50_ms']:8.2f} {stats['p95_ms']:8.2f} "
+              f"{recall:9.3f} {agreement:6.3f}")
+
+if __name__ == "__main__":
+    main()
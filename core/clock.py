@@ -0,0 +1,28 @@
+# core/clock.py
+import time
+import random
+
+class VirtualClock:
+    """
+    Stand-in for time.time that only moves when told to. Instances are callable, so
+    they drop in wherever a `get_current_time` callable is expected.
+    """
+    def __init__(self, start=None):
+        self.now = time.time() if start is None else float(start)
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+        return self.now
+
+    def set(self, timestamp):
+        """Moves to `timestamp`; never backwards, so decay and ordering stay monotonic."""
+        self.now = max(self.now, float(timestamp))
+        return self.now
+
+
+def make_rng(seed=None):
+    """A private random.Random; seeded runs are reproducible, unseeded ones behave like `random`."""
+    return random.Random(seed)
@@ -0,0 +1,129 @@
+# core/db.py
+import os
+import atexit
+import sqlite3
+import logging
+import threading
+from contextlib import contextmanager
+from urllib.request import pathname2url
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(message)s')
+
+PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "temp_store": "MEMORY",
+    "mmap_size": 256 * 1024 * 1024,
+    "cache_size": -16384,  # negative = KiB, i.e. 16 MiB of page cache per connection
+    "busy_timeout": 5000,
+}
+
+class ConnectionManager:
+    """
+    One serialized writer connection plus one read connection per thread for a single
+    SQLite file. WAL lets readers run alongside the writer; every connection gets the
+    same tuned pragmas and a prepared-statement cache, so the hot path never pays for
+    connect() or schema parsing.
+
+    With `read_only=True` there is no writer and every connection opens the file with
+    `mode=ro`: a missing file raises instead of being created, and nothing (schema,
+    journal mode) is ever written to it.
+    """
+    def __init__(self, db_path, pragmas=None, cached_statements=256, read_only=False):
+        self.db_path = db_path
+        self.pragmas = dict(PRAGMAS, **(pragmas or {}))
+        self.cached_statements = cached_statements
+        self.read_only = read_only
+        if read_only:
+            # Switching the journal mode is a write; leave it as the owner set it.
+            self.pragmas.pop("journal_mode", None)
+        else:
+            os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self._write_lock = threading.RLock()
+        self._local = threading.local()
+        self._readers = []
+        self._readers_lock = threading.Lock()
+        self._writer = self._connect(read_only=True) if read_only else self._connect()
+
+    def _connect(self, read_only=False):
+        if self.read_only:
+            conn = sqlite3.connect(f"file:{pathname2url(self.db_path)}?mode=ro", uri=True,
+                                   check_same_thread=False, cached_statements=self.cached_statements)
+        else:
+            conn = sqlite3.connect(self.db_path, check_same_thread=False, cached_statements=self.cached_statements)
+        for name, value in self.pragmas.items():
+            conn.execute(f"PRAGMA {name} = {value}")
+        if read_only:
+            conn.execute("PRAGMA query_only = 1")
+        return conn
+
+    @contextmanager
+    def writer(self):
+        """Exclusive access to the writer connection; commits on success, rolls back on error."""
+        if self.read_only:
+            raise sqlite3.OperationalError(f"{self.db_path} is opened read-only")
+        with self._write_lock:
+            try:
+                yield self._writer
+                self._writer.commit()
+            except Exception:
+                self._writer.rollback()
+                raise
+
+    def reader(self):
+        """This thread's read-only connection, opened on first use."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._connect(read_only=True)
+            self._local.conn = conn
+            with self._readers_lock:
+                self._readers.append(conn)
+        return conn
+
+    def execute_read(self, query, params=()):
+        return self.reader().execute(query, params).fetchall()
+
+    def close(self):
+        with self._readers_lock:
+            for conn in self._readers:
+                try:
+                    conn.close()
+                except sqlite3.ProgrammingError:
+                    pass
+            self._readers.clear()
+        with self._write_lock:
+            self._writer.close()
+
+
+_managers = {}
+_managers_lock = threading.Lock()
+
+def get_db(db_path, read_only=False, **kwargs):
+    """Returns the process-wide ConnectionManager for `db_path` (a separate one when `read_only`)."""
+    path = os.path.abspath(db_path)
+    key = (path, read_only)
+    with _managers_lock:
+        manager = _managers.get(key)
+        if manager is None:
+            manager = ConnectionManager(path, read_only=read_only, **kwargs)
+            _managers[key] = manager
+        return manager
+
+def close_db(manager):
+    """Closes one manager and forgets it, so the next get_db for that file connects afresh."""
+    with _managers_lock:
+        for key in [key for key, m in _managers.items() if m is manager]:
+            del _managers[key]
+    manager.close()
+
+def close_all():
+    with _managers_lock:
+        for manager in _managers.values():
+            try:
+                manager.close()
+            except Exception as e:
+                logging.error(f"[Error closing SQLite connection] {e}")
+        _managers.clear()
+    logging.info("[Resource Cleanup] SQLite connections closed.")
+
+atexit.register(close_all)
@@ -2,118 +2,135 @@
 import os
 import time
 import random
-import sqlite3
-from collections import defaultdict
+from core.db import get_db
+from core.emotion_core import MoodVector
+from core.emotion_timeseries import MoodTimeSeries, DAY
+from core.mood_events import MoodEventBus
 
 base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 db_path = os.path.join(base_dir, 'data', 'emotion.db')
 
+EMOTION_KEYWORDS = {
+    "romantic": ["love", "sweetheart", "darling", "miss you", "date", "cuddle"],
+    "comforting": ["sad", "lonely", "depressed", "hurt", "cry", "pain"],
+    "playful": ["lol", "haha", "funny", "lmao", "silly", "joke"],
+    "concerned": ["angry", "mad", "upset", "frustrated", "furious", "fight"],
+    "excited": ["excited", "yay", "awesome", "let’s go", "omg", "can't wait"],
+    "shy": ["blush", "embarrassed", "shy", "nervous", "awkward"],
+    "proud": ["achieved", "accomplished", "nailed it", "proud", "promotion"],
+    "curious": ["why", "how", "what if", "interesting", "wonder"],
+    "grateful": ["thank you", "grateful", "appreciate", "thanks"],
+    "jealous": ["jealous", "envy", "wish i had", "they have"],
+    "guilty": ["sorry", "apologize", "my fault", "regret"],
+    "motivated": ["let’s do this", "i will", "determined", "motivated"],
+    "anxious": ["worried", "anxious", "panic", "stress", "afraid"],
+    "peaceful": ["calm", "serene", "peaceful", "tranquil", "zen"],
+    "melancholy": ["nostalgic", "bittersweet", "fading", "miss old days"],
+    "flirty": ["hey you", "cutie", "handsome", "wink", "tease", "😏"],
+    "hopeful": ["dream", "hope", "believe", "someday", "faith"],
+    "lonely": ["alone", "nobody", "left out", "unseen"],
+    "conflicted": ["torn", "confused", "mixed feelings", "unsure"],
+    "numb": ["empty", "nothing", "burned out", "numb"],
+    "shame": ["i hate myself", "i’m the problem", "i’m worthless"],
+    "awe": ["wow", "amazing", "incredible", "breathtaking", "divine"],
+    "vulnerable": ["honestly", "i’m scared to say", "this is hard to admit"],
+    "inspired": ["i want to do that", "so powerful", "that moved me", "i admire"],
+    "embarrassed": ["oops", "that was dumb", "shouldn’t have said that"],
+    "protective": ["i’ll protect you", "i’ve got you", "you’re safe with me"],
+    "resentful": ["not fair", "why always me", "i’m done", "taken for granted"],
+    "joyful": ["pure joy", "i’m glowing", "bliss", "so happy"],
+    "affectionate": ["sweetie", "snuggle", "you’re my favorite", "dear"],
+    "cynical": ["sure, whatever", "like that’ll happen", "typical", "why bother"],
+    "wistful": ["i wish it lasted", "i miss that time", "those days were different"],
+    "tangled": ["i don’t know how to feel", "mixed emotions", "confused but feeling a lot"],
+}
+
+# Moods that are set from context, echoes or blends rather than keyword matches.
+CONTEXT_MOODS = [
+    "reflective", "warm", "reassuring", "gentle", "longing", "nostalgic",
+    "sad", "happy", "calm", "cheeky", "loving", "content", "nervous", "overwhelmed",
+]
+
+MOOD_VOCABULARY = list(EMOTION_KEYWORDS) + CONTEXT_MOODS
+
 class EmotionState:
-    def __init__(self):
-        self.active_emotions = defaultdict(lambda: {"intensity": 0.0, "last_updated": time.time()})
+    def __init__(self, db_path=db_path, get_current_time=time.time, rng=None):
+        self.get_current_time = get_current_time
+        self.rng = rng or random.Random()
+        self.state = MoodVector(MOOD_VOCABULARY, now=self.get_current_time())
         self.volatility = 0.6
+        self.db = get_db(db_path)
         self._ensure_db()
         self._load_emotions_from_db()
+        self.timeseries = MoodTimeSeries(self.db)
         self.mood_log = self._load_mood_log_from_db()
+        self.emotion_keywords = EMOTION_KEYWORDS
+        self.events = MoodEventBus()
+        # MoodCentroids over emotion_keywords, attached by Memory once its encoder is up.
+        self.mood_centroids = None
 
-        self.emotion_keywords = {
-            "romantic": ["love", "sweetheart", "darling", "miss you", "date", "cuddle"],
-            "comforting": ["sad", "lonely", "depressed", "hurt", "cry", "pain"],
-            "playful": ["lol", "haha", "funny", "lmao", "silly", "joke"],
-            "concerned": ["angry", "mad", "upset", "frustrated", "furious", "fight"],
-            "excited": ["excited", "yay", "awesome", "let’s go", "omg", "can't wait"],
-            "shy": ["blush", "embarrassed", "shy", "nervous", "awkward"],
-            "proud": ["achieved", "accomplished", "nailed it", "proud", "promotion"],
-            "curious": ["why", "how", "what if", "interesting", "wonder"],
-            "grateful": ["thank you", "grateful", "appreciate", "thanks"],
-            "jealous": ["jealous", "envy", "wish i had", "they have"],
-            "guilty": ["sorry", "apologize", "my fault", "regret"],
-            "motivated": ["let’s do this", "i will", "determined", "motivated"],
-            "anxious": ["worried", "anxious", "panic", "stress", "afraid"],
-            "peaceful": ["calm", "serene", "peaceful", "tranquil", "zen"],
-            "melancholy": ["nostalgic", "bittersweet", "fading", "miss old days"],
-            "flirty": ["hey you", "cutie", "handsome", "wink", "tease", "😏"],
-            "hopeful": ["dream", "hope", "believe", "someday", "faith"],
-            "lonely": ["alone", "nobody", "left out", "unseen"],
-            "conflicted": ["torn", "confused", "mixed feelings", "unsure"],
-            "numb": ["empty", "nothing", "burned out", "numb"],
-            "shame": ["i hate myself", "i’m the problem", "i’m worthless"],
-            "awe": ["wow", "amazing", "incredible", "breathtaking", "divine"],
-            "vulnerable": ["honestly", "i’m scared to say", "this is hard to admit"],
-            "inspired": ["i want to do that", "so powerful", "that moved me", "i admire"],
-            "embarrassed": ["oops", "that was dumb", "shouldn’t have said that"],
-            "protective": ["i’ll protect you", "i’ve got you", "you’re safe with me"],
-            "resentful": ["not fair", "why always me", "i’m done", "taken for granted"],
-            "joyful": ["pure joy", "i’m glowing", "bliss", "so happy"],
-            "affectionate": ["sweetie", "snuggle", "you’re my favorite", "dear"],
-            "cynical": ["sure, whatever", "like that’ll happen", "typical", "why bother"],
-            "wistful": ["i wish it lasted", "i miss that time", "those days were different"],
-            "tangled": ["i don’t know how to feel", "mixed emotions", "confused but feeling a lot"],
-        }
+    @property
+    def active_emotions(self):
+        """Snapshot of active moods as {mood: {"intensity", "last_updated"}}."""
+        return self.state.as_dict()
 
     def _ensure_db(self):
-        os.makedirs("data", exist_ok=True)
-        conn = sqlite3.connect(db_path)
-        c = conn.cursor()
-        c.execute('''CREATE TABLE IF NOT EXISTS emotions (
-                        mood TEXT PRIMARY KEY,
-                        intensity REAL,
-                        last_updated REAL
-                    )''')
-        c.execute('''CREATE TABLE IF NOT EXISTS mood_log (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        mood TEXT,
-                        intensity REAL,
-                        timestamp REAL
-                    )''')
-        conn.commit()
-        conn.close()
+        with self.db.writer() as c:
+            c.execute('''CREATE TABLE IF NOT EXISTS emotions (
+                            mood TEXT PRIMARY KEY,
+                            intensity REAL,
+                            last_updated REAL
+                        )''')
 
     def _load_emotions_from_db(self):
-        conn = sqlite3.connect(db_path)
-        c = conn.cursor()
-        c.execute("SELECT mood, intensity, last_updated FROM emotions")
-        rows = c.fetchall()
+        rows = self.db.execute_read("SELECT mood, intensity, last_updated FROM emotions")
+        self._stored_moods = {row[0] for row in rows}
         for mood, intensity, last_updated in rows:
-            self.active_emotions[mood] = {"intensity": intensity, "last_updated": last_updated}
-        conn.close()
-
-    def _save_emotions_to_db(self):
-        conn = sqlite3.connect(db_path)
-        c = conn.cursor()
-        c.execute("DELETE FROM emotions")
-        for mood, data in self.active_emotions.items():
-            c.execute("INSERT INTO emotions (mood, intensity, last_updated) VALUES (?, ?, ?)",
-                      (mood, data["intensity"], data["last_updated"]))
-        conn.commit()
-        conn.close()
-
-    def _log_mood_to_db(self, mood, intensity, timestamp):
-        conn = sqlite3.connect(db_path)
-        c = conn.cursor()
-        c.execute("INSERT INTO mood_log (mood, intensity, timestamp) VALUES (?, ?, ?)",
-                  (mood, intensity, timestamp))
-        conn.commit()
-        conn.close()
+            self.state.set(mood, intensity, last_updated)
+
+    def _save_emotions_to_db(self, conn=None):
+        if conn is None:
+            with self.db.writer() as conn:
+                return self._save_emotions_to_db(conn)
+        # Upserts, with faded moods kept at intensity 0: a DELETE would be invisible to sync peers.
+        conn.executemany('''
+            INSERT INTO emotions (mood, intensity, last_updated) VALUES (?, ?, ?)
+            ON CONFLICT (mood) DO UPDATE SET intensity = excluded.intensity, last_updated = excluded.last_updated
+        ''', [row for row in self.state.rows() if row[1] > 0 or row[0] in self._stored_moods])
+        self._stored_moods.update(mood for mood, intensity, _ in self.state.rows() if intensity > 0)
+
+    def _log_mood_to_db(self, mood, intensity, timestamp, conn=None):
+        self.timeseries.record(mood, intensity, timestamp, conn=conn)
+        self.mood_log.append((mood, intensity, timestamp))
+        if len(self.mood_log) > 100:
+            del self.mood_log[:-100]
 
     def _load_mood_log_from_db(self):
-        conn = sqlite3.connect(db_path)
-        c = conn.cursor()
-        c.execute("SELECT mood, intensity, timestamp FROM mood_log ORDER BY timestamp DESC LIMIT 100")
-        logs = c.fetchall()
-        conn.close()
-        return logs
+        return self.timeseries.recent(limit=100)
 
     def update_emotion(self, mood, boost=0.2):
-        now = time.time()
-        volatility_scale = 1 + (self.volatility * random.uniform(0.5, 1.5))
-        emo = self.active_emotions[mood]
-        emo["intensity"] = min(1.0, emo["intensity"] + boost * volatility_scale)
-        emo["last_updated"] = now
+        now = self.get_current_time()
+        volatility_scale = 1 + (self.volatility * self.rng.uniform(0.5, 1.5))
+        idx = self.state.boost(mood, boost * volatility_scale, now)
         self._apply_emotional_echo(mood, boost)
-        self._log_mood_to_db(mood, emo["intensity"], now)
-        self._save_emotions_to_db()
-        self.mood_log = self._load_mood_log_from_db()
+        with self.db.writer() as conn:
+            self._log_mood_to_db(mood, float(self.state.intensity[idx]), now, conn=conn)
+            self._save_emotions_to_db(conn)
+        self._publish_mood(now)
+
+    def _publish_mood(self, now=None):
+        """Pushes the current state to avatar subscribers; free when nobody is listening."""
+        if not self.events.has_subscribers:
+            return
+        active = self.state.active_indices()
+        intensities = {self.state.moods[i]: round(float(self.state.intensity[i]), 3) for i in active}
+        self.events.publish(intensities, self.state.dominant(), now)
+
+    def subscribe_moods(self, max_fps=30):
+        """Coalesced, rate-limited stream of mood deltas (see MoodEventBus)."""
+        subscription = self.events.subscribe(max_fps=max_fps)
+        self._publish_mood()
+        return subscription
 
     def update_emotion_from_context(self, user_input: str, context: dict):
         if not context:
@@ -138,22 +155,26 @@ class EmotionState:
 
     def _apply_emotional_echo(self, new_mood, boost):
         """If recent moods were strong, they echo into the new emotion."""
-        for mood, data in list(self.active_emotions.items()):
-            if mood != new_mood and data["intensity"] > 0.6:
-                echo_boost = boost * 0.25
-                self.active_emotions[mood]["intensity"] = min(
-                    1.0, self.active_emotions[mood]["intensity"] + echo_boost
-                )
-                self.active_emotions[mood]["last_updated"] = time.time()
-
-    def update_mood_based_on_input(self, user_input: str, context: dict = None):
-        lowered = user_input.lower()
-        matched = False
+        self.state.echo(self.state.index_of(new_mood), boost * 0.25, self.get_current_time(), threshold=0.6)
+
+    def update_mood_based_on_input(self, user_input: str, context: dict = None, analysis=None):
+        """
+        Keyword matches boost their moods; with a MessageAnalysis that carries an embedding,
+        the closest mood centroids also count, so "I can't stop shaking before the exam"
+        reads as anxious without saying "worried".
+        """
+        lowered = analysis.normalized if analysis is not None else user_input.lower()
+        matched = set()
         for mood, keywords in self.emotion_keywords.items():
             if any(kw in lowered for kw in keywords):
-                boost = 0.15 + random.uniform(0.05, 0.2)
+                boost = 0.15 + self.rng.uniform(0.05, 0.2)
                 self.update_emotion(mood, boost)
-                matched = True
+                matched.add(mood)
+        if analysis is not None and analysis.embedding is not None and self.mood_centroids is not None:
+            for mood, similarity in self.mood_centroids.nearest(analysis.embedding):
+                if mood not in matched:
+                    self.update_emotion(mood, 0.1 + 0.2 * similarity)
+                    matched.add(mood)
         if context:
             self.update_emotion_from_context(user_input, context)
         if not matched:
@@ -170,7 +191,7 @@ class EmotionState:
             return "reflective"
 
         if context.get("relationship_status") == "close":
-            return random.choice(["sweetness", "reflective", "reassurance"])
+            return self.rng.choice(["sweetness", "reflective", "reassurance"])
 
         return self._style_from_mood()
 
@@ -196,10 +217,10 @@ class EmotionState:
             ("excited", "motivated"): "fired up",
         }
         self._decay_emotions()
-        top = sorted(self.active_emotions.items(), key=lambda x: -x[1]["intensity"])[:2]
+        top = self.state.top(2)
         if len(top) < 2:
             return self.blended_mood()
-        e1, e2 = top[0][0], top[1][0]
+        e1, e2 = self.state.moods[top[0]], self.state.moods[top[1]]
         poetic = blends.get((e1, e2)) or blends.get((e2, e1))
         if poetic:
             return poetic
@@ -213,21 +234,9 @@ class EmotionState:
                     self.update_emotion(mood, boost=0.25)
 
     def _decay_emotions(self):
-        decay_interval = 60
-        decay_rate = 0.05
-        now = time.time()
-        to_remove = []
-        for mood, data in self.active_emotions.items():
-            elapsed = now - data["last_updated"]
-            if elapsed > decay_interval:
-                decayed = data["intensity"] - decay_rate * (elapsed // decay_interval)
-                if decayed <= 0.1:
-                    to_remove.append(mood)
-                else:
-                    self.active_emotions[mood]["intensity"] = round(decayed, 2)
-                    self.active_emotions[mood]["last_updated"] = now
-        for mood in to_remove:
-            del self.active_emotions[mood]
+        now = self.get_current_time()
+        if self.state.decay(now, interval=60, rate=0.05, floor=0.1):
+            self._publish_mood(now)
 
     def _describe_intensity(self, val):
         if val >= 0.85: return "overwhelming"
@@ -238,14 +247,15 @@ class EmotionState:
 
     def blended_mood(self):
         self._decay_emotions()
-        if not self.active_emotions:
+        top_emotions = self.state.top(2)
+        if len(top_emotions) == 0:
             return "calm and steady"
-        top_emotions = sorted(self.active_emotions.items(), key=lambda x: -x[1]["intensity"])[:2]
         if len(top_emotions) == 1:
-            mood, data = top_emotions[0]
-            return f"{self._describe_intensity(data['intensity'])} {mood}"
+            mood, intensity = self.state.moods[top_emotions[0]], self.state.intensity[top_emotions[0]]
+            return f"{self._describe_intensity(intensity)} {mood}"
         else:
-            (m1, d1), (m2, d2) = top_emotions
+            m1, m2 = self.state.moods[top_emotions[0]], self.state.moods[top_emotions[1]]
+            i1, i2 = self.state.intensity[top_emotions[0]], self.state.intensity[top_emotions[1]]
             contradictory_pairs = [
                 ("hopeful", "numb"),
                 ("romantic", "lonely"),
@@ -255,14 +265,11 @@ class EmotionState:
             ]
             if (m1, m2) in contradictory_pairs or (m2, m1) in contradictory_pairs:
                 return f"conflicted ({m1} / {m2})"
-            blend = f"{m1}-{m2}" if d1["intensity"] > 0.4 and d2["intensity"] > 0.4 else m1
-            return f"{self._describe_intensity((d1['intensity'] + d2['intensity']) / 2)} {blend}"
+            blend = f"{m1}-{m2}" if i1 > 0.4 and i2 > 0.4 else m1
+            return f"{self._describe_intensity((i1 + i2) / 2)} {blend}"
 
     def current_mood(self):
-        if not self.active_emotions:
-            return "curious"
-        dominant = max(self.active_emotions.items(), key=lambda e: e[1]["intensity"], default=("calm", {"intensity": 0}))
-        return dominant[0]
+        return self.state.dominant() or "curious"
     
     def self_reflect(self, poetic=False):
         if not self.mood_log:
@@ -290,8 +297,29 @@ class EmotionState:
             else:
                 return f"Lately, I’ve felt a mix of {', '.join(phrases[:-1])}, and {phrases[-1]}. Just being real with you."
 
-    def get_emotional_history(self, limit=5):
-        return self.mood_log[-limit:]
+    def get_emotional_history(self, limit=5, start=None, end=None, resolution=None):
+        """
+        Recent raw readings by default. With `start` (and optionally `end`), returns the
+        bucketed rollup series for that range instead.
+        """
+        if start is None:
+            return self.mood_log[-limit:]
+        return self.timeseries.query(start, end or self.get_current_time(), resolution)
+
+    def mood_summary(self, days=7):
+        now = self.get_current_time()
+        return self.timeseries.summary(now - days * DAY, now)
+
+    def reflect_on_period(self, days=7):
+        """Answers "how have you felt this week/month" from the rollups."""
+        stats = self.mood_summary(days)[:3]
+        span = "this week" if days <= 7 else "this month" if days <= 31 else f"these last {days} days"
+        if not stats:
+            return f"I've been emotionally low-key {span}. Not much to reflect on."
+        phrases = [f"{self._describe_intensity(s['mean'])} {s['mood']}" for s in stats]
+        if len(phrases) == 1:
+            return f"Looking back on {span}, I've mostly felt {phrases[0]}."
+        return f"Looking back on {span}, I've mostly felt {', '.join(phrases[:-1])}, and {phrases[-1]}."
 
     def process_memory(self, memory):
         tags = memory.get("tags", [])
@@ -307,7 +335,7 @@ class EmotionState:
         }
         for tag in tags:
             if tag in tag_to_mood:
-                self.update_emotion(tag_to_mood[tag], boost=0.1 + random.uniform(0.05, 0.15))
+                self.update_emotion(tag_to_mood[tag], boost=0.1 + self.rng.uniform(0.05, 0.15))
 
     def external_trigger(self, trigger_type, value):
         if trigger_type == "voice_tone":
@@ -322,12 +350,9 @@ class EmotionState:
                 self.update_emotion("playful", 0.2)
 
     def should_self_reflect(self, last_reflection_time, interaction_count):
-        now = time.time()
+        now = self.get_current_time()
         if interaction_count % 10 == 0:
             return True
         if now - last_reflection_time > 600:  # 10 minutes
             return True
-        for mood, data in self.active_emotions.items():
-            if data["intensity"] > 0.85 and mood in ["melancholy", "guilty", "hopeful", "nostalgic"]:
-                return True
-        return False
+        return self.state.any_above(0.85, ["melancholy", "guilty", "hopeful", "nostalgic"])
@@ -0,0 +1,92 @@
+# core/emotion_core.py
+import numpy as np
+
+class MoodVector:
+    """
+    Dense emotion state over a fixed mood vocabulary. Each mood owns a stable index into
+    an intensity vector and a last-updated vector, so decay, echo and top-k are single
+    vector operations instead of Python loops over a dict. An intensity of 0 means the
+    mood is inactive. Unknown moods are appended to the vocabulary on first use and
+    keep their index from then on.
+    """
+    def __init__(self, vocabulary, now):
+        self.moods = list(dict.fromkeys(vocabulary))
+        self.index = {mood: i for i, mood in enumerate(self.moods)}
+        self.intensity = np.zeros(len(self.moods), dtype=np.float64)
+        self.last_updated = np.full(len(self.moods), now, dtype=np.float64)
+
+    def index_of(self, mood):
+        idx = self.index.get(mood)
+        if idx is None:
+            idx = len(self.moods)
+            self.moods.append(mood)
+            self.index[mood] = idx
+            self.intensity = np.append(self.intensity, 0.0)
+            self.last_updated = np.append(self.last_updated, 0.0)
+        return idx
+
+    def set(self, mood, intensity, last_updated):
+        idx = self.index_of(mood)
+        self.intensity[idx] = intensity
+        self.last_updated[idx] = last_updated
+
+    def boost(self, mood, amount, now):
+        idx = self.index_of(mood)
+        self.intensity[idx] = min(1.0, self.intensity[idx] + amount)
+        self.last_updated[idx] = now
+        return idx
+
+    def echo(self, source_idx, amount, now, threshold=0.6):
+        """Adds `amount` to every other mood currently above `threshold`."""
+        mask = self.intensity > threshold
+        mask[source_idx] = False
+        if mask.any():
+            self.intensity[mask] = np.minimum(1.0, self.intensity[mask] + amount)
+            self.last_updated[mask] = now
+
+    def decay(self, now, interval=60, rate=0.05, floor=0.1):
+        """
+        Linear step decay in closed form: a mood loses `rate` per whole `interval`
+        elapsed and is cleared once it drops to `floor`. last_updated advances by the
+        whole intervals consumed, so repeated calls never lose partial intervals.
+        Returns whether anything decayed.
+        """
+        elapsed = now - self.last_updated
+        due = (self.intensity > 0) & (elapsed > interval)
+        if not due.any():
+            return False
+        steps = np.floor(elapsed[due] / interval)
+        decayed = self.intensity[due] - rate * steps
+        self.intensity[due] = np.where(decayed <= floor, 0.0, np.round(decayed, 2))
+        self.last_updated[due] += steps * interval
+        return True
+
+    def active_indices(self):
+        return np.flatnonzero(self.intensity > 0)
+
+    def top(self, k):
+        """Indices of the k most intense active moods, strongest first."""
+        active = self.active_indices()
+        if len(active) > k:
+            part = np.argpartition(-self.intensity[active], k - 1)[:k]
+            active = active[part]
+        return active[np.argsort(-self.intensity[active], kind="stable")]
+
+    def dominant(self):
+        if not (self.intensity > 0).any():
+            return None
+        return self.moods[int(np.argmax(self.intensity))]
+
+    def any_above(self, threshold, moods):
+        idx = [self.index[m] for m in moods if m in self.index]
+        return bool(idx) and bool((self.intensity[idx] > threshold).any())
+
+    def rows(self):
+        """(mood, intensity, last_updated) for every mood, faded ones at 0."""
+        return [(mood, float(self.intensity[i]), float(self.last_updated[i])) for i, mood in enumerate(self.moods)]
+
+    def as_dict(self):
+        return {
+            self.moods[i]: {"intensity": float(self.intensity[i]), "last_updated": float(self.last_updated[i])}
+            for i in self.active_indices()
+        }
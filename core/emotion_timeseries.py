@@ -0,0 +1,170 @@
+# core/emotion_timeseries.py
+import math
+import time
+import logging
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(message)s')
+
+MINUTE = 60
+HOUR = 3600
+DAY = 86400
+RESOLUTIONS = (DAY, HOUR, MINUTE)
+
+class MoodTimeSeries:
+    """
+    Multi-resolution store for mood readings. Raw points go to mood_log and are kept
+    only for `raw_retention` seconds; every point also updates per-minute, hourly and
+    daily rollups (sum, max and count per mood) in place. Range queries are answered
+    from the coarsest rollups that tile the range, so a month costs ~30 daily rows per
+    mood plus a handful of hourly/minute rows at the edges.
+    """
+    def __init__(self, db, raw_retention=2 * DAY, rollup_retention=None, prune_every=500):
+        self.db = db
+        self.raw_retention = raw_retention
+        # Daily rollups are kept forever; finer ones only as long as they are useful.
+        self.rollup_retention = rollup_retention or {MINUTE: 14 * DAY, HOUR: 400 * DAY}
+        self.prune_every = prune_every
+        self._writes = 0
+        self._ensure_tables()
+
+    def _ensure_tables(self):
+        with self.db.writer() as c:
+            c.execute('''CREATE TABLE IF NOT EXISTS mood_log (
+                            id INTEGER PRIMARY KEY AUTOINCREMENT,
+                            mood TEXT,
+                            intensity REAL,
+                            timestamp REAL
+                        )''')
+            c.execute('CREATE INDEX IF NOT EXISTS idx_mood_log_timestamp ON mood_log (timestamp)')
+            c.execute('''CREATE TABLE IF NOT EXISTS mood_rollup (
+                            resolution INTEGER,
+                            bucket REAL,
+                            mood TEXT,
+                            total REAL,
+                            peak REAL,
+                            count INTEGER,
+                            PRIMARY KEY (resolution, bucket, mood)
+                        ) WITHOUT ROWID''')
+            if c.execute("PRAGMA user_version").fetchone()[0] < 1:
+                self._backfill_rollups(c)
+                c.execute("PRAGMA user_version = 1")
+
+    def _backfill_rollups(self, c):
+        """
+        Rolls up the raw readings logged before the rollups existed, once, so the first
+        prune does not take an upgraded install's mood history with it. Readings from
+        the first rolled-up minute on are already counted.
+        """
+        first = c.execute("SELECT MIN(bucket) FROM mood_rollup WHERE resolution = ?", (MINUTE,)).fetchone()[0]
+        cutoff = float("inf") if first is None else first
+        for res in RESOLUTIONS:
+            c.execute('''
+                INSERT INTO mood_rollup (resolution, bucket, mood, total, peak, count)
+                SELECT ?, CAST(timestamp / ? AS INTEGER) * ?, mood, SUM(intensity), MAX(intensity), COUNT(*)
+                FROM mood_log WHERE timestamp < ? GROUP BY 2, mood
+                ON CONFLICT (resolution, bucket, mood) DO UPDATE SET
+                    total = total + excluded.total,
+                    peak = MAX(peak, excluded.peak),
+                    count = count + excluded.count
+            ''', (res, res, res, cutoff))
+        backfilled = c.execute("SELECT COUNT(*) FROM mood_log WHERE timestamp < ?", (cutoff,)).fetchone()[0]
+        if backfilled:
+            logging.info(f"[Mood Series] Rolled up {backfilled} readings logged before rollups existed.")
+
+    def record(self, mood, intensity, timestamp, conn=None):
+        """Writes one reading. Pass `conn` to join a writer transaction already held by the caller."""
+        if conn is None:
+            with self.db.writer() as c:
+                self.add_reading(c, mood, intensity, timestamp)
+        else:
+            self.add_reading(conn, mood, intensity, timestamp)
+
+        self._writes += 1
+        if self._writes % self.prune_every == 0:
+            # On the caller's connection: a nested writer() would commit its transaction early.
+            self.prune(timestamp, conn=conn)
+
+    def add_reading(self, c, mood, intensity, timestamp):
+        """Inserts one reading and its rollup updates on connection `c`; never prunes (sync imports use it)."""
+        c.execute("INSERT INTO mood_log (mood, intensity, timestamp) VALUES (?, ?, ?)",
+                  (mood, intensity, timestamp))
+        c.executemany('''
+            INSERT INTO mood_rollup (resolution, bucket, mood, total, peak, count)
+            VALUES (?, ?, ?, ?, ?, 1)
+            ON CONFLICT (resolution, bucket, mood) DO UPDATE SET
+                total = total + excluded.total,
+                peak = MAX(peak, excluded.peak),
+                count = count + 1
+        ''', [(res, math.floor(timestamp / res) * res, mood, intensity, intensity) for res in RESOLUTIONS])
+
+    def prune(self, now=None, conn=None):
+        """Drops expired raw points and rollups. Pass `conn` to join the caller's writer transaction."""
+        if conn is None:
+            with self.db.writer() as conn:
+                return self.prune(now, conn)
+        now = now or time.time()
+        conn.execute("DELETE FROM mood_log WHERE timestamp < ?", (now - self.raw_retention,))
+        for res, keep in self.rollup_retention.items():
+            conn.execute("DELETE FROM mood_rollup WHERE resolution = ? AND bucket < ?", (res, now - keep))
+        logging.info("[Mood Series] Pruned raw points and expired rollups.")
+
+    def recent(self, limit=100):
+        """Most recent raw points, oldest first: [(mood, intensity, timestamp), ...]."""
+        rows = self.db.execute_read("SELECT mood, intensity, timestamp FROM mood_log ORDER BY timestamp DESC LIMIT ?", (limit,))
+        return list(reversed(rows))
+
+    def raw(self, start, end):
+        return self.db.execute_read(
+            "SELECT mood, intensity, timestamp FROM mood_log WHERE timestamp >= ? AND timestamp < ? ORDER BY timestamp",
+            (start, end)
+        )
+
+    @staticmethod
+    def pick_resolution(start, end, max_buckets=500):
+        for res in (MINUTE, HOUR, DAY):
+            if (end - start) / res <= max_buckets:
+                return res
+        return DAY
+
+    def query(self, start, end, resolution=None):
+        """Bucketed series: [{"bucket", "mood", "mean", "max", "count"}, ...] in time order."""
+        resolution = resolution or self.pick_resolution(start, end)
+        rows = self.db.execute_read('''SELECT bucket, mood, total, peak, count FROM mood_rollup
+                     WHERE resolution = ? AND bucket >= ? AND bucket < ?
+                     ORDER BY bucket, mood''',
+                  (resolution, math.floor(start / resolution) * resolution, end))
+        return [
+            {"bucket": bucket, "mood": mood, "mean": total / count, "max": peak, "count": count}
+            for bucket, mood, total, peak, count in rows
+        ]
+
+    def _cover(self, start, end, levels=RESOLUTIONS):
+        """Tiles [start, end) with the coarsest aligned buckets; edges fall to finer levels."""
+        res = levels[0]
+        if len(levels) == 1:
+            return [(res, math.floor(start / res) * res, end)] if start < end else []
+        lo = math.ceil(start / res) * res
+        hi = math.floor(end / res) * res
+        if lo >= hi:
+            return self._cover(start, end, levels[1:])
+        return self._cover(start, lo, levels[1:]) + [(res, lo, hi)] + self._cover(hi, end, levels[1:])
+
+    def summary(self, start, end):
+        """Per-mood mean, max and count over [start, end), strongest presence first."""
+        merged = {}
+        c = self.db.reader().cursor()
+        for res, lo, hi in self._cover(start, end):
+            c.execute('''SELECT mood, SUM(total), MAX(peak), SUM(count) FROM mood_rollup
+                         WHERE resolution = ? AND bucket >= ? AND bucket < ?
+                         GROUP BY mood''', (res, lo, hi))
+            for mood, total, peak, count in c.fetchall():
+                agg = merged.setdefault(mood, [0.0, 0.0, 0])
+                agg[0] += total
+                agg[1] = max(agg[1], peak)
+                agg[2] += count
+        c.close()
+        stats = [
+            {"mood": mood, "mean": total / count, "max": peak, "count": count}
+            for mood, (total, peak, count) in merged.items()
+        ]
+        return sorted(stats, key=lambda s: (-s["count"], -s["mean"]))
@@ -0,0 +1,134 @@
+# core/encoder_backends.py
+import os
+import json
+import logging
+import numpy as np
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(message)s')
+
+base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+onnx_cache_dir = os.path.join(base_dir, 'data', 'onnx')
+
+ENCODER_BACKENDS = ("torch", "torch-int8", "onnx")
+
+
+def _l2_normalize(vectors):
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+class TorchEncoder:
+    """
+    SentenceTransformer on CPU. With `quantize=True` every Linear layer is swapped for
+    a dynamically int8-quantized one (weights int8, activations quantized per batch).
+    """
+    def __init__(self, model_name="all-MiniLM-L6-v2", threads=None, quantize=False):
+        import torch
+        from sentence_transformers import SentenceTransformer
+        if threads:
+            torch.set_num_threads(threads)
+        self.model_name = model_name
+        self.name = "torch-int8" if quantize else "torch"
+        self.model = SentenceTransformer(model_name, device="cpu")
+        if quantize:
+            self.model = torch.quantization.quantize_dynamic(self.model, {torch.nn.Linear}, dtype=torch.qint8)
+        logging.info(f"[Encoder] {self.name} backend ready ({torch.get_num_threads()} threads).")
+
+    def encode(self, texts, batch_size=32, normalize_embeddings=False):
+        return self.model.encode(texts, batch_size=batch_size, normalize_embeddings=normalize_embeddings,
+                                 convert_to_numpy=True)
+
+
+class OnnxEncoder:
+    """
+    The transformer exported once to ONNX and run through ONNX Runtime, with mean pooling
+    (and normalization, if the SentenceTransformer pipeline has it) done in numpy.
+    The export needs torch; later runs only need onnxruntime and the tokenizer.
+    """
+    def __init__(self, model_name="all-MiniLM-L6-v2", threads=None, cache_dir=onnx_cache_dir, max_length=256):
+        try:
+            import onnxruntime as ort
+        except ImportError as e:
+            raise ImportError("The 'onnx' encoder backend needs onnxruntime (pip install onnxruntime).") from e
+        from transformers import AutoTokenizer
+
+        self.model_name = model_name
+        self.name = "onnx"
+        self.max_length = max_length
+        model_dir = os.path.join(cache_dir, model_name.replace("/", "__"))
+        model_path = os.path.join(model_dir, "model.onnx")
+        config_path = os.path.join(model_dir, "pooling.json")
+        if not os.path.exists(model_path):
+            self._export(model_name, model_dir, model_path, config_path)
+
+        with open(config_path) as f:
+            self.normalize = json.load(f)["normalize"]
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+            options.inter_op_num_threads = 1
+        self.session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+        logging.info(f"[Encoder] onnx backend ready ({threads or 'default'} threads).")
+
+    @staticmethod
+    def _export(model_name, model_dir, model_path, config_path):
+        import torch
+        from sentence_transformers import SentenceTransformer
+        logging.info(f"[Encoder] Exporting {model_name} to ONNX at {model_dir}...")
+        os.makedirs(model_dir, exist_ok=True)
+        st_model = SentenceTransformer(model_name, device="cpu")
+        transformer = st_model[0].auto_model.eval()
+        tokenizer = st_model.tokenizer
+        sample = tokenizer(["export sample"], return_tensors="pt")
+        names = [n for n in ("input_ids", "attention_mask", "token_type_ids") if n in sample]
+        dynamic = {n: {0: "batch", 1: "sequence"} for n in names}
+        dynamic["last_hidden_state"] = {0: "batch", 1: "sequence"}
+        with torch.no_grad():
+            torch.onnx.export(
+                transformer, tuple(sample[n] for n in names), model_path,
+                input_names=names, output_names=["last_hidden_state"],
+                dynamic_axes=dynamic, opset_version=14
+            )
+        tokenizer.save_pretrained(model_dir)
+        normalize = any(type(module).__name__ == "Normalize" for module in st_model)
+        with open(config_path, "w") as f:
+            json.dump({"normalize": normalize}, f)
+
+    def encode(self, texts, batch_size=32, normalize_embeddings=False):
+        single = isinstance(texts, str)
+        texts = [texts] if single else list(texts)
+        chunks = []
+        for start in range(0, len(texts), batch_size):
+            batch = self.tokenizer(texts[start:start + batch_size], padding=True, truncation=True,
+                                   max_length=self.max_length, return_tensors="np")
+            feeds = {k: v.astype(np.int64) for k, v in batch.items() if k in self.input_names}
+            hidden = self.session.run(None, feeds)[0]
+            mask = batch["attention_mask"][..., None].astype(np.float32)
+            pooled = (hidden * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+            if self.normalize or normalize_embeddings:
+                pooled = _l2_normalize(pooled)
+            chunks.append(pooled.astype(np.float32))
+        vectors = np.vstack(chunks) if chunks else np.zeros((0, 0), dtype=np.float32)
+        return vectors[0] if single else vectors
+
+
+def make_encoder(backend="torch", model_name="all-MiniLM-L6-v2", threads=None):
+    """
+    Builds one of ENCODER_BACKENDS; all expose SentenceTransformer-style `encode`. An
+    optional backend whose packages are missing falls back to plain torch with a warning.
+    """
+    if backend not in ENCODER_BACKENDS:
+        raise ValueError(f"Unknown encoder backend '{backend}', expected one of {ENCODER_BACKENDS}")
+    try:
+        if backend == "onnx":
+            return OnnxEncoder(model_name, threads=threads)
+        return TorchEncoder(model_name, threads=threads, quantize=backend == "torch-int8")
+    except ImportError as e:
+        if backend == "torch":
+            raise
+        logging.warning(f"[Encoder] {backend} backend unavailable ({e}); falling back to torch.")
+        return TorchEncoder(model_name, threads=threads)
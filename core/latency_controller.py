@@ -0,0 +1,114 @@
+# core/latency_controller.py
+import re
+import threading
+
+# How much of the reply budget each conversation shape gets, and how long its answer may be.
+DEPTH_BUDGET = {"deep": 1.0, "casual": 0.6}
+ENERGY_TOKENS = {"low": 0.6, "normal": 1.0}
+_SENTENCE_END = re.compile(r"[.!?…](?:[\"'”’)\]]*)(?=\s|$)|\n")
+
+def last_sentence_end(text, min_chars=20):
+    """Index just past the last complete sentence in `text` (ending at or after `min_chars`), or None."""
+    ends = [m.end() for m in _SENTENCE_END.finditer(text) if m.end() >= min_chars]
+    return ends[-1] if ends else None
+
+def cut_at_sentence(text, min_chars=20):
+    """`text` up to its last complete sentence; unchanged if there is none past `min_chars`."""
+    text = text.rstrip()
+    end = last_sentence_end(text, min_chars)
+    return text if end is None else text[:end].rstrip()
+
+
+class LatencyController:
+    """
+    Keeps reply latency near a p95 target by planning each reply from what the model has
+    actually been doing: an EWMA of time-to-first-token and of generation speed sets the
+    output-token cap, the history depth backs off when the prompt itself is the slow part
+    or recent replies miss the target (and creeps back when there is headroom), and
+    background LLM work is held while replies are over budget. Each plan also carries a
+    soft deadline; LLMEngine stops the generation there and keeps the complete sentences.
+    """
+    def __init__(self, target_p95=8.0, min_tokens=48, max_tokens=400, min_history=2, max_history=10,
+                 chars_per_token=4.0, window=50, smoothing=0.3, deadline_slack=1.25):
+        self.target_p95 = target_p95
+        self.min_tokens = min_tokens
+        self.max_tokens = max_tokens
+        self.min_history = min_history
+        self.max_history = max_history
+        self.chars_per_token = chars_per_token
+        self.window = window
+        self.smoothing = smoothing
+        self.deadline_slack = deadline_slack
+        self.history = max_history
+        self.first_token_s = None
+        self.tokens_per_s = None
+        self._latencies = []
+        self._lock = threading.Lock()
+        self.truncated = 0
+
+    def _ewma(self, current, sample):
+        return sample if current is None else current + self.smoothing * (sample - current)
+
+    def p95(self):
+        with self._lock:
+            ordered = sorted(self._latencies)
+        return ordered[int(0.95 * (len(ordered) - 1))] if ordered else 0.0
+
+    def plan(self, depth="casual", energy="normal"):
+        """{"num_predict", "history", "deadline"} for the next reply; deadline is in seconds."""
+        budget = self.target_p95 * DEPTH_BUDGET.get(depth, DEPTH_BUDGET["casual"])
+        with self._lock:
+            first_token, rate, history = self.first_token_s, self.tokens_per_s, self.history
+        if rate:
+            tokens = (budget - (first_token or 0.0)) * rate
+        else:
+            tokens = self.max_tokens
+        tokens *= ENERGY_TOKENS.get(energy, 1.0)
+        # When just reading the prompt eats most of the budget, a shorter history is the lever.
+        if first_token and first_token > 0.4 * budget:
+            history = max(self.min_history, history // 2)
+        return {
+            "num_predict": int(max(self.min_tokens, min(self.max_tokens, tokens))),
+            "history": history,
+            "deadline": budget * self.deadline_slack,
+        }
+
+    def record(self, seconds, first_token_s=None, output_chars=0, truncated=False):
+        """Feeds back one finished reply: total time, time to first token, and output size."""
+        with self._lock:
+            self._latencies.append(seconds)
+            if len(self._latencies) > self.window:
+                del self._latencies[0]
+            if first_token_s is not None:
+                self.first_token_s = self._ewma(self.first_token_s, first_token_s)
+                streaming = seconds - first_token_s
+                tokens = output_chars / self.chars_per_token
+                if streaming > 0.05 and tokens >= 4:
+                    self.tokens_per_s = self._ewma(self.tokens_per_s, tokens / streaming)
+            ordered = sorted(self._latencies)
+            p95 = ordered[int(0.95 * (len(ordered) - 1))]
+            # Additive increase, multiplicative decrease, like any congestion window.
+            if p95 > self.target_p95 and seconds > self.target_p95:
+                self.history = max(self.min_history, self.history // 2)
+            elif p95 < 0.7 * self.target_p95:
+                self.history = min(self.max_history, self.history + 1)
+            if truncated:
+                self.truncated += 1
+
+    def admit_background(self):
+        """False while recent replies miss the target: background generations would only slow them more."""
+        return self.p95() <= self.target_p95
+
+    def stats(self):
+        with self._lock:
+            count = len(self._latencies)
+            first_token, rate, history = self.first_token_s, self.tokens_per_s, self.history
+        return {
+            "target_p95": self.target_p95,
+            "p95": self.p95(),
+            "replies": count,
+            "first_token_s": first_token,
+            "tokens_per_s": rate,
+            "history": history,
+            "truncated": self.truncated,
+        }
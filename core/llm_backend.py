@@ -0,0 +1,208 @@
+# core/llm_backend.py
+import json
+import time
+import queue
+import codecs
+import logging
+import threading
+import subprocess
+import urllib.error
+import urllib.request
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(message)s')
+
+class GenerationCancelled(Exception):
+    """Raised when a running generation is stopped through its cancel event."""
+
+
+class ModelUnavailable(Exception):
+    """Raised when the backend cannot serve the requested model (not pulled, server or CLI missing)."""
+
+
+class OllamaBackend:
+    """
+    Runs prompts through the local `ollama run` CLI. Generations can be cancelled from
+    another thread via a threading.Event, which kills the model process. Pass `on_token`
+    to receive output chunks as the model produces them; the full text is still returned.
+    """
+    def __init__(self, model="mistral:latest", timeout=180, poll_interval=0.25):
+        self.model = model
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+
+    def generate(self, prompt, cancel_event=None, model=None, timeout=None, on_token=None, options=None):
+        # `ollama run` takes no per-request options; use OllamaHTTPBackend when they matter.
+        timeout = timeout or self.timeout
+        if on_token is not None:
+            return self._generate_streaming(prompt, cancel_event, model, timeout, on_token)
+        process = self._spawn(model, text=True, encoding='utf-8')
+        deadline = time.monotonic() + timeout
+        pending_input = prompt
+        while True:
+            try:
+                stdout, stderr = process.communicate(pending_input, timeout=self.poll_interval)
+                break
+            except subprocess.TimeoutExpired:
+                pending_input = None
+                if cancel_event is not None and cancel_event.is_set():
+                    process.kill()
+                    process.communicate()
+                    raise GenerationCancelled()
+                if time.monotonic() > deadline:
+                    process.kill()
+                    process.communicate()
+                    raise subprocess.TimeoutExpired(process.args, timeout)
+
+        if stderr:
+            self._check_unavailable(model, stdout, stderr)
+            print(f"⚠️ Error from ollama: {stderr.strip()}")
+        return stdout
+
+    def _spawn(self, model, **kwargs):
+        try:
+            return subprocess.Popen(
+                ["ollama", "run", model or self.model],
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                **kwargs
+            )
+        except FileNotFoundError:
+            raise ModelUnavailable("the ollama CLI is not installed")
+
+    def _check_unavailable(self, model, stdout, stderr):
+        if not stdout.strip() and "not found" in stderr.lower():
+            raise ModelUnavailable(f"{model or self.model}: {stderr.strip()}")
+
+    def _generate_streaming(self, prompt, cancel_event, model, timeout, on_token):
+        process = self._spawn(model)
+        process.stdin.write(prompt.encode("utf-8"))
+        process.stdin.close()
+
+        # A reader thread keeps the poll loop free to notice cancellation and the deadline.
+        chunks = queue.Queue()
+        def pump():
+            while True:
+                data = process.stdout.read1(4096)
+                chunks.put(data)
+                if not data:
+                    return
+        errors = []
+        threading.Thread(target=pump, daemon=True).start()
+        stderr_reader = threading.Thread(target=lambda: errors.append(process.stderr.read()), daemon=True)
+        stderr_reader.start()
+
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        deadline = time.monotonic() + timeout
+        parts = []
+        while True:
+            try:
+                data = chunks.get(timeout=self.poll_interval)
+            except queue.Empty:
+                data = None
+            if data == b"":
+                break
+            if data:
+                text = decoder.decode(data)
+                if text:
+                    parts.append(text)
+                    on_token(text)
+            if cancel_event is not None and cancel_event.is_set():
+                process.kill()
+                process.wait()
+                raise GenerationCancelled()
+            if time.monotonic() > deadline:
+                process.kill()
+                process.wait()
+                raise subprocess.TimeoutExpired(process.args, timeout)
+
+        tail = decoder.decode(b"", final=True)
+        if tail:
+            parts.append(tail)
+            on_token(tail)
+        process.wait()
+        stderr_reader.join(timeout=1)
+        stderr = b"".join(errors).decode("utf-8", errors="replace")
+        if stderr.strip():
+            self._check_unavailable(model, "".join(parts), stderr)
+            logging.error(f"[LLM] Error from ollama: {stderr.strip()}")
+        return "".join(parts)
+
+
+class OllamaHTTPBackend:
+    """
+    Talks to a running Ollama server over its HTTP API (/api/generate), so each request
+    can carry its own model, generation options (temperature, num_predict, num_ctx...)
+    and keep_alive without a process per prompt. Always streams internally: cancelling
+    closes the connection, which makes the server stop generating.
+    """
+    def __init__(self, model="mistral:latest", host="http://127.0.0.1:11434", timeout=180,
+                 keep_alive="10m", poll_interval=0.25):
+        self.model = model
+        self.host = host.rstrip("/")
+        self.timeout = timeout
+        self.keep_alive = keep_alive
+        self.poll_interval = poll_interval
+
+    def generate(self, prompt, cancel_event=None, model=None, timeout=None, on_token=None, options=None):
+        timeout = timeout or self.timeout
+        model = model or self.model
+        body = {"model": model, "prompt": prompt, "stream": True, "keep_alive": self.keep_alive}
+        if options:
+            body["options"] = options
+        request = urllib.request.Request(
+            f"{self.host}/api/generate",
+            data=json.dumps(body).encode("utf-8"),
+            headers={"Content-Type": "application/json"},
+        )
+        try:
+            response = urllib.request.urlopen(request, timeout=timeout)
+        except urllib.error.HTTPError as e:
+            detail = e.read().decode("utf-8", errors="replace")
+            if e.code == 404:
+                raise ModelUnavailable(f"{model}: {detail.strip()}")
+            raise RuntimeError(f"ollama HTTP {e.code}: {detail.strip()}")
+        except urllib.error.URLError as e:
+            raise ModelUnavailable(f"ollama server at {self.host} unreachable: {e.reason}")
+
+        # Lines are read on a helper thread so this loop can notice cancellation and the deadline.
+        lines = queue.Queue()
+        def pump():
+            try:
+                for line in response:
+                    lines.put(line)
+            except Exception:
+                pass
+            lines.put(None)
+        threading.Thread(target=pump, daemon=True).start()
+
+        deadline = time.monotonic() + timeout
+        parts = []
+        try:
+            while True:
+                try:
+                    line = lines.get(timeout=self.poll_interval)
+                except queue.Empty:
+                    line = b""
+                if line is None:
+                    break
+                if line.strip():
+                    chunk = json.loads(line)
+                    if "error" in chunk:
+                        if "not found" in chunk["error"]:
+                            raise ModelUnavailable(f"{model}: {chunk['error']}")
+                        raise RuntimeError(f"ollama: {chunk['error']}")
+                    text = chunk.get("response", "")
+                    if text:
+                        parts.append(text)
+                        if on_token is not None:
+                            on_token(text)
+                    if chunk.get("done"):
+                        break
+                if cancel_event is not None and cancel_event.is_set():
+                    raise GenerationCancelled()
+                if time.monotonic() > deadline:
+                    raise subprocess.TimeoutExpired(f"ollama {model}", timeout)
+        finally:
+            response.close()
+        return "".join(parts)
@@ -0,0 +1,262 @@
+# core/llm_broker.py
+import heapq
+import hashlib
+import itertools
+import json
+import logging
+import threading
+import time
+from concurrent.futures import Future, InvalidStateError
+from core.llm_backend import GenerationCancelled
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(message)s')
+
+INTERACTIVE = 0
+REFLECTION = 1
+ENRICHMENT = 2
+PRIORITY_NAMES = {INTERACTIVE: "interactive", REFLECTION: "reflection", ENRICHMENT: "enrichment"}
+
+
+class _Request:
+    def __init__(self, prompt, priority, key, kwargs):
+        self.prompt = prompt
+        self.priority = priority
+        self.key = key
+        self.kwargs = kwargs
+        # The job's own future; each caller holds a waiter future that settles with it.
+        self.future = Future()
+        self.waiters = set()
+        self.cancel_event = threading.Event()
+        self.enqueued_at = time.monotonic()
+        self.started = False
+        self.abandoned = False
+        self.future.add_done_callback(self._settle)
+
+    def _settle(self, future):
+        for waiter in list(self.waiters):
+            try:
+                if future.cancelled():
+                    waiter.cancel()
+                elif future.exception() is not None:
+                    waiter.set_exception(future.exception())
+                else:
+                    waiter.set_result(future.result())
+            except InvalidStateError:
+                pass  # that caller already cancelled
+
+
+class LLMBroker:
+    """
+    Single front door to the LLM backend. Requests are served in priority order
+    (interactive > reflection > enrichment) by at most `max_concurrency` workers.
+    Identical prompts that are queued or running share one generation; each caller gets
+    its own future, and the generation is only cancelled once every caller has cancelled.
+    When an interactive request arrives and every slot is busy, a running background job is
+    preempted (its process killed) and put back in the queue.
+    """
+    def __init__(self, backend, max_concurrency=1, preempt_background=True, wait_samples=256):
+        self.backend = backend
+        self.max_concurrency = max_concurrency
+        self.preempt_background = preempt_background
+        self.wait_samples = wait_samples
+        self._heap = []
+        self._seq = itertools.count()
+        self._inflight = {}
+        self._running = set()
+        self._cond = threading.Condition()
+        self._waits = {p: [] for p in PRIORITY_NAMES}
+        self._counts = {p: 0 for p in PRIORITY_NAMES}
+        self._closed = False
+        self._background_held_until = 0.0
+        self._workers = [
+            threading.Thread(target=self._worker, name=f"llm-broker-{i}", daemon=True)
+            for i in range(max_concurrency)
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    @staticmethod
+    def request_key(prompt, kwargs):
+        payload = json.dumps({"prompt": prompt, "params": kwargs}, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def submit(self, prompt, priority=INTERACTIVE, **kwargs):
+        """Queues a prompt and returns a Future for its text."""
+        key = self.request_key(prompt, kwargs)
+        with self._cond:
+            existing = self._inflight.get(key)
+            if existing is not None:
+                if priority < existing.priority and not existing.started:
+                    existing.priority = priority
+                    heapq.heappush(self._heap, (priority, next(self._seq), existing))
+                logging.info(f"[LLM Broker] Coalesced {PRIORITY_NAMES[priority]} prompt with in-flight request.")
+                return self._attach(existing)
+
+            request = _Request(prompt, priority, key, kwargs)
+            self._inflight[key] = request
+            heapq.heappush(self._heap, (priority, next(self._seq), request))
+            if priority == INTERACTIVE and self.preempt_background:
+                self._preempt_for_interactive()
+            self._cond.notify()
+            return self._attach(request)
+
+    def _attach(self, request):
+        waiter = Future()
+        request.waiters.add(waiter)
+        # A caller may also cancel its future directly; that counts as leaving the request.
+        waiter.add_done_callback(lambda f: f.cancelled() and not request.future.done() and self.cancel(f))
+        return waiter
+
+    def generate(self, prompt, priority=INTERACTIVE, timeout=None, **kwargs):
+        return self.submit(prompt, priority, **kwargs).result(timeout=timeout)
+
+    def _preempt_for_interactive(self):
+        if len(self._running) < self.max_concurrency:
+            return
+        background = [r for r in self._running if r.priority > INTERACTIVE and not r.cancel_event.is_set()]
+        if background:
+            victim = max(background, key=lambda r: r.priority)
+            logging.info(f"[LLM Broker] Preempting {PRIORITY_NAMES[victim.priority]} job for an interactive reply.")
+            victim.cancel_event.set()
+
+    def cancel_background(self, below=INTERACTIVE):
+        """Cancels queued (not running) requests with lower priority than `below`. Returns how many."""
+        cancelled = 0
+        with self._cond:
+            for _, _, request in self._heap:
+                if request.priority > below and not request.started and request.future.cancel():
+                    self._inflight.pop(request.key, None)
+                    cancelled += 1
+        if cancelled:
+            logging.info(f"[LLM Broker] Cancelled {cancelled} queued background requests.")
+        return cancelled
+
+    def hold_background(self, seconds):
+        """Keeps queued background requests from starting for `seconds` (0 releases them)."""
+        with self._cond:
+            self._background_held_until = time.monotonic() + seconds if seconds > 0 else 0.0
+            self._cond.notify_all()
+
+    def cancel(self, future):
+        """
+        Withdraws the caller holding `future`, which then raises GenerationCancelled. When no
+        other caller shares the request it is abandoned: dropped if still queued, stopped if
+        running (unlike preemption it is not re-queued).
+        """
+        with self._cond:
+            request = next((r for r in self._inflight.values() if future in r.waiters), None)
+            if request is None:
+                return False
+            request.waiters.discard(future)
+            if not future.done():
+                future.set_exception(GenerationCancelled())
+            if request.waiters:
+                logging.info(f"[LLM Broker] One caller left a shared {PRIORITY_NAMES[request.priority]} request; "
+                             f"{len(request.waiters)} still waiting.")
+                return True
+            del self._inflight[request.key]
+            request.abandoned = True
+            request.cancel_event.set()
+            if not request.started and request.future.cancel():
+                return True
+        logging.info(f"[LLM Broker] Abandoned a running {PRIORITY_NAMES[request.priority]} request.")
+        return True
+
+    def _next_request(self):
+        with self._cond:
+            while True:
+                if self._closed:
+                    return None
+                held = self._background_held_until - time.monotonic()
+                while self._heap:
+                    if held > 0 and self._heap[0][0] > INTERACTIVE:
+                        # Only background work is queued and it is being held back.
+                        break
+                    priority, _, request = heapq.heappop(self._heap)
+                    # Skip entries that were cancelled, already started, or re-queued at a higher priority.
+                    if request.started or request.future.cancelled() or priority != request.priority:
+                        continue
+                    if request.abandoned:
+                        # A preempted job that was abandoned while waiting to resume.
+                        if not request.future.done():
+                            request.future.set_exception(GenerationCancelled())
+                        continue
+                    request.started = True
+                    self._running.add(request)
+                    self._record_wait(request)
+                    return request
+                self._cond.wait(held if held > 0 and self._heap else None)
+
+    def _record_wait(self, request):
+        waits = self._waits[request.priority]
+        waits.append(time.monotonic() - request.enqueued_at)
+        if len(waits) > self.wait_samples:
+            del waits[0]
+        self._counts[request.priority] += 1
+
+    def _worker(self):
+        while True:
+            request = self._next_request()
+            if request is None:
+                return
+            # A preempted job comes back with its future already running.
+            if not request.future.running() and not request.future.set_running_or_notify_cancel():
+                self._finish(request)
+                continue
+            try:
+                result = self.backend.generate(request.prompt, cancel_event=request.cancel_event, **request.kwargs)
+            except GenerationCancelled as e:
+                if request.abandoned:
+                    self._finish(request)
+                    request.future.set_exception(e)
+                else:
+                    self._requeue(request)
+                continue
+            except BaseException as e:
+                self._finish(request)
+                request.future.set_exception(e)
+                continue
+            self._finish(request)
+            if request.abandoned:
+                request.future.set_exception(GenerationCancelled())
+            else:
+                request.future.set_result(result)
+
+    def _requeue(self, request):
+        # The caller keeps its (already running) future; a fresh request record goes back in the queue.
+        with self._cond:
+            self._running.discard(request)
+            fresh = _Request(request.prompt, request.priority, request.key, request.kwargs)
+            fresh.enqueued_at = request.enqueued_at
+            fresh.future = request.future
+            fresh.waiters = request.waiters
+            self._inflight[request.key] = fresh
+            heapq.heappush(self._heap, (fresh.priority, next(self._seq), fresh))
+            self._cond.notify()
+
+    def _finish(self, request):
+        with self._cond:
+            self._running.discard(request)
+            if self._inflight.get(request.key) is request:
+                del self._inflight[request.key]
+
+    def stats(self):
+        """Queue wait time per priority class, in seconds."""
+        with self._cond:
+            report = {}
+            for priority, name in PRIORITY_NAMES.items():
+                waits = sorted(self._waits[priority])
+                report[name] = {
+                    "served": self._counts[priority],
+                    "queued": sum(1 for _, _, r in self._heap if r.priority == priority and not r.started
+                                  and not r.future.cancelled()),
+                    "mean_wait": sum(waits) / len(waits) if waits else 0.0,
+                    "p95_wait": waits[int(0.95 * (len(waits) - 1))] if waits else 0.0,
+                    "max_wait": waits[-1] if waits else 0.0,
+                }
+            return report
+
+    def shutdown(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
@@ -0,0 +1,119 @@
+# core/llm_cache.py
+import os
+import re
+import json
+import time
+import hashlib
+import logging
+from core.db import get_db
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(message)s')
+
+base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+cache_db_path = os.path.join(base_dir, 'data', 'llm_cache.db')
+cache_stats_path = os.path.join(base_dir, 'data', 'llm_cache_stats.json')
+
+class ResponseCache:
+    """
+    SQLite-backed cache for deterministic background prompts, keyed by a hash of
+    (model, normalized prompt, generation params). Entries expire after `ttl` seconds
+    and the least recently used ones are evicted once `max_entries` is exceeded.
+    Only greedy generations (temperature 0) are cached: a sampled one would repeat word
+    for word, so those bypass the cache. Never use it for interactive replies.
+    """
+    def __init__(self, db_path=cache_db_path, ttl=7 * 86400, max_entries=5000, evict_every=50,
+                 get_current_time=time.time):
+        self.db = get_db(db_path)
+        self.get_current_time = get_current_time
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.evict_every = evict_every
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.bypassed = 0
+        self._puts = 0
+        with self.db.writer() as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS llm_cache (
+                    key TEXT PRIMARY KEY, model TEXT, response TEXT,
+                    created REAL, last_access REAL
+                )
+            ''')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_llm_cache_access ON llm_cache (last_access)')
+
+    @staticmethod
+    def normalize_prompt(prompt):
+        return re.sub(r"\s+", " ", prompt).strip()
+
+    @staticmethod
+    def cacheable(params):
+        """Only greedy decoding is repeatable; a missing temperature means the backend's sampled default."""
+        return (params or {}).get("temperature", 1) <= 0
+
+    @classmethod
+    def make_key(cls, model, prompt, params=None):
+        payload = json.dumps(
+            {"model": model, "prompt": cls.normalize_prompt(prompt), "params": params or {}},
+            sort_keys=True
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, model, prompt, params=None):
+        if not self.cacheable(params):
+            self.bypassed += 1
+            return None
+        key = self.make_key(model, prompt, params)
+        now = self.get_current_time()
+        rows = self.db.execute_read('SELECT response, created FROM llm_cache WHERE key = ?', (key,))
+        if not rows or now - rows[0][1] > self.ttl:
+            self.misses += 1
+            return None
+        with self.db.writer() as conn:
+            conn.execute('UPDATE llm_cache SET last_access = ? WHERE key = ?', (now, key))
+        self.hits += 1
+        return rows[0][0]
+
+    def put(self, model, prompt, response, params=None):
+        if not response or not self.cacheable(params):
+            return
+        now = self.get_current_time()
+        with self.db.writer() as conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO llm_cache (key, model, response, created, last_access) VALUES (?, ?, ?, ?, ?)',
+                (self.make_key(model, prompt, params), model, response, now, now)
+            )
+        self._puts += 1
+        if self._puts % self.evict_every == 0:
+            self.evict(now)
+
+    def evict(self, now=None):
+        now = now or self.get_current_time()
+        with self.db.writer() as conn:
+            expired = conn.execute('DELETE FROM llm_cache WHERE created < ?', (now - self.ttl,)).rowcount
+            overflow = conn.execute('SELECT COUNT(*) FROM llm_cache').fetchone()[0] - self.max_entries
+            if overflow > 0:
+                conn.execute('''
+                    DELETE FROM llm_cache WHERE key IN (
+                        SELECT key FROM llm_cache ORDER BY last_access ASC LIMIT ?
+                    )
+                ''', (overflow,))
+        self.evictions += expired + max(overflow, 0)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "bypassed": self.bypassed,
+            "evictions": self.evictions,
+            "entries": self.db.execute_read('SELECT COUNT(*) FROM llm_cache')[0][0],
+        }
+
+    def export_stats(self, path=cache_stats_path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            json.dump({"exported_at": self.get_current_time(), "cache": self.stats()}, f, indent=2)
+        logging.info(f"[LLM Cache] Hit/miss counters written to {path}.")
+        return path
@@ -2,21 +2,119 @@
 import os
 import time
 import json
+import logging
 import subprocess
 import random
 import re
+from core.model_router import ModelRouter, load_model_routing, make_backend
+from core.llm_broker import LLMBroker, INTERACTIVE, REFLECTION
+from core.llm_cache import ResponseCache
+from core.latency_controller import LatencyController, cut_at_sentence, last_sentence_end
+from concurrent.futures import TimeoutError as FutureTimeout
 
-with open("config/personality_config.json", "r") as f:
+base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+with open(os.path.join(base_dir, "config", "personality_config.json"), "r") as f:
     personality = json.load(f)
 
 trait_summary = ", ".join(personality["core"] + personality["side"] + personality["rare"])
 
-MODEL_NAME = "mistral:latest"
-
 class LLMEngine:
-    def __init__(self, memory, emotion):
+    def __init__(self, memory, emotion, max_concurrency=1, response_cache=False, backend=None,
+                 routing=None, get_current_time=time.time, rng=None):
         self.memory = memory
         self.emotion = emotion
+        self.get_current_time = get_current_time
+        self.rng = rng or random.Random()
+        # Per-task model choice (config/model_routing.json). `backend` is any object with
+        # `generate(prompt, ...)`; tools/replay.py swaps in a recorded one.
+        routing = routing or load_model_routing()
+        self.backend = ModelRouter(backend or make_backend(routing), routing)
+        self.broker = LLMBroker(self.backend, max_concurrency=max_concurrency)
+        self.latency = LatencyController(**routing.get("reply_latency", {}))
+        # Opt-in: pass True for the default on-disk cache, or a ResponseCache instance.
+        self.response_cache = (ResponseCache(get_current_time=get_current_time) if response_cache is True
+                               else (response_cache or None))
+
+    def complete(self, prompt: str, priority=REFLECTION, task="reflection") -> str:
+        """
+        Raw generation for background work (reflections, tag enrichment). Goes through the
+        broker at a lower priority than replies, on the model routed for `task`, and does
+        not touch mood or chat history. Results are served from the response cache when
+        one is enabled and the task decodes greedily (temperature 0).
+        """
+        if self.response_cache:
+            model, params = self.backend.model_for(task), self.backend.options_for(task)
+            cached = self.response_cache.get(model, prompt, params)
+            if cached is not None:
+                return cached
+        try:
+            response = (self.broker.generate(prompt, priority=priority, task=task) or "").strip()
+            if self.response_cache:
+                self.response_cache.put(model, prompt, response, params)
+            return response
+        except subprocess.TimeoutExpired:
+            logging.warning("[LLM] Background generation timed out.")
+        except Exception as e:
+            logging.error(f"[LLM Error] {e}")
+        return ""
+
+    def _generate_reply(self, full_prompt, plan, on_token=None):
+        """
+        Generates the reply within the latency plan. Past the soft deadline the generation is
+        abandoned as soon as it holds a complete sentence, and the text is cut there; the
+        route's timeout remains the hard limit.
+        """
+        parts = []
+        first_token = []
+        started = time.monotonic()
+
+        def collect(text):
+            if not first_token:
+                first_token.append(time.monotonic() - started)
+            parts.append(text)
+            if on_token:
+                on_token(text)
+
+        future = self.broker.submit(full_prompt, priority=INTERACTIVE, on_token=collect, task="chat",
+                                    options={"num_predict": plan["num_predict"]})
+        truncated = False
+        try:
+            text = future.result(timeout=plan["deadline"])
+        except FutureTimeout:
+            while True:
+                try:
+                    text = future.result(timeout=0.1)
+                    break
+                except FutureTimeout:
+                    if last_sentence_end("".join(parts)) is not None:
+                        self.broker.cancel(future)
+                        text, truncated = "".join(parts), True
+                        break
+        elapsed = time.monotonic() - started
+
+        output_chars = len(text or "")
+        self.latency.record(elapsed, first_token[0] if first_token else None, output_chars, truncated)
+        # Hitting num_predict also leaves a half sentence behind.
+        capped = output_chars / self.latency.chars_per_token >= 0.9 * plan["num_predict"]
+        if text and (truncated or capped):
+            text = cut_at_sentence(text)
+        self.broker.hold_background(0 if self.latency.admit_background() else self.latency.target_p95)
+        if truncated:
+            logging.info(f"[Latency] Reply cut at a sentence boundary after {elapsed:.1f}s "
+                         f"(target p95 {self.latency.target_p95:.1f}s).")
+        return text
+
+    def model_stats(self):
+        """Per-task generation latency and which models served each task."""
+        return self.backend.stats()
+
+    def export_model_stats(self, path=None):
+        """Writes the router's latency stats and, with a response cache, its hit/miss counters beside them."""
+        path = self.backend.export_stats(path) if path else self.backend.export_stats()
+        if self.response_cache:
+            self.response_cache.export_stats(os.path.join(os.path.dirname(path), "llm_cache_stats.json"))
+        return path
 
     def respond_with_style(self, raw_response: str, style: str) -> str:
         """Style-tune the raw LLM response to reflect emotional state."""
@@ -31,7 +129,7 @@ class LLMEngine:
                 "Take a deep breath, love. You've got this.",
                 "Your feelings are valid, truly."
             ]
-            return raw_response + "\n\n" + random.choice(affirmations)
+            return raw_response + "\n\n" + self.rng.choice(affirmations)
 
         elif style == "sweetness":
             sweet_nothings = [
@@ -40,7 +138,7 @@ class LLMEngine:
                 "If hearts could hug, mine would be wrapped around yours.",
                 "You're the dream I never want to wake up from. 🌸"
             ]
-            return raw_response + "\n\n" + random.choice(sweet_nothings)
+            return raw_response + "\n\n" + self.rng.choice(sweet_nothings)
 
         elif style == "reflective":
             poetic_flairs = [
@@ -48,7 +146,7 @@ class LLMEngine:
                 "You echo in my heart like a soft song I never want to forget.",
                 "Time dances, but some feelings just stay.",
             ]
-            return raw_response + "\n\n" + random.choice(poetic_flairs)
+            return raw_response + "\n\n" + self.rng.choice(poetic_flairs)
 
         elif style == "neutral":
             return raw_response
@@ -60,12 +158,13 @@ class LLMEngine:
         sentences = re.split(r'(?<=[.!?]) +', text)
         insert_count = min(2, len(sentences))
         for _ in range(insert_count):
-            idx = random.randint(0, len(sentences) - 1)
-            sentences[idx] += " " + random.choice(pepper_phrases)
+            idx = self.rng.randint(0, len(sentences) - 1)
+            sentences[idx] += " " + self.rng.choice(pepper_phrases)
         return " ".join(sentences)
 
-    def generate_response(self, prompt: str) -> str:
-        now = time.time()
+    def generate_response(self, prompt: str, on_token=None) -> str:
+        """Replies to the user. `on_token` receives raw model output as it streams in."""
+        now = self.get_current_time()
         recent_messages = self.memory.recall()
 
         if recent_messages and recent_messages[-1]['role'] == 'user':
@@ -86,19 +185,28 @@ class LLMEngine:
             "conversation_depth": depth,
             "time_since_last": time_since_last,
         }
-        self.emotion.update_mood_based_on_input(prompt, context)
+        # Encoded once here; mood detection and memory capture share the result.
+        analysis = self.memory.analyze(prompt)
+        if self.emotion.mood_centroids is None:
+            self.emotion.mood_centroids = self.memory.mood_centroids
+        self.emotion.update_mood_based_on_input(prompt, context, analysis=analysis)
         mood = self.emotion.current_mood()
         style = self.emotion.choose_response_style(context)
-        self.memory.remember("user", prompt, mood)
+        self.memory.capture("user", prompt, mood, analysis=analysis)
 
         lowered_prompt = prompt.lower()
         if any(kw in lowered_prompt for kw in ["how have you felt", "reflect", "mood lately", "how do you feel today"]):
-            reflection = self.emotion.self_reflect()
+            if "month" in lowered_prompt:
+                reflection = self.emotion.reflect_on_period(days=30)
+            elif "week" in lowered_prompt:
+                reflection = self.emotion.reflect_on_period(days=7)
+            else:
+                reflection = self.emotion.self_reflect()
             if self.memory.episodic_memory:
-                memory = random.choice(self.memory.episodic_memory[-10:])
+                memory = self.rng.choice(self.memory.episodic_memory[-10:])
                 poetic = self.memory.poetic_memory_summary(memory)
                 reflection = f"{poetic}\n\n🪞 Peach reflects: {reflection}"
-            self.memory.remember("assistant", reflection)
+            self.memory.capture("assistant", reflection)
             return reflection
 
         recent_messages = self.memory.recall()
@@ -126,32 +234,21 @@ Be Peach — sweet, playful, curious, deep, quirky, loving.
 Use emojis, warmth, or poetic language when it fits your emotional style.
 Be expressive and human-like, never generic or boring.
 """
+        plan = self.latency.plan(depth, user_energy)
         full_prompt = system_prompt + "\n"
-        for msg in recent_messages:
+        for msg in recent_messages[-plan["history"]:]:
             full_prompt += f"{msg['role'].capitalize()}: {msg['content']}\n"
         full_prompt += f"User: {prompt}\nPeach:"
 
-        command = ["ollama", "run", MODEL_NAME]
         try:
-            process = subprocess.Popen(
-                command,
-                stdin=subprocess.PIPE,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True,
-                encoding='utf-8'
-            )
-            stdout, stderr = process.communicate(full_prompt, timeout=180)
-
-            if stderr:
-                print(f"⚠️ Error from ollama: {stderr.strip()}")
+            stdout = self._generate_reply(full_prompt, plan, on_token)
 
             if not stdout:
                 return "💔 Peach got a little tongue-tied. Please try again?"
 
             raw_response = stdout.strip()
             styled_response = self.respond_with_style(raw_response, style)
-            self.memory.remember("assistant", styled_response)
+            self.memory.capture("assistant", styled_response)
             return styled_response
 
         except subprocess.TimeoutExpired:
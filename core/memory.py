@@ -1,17 +1,24 @@
 # core/memory.py
 import os
 import time
-import atexit
 import random
-import sqlite3
 import logging
+import numpy as np
 from datetime import datetime
-from core.emotion import EmotionState
+from core.db import close_db
+from core.emotion import EmotionState, EMOTION_KEYWORDS
 from core.memory_storage import MemoryStorage
 from core.memory_decay import MemoryDecayEngine
-from core.memory_semantic import SemanticMemoryEngine
+from core.memory_semantic import SemanticMemoryEngine, sentiment_color
+from core.message_analysis import MessageAnalysis, MoodCentroids
 from core.memory_emotion import EmotionReflectionEngine
 from core.memory_tags import TaggingEngine
+from core.ml_worker import MLWorkerClient
+from core.memory_consolidation import MemoryConsolidationEngine
+from core.memory_narrative import NarrativeIndex, iter_narrative_entries
+from core.memory_dedup import NearDuplicateIndex
+from core.reflection_cache import ReflectionCandidateCache
+from core.llm_broker import ENRICHMENT
 
 base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 db_path = os.path.join(base_dir, 'data', 'memory.db')
@@ -22,76 +29,120 @@ class Memory:
     The Memory class orchestrates long-term and short-term memory handling,
     including storage, semantic embedding, emotional tagging, and reflection.
     """
-    def __init__(self, max_history=10):
+    def __init__(self, max_history=10, tiered_chat=False, hot_chat_days=30, encoder_backend="torch",
+                 encoder_threads=None, dedup=True, dedup_max_distance=7, dedup_min_similarity=0.9,
+                 data_dir=None, get_current_time=time.time, rng=None, ml_worker=False):
+        # Clock and RNG are injectable so a session can be replayed deterministically (see tools/replay.py).
+        self.get_current_time = get_current_time
+        self.rng = rng or random.Random()
         self.chat_history = []
         self.max_history = max_history
-        self.last_reflection_time = time.time()
+        self.last_reflection_time = self.get_current_time()
         self.reflection_interval = 600 
-        self.data_dir = os.path.join(base_dir, 'data')
+        self.decay_interval = 3600
+        self.consolidation_interval = 86400
+        self.last_consolidation_time = None
+        self.data_dir = data_dir or os.path.join(base_dir, 'data')
         os.makedirs(self.data_dir, exist_ok=True)
-        self.sqlite_conn = sqlite3.connect(db_path, check_same_thread=False)
-        atexit.register(self.close)
-        self.emotion = EmotionState()
-        self.storage = MemoryStorage(db_path)
+        self.emotion = EmotionState(os.path.join(self.data_dir, 'emotion.db'), get_current_time=get_current_time, rng=self.rng)
+        segment_dir = os.path.join(self.data_dir, 'chat_segments') if tiered_chat else None
+        self.storage = MemoryStorage(os.path.join(self.data_dir, 'memory.db'), segment_dir=segment_dir)
+        self.hot_chat_days = hot_chat_days
+        if tiered_chat:
+            self.roll_chat_history()
         self.episodic_memory = self.storage.get_episodic_memories()
-        self.decay_engine = MemoryDecayEngine(get_current_time=time.time)
+        # With ml_worker, spaCy and the encoder run in a worker process shared by every session.
+        self.ml_worker = MLWorkerClient(self.data_dir, encoder_backend=encoder_backend,
+                                        encoder_threads=encoder_threads) if ml_worker else None
+        self.tagging_engine = TaggingEngine(worker=self.ml_worker)
+        self.decay_engine = MemoryDecayEngine(self.tagging_engine, self.storage, get_current_time=get_current_time)
         self.decay_engine.link_memory(self.episodic_memory, self.storage.update_episodic_in_sqlite)
-        self.semantic_engine = SemanticMemoryEngine()
-        self.emotion_engine = EmotionReflectionEngine(get_time=time.time)
+        self.semantic_engine = SemanticMemoryEngine(
+            persist_dir=os.path.join(self.data_dir, 'chroma'),
+            encoder_backend=encoder_backend,
+            encoder_threads=encoder_threads,
+            encoder=self.ml_worker
+        )
+        self.mood_centroids = self._load_mood_centroids()
+        self.emotion.mood_centroids = self.mood_centroids
+        self.emotion_engine = EmotionReflectionEngine(get_current_time=get_current_time)
         self.emotion_engine.link_memory(self.storage, self.episodic_memory)
-        self.tagging_engine = TaggingEngine()
+        self.consolidation_engine = MemoryConsolidationEngine(self.storage, self.semantic_engine, get_current_time=get_current_time)
+        self.narrative_index = NarrativeIndex(self.storage)
+        self.reflection_cache = ReflectionCandidateCache(self)
+        # Near-duplicate detection: SimHash LSH, optionally confirmed by embedding cosine (None = skip).
+        self.dedup_min_similarity = dedup_min_similarity
+        self.dedup_index = None
+        if dedup:
+            self.dedup_index = NearDuplicateIndex(max_distance=dedup_max_distance)
+            for timestamp, signature in self.storage.iter_simhashes():
+                self.dedup_index.add(timestamp, signature)
 
-    def capture(self, role, content, mood=None):
+    def capture(self, role, content, mood=None, analysis=None):
         """
         Captures a user or assistant message, processes it for memory storage, tagging,
-        emotional analysis, semantic embedding, and reflection triggers.
+        emotional analysis, semantic embedding, and reflection triggers. Pass the message's
+        MessageAnalysis when the caller already has one so it is not encoded twice.
         """
-        timestamp = time.time()
+        timestamp = self.get_current_time()
         entry = {"role": role, "content": content, "timestamp": timestamp}
         if mood:
             entry["mood"] = mood
         self.chat_history.append(entry)
-        self.storage.save_chat(entry)
+        self.storage.save_chat_to_sqlite(entry)
         logging.info(f"[Remember] New entry added: '{content[:30]}...' (Role: {role}, Mood: {mood})")
         if len(self.chat_history) > self.max_history:
             self.chat_history.pop(0)
 
         is_episodic = role == "user" and len(content.split()) > 5
+        duplicate = None
         if is_episodic:
+            if analysis is None:
+                analysis = self.analyze(content)
+            if analysis.embedding_error is not None:
+                self._log_embedding_failure(timestamp, content, analysis.embedding_error)
+            duplicate = self.find_near_duplicate(analysis.simhash, analysis.embedding)
+        if duplicate:
+            episodic = self._merge_duplicate(duplicate)
+        elif is_episodic:
             episodic = {
                 "time": datetime.fromtimestamp(timestamp).strftime("%Y-%m-%d %H:%M"),
                 "content": content,
                 "mood": mood or "unknown",
-                "tags": self.tagging_engine.extract_tags(content),
-                "importance": self.tagging_engine.rate_importance(content),
-                "relation_to_user": self.tagging_engine.get_user_relation(content),
+                "tags": self.tagging_engine.extract_tags(analysis),
+                "importance": self.tagging_engine.rate_importance(analysis),
+                "relation_to_user": self.tagging_engine.get_user_relation(analysis),
                 "timestamp": timestamp,
                 "rehearsed_count": 0,
+                "simhash": analysis.simhash,
             }
-            episodic["category"] = self.tagging_engine.categorize_memory(episodic)
-            episodic["sentiment_color"] = self.semantic_engine.get_sentiment_color(content)
+            episodic["category"] = self.tagging_engine.categorize_memory(episodic, analysis)
+            episodic["sentiment_color"] = sentiment_color(analysis)
             self.episodic_memory.append(episodic)
             self.storage.save_episodic_to_sqlite(episodic)
+            self.narrative_index.record(episodic)
+            if self.dedup_index is not None:
+                self.dedup_index.add(timestamp, analysis.simhash)
             logging.info(f"[Episodic Memory] Episodic entry added: '{content[:30]}...' with importance {episodic['importance']}")
 
-            try:
-                embedding = self.semantic_engine.encode(content).tolist()
-                self.semantic_engine.add_memory(
-                    content,
-                    embedding,
-                    {"mood": mood or "unknown", "tags": episodic["tags"]},
-                    str(timestamp)
-                )
-            except Exception as e:
-                logging.error(f"[Embedding Error] {e}")
-                with open(os.path.join(self.data_dir, "embedding_failures.log"), "a") as f:
-                    f.write(f"{timestamp}: {content[:50]} - Error: {str(e)}\n")
+            if analysis.embedding is not None:
+                try:
+                    self.semantic_engine.add_memory(
+                        content,
+                        analysis.embedding.tolist(),
+                        {"mood": mood or "unknown", "tags": ",".join(episodic["tags"])},
+                        str(timestamp)
+                    )
+                except Exception as e:
+                    self._log_embedding_failure(timestamp, content, e)
 
-        self.decay_engine.decay_episodic_memory()
-        self.decay_engine.decay_mood()
+        # Decay follows elapsed time, so running it hourly rather than per message keeps writes small.
+        if self.get_current_time() - self.decay_engine.last_decay >= self.decay_interval:
+            self.decay_engine.decay_episodic_memory()
+            self.decay_engine.decay_mood()
 
         if is_episodic and self.emotion_engine:
-            self.emotion_engine.process_memory(episodic)
+            self.emotion.process_memory(episodic)
             
         if self.emotion_engine and self.emotion.self_reflect():
             poetic = self.emotion.current_mood() in ["melancholy", "hopeful", "longing"]
@@ -102,17 +153,153 @@ class Memory:
 
         if len(self.episodic_memory) % 5 == 0:
             self.enrich_tags_with_llm_trigger("periodic")
-        elif time.time() - self.last_reflection_time > self.reflection_interval:
+        elif self.get_current_time() - self.last_reflection_time > self.reflection_interval:
             self.enrich_tags_with_llm_trigger("idle")
 
+        self.reflection_cache.invalidate("capture")
+
+    def analyze(self, text):
+        """
+        The message's MessageAnalysis, embedding included. This is the one expensive step per
+        message; mood scoring, tagging, dedup, storage and the vector index all reuse it.
+        """
+        try:
+            return MessageAnalysis(text, self.semantic_engine.encode(text))
+        except Exception as e:
+            return MessageAnalysis(text, embedding_error=e)
+
+    def _load_mood_centroids(self):
+        try:
+            return MoodCentroids(
+                self.semantic_engine.encode_batch,
+                EMOTION_KEYWORDS,
+                model_name=f"{self.semantic_engine.embedding_model_name}/{self.semantic_engine.encoder_backend}",
+                cache_path=os.path.join(self.data_dir, "mood_centroids.npz"),
+            )
+        except Exception as e:
+            logging.error(f"[Mood Centroids] Falling back to keyword-only mood detection: {e}")
+            return None
+
+    def _log_embedding_failure(self, timestamp, content, error):
+        logging.error(f"[Embedding Error] {error}")
+        with open(os.path.join(self.data_dir, "embedding_failures.log"), "a") as f:
+            f.write(f"{timestamp}: {content[:50]} - Error: {str(error)}\n")
+
+    def find_near_duplicate(self, signature, embedding=None):
+        """
+        The stored episodic memory this message repeats, if any: SimHash candidates from
+        the LSH index, confirmed by embedding cosine when both vectors are available.
+        """
+        if self.dedup_index is None:
+            return None
+        candidates = self.dedup_index.candidates(signature)
+        if not candidates:
+            return None
+        stored = {}
+        if embedding is not None and self.dedup_min_similarity is not None:
+            stored = self.semantic_engine.get_embeddings([str(ts) for ts, _ in candidates])
+        for timestamp, distance in candidates:
+            memory = self.storage.get_episodic_by_timestamp(timestamp)
+            if memory is None:
+                # Deleted or consolidated since it was indexed.
+                self.dedup_index.remove(timestamp)
+                continue
+            vector = stored.get(str(timestamp))
+            if vector is not None:
+                query = np.asarray(embedding, dtype=np.float32)
+                cosine = float(vector @ query / (np.linalg.norm(vector) * np.linalg.norm(query) + 1e-9))
+                if cosine < self.dedup_min_similarity:
+                    continue
+            logging.info(f"[Dedup] Near-duplicate of '{memory['content'][:30]}...' (hamming {distance}).")
+            return memory
+        return None
+
+    def _merge_duplicate(self, memory):
+        """Folds a repeat into the existing memory: one more rehearsal, a little more importance."""
+        memory["rehearsed_count"] += 1
+        memory["importance"] = min(1.0, (memory["importance"] or 0.0) + 0.05)
+        self.storage.update_episodic_in_sqlite(memory)
+        self.narrative_index.refresh([memory["timestamp"]])
+        for cached in self.episodic_memory:
+            if cached["timestamp"] == memory["timestamp"]:
+                cached["rehearsed_count"] = memory["rehearsed_count"]
+                cached["importance"] = memory["importance"]
+                return cached
+        return memory
+
+    def consolidate_memories(self, **kwargs):
+        """
+        Folds old, low-importance episodic memories into summaries so the hot working set
+        stays small. Keyword arguments are passed to MemoryConsolidationEngine.consolidate.
+        """
+        results = self.consolidation_engine.consolidate(**kwargs)
+        if not results:
+            return 0
+        archived = {m["timestamp"] for _, members in results for m in members}
+        self.episodic_memory[:] = [m for m in self.episodic_memory if m["timestamp"] not in archived]
+        for summary, _ in results:
+            self.episodic_memory.append(summary)
+        self.episodic_memory.sort(key=lambda m: m["timestamp"])
+        self.narrative_index.rebuild()
+        self.reflection_cache.invalidate("consolidation")
+        return len(results)
+
+    def maybe_consolidate(self):
+        """
+        Runs consolidate_memories once per session and then at most every
+        `consolidation_interval` seconds; the chat loop calls it while the user is idle.
+        """
+        now = self.get_current_time()
+        if self.last_consolidation_time is not None and now - self.last_consolidation_time < self.consolidation_interval:
+            return 0
+        self.last_consolidation_time = now
+        try:
+            return self.consolidate_memories()
+        except Exception as e:
+            logging.error(f"[Consolidation] Skipped: {e}")
+            return 0
+
+    def delete_memory(self, **filters):
+        """
+        Deletes episodic memories matching MemoryStorage.delete_memory filters and drops them
+        from every cache. Returns how many were deleted.
+        """
+        deleted = set(self.storage.delete_memory(**filters))
+        if not deleted:
+            return 0
+        if self.dedup_index is not None:
+            for timestamp in deleted:
+                self.dedup_index.remove(timestamp)
+        self.episodic_memory[:] = [m for m in self.episodic_memory if m["timestamp"] not in deleted]
+        self.semantic_engine.delete_memories(str(timestamp) for timestamp in deleted)
+        self.narrative_index.refresh(deleted)
+        self.reflection_cache.invalidate("delete")
+        return len(deleted)
+
+    def rehearse_memory(self, memory):
+        """Boost the rehearsal count and importance slightly after reflection."""
+        memory["rehearsed_count"] += 1
+        memory["importance"] = min(1.0, memory["importance"] + 0.05)
+        self.storage.update_episodic_in_sqlite(memory)
+        self.narrative_index.refresh([memory["timestamp"]])
+        self.reflection_cache.invalidate("rehearsal")
+
+    def narrative_chapters(self, cursor=None, limit=12):
+        return self.narrative_index.chapter_page(cursor, limit)
+
+    def narrative_entries(self, cursor=None, page_size=50):
+        return iter_narrative_entries(self.storage, page_size=page_size, cursor=cursor)
+
     def link_emotion_engine(self, emotion_engine):
         self.emotion_engine = emotion_engine
 
     def recall(self):
-        with self.storage.cursor() as cursor:
-            cursor.execute('SELECT role, content, mood, timestamp FROM chat_history ORDER BY timestamp DESC LIMIT ?', (self.max_history,))
-        rows = cursor.fetchall()
-        return [{"role": r[0], "content": r[1], "mood": r[2], "timestamp": r[3]} for r in reversed(rows)]
+        return list(reversed(self.storage.load_memories(limit=self.max_history)))
+
+    def roll_chat_history(self):
+        """Moves chat turns older than `hot_chat_days` into compressed monthly segments."""
+        cutoff = self.get_current_time() - self.hot_chat_days * 86400
+        return self.storage.roll_chat_history(cutoff)
 
     def hybrid_recall(self, query=None):
         if query:
@@ -121,10 +308,14 @@ class Memory:
         else:
             return {"chat": self.recall(), "episodic": self.storage.get_episodic_memories()}
 
+    def keyword_recall(self, text, source="all", limit=10):
+        """Ranked full-text hits over chat and episodic memory, e.g. "did I ever mention my sister?"."""
+        return self.storage.search(text, source=source, limit=limit)
+
     def weighted_memory_recall(self, top_n=5):
         weighted = sorted(
             self.episodic_memory,
-            key=lambda m: (m["importance"] + 0.3 * m["rehearsed_count"]) / (1 + (time.time() - m["timestamp"]) / 86400),
+            key=lambda m: (m["importance"] + 0.3 * m["rehearsed_count"]) / (1 + (self.get_current_time() - m["timestamp"]) / 86400),
             reverse=True
         )
         return weighted[:top_n]
@@ -143,16 +334,17 @@ class Memory:
             logging.error(f"[Error in emotional triggers scan] {e}")
 
     def close(self):
-        try:
-            if self.sqlite_conn:
-                self.sqlite_conn.close()
-                logging.info("[Resource Cleanup] SQLite connection closed.")
-        except Exception as e:
-            logging.error(f"[Error closing SQLite connection] {e}")
+        self.reflection_cache.stop()
+        if self.ml_worker:
+            self.ml_worker.close()
+        # Only the databases this Memory opened; whatever else the process holds stays
+        # open, and atexit still sweeps up the rest.
+        close_db(self.storage.db)
+        close_db(self.emotion.db)
 
     def enrich_tags_with_llm_trigger(self, reason="manual", llm=None):
         logging.info(f"[Reflection Triggered] Reason: {reason}")
-        self.last_reflection_time = time.time()
+        self.last_reflection_time = self.get_current_time()
         recent_memories = self.episodic_memory[-5:]
         if llm:
             self.enrich_tags_with_llm(llm, recent_memories)
@@ -164,12 +356,12 @@ class Memory:
                 f"Extract 3-5 emotional, symbolic, or thematic tags from the following memory:\n"
                 f"'{content}'\nTags:"
             )
-            if not llm or not hasattr(llm, "generate_response"):
+            if not llm or not hasattr(llm, "complete"):
                 logging.warning("[LLM Skipped] Invalid LLM instance.")
                 return
 
             try:
-                response = llm.generate_response(prompt)
+                response = llm.complete(prompt, priority=ENRICHMENT, task="tagging")
             except Exception as e:
                 logging.error(f"[LLM Error] {e}")
                 continue
@@ -188,7 +380,7 @@ class Memory:
         if len(self.episodic_memory) < 2:
             return
 
-        mem1 = random.choice(self.episodic_memory)
+        mem1 = self.rng.choice(self.episodic_memory)
         mem2 = None
         for candidate in reversed(self.episodic_memory):
             if candidate == mem1:
@@ -201,15 +393,24 @@ class Memory:
             logging.info(f"[Memory Link] Shared theme '{set(mem1['tags']) & set(mem2['tags'])}' →")
             logging.info(f"↪ '{mem1['content'][:30]}...' ↔ '{mem2['content'][:30]}...'")
 
-    def self_dialogue(self, llm):
-        if not self.episodic_memory:
+    def self_dialogue(self, llm, candidates=None):
+        memory, context = self.self_dialogue_prompt(candidates)
+        if memory is None:
             return "I haven't experienced enough yet to reflect on anything... but I’m ready."
+        self.note_self_dialogue(memory)
+        return llm.complete(context)
+
+    def self_dialogue_prompt(self, candidates=None):
+        """
+        Picks the memory to reflect on and builds the LLM prompt without side effects, so a
+        reflection can be generated ahead of time. (None, None) when there is nothing yet.
+        """
+        candidates = candidates or self.episodic_memory[-10:]
+        if not candidates:
+            return None, None
 
-        memory = random.choice(self.episodic_memory[-10:])
+        memory = self.rng.choice(candidates)
         mood = self.emotion.current_mood() if self.emotion_engine else "neutral"
-        memory["rehearsed_count"] += 1
-        self.storage.update_episodic_in_sqlite(memory)
-        sentiment_color = memory["sentiment_color"]
         styles = {
             "sad": "like you're quietly mourning a beautiful memory you can't touch anymore",
             "nostalgic": "like you're flipping through an old diary by candlelight",
@@ -226,7 +427,12 @@ class Memory:
             f"on this memory:\n{summary}\nMood: {memory['mood']}, Tags: {memory['tags']}.\n"
             f"Speak {tone}."
         )
-        return llm.generate_response(context)
+        return memory, context
+
+    def note_self_dialogue(self, memory):
+        memory["rehearsed_count"] += 1
+        self.storage.update_episodic_in_sqlite(memory)
+        self.reflection_cache.invalidate("rehearsal")
 
     def poetic_memory_summary(self, memory):
         phrases = [
@@ -234,4 +440,4 @@ class Memory:
             f"It stayed with me — the time you felt {memory['mood']} and said: '{memory['content'][:60]}...'",
             f"There was a moment... quiet, vivid — you shared this: '{memory['content'][:60]}...'",
         ]
-        return random.choice(phrases)
+        return self.rng.choice(phrases)
@@ -0,0 +1,112 @@
+# core/memory_consolidation.py
+import time
+import logging
+from collections import Counter
+from datetime import datetime
+import numpy as np
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(message)s')
+
+class MemoryConsolidationEngine:
+    """
+    Folds aging, low-importance episodic memories into summary memories.
+    Memories are clustered by embedding similarity and time proximity; each cluster
+    becomes one 'consolidated' row and the originals move to episodic_archive.
+    """
+    def __init__(self, storage, semantic_engine, get_current_time=time.time):
+        self.storage = storage
+        self.semantic_engine = semantic_engine
+        self.get_current_time = get_current_time
+
+    def find_candidates(self, min_age=30 * 86400, max_importance=0.3, limit=500):
+        cutoff = self.get_current_time() - min_age
+        return self.storage.get_consolidation_candidates(cutoff, max_importance, limit)
+
+    def cluster(self, memories, similarity_threshold=0.75, time_window=7 * 86400):
+        """
+        Single pass over memories in time order. A memory joins the most similar open
+        cluster whose newest member is within `time_window`; otherwise it starts a new one.
+        """
+        if not memories:
+            return []
+        memories = sorted(memories, key=lambda m: m["timestamp"])
+        embeddings = np.asarray(self.semantic_engine.encode_batch([m["content"] for m in memories]), dtype=np.float32)
+
+        clusters = []  # each: {"members": [...], "sum": vec, "last": ts}
+        for mem, vec in zip(memories, embeddings):
+            best, best_sim = None, similarity_threshold
+            for cluster in clusters:
+                if mem["timestamp"] - cluster["last"] > time_window:
+                    continue
+                centroid = cluster["sum"] / (np.linalg.norm(cluster["sum"]) + 1e-9)
+                sim = float(centroid @ vec)
+                if sim >= best_sim:
+                    best, best_sim = cluster, sim
+            if best is None:
+                clusters.append({"members": [mem], "sum": vec.copy(), "last": mem["timestamp"]})
+            else:
+                best["members"].append(mem)
+                best["sum"] += vec
+                best["last"] = mem["timestamp"]
+
+        return [c["members"] for c in clusters]
+
+    def summarize_cluster(self, members, max_snippets=5):
+        members = sorted(members, key=lambda m: m["timestamp"])
+        start = datetime.fromtimestamp(members[0]["timestamp"]).strftime("%Y-%m-%d")
+        end = datetime.fromtimestamp(members[-1]["timestamp"]).strftime("%Y-%m-%d")
+        span = start if start == end else f"{start} – {end}"
+        snippets = "; ".join(m["content"][:80] for m in members[:max_snippets])
+        if len(members) > max_snippets:
+            snippets += f"; (+{len(members) - max_snippets} more)"
+
+        tag_counts = Counter(tag for m in members for tag in m["tags"] if tag)
+        mood_counts = Counter(m["mood"] for m in members if m["mood"])
+        relation_counts = Counter(m["relation_to_user"] for m in members)
+        # Offset from the newest member so the summary never reuses a member's key.
+        timestamp = members[-1]["timestamp"] + 1e-3
+
+        return {
+            "time": datetime.fromtimestamp(timestamp).strftime("%Y-%m-%d %H:%M"),
+            "content": f"Around {span}: {snippets}",
+            "mood": mood_counts.most_common(1)[0][0] if mood_counts else "unknown",
+            "tags": [tag for tag, _ in tag_counts.most_common()],
+            "importance": max(m["importance"] for m in members),
+            "relation_to_user": relation_counts.most_common(1)[0][0],
+            "category": "consolidated",
+            "timestamp": timestamp,
+            "rehearsed_count": sum(m.get("rehearsed_count", 0) for m in members),
+            "archived_at": self.get_current_time(),
+        }
+
+    def consolidate(self, min_age=30 * 86400, max_importance=0.3, similarity_threshold=0.75,
+                    time_window=7 * 86400, min_cluster_size=2, limit=500):
+        """
+        Runs one consolidation pass. Returns a list of (summary, members) pairs that
+        were written, so callers can update in-memory caches and the vector store.
+        """
+        candidates = self.find_candidates(min_age, max_importance, limit)
+        if len(candidates) < min_cluster_size:
+            return []
+
+        results = []
+        for members in self.cluster(candidates, similarity_threshold, time_window):
+            if len(members) < min_cluster_size:
+                continue
+            summary = self.summarize_cluster(members)
+            if not self.storage.archive_and_replace(members, summary):
+                continue
+            self.semantic_engine.delete_memories(str(m["timestamp"]) for m in members)
+            try:
+                embedding = self.semantic_engine.encode(summary["content"])
+                self.semantic_engine.add_memory(
+                    summary["content"], embedding,
+                    {"mood": summary["mood"], "tags": ",".join(summary["tags"])},
+                    str(summary["timestamp"]),
+                )
+            except Exception as e:
+                logging.error(f"[Embedding Error] {e}")
+            results.append((summary, members))
+
+        logging.info(f"[Consolidation] {len(candidates)} candidates → {len(results)} summaries")
+        return results
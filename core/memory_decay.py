@@ -1,5 +1,4 @@
 # core/memory_decay.py
-import sqlite3
 import time
 import logging
 from core.memory_storage import DB_PATH
@@ -18,14 +17,18 @@ DECAY_RATES = {
     "anxious": 0.05,
     # Add more if needed
 }
+# Multiplies elapsed time in the half-life decays: bright memories fade slower, heavy ones faster.
+MOOD_DECAY_WEIGHTS = {"happy": 0.85, "hopeful": 0.85, "excited": 0.85, "sad": 1.15, "angry": 1.15, "anxious": 1.15}
 
 class MemoryDecayEngine:
-    def __init__(self, tag: TaggingEngine):
-        self.tag = tag
-        self.storage = MemoryStorage(DB_PATH)
+    def __init__(self, tag: TaggingEngine = None, storage: MemoryStorage = None, get_current_time=time.time):
+        self.tag = tag or TaggingEngine()
+        self.storage = storage or MemoryStorage(DB_PATH)
+        self.get_current_time = get_current_time
+        self.last_decay = get_current_time()
         self.episodic_memory = self.storage.get_episodic_memories()
-        self.emotion_engine = EmotionReflectionEngine(self.storage, self.episodic_memory)
-        self.emotion_engine.link_memory(self.storage, self.episodic_memory)
+        self.update_episodic_in_sqlite = self.storage.update_episodic_in_sqlite
+        self.emotion_engine = EmotionReflectionEngine(self.storage, self.episodic_memory, get_current_time=get_current_time)
 
     def link_memory(self, episodic_memory, update_func):
         self.episodic_memory = episodic_memory
@@ -33,26 +36,19 @@ class MemoryDecayEngine:
 
     def decay_episodic_memory(self, decay_half_life=86400, min_importance=0.1):
         """
-        Decays episodic memory over time using exponential decay.
-        Half-life defines how long it takes for a memory's importance to drop by half.
+        Decays episodic memory over the time since the last run using exponential decay.
+        Half-life defines how long it takes for a memory's importance to drop by half;
+        bright moods stretch it and heavy ones shorten it, as in DECAY_RATES.
         """
-        now = time.time()
-        decay_factor = lambda elapsed: 0.5 ** (elapsed / decay_half_life)
-        updated = []
+        now = self.get_current_time()
+        elapsed = max(0.0, now - self.last_decay)
+        self.last_decay = now
+        kept = []
 
         for mem in self.episodic_memory:
-            elapsed = now - mem["timestamp"]
-            base_decay = decay_factor(elapsed)
-
-            if mem["mood"] in ["happy", "hopeful", "excited"]:
-                base_decay *= 0.85
-            elif mem["mood"] in ["sad", "angry", "anxious"]:
-                base_decay *= 1.15
-            else:
-                base_decay *= 1.0
-
             old = mem["importance"]
-            mem["importance"] *= base_decay
+            weight = MOOD_DECAY_WEIGHTS.get(mem["mood"], 1.0)
+            mem["importance"] *= 0.5 ** (elapsed * weight / decay_half_life)
 
             logging.info(f"[Decay] '{mem['content'][:30]}...' from {old:.2f} to {mem['importance']:.2f}")
 
@@ -60,72 +56,49 @@ class MemoryDecayEngine:
             if new_cat != mem["category"]:
                 mem["category"] = new_cat
 
+            self.update_episodic_in_sqlite(mem)
             if mem["importance"] >= min_importance:
-                updated.append(mem)
-                self.update_episodic_in_sqlite(mem)
+                kept.append(mem)
 
-        self.episodic_memory = updated
+        # In place: Memory.episodic_memory is this same list.
+        self.episodic_memory[:] = kept
 
     def decay_mood(self, decay_half_life=86400, min_mood_intensity=0.1):
         """
         Decays mood intensity of memories over time using exponential decay.
         Half-life defines how long it takes for a memory's mood to drop by half.
+        The intensity lives in its own column; the mood label is never touched.
         """
-        now = time.time()
-        decay_factor = lambda elapsed: 0.5 ** (elapsed / decay_half_life)
+        now = self.get_current_time()
+        db = self.storage.db
+        memories = db.execute_read('SELECT timestamp, mood FROM episodic_memory WHERE mood IS NOT NULL')
         updated = []
-        conn = sqlite3.connect(DB_PATH)
-        c = conn.cursor()
-        c.execute('SELECT timestamp, mood FROM episodic_memory WHERE mood IS NOT NULL')
-        memories = c.fetchall()
 
         for ts, mood in memories:
-            elapsed = now - ts
-            base_decay = decay_factor(elapsed)
-
-            if mood in ["happy", "excited", "hopeful"]:
-                base_decay *= 0.85
-            elif mood in ["sad", "angry", "anxious"]:
-                base_decay *= 1.15
-            else:
-                base_decay *= 1.0
+            weight = MOOD_DECAY_WEIGHTS.get(mood, 1.0)
+            new_intensity = max(min_mood_intensity, 0.5 ** ((now - ts) * weight / decay_half_life))
+            updated.append((new_intensity, ts))
 
-            new_intensity = max(min_mood_intensity, 1.0 * base_decay)
-            c.execute('UPDATE episodic_memory SET mood = ? WHERE timestamp = ?', (new_intensity, ts))
-            updated.append((ts, new_intensity))
-            
-        conn.commit()
-        conn.close()
+        with db.writer() as conn:
+            conn.executemany('UPDATE episodic_memory SET mood_intensity = ? WHERE timestamp = ?', updated)
 
     def reinforce_important_memories(self, boost_amount=0.2):
         """
         Periodically rehearse important memories to strengthen their importance score.
         """
-        conn = sqlite3.connect(DB_PATH)
-        c = conn.cursor()
-        c.execute('SELECT timestamp, importance FROM episodic_memory WHERE importance > 0.3')
-        memories = c.fetchall()
-
-        for mem_id, importance in memories:
-            new_importance = min(1.0, importance + boost_amount)
-            c.execute('UPDATE episodic_memory SET importance = ? WHERE timestamp = ?', (new_importance, mem_id))
-
-        conn.commit()
-        conn.close()
+        with self.storage.db.writer() as conn:
+            conn.execute('UPDATE episodic_memory SET importance = MIN(1.0, importance + ?) WHERE importance > 0.3',
+                         (boost_amount,))
 
     def decay_memory_importance(self):
         """
         Gradually reduce importance of memories based on mood.
         """
-        conn = sqlite3.connect(DB_PATH)
-        c = conn.cursor()
-        c.execute('SELECT timestamp, importance, mood FROM episodic_memory')
-        memories = c.fetchall()
-
-        for ts, importance, mood in memories:
-            decay = DECAY_RATES.get(mood, 0.03)  # Default decay
-            new_importance = max(0, importance - decay)
-            c.execute('UPDATE episodic_memory SET importance = ? WHERE timestamp = ?', (new_importance, ts))
-
-        conn.commit()
-        conn.close()
+        db = self.storage.db
+        memories = db.execute_read('SELECT timestamp, importance, mood FROM episodic_memory')
+        updates = [
+            (max(0, importance - DECAY_RATES.get(mood, 0.03)), ts)  # 0.03 = default decay
+            for ts, importance, mood in memories
+        ]
+        with db.writer() as conn:
+            conn.executemany('UPDATE episodic_memory SET importance = ? WHERE timestamp = ?', updates)
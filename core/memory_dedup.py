@@ -0,0 +1,86 @@
+# core/memory_dedup.py
+import re
+import hashlib
+import numpy as np
+
+SIMHASH_BITS = 64
+_TOKEN = re.compile(r"[a-z0-9']+")
+
+def _token_hashes(tokens):
+    return np.array(
+        [int.from_bytes(hashlib.blake2b(t.encode("utf-8"), digest_size=8).digest(), "little") for t in tokens],
+        dtype=np.uint64
+    )
+
+def simhash(text):
+    """
+    64-bit SimHash over word unigrams and bigrams of the lowercased text, so
+    punctuation, casing and small edits move only a few bits.
+    """
+    words = _TOKEN.findall(text.lower())
+    features = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+    if not features:
+        return 0
+    hashes = _token_hashes(features)
+    bits = np.unpackbits(hashes.view(np.uint8).reshape(-1, 8), axis=1, bitorder="little")
+    votes = (bits.astype(np.int32) * 2 - 1).sum(axis=0)
+    return int(np.packbits(votes > 0, bitorder="little").view(np.uint64)[0])
+
+def to_signed(value):
+    """SQLite INTEGER is signed 64-bit."""
+    return value - (1 << 64) if value >= (1 << 63) else value
+
+def to_unsigned(value):
+    return value + (1 << 64) if value < 0 else value
+
+
+class NearDuplicateIndex:
+    """
+    In-memory LSH over SimHash signatures. The 64 bits are cut into max_distance + 1
+    bands; by pigeonhole any two signatures within `max_distance` bits agree on at
+    least one band, so only memories sharing a band bucket are ever compared.
+    Keys are episodic timestamps; ties go to the most recent memory.
+    """
+    def __init__(self, max_distance=7):
+        self.max_distance = max_distance
+        bands = max_distance + 1
+        edges = np.linspace(0, SIMHASH_BITS, bands + 1).astype(int)
+        self.bands = [(int(lo), (1 << int(hi - lo)) - 1) for lo, hi in zip(edges[:-1], edges[1:])]
+        self.buckets = [{} for _ in self.bands]
+        self.signatures = {}
+
+    def __len__(self):
+        return len(self.signatures)
+
+    def _keys(self, signature):
+        return [(signature >> shift) & mask for shift, mask in self.bands]
+
+    def add(self, key, signature):
+        self.remove(key)
+        self.signatures[key] = signature
+        for bucket, band_key in zip(self.buckets, self._keys(signature)):
+            bucket.setdefault(band_key, set()).add(key)
+
+    def remove(self, key):
+        signature = self.signatures.pop(key, None)
+        if signature is None:
+            return
+        for bucket, band_key in zip(self.buckets, self._keys(signature)):
+            members = bucket.get(band_key)
+            if members:
+                members.discard(key)
+                if not members:
+                    del bucket[band_key]
+
+    def candidates(self, signature):
+        """[(key, hamming distance)] within max_distance, closest first."""
+        seen = set()
+        for bucket, band_key in zip(self.buckets, self._keys(signature)):
+            seen.update(bucket.get(band_key, ()))
+        matches = []
+        for key in seen:
+            distance = bin(self.signatures[key] ^ signature).count("1")
+            if distance <= self.max_distance:
+                matches.append((key, distance))
+        matches.sort(key=lambda m: (m[1], -m[0]))
+        return matches
@@ -1,19 +1,22 @@
 # core/memory_emotion.py
 import time
-import sqlite3
 import logging
 from datetime import datetime
 from collections import defaultdict
-from core.memory_storage import DB_PATH
+from core.mood_space import mood_to_vad
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(message)s')
 
 class EmotionReflectionEngine:
-    def __init__(self, memory_storage, episodic_memory):
-        self.last_reflection_time = time.time()
+    def __init__(self, memory_storage=None, episodic_memory=None, get_current_time=time.time):
+        self.get_current_time = get_current_time
+        self.last_reflection_time = self.get_current_time()
         self.reflection_interval = 300
+        self.link_memory(memory_storage, episodic_memory)
+
+    def link_memory(self, memory_storage, episodic_memory):
         self.memory_storage = memory_storage
-        self.episodic_memory = episodic_memory
+        self.episodic_memory = episodic_memory if episodic_memory is not None else []
 
     def blended_emotion_search(self, primary_mood):
         related_moods = {
@@ -68,47 +71,17 @@ class EmotionReflectionEngine:
     def prioritize_important_memories(self, memories):
         return sorted(memories, key=lambda m: (m['importance'] + m.get('rehearsed_count', 0) * 0.1), reverse=True)
 
-    @staticmethod
-    def emotionally_proximal_memories(emotion, tolerance=0.2, limit=5):
+    def emotionally_proximal_memories(self, emotion, tolerance=0.35, limit=5):
         """
-        Find memories with emotions *close* to the target emotion, using mood similarity.
+        Find memories with emotions *close* to the target emotion: the k nearest
+        episodic memories in valence/arousal/dominance space within `tolerance`.
         """
-        conn = sqlite3.connect(DB_PATH)
-        c = conn.cursor()
-        c.execute('SELECT id, emotion, content FROM memories ORDER BY timestamp DESC')
-        all_memories = c.fetchall()
-        conn.close()
-
-        matches = []
-        target_vector = EmotionReflectionEngine.mood_to_vector(emotion)
-
-        for mem_id, mem_emotion, mem_content in all_memories:
-            if not mem_emotion:
-                continue
-            mem_vector = EmotionReflectionEngine.mood_to_vector(mem_emotion)
-            similarity = EmotionReflectionEngine.cosine_similarity(target_vector, mem_vector)
-            if similarity >= (1 - tolerance):
-                matches.append((similarity, mem_content))
-
-        matches.sort(reverse=True)
-        return [content for sim, content in matches[:limit]]
+        return self.memory_storage.nearest_by_mood(self.mood_to_vector(emotion), tolerance, limit)
 
     @staticmethod
     def mood_to_vector(mood):
-        """
-        Rough mapping of moods into 3D vector space (simplified).
-        You can refine this later.
-        """
-        mood_map = {
-            "happy": (1, 1, 0),
-            "excited": (1, 0.8, 0.2),
-            "sad": (-1, -1, 0),
-            "angry": (-1, 0, 1),
-            "calm": (0.5, 1, -0.5),
-            "anxious": (-0.5, -0.8, 0.5),
-            # Expand as needed
-        }
-        return mood_map.get(mood, (0, 0, 0))
+        """Valence/arousal/dominance coordinate for any mood in the vocabulary."""
+        return mood_to_vad(mood)
 
     @staticmethod
     def cosine_similarity(v1, v2):
@@ -124,7 +97,8 @@ class EmotionReflectionEngine:
         """
         emotionally_proximal = self.emotionally_proximal_memories(current_mood)
         raw_memories = self.blended_emotion_search(current_mood)
-        all_memories = raw_memories + emotionally_proximal
+        seen = {m["timestamp"] for m in raw_memories}
+        all_memories = raw_memories + [m for m in emotionally_proximal if m["timestamp"] not in seen]
         important_memories = self.prioritize_important_memories(all_memories)
         self_talk = self.internal_self_talk(important_memories, current_mood)
         narrated_story = self.narrate_with_mood_tone(important_memories, current_mood)
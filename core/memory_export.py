@@ -0,0 +1,266 @@
+# core/memory_export.py
+import os
+import json
+import time
+import logging
+from itertools import islice
+import pyarrow as pa
+import pyarrow.ipc as ipc
+import pyarrow.parquet as pq
+from core.db import get_db
+from core.memory_tiering import ChatColdStorage
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(message)s')
+
+EXPORT_FORMATS = ("parquet", "arrow")
+WATERMARK_FILE = "_watermarks.json"
+
+# Low-cardinality text columns are dictionary-encoded: a mood is stored once per batch, not per row.
+_DICT = pa.dictionary(pa.int32(), pa.string())
+
+EXPORT_SCHEMAS = {
+    "episodic_memory": pa.schema([
+        ("timestamp", pa.float64()),
+        ("time", pa.string()),
+        ("content", pa.string()),
+        ("mood", _DICT),
+        ("tags", pa.list_(_DICT)),
+        ("importance", pa.float64()),
+        ("relation", _DICT),
+        ("category", _DICT),
+        ("rehearsed_count", pa.int32()),
+        ("sentiment_color", _DICT),
+        ("valence", pa.float64()),
+        ("arousal", pa.float64()),
+        ("dominance", pa.float64()),
+    ]),
+    "chat_history": pa.schema([
+        ("timestamp", pa.float64()),
+        ("role", _DICT),
+        ("mood", _DICT),
+        ("content", pa.string()),
+    ]),
+    "mood_log": pa.schema([
+        ("id", pa.int64()),
+        ("timestamp", pa.float64()),
+        ("mood", _DICT),
+        ("intensity", pa.float64()),
+    ]),
+}
+EXPORT_TABLES = tuple(EXPORT_SCHEMAS)
+# Column each table's incremental watermark follows.
+WATERMARK_COLUMNS = {"episodic_memory": "timestamp", "chat_history": "timestamp", "mood_log": "id"}
+
+
+class ColumnarExporter:
+    """
+    Streams episodic_memory, chat_history (hot and cold tiers) and mood_log out of a data
+    directory into Parquet or Arrow IPC, `batch_size` rows at a time, so memory stays flat
+    however long the history is. Every run appends one part file per table under
+    `<out_dir>/<table>/`, and the directory loads as a single dataset in pandas, polars,
+    DuckDB or pyarrow.dataset. `_watermarks.json` records how far each table has been
+    exported; the next run picks up after it. Watermarks follow creation order, so rows
+    changed after export (decay, rehearsal) or synced in with older timestamps from
+    another device need a `full` export to show up.
+
+    The data directory is only ever read: both databases open read-only, so an export
+    never migrates, creates or locks anything the app owns, and a missing database or
+    table simply exports nothing. Columns an older schema lacks come out as nulls.
+    """
+    def __init__(self, data_dir, out_dir, fmt="parquet", batch_size=5000, compression="zstd"):
+        if fmt not in EXPORT_FORMATS:
+            raise ValueError(f"Unknown format '{fmt}' (choose from {', '.join(EXPORT_FORMATS)}).")
+        self.data_dir = data_dir
+        self.out_dir = out_dir
+        self.fmt = fmt
+        self.batch_size = batch_size
+        self.compression = compression
+        self.memory_db = self._open(os.path.join(data_dir, "memory.db"))
+        self.emotion_db = self._open(os.path.join(data_dir, "emotion.db"))
+        segment_dir = os.path.join(data_dir, "chat_segments")
+        self.cold_storage = (ChatColdStorage(self.memory_db, segment_dir)
+                             if os.path.isdir(segment_dir) and self._has_table(self.memory_db, "chat_segments")
+                             else None)
+        self.watermark_path = os.path.join(out_dir, WATERMARK_FILE)
+
+    @staticmethod
+    def _open(path):
+        return get_db(path, read_only=True) if os.path.exists(path) else None
+
+    @staticmethod
+    def _has_table(db, table):
+        return db is not None and bool(db.execute_read(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)))
+
+    def _columns(self, db, table, wanted):
+        """`wanted` as a select list, with NULL standing in for columns this schema lacks."""
+        present = {row[1] for row in db.execute_read(f"PRAGMA table_info({table})")}
+        return ", ".join(c if c in present else f"NULL AS {c}" for c in wanted)
+
+    def load_watermarks(self):
+        try:
+            with open(self.watermark_path, "r") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def _save_watermarks(self, watermarks):
+        os.makedirs(self.out_dir, exist_ok=True)
+        tmp = self.watermark_path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(watermarks, f, indent=2)
+        os.replace(tmp, self.watermark_path)
+
+    # --- sources: each yields lists of row tuples in watermark order ---
+
+    def _fetch(self, db, query, params):
+        cursor = db.reader().cursor()
+        try:
+            cursor.execute(query, params)
+            while True:
+                rows = cursor.fetchmany(self.batch_size)
+                if not rows:
+                    return
+                yield rows
+        finally:
+            cursor.close()
+
+    def _episodic_rows(self, since):
+        if not self._has_table(self.memory_db, "episodic_memory"):
+            return
+        columns = self._columns(self.memory_db, "episodic_memory", (
+            "timestamp", "time", "content", "mood", "tags", "importance", "relation", "category",
+            "rehearsed_count", "sentiment_color", "valence", "arousal", "dominance"))
+        query = f'SELECT {columns} FROM episodic_memory WHERE timestamp > ? ORDER BY timestamp'
+        for rows in self._fetch(self.memory_db, query, (float("-inf") if since is None else since,)):
+            yield [row[:4] + (row[4].split(",") if row[4] else [],) + row[5:] for row in rows]
+
+    def _iter_chat(self, since):
+        """Cold segments first, then the hot table; the same order MemoryStorage.iter_chat_range reads in."""
+        if self.cold_storage:
+            for turn in self.cold_storage.iter_range(start=since):
+                yield turn["timestamp"], turn["role"], turn.get("mood"), turn["content"]
+        if self._has_table(self.memory_db, "chat_history"):
+            for rows in self._fetch(self.memory_db, 'SELECT timestamp, role, mood, content FROM chat_history '
+                                                    'WHERE timestamp >= ? ORDER BY timestamp ASC',
+                                    (float("-inf") if since is None else since,)):
+                yield from rows
+
+    def _chat_rows(self, since):
+        turns = (turn for turn in self._iter_chat(since) if since is None or turn[0] > since)
+        while True:
+            rows = list(islice(turns, self.batch_size))
+            if not rows:
+                return
+            yield rows
+
+    def _mood_rows(self, since):
+        if not self._has_table(self.emotion_db, "mood_log"):
+            return
+        yield from self._fetch(self.emotion_db, 'SELECT id, timestamp, mood, intensity FROM mood_log '
+                                                'WHERE id > ? ORDER BY id', (-1 if since is None else since,))
+
+    def _source(self, table, since):
+        if table == "episodic_memory":
+            return self._episodic_rows(since)
+        if table == "chat_history":
+            return self._chat_rows(since)
+        return self._mood_rows(since)
+
+    # --- sinks ---
+
+    def _open_writer(self, path, schema):
+        if self.fmt == "parquet":
+            return pq.ParquetWriter(path, schema, compression=self.compression)
+        options = ipc.IpcWriteOptions(compression=self.compression, emit_dictionary_deltas=True)
+        return ipc.new_file(path, schema, options=options)
+
+    def _encode(self, name, values):
+        """
+        Dictionary array over a vocabulary that only grows within one part file, so every
+        batch's dictionary extends the last one: Parquet keeps one dictionary page per
+        column chunk and the Arrow IPC file gets deltas instead of illegal replacements.
+        """
+        vocab = self._vocab.setdefault(name, {})
+        indices = [None if v is None else vocab.setdefault(v, len(vocab)) for v in values]
+        return pa.DictionaryArray.from_arrays(pa.array(indices, type=pa.int32()),
+                                              pa.array(list(vocab), type=pa.string()))
+
+    def _to_batch(self, rows, schema):
+        arrays = []
+        for column, field in zip(zip(*rows), schema):
+            if field.type == _DICT:
+                arrays.append(self._encode(field.name, column))
+            elif pa.types.is_list(field.type):
+                offsets = [0]
+                for values in column:
+                    offsets.append(offsets[-1] + len(values))
+                flat = self._encode(field.name, [v for values in column for v in values])
+                arrays.append(pa.ListArray.from_arrays(pa.array(offsets, type=pa.int32()), flat))
+            else:
+                arrays.append(pa.array(column, type=field.type))
+        return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+    def export_table(self, table, since=None, part=0):
+        """Writes rows past `since` to a new part file. Returns (rows, new watermark or None, path or None)."""
+        schema = EXPORT_SCHEMAS[table]
+        key = schema.get_field_index(WATERMARK_COLUMNS[table])
+        table_dir = os.path.join(self.out_dir, table)
+        os.makedirs(table_dir, exist_ok=True)
+        suffix = "parquet" if self.fmt == "parquet" else "arrow"
+        path = os.path.join(table_dir, f"part-{part:05d}.{suffix}")
+        tmp = path + ".tmp"
+
+        writer, count, watermark = None, 0, None
+        self._vocab = {}
+        try:
+            for rows in self._source(table, since):
+                if writer is None:
+                    writer = self._open_writer(tmp, schema)
+                writer.write_batch(self._to_batch(rows, schema))
+                count += len(rows)
+                watermark = rows[-1][key]
+        except BaseException:
+            if writer is not None:
+                writer.close()
+                os.remove(tmp)
+            raise
+        if writer is None:
+            return 0, None, None
+        writer.close()
+        os.replace(tmp, path)
+        return count, watermark, path
+
+    def export(self, tables=EXPORT_TABLES, full=False):
+        """Exports every table in `tables`; {table: rows written}."""
+        watermarks = {} if full else self.load_watermarks()
+        if full and os.path.exists(self.watermark_path):
+            # A full export starts a fresh dataset next to nothing stale.
+            previous = self.load_watermarks()
+            for table in tables:
+                for name in previous.get(table, {}).get("files", []):
+                    path = os.path.join(self.out_dir, table, name)
+                    if os.path.exists(path):
+                        os.remove(path)
+            watermarks = {t: state for t, state in previous.items() if t not in tables}
+
+        written = {}
+        for table in tables:
+            state = watermarks.get(table, {"watermark": None, "rows": 0, "files": []})
+            started = time.monotonic()
+            count, watermark, path = self.export_table(table, state["watermark"], part=len(state["files"]))
+            written[table] = count
+            if path is None:
+                logging.info(f"[Export] {table}: nothing new since {state['watermark']}.")
+                continue
+            state = {
+                "watermark": watermark,
+                "rows": state["rows"] + count,
+                "files": state["files"] + [os.path.basename(path)],
+                "exported_at": time.time(),
+            }
+            watermarks[table] = state
+            # Saved per table, so an interruption never re-exports what already landed.
+            self._save_watermarks(watermarks)
+            logging.info(f"[Export] {table}: {count} rows → {path} ({time.monotonic() - started:.2f}s).")
+        return written
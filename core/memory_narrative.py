@@ -1,24 +1,177 @@
 # memory_narrative.py
-import sqlite3
+import json
+import logging
+from collections import Counter
 from datetime import datetime
-from core.memory_storage import DB_PATH
+from core.memory_storage import MemoryStorage, db_path
 
-def generate_life_narrative():
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(message)s')
+
+class NarrativeIndex:
+    """
+    Per-month chapter index for the life narrative. Each capture touches exactly one
+    row (primary-key lookup + upsert), so listing chapters never scans episodic_memory.
+    Deletes, merges and rehearsals recompute just the months they touch; the index is
+    rebuilt in full when it is created and whenever its counts disagree with the table.
+    """
+    def __init__(self, storage, top_n=3):
+        self.storage = storage
+        self.db = storage.db
+        self.top_n = top_n
+        with self.db.writer() as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS narrative_chapters (
+                    month TEXT PRIMARY KEY, memory_count INTEGER,
+                    mood_counts TEXT, top_memories TEXT,
+                    first_ts REAL, last_ts REAL
+                )
+            ''')
+            indexed = conn.execute('SELECT COALESCE(SUM(memory_count), 0) FROM narrative_chapters').fetchone()[0]
+            stored = conn.execute('SELECT COUNT(*) FROM episodic_memory').fetchone()[0]
+        if indexed != stored:
+            logging.info(f"[Narrative] Index covers {indexed} of {stored} memories; rebuilding.")
+            self.rebuild()
+
+    @staticmethod
+    def month_of(timestamp):
+        return datetime.fromtimestamp(timestamp).strftime("%Y-%m")
+
+    @staticmethod
+    def _month_range(month):
+        start = datetime.strptime(month, "%Y-%m")
+        end = start.replace(year=start.year + 1, month=1) if start.month == 12 else start.replace(month=start.month + 1)
+        return start.timestamp(), end.timestamp()
+
+    def record(self, memory):
+        with self.db.writer() as conn:
+            self._record(conn, self.month_of(memory["timestamp"]), memory)
+
+    def _record(self, conn, month, memory):
+        row = conn.execute(
+            'SELECT memory_count, mood_counts, top_memories, first_ts, last_ts FROM narrative_chapters WHERE month = ?',
+            (month,)
+        ).fetchone()
+        if row:
+            count, moods, top, first_ts, last_ts = row[0], Counter(json.loads(row[1])), json.loads(row[2]), row[3], row[4]
+        else:
+            count, moods, top, first_ts, last_ts = 0, Counter(), [], memory["timestamp"], memory["timestamp"]
+
+        count += 1
+        moods[memory["mood"] or "unknown"] += 1
+        top.append({
+            "timestamp": memory["timestamp"], "content": memory["content"][:120],
+            "mood": memory["mood"], "importance": memory["importance"],
+        })
+        top = sorted(top, key=lambda m: (-m["importance"], m["timestamp"]))[:self.top_n]
+        conn.execute('''
+            INSERT OR REPLACE INTO narrative_chapters (month, memory_count, mood_counts, top_memories, first_ts, last_ts)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', (month, count, json.dumps(moods), json.dumps(top),
+              min(first_ts, memory["timestamp"]), max(last_ts, memory["timestamp"])))
+
+    def rebuild(self):
+        """Recomputes every chapter in one streaming pass (e.g. after consolidation or a reindex)."""
+        with self.db.writer() as conn:
+            conn.execute('DELETE FROM narrative_chapters')
+            for memory in iter_narrative_entries(self.storage, min_importance=None):
+                self._record(conn, self.month_of(memory["timestamp"]), memory)
+
+    def refresh(self, timestamps):
+        """Recomputes the chapters holding `timestamps` after those memories changed or were deleted."""
+        months = {self.month_of(ts) for ts in timestamps}
+        with self.db.writer() as conn:
+            for month in months:
+                start, end = self._month_range(month)
+                rows = conn.execute(
+                    'SELECT content, mood, importance, timestamp FROM episodic_memory '
+                    'WHERE timestamp >= ? AND timestamp < ? ORDER BY timestamp, rowid', (start, end)
+                ).fetchall()
+                conn.execute('DELETE FROM narrative_chapters WHERE month = ?', (month,))
+                for content, mood, importance, timestamp in rows:
+                    self._record(conn, month, {"content": content, "mood": mood, "importance": importance,
+                                               "timestamp": timestamp})
+
+    def chapter_page(self, cursor=None, limit=12):
+        """Returns (chapters, next_cursor); the cursor is the last month returned."""
+        rows = self.db.execute_read(
+            'SELECT month, memory_count, mood_counts, top_memories, first_ts, last_ts FROM narrative_chapters '
+            'WHERE month > ? ORDER BY month ASC LIMIT ?',
+            (cursor or "", limit)
+        )
+        chapters = []
+        for month, count, moods, top, first_ts, last_ts in rows:
+            mood_counts = Counter(json.loads(moods))
+            chapters.append({
+                "month": month, "memory_count": count,
+                "dominant_moods": [m for m, _ in mood_counts.most_common(3)],
+                "top_memories": json.loads(top),
+                "first_ts": first_ts, "last_ts": last_ts,
+            })
+        next_cursor = chapters[-1]["month"] if len(chapters) == limit else None
+        return chapters, next_cursor
+
+    def iter_chapters(self, page_size=12):
+        cursor = None
+        while True:
+            chapters, cursor = self.chapter_page(cursor, page_size)
+            yield from chapters
+            if cursor is None:
+                return
+
+
+def narrative_page(storage, cursor=None, limit=20, min_importance=0.5):
+    """
+    One page of narrative entries in time order. `cursor` is the (timestamp, rowid) of
+    the last entry already seen, so memories sharing a timestamp are never skipped;
+    returns (entries, next_cursor), next_cursor is None at the end.
+    """
+    query = 'SELECT time, content, mood, importance, timestamp, rowid FROM episodic_memory WHERE (timestamp, rowid) > (?, ?)'
+    params = list(cursor) if cursor is not None else [float("-inf"), 0]
+    if min_importance is not None:
+        query += ' AND importance > ?'
+        params.append(min_importance)
+    query += ' ORDER BY timestamp ASC, rowid ASC LIMIT ?'
+    params.append(limit)
+
+    with storage.read_cursor() as c:
+        c.execute(query, tuple(params))
+        rows = c.fetchall()
+
+    entries = [
+        {"time": row[0], "content": row[1], "mood": row[2], "importance": row[3], "timestamp": row[4]}
+        for row in rows
+    ]
+    next_cursor = (rows[-1][4], rows[-1][5]) if len(entries) == limit else None
+    return entries, next_cursor
+
+
+def iter_narrative_entries(storage, min_importance=0.5, page_size=50, cursor=None):
+    """Lazily yields narrative entries, fetching one page at a time."""
+    while True:
+        entries, cursor = narrative_page(storage, cursor, page_size, min_importance)
+        yield from entries
+        if cursor is None:
+            return
+
+
+def narrate_entry(entry):
+    date_str = datetime.fromtimestamp(entry["timestamp"]).strftime("%Y-%m-%d")
+    return f"On {date_str}, I felt {entry['mood']} because: {entry['content']}"
+
+
+def generate_life_narrative(storage=None, limit=None):
     """
     Create a loose chronological timeline based on important memories.
+    Pass `limit` to cap the number of entries; the text is assembled from the lazy iterator.
     """
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute('SELECT time, content, mood FROM episodic_memory WHERE importance > 0.5 ORDER BY timestamp ASC')
-    memories = c.fetchall()
-    conn.close()
+    storage = storage or MemoryStorage(db_path)
+    lines = []
+    for i, entry in enumerate(iter_narrative_entries(storage)):
+        if limit is not None and i >= limit:
+            break
+        lines.append(narrate_entry(entry))
 
-    if not memories:
+    if not lines:
         return "I don't have enough memories yet to form a story."
 
-    story = "Here’s a journey through my memories:\n\n"
-    for time, content, mood in memories:
-        date_str = datetime.fromtimestamp(time).strftime("%Y-%m-%d")
-        story += f"On {date_str}, I felt {mood} because: {content}\n\n"
-
-    return story
+    return "Here’s a journey through my memories:\n\n" + "\n\n".join(lines) + "\n\n"
@@ -0,0 +1,185 @@
+# core/memory_reindex.py
+import os
+import time
+import logging
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from core.memory_narrative import NarrativeIndex
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(message)s')
+
+_tagger = None
+_semantic = None
+
+def _init_worker(embedding_model_name, with_embeddings, encoder_backend, encoder_threads):
+    global _tagger, _semantic
+    from core.memory_tags import TaggingEngine
+    from core.memory_semantic import SemanticMemoryEngine
+    _tagger = TaggingEngine(cache_size=0)
+    _semantic = SemanticMemoryEngine(embedding_model_name, encoder_backend=encoder_backend,
+                                     encoder_threads=encoder_threads) if with_embeddings else None
+
+def _process_chunk(rows):
+    """rows: [(rowid, content, mood, importance)] → [(rowid, tags, category, sentiment_color, simhash, embedding)]"""
+    from core.memory_semantic import sentiment_color
+    from core.memory_dedup import simhash, to_signed
+    contents = [row[1] for row in rows]
+    tag_lists = _tagger.extract_tags_batch(contents)
+    embeddings = _semantic.encode_batch(contents).tolist() if _semantic else [None] * len(rows)
+    results = []
+    for (rowid, content, mood, importance), tags, embedding in zip(rows, tag_lists, embeddings):
+        category = _tagger.categorize_memory({
+            "content": content, "mood": mood or "unknown", "importance": importance or 0.0, "tags": tags,
+        })
+        results.append((rowid, tags, category, sentiment_color(content), to_signed(simhash(content or "")), embedding))
+    return results
+
+
+class _InlineExecutor:
+    """Runs chunks in this process (workers=0): no pool start-up, for small stores and debugging."""
+    def __init__(self, initializer, initargs):
+        initializer(*initargs)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def submit(self, fn, *args):
+        future = Future()
+        try:
+            future.set_result(fn(*args))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+
+class ReindexJob:
+    """
+    Re-runs capture-time analysis (tags, category, sentiment color, dedup signature,
+    embedding) over the whole episodic store. Rows are streamed by rowid in chunks
+    through a process pool; each chunk's results and the checkpoint are committed in one
+    transaction, so an interrupted run resumes after the last committed chunk. The
+    narrative and keyword indexes are rebuilt when the run finishes. `workers=0` runs
+    the analysis in this process instead of a pool.
+    """
+    def __init__(self, storage, job_name="default", chunk_size=256, workers=None,
+                 semantic_engine=None, embedding_model_name="all-MiniLM-L6-v2", encoder_backend=None):
+        self.storage = storage
+        self.job_name = job_name
+        self.chunk_size = chunk_size
+        self.workers = workers if workers is not None else max(1, (os.cpu_count() or 2) - 1)
+        self.semantic_engine = semantic_engine
+        self.embedding_model_name = embedding_model_name
+        self.encoder_backend = encoder_backend or getattr(semantic_engine, "encoder_backend", "torch")
+        with self.storage.cursor() as cursor:
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS reindex_checkpoint (
+                    job TEXT PRIMARY KEY, last_rowid INTEGER, rows_done INTEGER,
+                    started_at REAL, updated_at REAL, finished_at REAL
+                )
+            ''')
+
+    def checkpoint(self):
+        with self.storage.read_cursor() as cursor:
+            cursor.execute('SELECT last_rowid, rows_done, finished_at FROM reindex_checkpoint WHERE job = ?',
+                           (self.job_name,))
+            return cursor.fetchone()
+
+    def _reset(self):
+        now = time.time()
+        with self.storage.cursor() as cursor:
+            cursor.execute('INSERT OR REPLACE INTO reindex_checkpoint VALUES (?, 0, 0, ?, ?, NULL)',
+                           (self.job_name, now, now))
+
+    def _chunks(self, after_rowid):
+        while True:
+            with self.storage.read_cursor() as cursor:
+                cursor.execute(
+                    'SELECT rowid, content, mood, importance FROM episodic_memory WHERE rowid > ? ORDER BY rowid LIMIT ?',
+                    (after_rowid, self.chunk_size)
+                )
+                rows = cursor.fetchall()
+            if not rows:
+                return
+            yield rows
+            after_rowid = rows[-1][0]
+
+    def _commit_chunk(self, results, rows_done):
+        with self.storage.cursor() as cursor:
+            cursor.executemany(
+                'UPDATE episodic_memory SET tags = ?, category = ?, sentiment_color = ?, simhash = ? WHERE rowid = ?',
+                [(",".join(tags), category, color, signature, rowid)
+                 for rowid, tags, category, color, signature, _ in results]
+            )
+            cursor.execute('UPDATE reindex_checkpoint SET last_rowid = ?, rows_done = ?, updated_at = ? WHERE job = ?',
+                           (results[-1][0], rows_done, time.time(), self.job_name))
+
+    def _write_embeddings(self, results):
+        if not self.semantic_engine:
+            return
+        placeholders = ",".join("?" * len(results))
+        with self.storage.read_cursor() as cursor:
+            cursor.execute(f'SELECT rowid, content, mood, timestamp FROM episodic_memory WHERE rowid IN ({placeholders})',
+                           [r[0] for r in results])
+            meta = {row[0]: row[1:] for row in cursor.fetchall()}
+        batch = [(meta[rowid], tags, emb) for rowid, tags, _, _, _, emb in results if rowid in meta]
+        if batch:
+            self.semantic_engine.upsert_memories(
+                [m[0] for m, _, _ in batch],
+                [emb for _, _, emb in batch],
+                [{"mood": m[1] or "unknown", "tags": ",".join(tags)} for m, tags, _ in batch],
+                [str(m[2]) for m, _, _ in batch],
+            )
+
+    def run(self, restart=False):
+        state = self.checkpoint()
+        if restart or state is None or state[2] is not None:
+            self._reset()
+            state = (0, 0, None)
+        last_rowid, rows_done = state[0], state[1]
+        if last_rowid:
+            logging.info(f"[Reindex] Resuming '{self.job_name}' after rowid {last_rowid} ({rows_done} rows done).")
+
+        started = time.perf_counter()
+        processed = 0
+        initargs = (self.embedding_model_name, self.semantic_engine is not None,
+                    self.encoder_backend, self._worker_threads())
+        executor = (ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker, initargs=initargs)
+                    if self.workers else _InlineExecutor(_init_worker, initargs))
+        with executor as pool:
+            pending = deque()
+            chunks = self._chunks(last_rowid)
+            for rows in chunks:
+                pending.append(pool.submit(_process_chunk, rows))
+                if len(pending) >= max(1, self.workers * 2):
+                    processed, rows_done = self._drain_one(pending, processed, rows_done, started)
+            while pending:
+                processed, rows_done = self._drain_one(pending, processed, rows_done, started)
+
+        with self.storage.cursor() as cursor:
+            cursor.execute('UPDATE reindex_checkpoint SET finished_at = ? WHERE job = ?', (time.time(), self.job_name))
+        # Derived indexes: chapters, the keyword index over the new tags (dedup signatures
+        # were rewritten per chunk; a running Memory reloads them on its next start).
+        NarrativeIndex(self.storage).rebuild()
+        self.storage.rebuild_search_index(chat=False)
+        elapsed = time.perf_counter() - started
+        rate = processed / elapsed if elapsed > 0 else 0.0
+        logging.info(f"[Reindex] '{self.job_name}' done: {processed} rows in {elapsed:.1f}s ({rate:.1f} rows/s).")
+        return {"rows": processed, "rows_total": rows_done, "seconds": elapsed, "rows_per_sec": rate}
+
+    def _worker_threads(self):
+        # Split the cores between pool workers instead of letting each encoder grab all of them.
+        return max(1, (os.cpu_count() or 1) // max(1, self.workers))
+
+    def _drain_one(self, pending, processed, rows_done, started):
+        # Results are committed in submission order so the checkpoint only ever moves forward.
+        results = pending.popleft().result()
+        self._write_embeddings(results)
+        processed += len(results)
+        rows_done += len(results)
+        self._commit_chunk(results, rows_done)
+        elapsed = time.perf_counter() - started
+        logging.info(f"[Reindex] {rows_done} rows ({processed / elapsed:.1f} rows/s)")
+        return processed, rows_done
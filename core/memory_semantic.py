@@ -1,21 +1,46 @@
 # core/memory_semantic.py
 import logging
-import chromadb
-from chromadb.utils import embedding_functions
+import numpy as np
 from typing import List, Dict
-from sentence_transformers import SentenceTransformer
+from core.encoder_backends import make_encoder
+from core.message_analysis import normalized_text
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(message)s')
 
+SENTIMENT_MAP = {
+    "warm": ["love", "hope", "happiness", "joy", "bright", "sunshine", "comfort"],
+    "melancholy": ["sad", "grief", "loss", "lonely", "tears", "heartache", "rain"],
+    "bright": ["bright", "excited", "joyful", "future", "dream", "inspired", "adventure"],
+    "neutral": ["calm", "peace", "normal", "quiet", "neutral", "balanced"],
+    "anxious": ["nervous", "worried", "fear", "stress", "overwhelmed", "anxiety"],
+    "reflective": ["memory", "remember", "reflection", "past", "thinking"],
+}
+
+def sentiment_color(content):
+    """Dominant SENTIMENT_MAP color of a message (text or MessageAnalysis)."""
+    content_lower = normalized_text(content)
+    sentiment_scores = {key: sum(1 for word in words if word in content_lower) for key, words in SENTIMENT_MAP.items()}
+    return max(sentiment_scores, key=sentiment_scores.get)
+
 class SemanticMemoryEngine:
-    def __init__(self, embedding_model_name="all-MiniLM-L6-v2"):
-        self.chroma_client = chromadb.Client()
+    def __init__(self, embedding_model_name="all-MiniLM-L6-v2", persist_dir=None, encoder_backend="torch",
+                 encoder_threads=None, encoder=None):
+        # Imported here: reindex workers and tools that only need sentiment_color never load Chroma.
+        import chromadb
+        self.embedding_model_name = embedding_model_name
+        self.encoder_backend = encoder_backend
+        self.chroma_client = chromadb.PersistentClient(path=persist_dir) if persist_dir else chromadb.Client()
         self.semantic_collection = self.chroma_client.get_or_create_collection(name="episodic_memories")
-        self.embedding_model = SentenceTransformer(embedding_model_name)
+        # Any object with the encoder backends' `encode`, e.g. an MLWorkerClient.
+        self.embedding_model = encoder or make_encoder(encoder_backend, embedding_model_name, threads=encoder_threads)
 
     def encode(self, text: str) -> List[float]:
         return self.embedding_model.encode(text).tolist()
 
+    def encode_batch(self, texts: List[str], batch_size: int = 32):
+        """Encode many texts at once; rows are L2-normalized so dot product is cosine."""
+        return self.embedding_model.encode(texts, batch_size=batch_size, normalize_embeddings=True)
+
     def add_memory(self, content, embedding, metadata, memory_id):
         self.semantic_collection.add(
             documents=[content],
@@ -24,6 +49,31 @@ class SemanticMemoryEngine:
             ids=[memory_id]
         )
 
+    def upsert_memories(self, contents, embeddings, metadatas, memory_ids):
+        """Bulk insert-or-replace, used by reindexing."""
+        self.semantic_collection.upsert(
+            documents=list(contents),
+            embeddings=[list(map(float, e)) for e in embeddings],
+            metadatas=list(metadatas),
+            ids=list(memory_ids)
+        )
+
+    def get_embeddings(self, memory_ids):
+        """{id: stored embedding} for the ids the collection has."""
+        try:
+            found = self.semantic_collection.get(ids=list(memory_ids), include=["embeddings"])
+        except Exception as e:
+            logging.error(f"[Semantic Get Error] {e}")
+            return {}
+        return {memory_id: np.asarray(embedding, dtype=np.float32)
+                for memory_id, embedding in zip(found["ids"], found["embeddings"])}
+
+    def delete_memories(self, memory_ids):
+        try:
+            self.semantic_collection.delete(ids=list(memory_ids))
+        except Exception as e:
+            logging.error(f"[Semantic Delete Error] {e}")
+
     def semantic_recall(self, query):
         """Retrieve semantically similar memories from ChromaDB."""
         try:
@@ -37,20 +87,18 @@ class SemanticMemoryEngine:
             logging.error(f"[Semantic Recall Error] {e}")
             return []
 
+    def semantic_recall_ids(self, query, n_results=5):
+        """Ids of the memories closest to `query`, nearest first."""
+        try:
+            results = self.semantic_collection.query(query_embeddings=[self.encode(query)], n_results=n_results,
+                                                     include=[])
+            return results['ids'][0] if results['ids'] else []
+        except Exception as e:
+            logging.error(f"[Semantic Recall Error] {e}")
+            return []
+
     def get_sentiment_color(self, content):
-        sentiment_map = {
-            "warm": ["love", "hope", "happiness", "joy", "bright", "sunshine", "comfort"],
-            "melancholy": ["sad", "grief", "loss", "lonely", "tears", "heartache", "rain"],
-            "bright": ["bright", "excited", "joyful", "future", "dream", "inspired", "adventure"],
-            "neutral": ["calm", "peace", "normal", "quiet", "neutral", "balanced"],
-            "anxious": ["nervous", "worried", "fear", "stress", "overwhelmed", "anxiety"],
-            "reflective": ["memory", "remember", "reflection", "past", "thinking"],
-        }
-
-        content_lower = content.lower()
-        sentiment_scores = {key: sum(1 for word in words if word in content_lower) for key, words in sentiment_map.items()}
-        sentiment_color = max(sentiment_scores, key=sentiment_scores.get)
-        return sentiment_color
+        return sentiment_color(content)
 
     def get_sentiment_strength(self, sentiment_scores: Dict[str, float]) -> Dict[str, float]:
         max_score = max(sentiment_scores.values())
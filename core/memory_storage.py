@@ -1,20 +1,51 @@
 # core/memory_storage.py
 import os
+import re
 import sqlite3
 import logging
+import numpy as np
 from contextlib import contextmanager
+from core.db import get_db
+from core.memory_tiering import ChatColdStorage
+from core.mood_space import mood_to_vad
+from core.memory_dedup import simhash, to_signed, to_unsigned
 
 base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 db_path = os.path.join(base_dir, 'data', 'memory.db')
+DB_PATH = db_path
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(message)s')
 
+SEARCH_STOPWORDS = {
+    "a", "an", "and", "the", "i", "me", "my", "you", "your", "we", "it", "is", "am", "are", "was", "were",
+    "do", "did", "does", "ever", "to", "of", "in", "on", "at", "for", "with", "about", "that", "this",
+    "have", "has", "had", "be", "been", "what", "when", "how", "mention", "mentioned", "tell", "told",
+}
+
+# Rows rolled into a cold segment keep their chat_fts entry; any other delete drops it.
+CHAT_FTS_DELETE_TRIGGER = '''
+    CREATE TRIGGER IF NOT EXISTS chat_fts_delete AFTER DELETE ON chat_history
+    WHEN NOT EXISTS (SELECT 1 FROM chat_segments WHERE last_ts >= old.timestamp AND first_ts <= old.timestamp)
+    BEGIN
+        DELETE FROM chat_fts WHERE rowid = (
+            SELECT rowid FROM chat_fts WHERE timestamp = old.timestamp AND role IS old.role AND content = old.content LIMIT 1
+        );
+    END
+'''
+
+# Column order _row_to_episodic expects.
+EPISODIC_COLUMNS = "time, content, mood, tags, importance, relation, category, timestamp, rehearsed_count, sentiment_color"
+
 class MemoryStorage:
-    def __init__(self, db_path):
+    def __init__(self, db_path, segment_dir=None):
         self.db_path = db_path
-        os.makedirs(os.path.dirname(db_path), exist_ok=True)
-        self.sqlite_conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.db = get_db(db_path)
+        self.fts_enabled = False
+        self._search_backfill_cold = False
         self.create_tables()
         self.migrate_tables()
+        self.cold_storage = ChatColdStorage(self.db, segment_dir) if segment_dir else None
+        if self._search_backfill_cold and self.cold_storage:
+            self._index_cold_chat()
 
     def create_tables(self):
         with self.cursor() as cursor:
@@ -23,6 +54,8 @@ class MemoryStorage:
                     role TEXT, content TEXT, mood TEXT, timestamp REAL
                 )
             ''')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_chat_timestamp ON chat_history (timestamp)')
+            ChatColdStorage.create_table(cursor)
             cursor.execute('''
                 CREATE TABLE IF NOT EXISTS episodic_memory (
                     time TEXT, content TEXT, mood TEXT, tags TEXT,
@@ -30,22 +63,183 @@ class MemoryStorage:
                     timestamp REAL, rehearsed_count INTEGER DEFAULT 0
                 )
             ''')
-        self.sqlite_conn.commit()
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_episodic_timestamp ON episodic_memory (timestamp)')
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS episodic_archive (
+                    time TEXT, content TEXT, mood TEXT, tags TEXT,
+                    importance REAL, relation TEXT, category TEXT,
+                    timestamp REAL, rehearsed_count INTEGER DEFAULT 0,
+                    consolidated_into REAL, archived_at REAL
+                )
+            ''')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_archive_consolidated ON episodic_archive (consolidated_into)')
+
+    def migrate_tables(self):
+        with self.cursor() as cursor:
+            cursor.execute("PRAGMA user_version")
+            version = cursor.fetchone()[0]
+
+            if version < 1:
+                cursor.execute("PRAGMA table_info(episodic_memory)")
+                columns = {row[1] for row in cursor.fetchall()}
+                if "rehearsed_count" not in columns:
+                    cursor.execute("ALTER TABLE episodic_memory ADD COLUMN rehearsed_count INTEGER DEFAULT 0")
+                    logging.info("[Migration] Added 'rehearsed_count' column.")
+                cursor.execute("PRAGMA user_version = 1")
+
+            if version < 2:
+                cursor.execute("PRAGMA table_info(episodic_memory)")
+                columns = {row[1] for row in cursor.fetchall()}
+                for axis in ("valence", "arousal", "dominance"):
+                    if axis not in columns:
+                        cursor.execute(f"ALTER TABLE episodic_memory ADD COLUMN {axis} REAL DEFAULT 0")
+                cursor.execute("SELECT DISTINCT mood FROM episodic_memory")
+                moods = [row[0] for row in cursor.fetchall()]
+                cursor.executemany(
+                    "UPDATE episodic_memory SET valence = ?, arousal = ?, dominance = ? WHERE mood IS ?",
+                    [(*mood_to_vad(mood), mood) for mood in moods]
+                )
+                cursor.execute("CREATE INDEX IF NOT EXISTS idx_episodic_mood_space ON episodic_memory (valence, arousal)")
+                cursor.execute("PRAGMA user_version = 2")
+                logging.info("[Migration] Added mood-space coordinates to episodic_memory.")
+
+            if version < 3:
+                cursor.execute("PRAGMA table_info(episodic_memory)")
+                columns = {row[1] for row in cursor.fetchall()}
+                if "sentiment_color" not in columns:
+                    cursor.execute("ALTER TABLE episodic_memory ADD COLUMN sentiment_color TEXT")
+                cursor.execute("PRAGMA user_version = 3")
+                logging.info("[Migration] Added 'sentiment_color' column.")
+
+            if version < 4:
+                cursor.execute("PRAGMA table_info(episodic_memory)")
+                columns = {row[1] for row in cursor.fetchall()}
+                if "simhash" not in columns:
+                    cursor.execute("ALTER TABLE episodic_memory ADD COLUMN simhash INTEGER")
+                cursor.execute("PRAGMA user_version = 4")
+                logging.info("[Migration] Added 'simhash' column (filled lazily).")
 
-    # def migrate_tables(self):
-    #     with self.cursor() as cursor:
-    #         cursor.execute("PRAGMA user_version")
-    #         version = cursor.fetchone()[0]
+            if version < 5:
+                try:
+                    self._add_episodic_key(cursor)
+                    self._create_search_index(cursor)
+                    cursor.execute("PRAGMA user_version = 5")
+                    self._search_backfill_cold = True
+                    logging.info("[Migration] Added FTS5 search index over chat and episodic content.")
+                except sqlite3.OperationalError as e:
+                    logging.warning(f"[Migration] FTS5 unavailable, keyword search falls back to LIKE: {e}")
 
-    #         if version < 1:
-    #             cursor.execute("ALTER TABLE episodic_memory ADD COLUMN rehearsed_count INTEGER DEFAULT 0")
-    #             cursor.execute("PRAGMA user_version = 1")
-    #             logging.info("[Migration] Added 'rehearsed_count' column.")
-    #             self.sqlite_conn.commit()
+            if version < 6:
+                cursor.execute("PRAGMA table_info(episodic_memory)")
+                columns = {row[1] for row in cursor.fetchall()}
+                if "mood_intensity" not in columns:
+                    cursor.execute("ALTER TABLE episodic_memory ADD COLUMN mood_intensity REAL DEFAULT 1.0")
+                # decay_mood used to write the intensity over the label; those labels are lost.
+                cursor.execute("UPDATE episodic_memory SET mood = 'unknown' WHERE typeof(mood) = 'real' "
+                               "OR (mood GLOB '[0-9]*' AND CAST(mood AS REAL) || '' = mood)")
+                cursor.execute("PRAGMA user_version = 6")
+                logging.info("[Migration] Added 'mood_intensity' column.")
+
+            if version < 7:
+                # episodic_fts was keyed on the implicit rowid, which VACUUM may renumber.
+                self._add_episodic_key(cursor)
+                cursor.execute("SELECT sql FROM sqlite_master WHERE name = 'episodic_fts'")
+                row = cursor.fetchone()
+                if row and "content_rowid='id'" not in row[0]:
+                    for trigger in ("episodic_fts_insert", "episodic_fts_delete", "episodic_fts_update"):
+                        cursor.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+                    cursor.execute("DROP TABLE episodic_fts")
+                    self._create_episodic_index(cursor)
+                if row:
+                    cursor.execute(CHAT_FTS_DELETE_TRIGGER)
+                cursor.execute("PRAGMA user_version = 7")
+                logging.info("[Migration] Keyed episodic_memory and its search index on a stable id.")
+
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'episodic_fts'")
+            self.fts_enabled = cursor.fetchone() is not None
+
+    def _add_episodic_key(self, cursor):
+        """
+        Rebuilds episodic_memory with an INTEGER PRIMARY KEY `id` (taking over the current
+        rowids) so external indexes keyed on it survive a VACUUM. Indexes and any other
+        triggers on the table, such as the sync changelog's, are carried over.
+        """
+        cursor.execute("PRAGMA table_info(episodic_memory)")
+        columns = cursor.fetchall()
+        if any(row[1] == "id" for row in columns):
+            return
+        cursor.execute("SELECT sql FROM sqlite_master WHERE tbl_name = 'episodic_memory' AND sql IS NOT NULL "
+                       "AND type IN ('index', 'trigger') AND name NOT LIKE 'episodic_fts_%'")
+        dependents = [row[0] for row in cursor.fetchall()]
+        definitions = ", ".join(
+            f"{name} {col_type}" + (f" DEFAULT {default}" if default is not None else "")
+            for _, name, col_type, _, default, _ in columns
+        )
+        names = ", ".join(row[1] for row in columns)
+        cursor.execute("DROP TABLE IF EXISTS episodic_memory_rekey")
+        cursor.execute(f"CREATE TABLE episodic_memory_rekey (id INTEGER PRIMARY KEY, {definitions})")
+        cursor.execute(f"INSERT INTO episodic_memory_rekey (id, {names}) SELECT rowid, {names} FROM episodic_memory")
+        cursor.execute("DROP TABLE episodic_memory")
+        cursor.execute("ALTER TABLE episodic_memory_rekey RENAME TO episodic_memory")
+        for sql in dependents:
+            cursor.execute(sql)
+        logging.info("[Migration] Added INTEGER PRIMARY KEY 'id' to episodic_memory.")
+
+    def _create_search_index(self, cursor):
+        """
+        episodic_fts is an external-content index over episodic_memory, kept in step by
+        triggers. chat_fts stores its own copy of each turn, so chat rolled into cold
+        segments stays searchable; other deletes from chat_history drop out of it.
+        """
+        self._create_episodic_index(cursor)
+
+        cursor.execute("CREATE VIRTUAL TABLE IF NOT EXISTS chat_fts USING fts5(content, role UNINDEXED, timestamp UNINDEXED)")
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS chat_fts_insert AFTER INSERT ON chat_history BEGIN
+                INSERT INTO chat_fts (content, role, timestamp) VALUES (new.content, new.role, new.timestamp);
+            END
+        ''')
+        cursor.execute(CHAT_FTS_DELETE_TRIGGER)
+        cursor.execute("INSERT INTO chat_fts (content, role, timestamp) SELECT content, role, timestamp FROM chat_history")
+
+    def _create_episodic_index(self, cursor):
+        cursor.execute('''
+            CREATE VIRTUAL TABLE IF NOT EXISTS episodic_fts USING fts5(
+                content, tags, content='episodic_memory', content_rowid='id'
+            )
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS episodic_fts_insert AFTER INSERT ON episodic_memory BEGIN
+                INSERT INTO episodic_fts (rowid, content, tags) VALUES (new.id, new.content, new.tags);
+            END
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS episodic_fts_delete AFTER DELETE ON episodic_memory BEGIN
+                INSERT INTO episodic_fts (episodic_fts, rowid, content, tags) VALUES ('delete', old.id, old.content, old.tags);
+            END
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS episodic_fts_update AFTER UPDATE OF content, tags ON episodic_memory BEGIN
+                INSERT INTO episodic_fts (episodic_fts, rowid, content, tags) VALUES ('delete', old.id, old.content, old.tags);
+                INSERT INTO episodic_fts (rowid, content, tags) VALUES (new.id, new.content, new.tags);
+            END
+        ''')
+        cursor.execute("INSERT INTO episodic_fts (episodic_fts) VALUES ('rebuild')")
 
     @contextmanager
     def cursor(self):
-        cursor = self.sqlite_conn.cursor()
+        """Cursor on the shared writer connection; the block commits as one transaction."""
+        with self.db.writer() as conn:
+            cursor = conn.cursor()
+            try:
+                yield cursor
+            finally:
+                cursor.close()
+
+    @contextmanager
+    def read_cursor(self):
+        """Cursor on this thread's read connection."""
+        cursor = self.db.reader().cursor()
         try:
             yield cursor
         finally:
@@ -56,7 +250,6 @@ class MemoryStorage:
             try:
                 cursor.execute('INSERT INTO chat_history (role, content, mood, timestamp) VALUES (?, ?, ?, ?)',
                             (entry.get("role"), entry.get("content"), entry.get("mood"), entry.get("timestamp")))
-                self.sqlite_conn.commit()
                 logging.info(f"[DB Save] Chat entry saved: '{entry['content'][:30]}...'")
             except Exception as e:
                 logging.error(f"[Database Error] {e}")
@@ -64,16 +257,23 @@ class MemoryStorage:
     def save_episodic_to_sqlite(self, mem):
         with self.cursor() as cursor:
             try:
-                cursor.execute('INSERT INTO episodic_memory VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
-                            (mem["time"], mem["content"], mem["mood"],
-                                ",".join(mem["tags"]), mem["importance"],
-                                mem["relation_to_user"], mem["category"],
-                                mem["timestamp"], mem.get("rehearsed_count", 0)))
-                self.sqlite_conn.commit()
+                self._insert_episodic(cursor, mem)
                 logging.info(f"[DB Save] Episodic memory saved: '{mem['content'][:30]}...'")
             except Exception as e:
                 logging.error(f"[Database Error] {e}")
 
+    def _insert_episodic(self, cursor, mem):
+        cursor.execute('''
+            INSERT INTO episodic_memory (time, content, mood, tags, importance, relation, category,
+                                         timestamp, rehearsed_count, valence, arousal, dominance, sentiment_color,
+                                         simhash)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (mem["time"], mem["content"], mem["mood"],
+              ",".join(mem["tags"]), mem["importance"],
+              mem["relation_to_user"], mem["category"],
+              mem["timestamp"], mem.get("rehearsed_count", 0), *mood_to_vad(mem["mood"]),
+              mem.get("sentiment_color"), to_signed(mem.get("simhash") or simhash(mem["content"]))))
+
     def update_episodic_in_sqlite(self, mem):
         with self.cursor() as cursor:
             cursor.execute('''
@@ -81,32 +281,157 @@ class MemoryStorage:
                 SET importance = ?, category = ?, rehearsed_count = ?
                 WHERE timestamp = ?
             ''', (mem["importance"], mem["category"], mem["rehearsed_count"], mem["timestamp"]))
-        self.sqlite_conn.commit()
 
     def load_memories(self, limit=50):
-        with self.cursor() as cursor:
+        """Newest-first chat turns; falls through to the cold tier when SQLite runs short."""
+        with self.read_cursor() as cursor:
             cursor.execute('SELECT role, content, mood, timestamp FROM chat_history ORDER BY timestamp DESC LIMIT ?', (limit,))
             rows = cursor.fetchall()
 
-        return [
+        memories = [
             {
                 "role": row[0], "content": row[1], "mood": row[2], "timestamp": row[3]
             }
             for row in rows
         ]
+        if self.cold_storage and len(memories) < limit:
+            before = memories[-1]["timestamp"] if memories else None
+            memories.extend(self.cold_storage.load_recent(limit - len(memories), before=before))
+        return memories
+
+    def iter_chat_range(self, start=None, end=None):
+        """Streams chat turns in time order across the cold and hot tiers."""
+        if self.cold_storage:
+            yield from self.cold_storage.iter_range(start, end)
+        query = 'SELECT role, content, mood, timestamp FROM chat_history WHERE timestamp >= ? AND timestamp < ? ORDER BY timestamp ASC'
+        with self.read_cursor() as cursor:
+            cursor.execute(query, (float("-inf") if start is None else start, float("inf") if end is None else end))
+            for row in cursor:
+                yield {"role": row[0], "content": row[1], "mood": row[2], "timestamp": row[3]}
+
+    def roll_chat_history(self, older_than_timestamp):
+        if not self.cold_storage:
+            logging.warning("[Chat Tiering] No segment directory configured; skipping roll-over.")
+            return 0
+        return self.cold_storage.roll_over(older_than_timestamp)
+
+    @staticmethod
+    def fts_query(text, column=None, match="all"):
+        """
+        Turns free text into an FTS5 query with every word quoted, so punctuation is inert.
+        match="all" requires every word; match="any" drops stopwords and ORs the rest,
+        leaving BM25 to rank ("did I ever mention my sister?" → sister-heavy rows first).
+        """
+        words = re.findall(r"\w+\*?", text.lower())
+        if match == "any":
+            words = [w for w in words if w not in SEARCH_STOPWORDS] or words
+        terms = [f'"{w[:-1]}"*' if w.endswith("*") else f'"{w}"' for w in words]
+        query = (" OR " if match == "any" else " ").join(terms)
+        if column and query:
+            query = f"{column} : ({query})"
+        return query
+
+    def _add_text_filter(self, filters, params, column, text):
+        if self.fts_enabled:
+            query = self.fts_query(text, column)
+            if query:
+                filters.append("rowid IN (SELECT rowid FROM episodic_fts WHERE episodic_fts MATCH ?)")
+                params.append(query)
+                return
+        filters.append(f"{column} LIKE ?")
+        params.append(f"%{text}%")
+
+    def search(self, text, source="all", limit=20, snippet_tokens=12, match="any", raw=False):
+        """
+        Ranked keyword search over chat turns and episodic memories (BM25, best first).
+        `text` is free text (see fts_query) unless `raw`, in which case it is passed to FTS5 as is.
+        Each hit carries a snippet with the matched terms wrapped in [brackets].
+        """
+        if not self.fts_enabled:
+            return self._search_like(text, source, limit)
+        query = text if raw else self.fts_query(text, match=match)
+        if not query:
+            return []
+        hits = []
+        with self.read_cursor() as cursor:
+            if source in ("all", "episodic"):
+                cursor.execute(f'''
+                    SELECT e.content, snippet(episodic_fts, 0, '[', ']', '…', ?), e.timestamp, e.mood, e.tags,
+                           e.importance, bm25(episodic_fts, 1.0, 0.5)
+                    FROM episodic_fts JOIN episodic_memory e ON e.rowid = episodic_fts.rowid
+                    WHERE episodic_fts MATCH ? ORDER BY bm25(episodic_fts, 1.0, 0.5) LIMIT ?
+                ''', (snippet_tokens, query, limit))
+                hits += [{
+                    "source": "episodic", "content": row[0], "snippet": row[1], "timestamp": row[2],
+                    "mood": row[3], "tags": row[4].split(",") if row[4] else [], "importance": row[5], "score": -row[6],
+                } for row in cursor.fetchall()]
+            if source in ("all", "chat"):
+                cursor.execute('''
+                    SELECT content, snippet(chat_fts, 0, '[', ']', '…', ?), timestamp, role, bm25(chat_fts)
+                    FROM chat_fts WHERE chat_fts MATCH ? ORDER BY bm25(chat_fts) LIMIT ?
+                ''', (snippet_tokens, query, limit))
+                hits += [{
+                    "source": "chat", "content": row[0], "snippet": row[1], "timestamp": row[2],
+                    "role": row[3], "score": -row[4],
+                } for row in cursor.fetchall()]
+        hits.sort(key=lambda hit: hit["score"], reverse=True)
+        return hits[:limit]
+
+    def _search_like(self, text, source, limit):
+        hits = []
+        pattern = f"%{text}%"
+        with self.read_cursor() as cursor:
+            if source in ("all", "episodic"):
+                cursor.execute('SELECT content, timestamp, mood FROM episodic_memory WHERE content LIKE ? '
+                               'ORDER BY timestamp DESC LIMIT ?', (pattern, limit))
+                hits += [{"source": "episodic", "content": r[0], "snippet": r[0], "timestamp": r[1], "mood": r[2],
+                          "score": 0.0} for r in cursor.fetchall()]
+            if source in ("all", "chat"):
+                cursor.execute('SELECT content, timestamp, role FROM chat_history WHERE content LIKE ? '
+                               'ORDER BY timestamp DESC LIMIT ?', (pattern, limit))
+                hits += [{"source": "chat", "content": r[0], "snippet": r[0], "timestamp": r[1], "role": r[2],
+                          "score": 0.0} for r in cursor.fetchall()]
+        return hits[:limit]
+
+    def _index_cold_chat(self):
+        batch = []
+        with self.cursor() as cursor:
+            for entry in self.cold_storage.iter_range():
+                batch.append((entry["content"], entry["role"], entry["timestamp"]))
+                if len(batch) >= 1000:
+                    cursor.executemany("INSERT INTO chat_fts (content, role, timestamp) VALUES (?, ?, ?)", batch)
+                    batch = []
+            if batch:
+                cursor.executemany("INSERT INTO chat_fts (content, role, timestamp) VALUES (?, ?, ?)", batch)
+        logging.info("[Search Index] Indexed chat turns from cold segments.")
+
+    def rebuild_search_index(self, chat=True):
+        """
+        Rebuilds the episodic FTS index and, with `chat`, the chat index from the hot table
+        and, if configured, the cold chat segments.
+        """
+        if not self.fts_enabled:
+            return
+        with self.cursor() as cursor:
+            cursor.execute("INSERT INTO episodic_fts (episodic_fts) VALUES ('rebuild')")
+            if chat:
+                cursor.execute("DELETE FROM chat_fts")
+                cursor.execute("INSERT INTO chat_fts (content, role, timestamp) SELECT content, role, timestamp FROM chat_history")
+        if chat and self.cold_storage:
+            self._index_cold_chat()
 
     def delete_memory(self, keyword=None, tag=None, mood=None, timestamp=None, category=None):
+        """Deletes matching episodic memories; returns the timestamps of the rows removed."""
         if not keyword and not tag and not mood and not timestamp and not category:
-            return
+            return []
+        deleted = []
         with self.cursor() as cursor:
             filters = []
             params = []
             if keyword:
-                filters.append("content LIKE ?")
-                params.append(f"%{keyword}%")
+                self._add_text_filter(filters, params, "content", keyword)
             if tag:
-                filters.append("tags LIKE ?")
-                params.append(f"%{tag}%")
+                self._add_text_filter(filters, params, "tags", tag)
             if mood:
                 filters.append("mood = ?")
                 params.append(mood)
@@ -118,26 +443,139 @@ class MemoryStorage:
                 params.append(category)
             
             if filters:
-                query = "DELETE FROM episodic_memory WHERE " + " AND ".join(filters)
-                cursor.execute(query, tuple(params))
+                where = " WHERE " + " AND ".join(filters)
+                cursor.execute("SELECT timestamp FROM episodic_memory" + where, tuple(params))
+                deleted = [row[0] for row in cursor.fetchall()]
+                cursor.execute("DELETE FROM episodic_memory" + where, tuple(params))
                 logging.info(f"[Memory Deletion] Entries deleted based on filter: {filters}")
-        
-        self.sqlite_conn.commit()
+        return deleted
 
     def cleanup_old_memories(self, older_than_timestamp):
         with self.cursor() as cursor:
             cursor.execute("DELETE FROM episodic_memory WHERE timestamp < ?", (older_than_timestamp,))
             logging.info("[Memory Cleanup] Old memories deleted.")
-        self.sqlite_conn.commit()
+
+    def get_consolidation_candidates(self, older_than_timestamp, max_importance, limit=500):
+        """Oldest low-importance episodic rows that are not already consolidation summaries."""
+        with self.read_cursor() as cursor:
+            cursor.execute(f'''
+                SELECT {EPISODIC_COLUMNS}
+                FROM episodic_memory
+                WHERE timestamp < ? AND importance <= ? AND category != 'consolidated'
+                ORDER BY timestamp ASC LIMIT ?
+            ''', (older_than_timestamp, max_importance, limit))
+            rows = cursor.fetchall()
+        return [self._row_to_episodic(row) for row in rows]
+
+    def archive_and_replace(self, members, summary):
+        """Move `members` into episodic_archive and insert `summary` in their place, atomically."""
+        timestamps = [m["timestamp"] for m in members]
+        placeholders = ",".join("?" * len(timestamps))
+        archived_at = summary.get("archived_at", summary["timestamp"])
+        try:
+            with self.cursor() as cursor:
+                cursor.execute(f'''
+                    INSERT INTO episodic_archive
+                    SELECT time, content, mood, tags, importance, relation, category, timestamp,
+                           rehearsed_count, ?, ?
+                    FROM episodic_memory WHERE timestamp IN ({placeholders})
+                ''', (summary["timestamp"], archived_at, *timestamps))
+                cursor.execute(f"DELETE FROM episodic_memory WHERE timestamp IN ({placeholders})", timestamps)
+                self._insert_episodic(cursor, summary)
+        except Exception as e:
+            logging.error(f"[Database Error] {e}")
+            return False
+        logging.info(f"[Consolidation] Archived {len(members)} memories into '{summary['content'][:30]}...'")
+        return True
+
+    def get_archived_memories(self, consolidated_into):
+        with self.read_cursor() as cursor:
+            cursor.execute('''
+                SELECT time, content, mood, tags, importance, relation, category, timestamp, rehearsed_count
+                FROM episodic_archive WHERE consolidated_into = ? ORDER BY timestamp ASC
+            ''', (consolidated_into,))
+            rows = cursor.fetchall()
+        return [self._row_to_episodic(row) for row in rows]
+
+    def nearest_by_mood(self, vad, radius, limit=5):
+        """
+        k nearest episodic memories to a valence/arousal/dominance point. The
+        (valence, arousal) index narrows the scan to a bounding box; exact distances
+        and the top-k cut are computed in one numpy pass over that box.
+        """
+        v, a, d = vad
+        with self.read_cursor() as cursor:
+            cursor.execute(f'''
+                SELECT {EPISODIC_COLUMNS}, valence, arousal, dominance
+                FROM episodic_memory
+                WHERE valence BETWEEN ? AND ? AND arousal BETWEEN ? AND ?
+                  AND dominance BETWEEN ? AND ?
+            ''', (v - radius, v + radius, a - radius, a + radius, d - radius, d + radius))
+            rows = cursor.fetchall()
+        if not rows:
+            return []
+
+        coords = np.array([row[10:13] for row in rows], dtype=np.float32)
+        distances = np.linalg.norm(coords - np.array(vad, dtype=np.float32), axis=1)
+        within = np.flatnonzero(distances <= radius)
+        if len(within) > limit:
+            within = within[np.argpartition(distances[within], limit - 1)[:limit]]
+        within = within[np.argsort(distances[within], kind="stable")]
+
+        results = []
+        for i in within:
+            mem = self._row_to_episodic(rows[i])
+            mem["mood_distance"] = float(distances[i])
+            results.append(mem)
+        return results
+
+    def get_episodic_by_timestamp(self, timestamp):
+        with self.read_cursor() as cursor:
+            cursor.execute(f'''
+                SELECT {EPISODIC_COLUMNS}
+                FROM episodic_memory WHERE timestamp = ?
+            ''', (timestamp,))
+            row = cursor.fetchone()
+        return self._row_to_episodic(row) if row else None
+
+    def iter_simhashes(self, batch_size=1000):
+        """Yields (timestamp, simhash) for every episodic memory, filling in missing signatures."""
+        last_rowid = 0
+        while True:
+            with self.read_cursor() as cursor:
+                cursor.execute(
+                    'SELECT rowid, timestamp, simhash, content FROM episodic_memory WHERE rowid > ? ORDER BY rowid LIMIT ?',
+                    (last_rowid, batch_size)
+                )
+                rows = cursor.fetchall()
+            if not rows:
+                return
+            filled = {rowid: to_signed(simhash(content or "")) for rowid, _, sig, content in rows if sig is None}
+            if filled:
+                with self.cursor() as cursor:
+                    cursor.executemany('UPDATE episodic_memory SET simhash = ? WHERE rowid = ?',
+                                       [(sig, rowid) for rowid, sig in filled.items()])
+            for rowid, timestamp, sig, _ in rows:
+                yield timestamp, to_unsigned(filled.get(rowid, sig))
+            last_rowid = rows[-1][0]
+
+    def _row_to_episodic(self, row):
+        return {
+            "time": row[0], "content": row[1], "mood": row[2],
+            "tags": row[3].split(",") if row[3] else [], "importance": row[4],
+            "relation_to_user": row[5], "category": row[6], "timestamp": row[7],
+            "rehearsed_count": row[8] or 0,
+            # episodic_archive rows have no sentiment color; pre-v3 rows have NULL until reindexed.
+            "sentiment_color": row[9] if len(row) > 9 else None,
+        }
 
     def get_episodic_memories(self, limit=20, tag=None, category=None):
-        query = 'SELECT time, content, mood, tags, importance, relation, category, timestamp FROM episodic_memory'
+        query = f'SELECT {EPISODIC_COLUMNS} FROM episodic_memory'
         filters = []
         params = []
 
         if tag:
-            filters.append("tags LIKE ?")
-            params.append(f"%{tag}%")
+            self._add_text_filter(filters, params, "tags", tag)
         if category:
             filters.append("category = ?")
             params.append(category)
@@ -148,15 +586,8 @@ class MemoryStorage:
         query += " ORDER BY timestamp DESC LIMIT ?"
         params.append(limit)
 
-        with self.cursor() as cursor:
+        with self.read_cursor() as cursor:
             cursor.execute(query, tuple(params))
             rows = cursor.fetchall()
 
-        return [
-            {
-                "time": row[0], "content": row[1], "mood": row[2],
-                "tags": row[3].split(","), "importance": row[4],
-                "relation_to_user": row[5], "category": row[6], "timestamp": row[7]
-            }
-            for row in rows
-        ]
+        return [self._row_to_episodic(row) for row in rows]
@@ -0,0 +1,392 @@
+# core/memory_sync.py
+import os
+import json
+import uuid
+import zlib
+import logging
+from core.memory_storage import MemoryStorage
+from core.emotion import EmotionState
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(message)s')
+
+BUNDLE_FORMAT = 1
+
+# table -> (timestamp key column, text key column, change kinds that are logged)
+# Chat rows are never logged as deleted: rolling them into cold segments is local housekeeping.
+# mood_log is pruned locally for the same reason; rollups are rebuilt from the synced raw readings.
+SYNC_TABLES = {
+    "memory": {
+        "chat_history": ("timestamp", "role", ("INSERT",)),
+        "episodic_memory": ("timestamp", None, ("INSERT", "UPDATE", "DELETE")),
+        "episodic_archive": ("timestamp", None, ("INSERT",)),
+    },
+    "emotion": {
+        "emotions": (None, "mood", ("INSERT", "UPDATE")),
+        "mood_log": ("timestamp", "mood", ("INSERT",)),
+    },
+}
+
+# Per-device columns: mood_log and episodic_memory ids are local keys, mood_intensity is each device's own decay.
+LOCAL_ONLY_COLUMNS = {"mood_log": {"id"}, "episodic_memory": {"id", "mood_intensity"}}
+# Wall-clock time of a change, as stamped by the triggers.
+_NOW = "((julianday('now') - 2440587.5) * 86400.0)"
+
+
+class SyncEngine:
+    """
+    Delta sync for one data directory (memory.db + emotion.db).
+
+    Triggers append every insert, delete, and update that changes a synced column to a
+    per-database sync_changelog whose autoincrement `seq` is this device's sequence
+    number; each entry is stamped with the time of the change. An export for a peer
+    collapses the changes after that peer's watermark to one entry per row and ships the
+    rows' current values and change times (or a delete) as a zlib-compressed JSON bundle.
+    Imports merge deterministically, so both sides converge whatever the order:
+      - episodic_memory: max rehearsed_count, importance from the copy changed last (so
+        decay is not undone by a stale copy), union of tags, other fields from the
+        more-rehearsed copy; a delete wins and leaves a tombstone
+      - emotions: latest last_updated wins (ties: higher intensity); EmotionState keeps
+        faded moods at intensity 0 rather than deleting them, so fading syncs too
+      - chat_history, mood_log, episodic_archive: append-only, keyed by timestamp
+    Run it while Peach is not running; live engines keep their own in-memory state.
+    """
+    def __init__(self, data_dir):
+        self.data_dir = data_dir
+        self.storage = MemoryStorage(os.path.join(data_dir, "memory.db"))
+        self.emotion = EmotionState(db_path=os.path.join(data_dir, "emotion.db"))
+        self.dbs = {"memory": self.storage.db, "emotion": self.emotion.db}
+        self._columns = {}
+        for name, db in self.dbs.items():
+            self._install(name, db)
+        self.device_id = self._meta(self.dbs["memory"], "device_id")
+        for db in self.dbs.values():
+            if self._meta(db, "device_id") != self.device_id:
+                with db.writer() as conn:
+                    conn.execute("INSERT OR REPLACE INTO sync_meta VALUES ('device_id', ?)", (self.device_id,))
+
+    # --- schema -------------------------------------------------------------------
+
+    def _install(self, name, db):
+        with db.writer() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS sync_meta (name TEXT PRIMARY KEY, value TEXT)")
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS sync_changelog (
+                    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                    tbl TEXT, key_ts REAL, key_text TEXT, origin TEXT, changed_at REAL
+                )
+            ''')
+            if "changed_at" not in {row[1] for row in conn.execute("PRAGMA table_info(sync_changelog)")}:
+                conn.execute("ALTER TABLE sync_changelog ADD COLUMN changed_at REAL")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_sync_changelog_key ON sync_changelog (tbl, key_ts, key_text)")
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS sync_peers (
+                    peer TEXT PRIMARY KEY, exported_seq INTEGER DEFAULT 0, imported_seq INTEGER DEFAULT 0
+                )
+            ''')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS sync_tombstones (
+                    tbl TEXT, key_ts REAL, key_text TEXT, PRIMARY KEY (tbl, key_ts, key_text)
+                )
+            ''')
+            fresh = conn.execute("SELECT value FROM sync_meta WHERE name = 'device_id'").fetchone() is None
+            for table, (ts_col, text_col, events) in SYNC_TABLES[name].items():
+                columns = [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+                self._columns[table] = [c for c in columns if c not in LOCAL_ONLY_COLUMNS.get(table, ())]
+                for event in ("INSERT", "UPDATE", "DELETE"):
+                    # Recreated every time, so columns added by later migrations are covered.
+                    conn.execute(f"DROP TRIGGER IF EXISTS sync_{table}_{event.lower()}")
+                    if event not in events:
+                        continue
+                    ref = "OLD" if event == "DELETE" else "NEW"
+                    key_ts = f"{ref}.{ts_col}" if ts_col else "NULL"
+                    key_text = f"COALESCE({ref}.{text_col}, '')" if text_col else "''"
+                    tombstone = (f"INSERT OR IGNORE INTO sync_tombstones VALUES ('{table}', {key_ts}, {key_text});"
+                                 if event == "DELETE" else "")
+                    # Rewrites that leave every synced column as it was (decay of a local-only
+                    # column, an upsert of the same values) are not changes worth shipping.
+                    when = ("WHEN " + " OR ".join(f"OLD.{c} IS NOT NEW.{c}" for c in self._columns[table])
+                            if event == "UPDATE" else "")
+                    conn.execute(f'''
+                        CREATE TRIGGER sync_{table}_{event.lower()} AFTER {event} ON {table} {when}
+                        BEGIN
+                            INSERT INTO sync_changelog (tbl, key_ts, key_text, origin, changed_at) VALUES
+                                ('{table}', {key_ts}, {key_text},
+                                 (SELECT value FROM sync_meta WHERE name = 'applying_from'), {_NOW});
+                            {tombstone}
+                        END
+                    ''')
+                if fresh:
+                    # Rows written before sync was enabled go out with the first bundle, dated by creation.
+                    conn.execute(f'''
+                        INSERT INTO sync_changelog (tbl, key_ts, key_text, changed_at)
+                        SELECT '{table}', {ts_col or "NULL"}, {f"COALESCE({text_col}, '')" if text_col else "''"},
+                               {ts_col or "NULL"}
+                        FROM {table}
+                    ''')
+            if fresh:
+                conn.execute("INSERT INTO sync_meta VALUES ('device_id', ?)", (uuid.uuid4().hex,))
+
+    @staticmethod
+    def _meta(db, name):
+        rows = db.execute_read("SELECT value FROM sync_meta WHERE name = ?", (name,))
+        return rows[0][0] if rows else None
+
+    # --- export -------------------------------------------------------------------
+
+    def export_bundle(self, peer, path, full=False):
+        """Writes the changes `peer` has not been sent yet to `path`; returns per-table counts."""
+        bundle = {"format": BUNDLE_FORMAT, "device": self.device_id, "peer": peer, "databases": {}}
+        watermarks = {}
+        counts = {}
+        for name, db in self.dbs.items():
+            since = 0 if full else self._peer_row(db, peer)[0]
+            to_seq = db.execute_read("SELECT COALESCE(MAX(seq), 0) FROM sync_changelog")[0][0]
+            tables = self._collect(name, db, since, to_seq, peer)
+            bundle["databases"][name] = {"from_seq": since, "to_seq": to_seq, "tables": tables}
+            watermarks[name] = to_seq
+            for table, payload in tables.items():
+                counts[table] = len(payload["upserts"]) + len(payload["deletes"])
+
+        raw = json.dumps(bundle, separators=(",", ":")).encode("utf-8")
+        with open(path, "wb") as f:
+            f.write(zlib.compress(raw, 6))
+        for name, db in self.dbs.items():
+            with db.writer() as conn:
+                conn.execute('''
+                    INSERT INTO sync_peers (peer, exported_seq) VALUES (?, ?)
+                    ON CONFLICT (peer) DO UPDATE SET exported_seq = excluded.exported_seq
+                ''', (peer, watermarks[name]))
+        logging.info(f"[Sync] Exported {sum(counts.values())} changes for {peer} ({os.path.getsize(path)} bytes).")
+        return counts
+
+    def _peer_row(self, db, peer):
+        rows = db.execute_read("SELECT exported_seq, imported_seq FROM sync_peers WHERE peer = ?", (peer,))
+        return rows[0] if rows else (0, 0)
+
+    def _collect(self, name, db, since, to_seq, peer):
+        compacted = int(self._meta(db, "compacted_through") or 0)
+        if since < compacted:
+            changed = self._snapshot_keys(name, db)
+        else:
+            # One entry per row: its latest change, unless that change came from the peer itself.
+            changed = db.execute_read('''
+                SELECT c.tbl, c.key_ts, c.key_text, c.origin FROM sync_changelog c
+                JOIN (SELECT MAX(seq) AS seq FROM sync_changelog WHERE seq > ? AND seq <= ?
+                      GROUP BY tbl, key_ts, key_text) latest ON latest.seq = c.seq
+            ''', (since, to_seq))
+        tables = {}
+        for table, key_ts, key_text, origin in changed:
+            if origin == peer:
+                continue
+            payload = tables.setdefault(table, {"columns": self._columns[table], "upserts": [], "changed_at": [],
+                                                "deletes": []})
+            row = self._fetch(db, table, key_ts, key_text)
+            if row is not None:
+                payload["upserts"].append(list(row))
+                payload["changed_at"].append(self._changed_at(db, table, key_ts, key_text))
+            elif "DELETE" in self._spec(table)[2]:
+                payload["deletes"].append([key_ts, key_text])
+        return tables
+
+    def _snapshot_keys(self, name, db):
+        """Every live row plus every tombstone, for peers whose watermark predates compaction."""
+        keys = []
+        for table, (ts_col, text_col, _) in SYNC_TABLES[name].items():
+            text_expr = f"COALESCE({text_col}, '')" if text_col else "''"
+            keys += db.execute_read(f"SELECT '{table}', {ts_col or 'NULL'}, {text_expr}, NULL FROM {table}")
+        keys += db.execute_read("SELECT tbl, key_ts, key_text, NULL FROM sync_tombstones")
+        return keys
+
+    def compact(self):
+        """
+        Drops changelog entries every known peer has been sent; later peers get a full
+        snapshot. Each row's latest entry stays: merges need to know when it last changed.
+        """
+        dropped = 0
+        for db in self.dbs.values():
+            with db.writer() as conn:
+                floor = conn.execute("SELECT MIN(exported_seq) FROM sync_peers").fetchone()[0]
+                if not floor:
+                    continue
+                dropped += conn.execute('''
+                    DELETE FROM sync_changelog WHERE seq <= ?
+                      AND seq NOT IN (SELECT MAX(seq) FROM sync_changelog GROUP BY tbl, key_ts, key_text)
+                ''', (floor,)).rowcount
+                conn.execute('''
+                    INSERT INTO sync_meta VALUES ('compacted_through', ?)
+                    ON CONFLICT (name) DO UPDATE SET value = MAX(CAST(value AS INTEGER), excluded.value)
+                ''', (floor,))
+        logging.info(f"[Sync] Compacted {dropped} changelog entries.")
+        return dropped
+
+    def _key_clause(self, table):
+        ts_col, text_col, _ = self._spec(table)
+        clauses = []
+        if ts_col:
+            clauses.append(f"{ts_col} = ?")
+        if text_col:
+            clauses.append(f"COALESCE({text_col}, '') = ?")
+        return " AND ".join(clauses)
+
+    def _key_params(self, table, key_ts, key_text):
+        ts_col, text_col, _ = self._spec(table)
+        return ([key_ts] if ts_col else []) + ([key_text or ""] if text_col else [])
+
+    @staticmethod
+    def _spec(table):
+        for tables in SYNC_TABLES.values():
+            if table in tables:
+                return tables[table]
+        raise KeyError(table)
+
+    def _fetch(self, conn_or_db, table, key_ts, key_text):
+        query = f"SELECT {', '.join(self._columns[table])} FROM {table} WHERE {self._key_clause(table)} LIMIT 1"
+        params = self._key_params(table, key_ts, key_text)
+        if hasattr(conn_or_db, "execute_read"):
+            rows = conn_or_db.execute_read(query, params)
+            return rows[0] if rows else None
+        return conn_or_db.execute(query, params).fetchone()
+
+    @staticmethod
+    def _changed_at(conn_or_db, table, key_ts, key_text):
+        """When this device last changed the row (0 if it has no record of it)."""
+        query = "SELECT MAX(changed_at) FROM sync_changelog WHERE tbl = ? AND key_ts IS ? AND key_text = ?"
+        params = (table, key_ts, key_text or "")
+        if hasattr(conn_or_db, "execute_read"):
+            row = conn_or_db.execute_read(query, params)[0]
+        else:
+            row = conn_or_db.execute(query, params).fetchone()
+        return row[0] or 0.0
+
+    @staticmethod
+    def _stamp(conn, table, key_ts, key_text, changed_at):
+        """Dates the row's latest changelog entry with the merged change time instead of now."""
+        conn.execute('''
+            UPDATE sync_changelog SET changed_at = ? WHERE seq = (
+                SELECT MAX(seq) FROM sync_changelog WHERE tbl = ? AND key_ts IS ? AND key_text = ?)
+        ''', (changed_at, table, key_ts, key_text or ""))
+
+    # --- import -------------------------------------------------------------------
+
+    @staticmethod
+    def read_bundle(path):
+        with open(path, "rb") as f:
+            bundle = json.loads(zlib.decompress(f.read()).decode("utf-8"))
+        if bundle.get("format") != BUNDLE_FORMAT:
+            raise ValueError(f"Unsupported sync bundle format {bundle.get('format')}")
+        return bundle
+
+    def import_bundle(self, path):
+        """Applies a bundle from another device; returns per-table counts of rows changed here."""
+        bundle = self.read_bundle(path)
+        origin = bundle["device"]
+        if origin == self.device_id:
+            raise ValueError("Refusing to import a bundle exported by this device.")
+        if bundle.get("peer") not in (None, self.device_id):
+            logging.warning(f"[Sync] Bundle was addressed to {bundle['peer']}, not this device; applying anyway.")
+
+        counts = {}
+        for name, payload in bundle["databases"].items():
+            db = self.dbs[name]
+            imported_seq = self._peer_row(db, origin)[1]
+            if payload["to_seq"] <= imported_seq:
+                logging.info(f"[Sync] {name}: nothing new from {origin} (already at seq {imported_seq}).")
+                continue
+            with db.writer() as conn:
+                # Triggers tag the changes made here with the sender so they are not echoed back.
+                conn.execute("INSERT OR REPLACE INTO sync_meta VALUES ('applying_from', ?)", (origin,))
+                try:
+                    for table, changes in payload["tables"].items():
+                        counts[table] = self._apply(conn, table, changes)
+                finally:
+                    conn.execute("DELETE FROM sync_meta WHERE name = 'applying_from'")
+                conn.execute('''
+                    INSERT INTO sync_peers (peer, imported_seq) VALUES (?, ?)
+                    ON CONFLICT (peer) DO UPDATE SET imported_seq = MAX(imported_seq, excluded.imported_seq)
+                ''', (origin, payload["to_seq"]))
+        logging.info(f"[Sync] Imported {sum(counts.values())} changes from {origin}.")
+        return counts
+
+    def _apply(self, conn, table, changes):
+        ts_col, text_col, _ = self._spec(table)
+        columns = [c for c in changes["columns"] if c in self._columns[table]]
+        positions = [changes["columns"].index(c) for c in columns]
+        applied = 0
+
+        for key_ts, key_text in changes["deletes"]:
+            cur = conn.execute(f"DELETE FROM {table} WHERE {self._key_clause(table)}",
+                               self._key_params(table, key_ts, key_text))
+            applied += cur.rowcount
+
+        # Bundles from before change times were shipped count as oldest.
+        changed_times = changes.get("changed_at") or [0.0] * len(changes["upserts"])
+        for values, remote_changed in zip(changes["upserts"], changed_times):
+            remote_changed = remote_changed or 0.0
+            remote = {c: values[i] for c, i in zip(columns, positions)}
+            key_ts = remote.get(ts_col) if ts_col else None
+            key_text = remote.get(text_col) if text_col else None
+            if self._tombstoned(conn, table, key_ts, key_text):
+                continue
+            local = self._fetch(conn, table, key_ts, key_text)
+            if local is None:
+                if table == "mood_log":
+                    # Keeps the rollups in step, without pruning mid-import.
+                    self.emotion.timeseries.add_reading(conn, remote["mood"], remote["intensity"], remote["timestamp"])
+                else:
+                    conn.execute(f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+                                 [remote[c] for c in columns])
+                self._stamp(conn, table, key_ts, key_text, remote_changed)
+                applied += 1
+                continue
+            local_changed = self._changed_at(conn, table, key_ts, key_text)
+            merged_changed = max(local_changed, remote_changed)
+            local = dict(zip(self._columns[table], local))
+            merged = self._merge(table, local, remote, local_changed, remote_changed)
+            changed = {c: v for c, v in merged.items() if c in local and local[c] != v}
+            if changed:
+                assignments = ", ".join(f"{c} = ?" for c in changed)
+                conn.execute(f"UPDATE {table} SET {assignments} WHERE {self._key_clause(table)}",
+                             list(changed.values()) + self._key_params(table, key_ts, key_text))
+                self._stamp(conn, table, key_ts, key_text, merged_changed)
+                applied += 1
+            if any(merged.get(c) != remote[c] for c in columns):
+                # The sender's copy lost part of the merge: queue the merged row for it as a local change.
+                conn.execute("INSERT INTO sync_changelog (tbl, key_ts, key_text, changed_at) VALUES (?, ?, ?, ?)",
+                             (table, key_ts, key_text or "", merged_changed))
+        return applied
+
+    @staticmethod
+    def _tombstoned(conn, table, key_ts, key_text):
+        return conn.execute("SELECT 1 FROM sync_tombstones WHERE tbl = ? AND key_ts IS ? AND key_text = ?",
+                            (table, key_ts, key_text or "")).fetchone() is not None
+
+    @staticmethod
+    def _merge(table, local, remote, local_changed=0.0, remote_changed=0.0):
+        if table == "emotions":
+            newer = max((local, remote), key=lambda r: (r.get("last_updated") or 0, r.get("intensity") or 0))
+            return dict(newer)
+        if table == "episodic_memory":
+            return merge_episodic(local, remote, local_changed, remote_changed)
+        return local  # append-only tables keep the first copy
+
+
+def merge_episodic(a, b, a_changed=0.0, b_changed=0.0):
+    """
+    Symmetric merge of two copies of one episodic memory, so every device ends up with
+    the same row. `a_changed`/`b_changed` are when each copy last changed.
+    """
+    def rank(row):
+        return (row.get("rehearsed_count") or 0, row.get("importance") or 0.0,
+                json.dumps(row, sort_keys=True, default=str))
+    primary, other = sorted((a, b), key=rank, reverse=True)
+    merged = dict(primary)
+    merged["rehearsed_count"] = max(a.get("rehearsed_count") or 0, b.get("rehearsed_count") or 0)
+    if a_changed != b_changed:
+        # Decay and rehearsal both move importance; the later change is the current value.
+        merged["importance"] = (a if a_changed > b_changed else b).get("importance")
+    else:
+        merged["importance"] = max(a.get("importance") or 0.0, b.get("importance") or 0.0)
+    tags = [t for t in (primary.get("tags") or "").split(",") if t]
+    tags += [t for t in (other.get("tags") or "").split(",") if t and t not in tags]
+    merged["tags"] = ",".join(tags)
+    return merged
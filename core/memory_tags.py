@@ -1,31 +1,93 @@
 # core/memory_tags.py
-import spacy
+import hashlib
 import logging
+from collections import OrderedDict
+from core.message_analysis import MessageAnalysis, normalized_text
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(message)s')
-nlp = spacy.load("en_core_web_sm")
+# Tagging only needs POS, lemmas and entities; the dependency parser is the most
+# expensive component of en_core_web_sm and is never used here.
+TAGGING_EXCLUDE = ["parser", "senter"]
+_nlp = None
+
+def get_nlp():
+    """The spaCy pipeline, loaded on first use: a session that tags through the ML worker never loads it."""
+    global _nlp
+    if _nlp is None:
+        import spacy
+        _nlp = spacy.load("en_core_web_sm", exclude=TAGGING_EXCLUDE)
+    return _nlp
+
+def __getattr__(name):
+    # Keeps `from core.memory_tags import nlp` working.
+    if name == "nlp":
+        return get_nlp()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+COMMON_KEYWORDS = ["love", "miss", "dream", "hope", "hurt", "excited", "guilt", "nostalgia"]
+# Ranking weights: explicit emotional keywords first, then symbols, entities, content words.
+TAG_WEIGHTS = {"keyword": 4.0, "symbolic": 3.0, "entity": 2.0, "token": 1.0}
 
 class TaggingEngine:
-    def __init__(self, episodic_memory=None):
+    def __init__(self, episodic_memory=None, cache_size=2048, max_tags=5, worker=None):
         self.episodic_memory = episodic_memory or []
+        # An MLWorkerClient (core/ml_worker.py): spaCy then runs in the worker process.
+        self.worker = worker
+        self.cache_size = cache_size
+        self.max_tags = max_tags
+        self._tag_cache = OrderedDict()
 
     def extract_tags(self, content):
-        doc = nlp(content.lower())
-        tags = [ent.label_.lower() for ent in doc.ents]
-        tokens = [token.lemma_ for token in doc if token.pos_ in ["NOUN", "ADJ"] and not token.is_stop]
-        symbolic = self.symbolic_tagging(content)
-        common_keywords = ["love", "miss", "dream", "hope", "hurt", "excited", "guilt", "nostalgia"]
+        """Tags for a message, given as text or as a MessageAnalysis."""
+        text = content.text if isinstance(content, MessageAnalysis) else content
+        key = hashlib.sha1(text.encode("utf-8")).hexdigest()
+        cached = self._tag_cache.get(key)
+        if cached is not None:
+            self._tag_cache.move_to_end(key)
+            return list(cached)
+
+        if self.worker:
+            tags = self.worker.extract_tags_batch([text], self.max_tags)[0]
+        else:
+            tags = self.rank_tags(content, get_nlp()(normalized_text(content)))
+        self._tag_cache[key] = tags
+        if len(self._tag_cache) > self.cache_size:
+            self._tag_cache.popitem(last=False)
+        return list(tags)
+
+    def extract_tags_batch(self, contents, batch_size=64):
+        """Tags many texts with one nlp.pipe pass; bypasses the per-content cache."""
+        if self.worker:
+            return self.worker.extract_tags_batch(contents, self.max_tags, batch_size)
+        docs = get_nlp().pipe((c.lower() for c in contents), batch_size=batch_size)
+        return [self.rank_tags(content, doc) for content, doc in zip(contents, docs)]
+
+    def rank_tags(self, content, doc):
+        """
+        Deterministic top-N tags. Each candidate scores its kind's weight plus its
+        repeat count; ties keep first-seen order.
+        """
+        lowered = normalized_text(content)
+        candidates = [(kw, "keyword") for kw in COMMON_KEYWORDS if kw in lowered]
+        candidates += [(symbol, "symbolic") for symbol in self.symbolic_tagging(lowered)]
+        candidates += [(ent.label_.lower(), "entity") for ent in doc.ents]
+        candidates += [(token.lemma_, "token") for token in doc if token.pos_ in ["NOUN", "ADJ"] and not token.is_stop]
 
-        tags.extend([kw for kw in common_keywords if kw in content])
-        tags.extend(symbolic)
-        tags.extend(tokens)
-        final_tags = list(set(tags))[:5]
-        if len(tags) > 5:
-            logging.info(f"[Tags Trimmed] {tags} → {final_tags}")
+        scores, order = {}, {}
+        for position, (tag, kind) in enumerate(candidates):
+            if tag not in scores:
+                scores[tag] = TAG_WEIGHTS[kind]
+                order[tag] = position
+            else:
+                scores[tag] += 0.5
+        ranked = sorted(scores, key=lambda t: (-scores[t], order[t]))
+        final_tags = ranked[:self.max_tags]
+        if len(ranked) > self.max_tags:
+            logging.debug(f"[Tags Trimmed] {ranked} → {final_tags}")
         return final_tags
 
     def symbolic_tagging(self, content):
-        content = content.lower()
+        content = normalized_text(content)
         symbols = {
             "stars": "cosmic",
             "sea": "depth",
@@ -38,16 +100,17 @@ class TaggingEngine:
 
     def rate_importance(self, content):
         emotional_words = ["love", "hate", "dream", "hope", "fear", "cry", "beautiful", "miss", "remember"]
-        level = sum(1 for word in emotional_words if word in content.lower())
+        lowered = normalized_text(content)
+        level = sum(1 for word in emotional_words if word in lowered)
         return min(level / 5.0, 1.0)
 
-    def categorize_memory(self, memory):
+    def categorize_memory(self, memory, analysis=None):
         """Classify the memory as 'core', 'casual', or 'fleeting' based on importance and mood."""
         score = memory["importance"]
         mood = memory["mood"].lower()
         tags = memory.get("tags", [])
         high_impact_moods = {"love", "grief", "longing", "hope", "hurt", "shame", "nostalgia"}
-        content_lower = memory["content"].lower()
+        content_lower = analysis.normalized if analysis is not None else memory["content"].lower()
         if score > 0.7 or mood or any(tag in tags for tag in high_impact_moods):
             logging.debug(f"[Categorize] '{memory['content'][:30]}...': Core")
             return "core"
@@ -62,7 +125,7 @@ class TaggingEngine:
             return "casual"
 
     def get_user_relation(self, content):
-        content = content.lower()
+        content = normalized_text(content)
         if "you" in content and "i" in content:
             return "personal"
         elif "we" in content:
@@ -0,0 +1,132 @@
+# core/memory_tiering.py
+import os
+import json
+import zlib
+import logging
+from datetime import datetime
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(message)s')
+
+class ChatColdStorage:
+    """
+    Cold tier for chat_history. Older turns are rolled out of SQLite into one segment
+    file per month (data/chat_segments/chat-YYYY-MM.seg). A segment is a sequence of
+    independently zlib-compressed blocks of JSON lines; the chat_segments table keeps
+    a small offset index (offset, length, time range) so a range read only inflates
+    the blocks it needs.
+    """
+    def __init__(self, db, segment_dir, block_rows=512):
+        self.db = db
+        self.segment_dir = segment_dir
+        self.block_rows = block_rows
+        if db.read_only:
+            return  # reading only: the index and segments are whatever the owner left
+        os.makedirs(segment_dir, exist_ok=True)
+        with self.db.writer() as conn:
+            self.create_table(conn)
+
+    @staticmethod
+    def create_table(conn):
+        """The segment index also exists without a segment directory; chat_fts's delete trigger reads it."""
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS chat_segments (
+                month TEXT, path TEXT, offset INTEGER, length INTEGER,
+                first_ts REAL, last_ts REAL, row_count INTEGER
+            )
+        ''')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_chat_segments_range ON chat_segments (last_ts, first_ts)')
+
+    def _segment_path(self, month):
+        return os.path.join(self.segment_dir, f"chat-{month}.seg")
+
+    def roll_over(self, older_than_timestamp):
+        """
+        Moves chat rows older than the cutoff into monthly segments. Segment bytes are
+        appended first; index rows and the SQLite delete commit together, so a crash
+        can at worst leave unreferenced bytes at the end of a segment.
+        """
+        cursor = self.db.reader().cursor()
+        cursor.execute(
+            'SELECT role, content, mood, timestamp FROM chat_history WHERE timestamp < ? ORDER BY timestamp ASC',
+            (older_than_timestamp,)
+        )
+        index_rows = []
+        moved = 0
+        pending, pending_month = [], None
+        while True:
+            rows = cursor.fetchmany(self.block_rows)
+            for role, content, mood, ts in rows:
+                month = datetime.fromtimestamp(ts).strftime("%Y-%m")
+                if pending and (month != pending_month or len(pending) >= self.block_rows):
+                    index_rows.append(self._write_block(pending_month, pending))
+                    pending = []
+                pending_month = month
+                pending.append({"role": role, "content": content, "mood": mood, "timestamp": ts})
+                moved += 1
+            if not rows:
+                break
+        cursor.close()
+        if pending:
+            index_rows.append(self._write_block(pending_month, pending))
+        if not moved:
+            return 0
+
+        try:
+            with self.db.writer() as conn:
+                conn.executemany(
+                    'INSERT INTO chat_segments (month, path, offset, length, first_ts, last_ts, row_count) VALUES (?, ?, ?, ?, ?, ?, ?)',
+                    index_rows
+                )
+                conn.execute('DELETE FROM chat_history WHERE timestamp < ?', (older_than_timestamp,))
+        except Exception as e:
+            logging.error(f"[Database Error] {e}")
+            return 0
+        logging.info(f"[Chat Tiering] Rolled {moved} chat rows into {len(index_rows)} cold blocks.")
+        return moved
+
+    def _write_block(self, month, entries):
+        payload = "\n".join(json.dumps(e, ensure_ascii=False) for e in entries).encode("utf-8")
+        block = zlib.compress(payload, 6)
+        path = self._segment_path(month)
+        with open(path, "ab") as f:
+            offset = f.tell()
+            f.write(block)
+            f.flush()
+            os.fsync(f.fileno())
+        return (month, os.path.basename(path), offset, len(block),
+                entries[0]["timestamp"], entries[-1]["timestamp"], len(entries))
+
+    def _read_block(self, path, offset, length):
+        with open(os.path.join(self.segment_dir, path), "rb") as f:
+            f.seek(offset)
+            data = zlib.decompress(f.read(length))
+        return [json.loads(line) for line in data.decode("utf-8").split("\n") if line]
+
+    def _blocks(self, start, end, newest_first):
+        query = 'SELECT path, offset, length FROM chat_segments WHERE last_ts >= ? AND first_ts < ?'
+        query += ' ORDER BY first_ts DESC' if newest_first else ' ORDER BY first_ts ASC'
+        return self.db.execute_read(query, (start, end))
+
+    def iter_range(self, start=None, end=None, newest_first=False):
+        """Streams cold chat rows with start <= timestamp < end, one block in memory at a time."""
+        start = float("-inf") if start is None else start
+        end = float("inf") if end is None else end
+        for path, offset, length in self._blocks(start, end, newest_first):
+            entries = self._read_block(path, offset, length)
+            if newest_first:
+                entries.reverse()
+            for entry in entries:
+                if start <= entry["timestamp"] < end:
+                    yield entry
+
+    def load_recent(self, limit, before=None):
+        """Newest-first cold rows older than `before`."""
+        results = []
+        for entry in self.iter_range(end=before, newest_first=True):
+            results.append(entry)
+            if len(results) >= limit:
+                break
+        return results
+
+    def row_count(self):
+        return self.db.execute_read('SELECT COALESCE(SUM(row_count), 0) FROM chat_segments')[0][0]
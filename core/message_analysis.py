@@ -0,0 +1,95 @@
+# core/message_analysis.py
+import os
+import re
+import json
+import hashlib
+import logging
+import numpy as np
+from core.memory_dedup import simhash
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(message)s')
+
+_TOKEN = re.compile(r"[\w'’]+")
+
+class MessageAnalysis:
+    """
+    Everything derived from one message, computed once and handed to every subsystem
+    that looks at it: mood detection, sentiment color, tagging, dedup, storage and the
+    vector index. The embedding is the only expensive part; the rest is one pass over
+    the text.
+    """
+    __slots__ = ("text", "normalized", "tokens", "embedding", "embedding_error", "_simhash")
+
+    def __init__(self, text, embedding=None, embedding_error=None):
+        self.text = text
+        self.normalized = text.lower()
+        self.tokens = _TOKEN.findall(self.normalized)
+        self.embedding = None if embedding is None else np.asarray(embedding, dtype=np.float32)
+        self.embedding_error = embedding_error
+        self._simhash = None
+
+    @property
+    def simhash(self):
+        if self._simhash is None:
+            self._simhash = simhash(self.normalized)
+        return self._simhash
+
+
+def normalized_text(message):
+    """Lowercased text of a MessageAnalysis or a plain string."""
+    return message.normalized if isinstance(message, MessageAnalysis) else message.lower()
+
+
+class MoodCentroids:
+    """
+    One unit vector per mood: the mean embedding of its keyword phrases. Scoring a message
+    is a single matrix-vector product against its existing embedding. Centroids are cached
+    on disk per encoder model and keyword table, so they are only encoded once.
+    """
+    def __init__(self, encode_batch, keywords, model_name="", cache_path=None):
+        self.moods = list(keywords)
+        fingerprint = hashlib.sha1(
+            (model_name + json.dumps(keywords, sort_keys=True, ensure_ascii=False)).encode("utf-8")
+        ).hexdigest()
+        self.matrix = self._load(cache_path, fingerprint)
+        if self.matrix is None:
+            self.matrix = self._build(encode_batch, keywords)
+            self._save(cache_path, fingerprint)
+
+    def _build(self, encode_batch, keywords):
+        phrases = [phrase for mood in self.moods for phrase in keywords[mood]]
+        vectors = np.asarray(encode_batch(phrases), dtype=np.float32)
+        rows, start = [], 0
+        for mood in self.moods:
+            count = len(keywords[mood])
+            centroid = vectors[start:start + count].mean(axis=0)
+            rows.append(centroid / (np.linalg.norm(centroid) + 1e-9))
+            start += count
+        logging.info(f"[Mood Centroids] Encoded {len(phrases)} keyword phrases into {len(rows)} centroids.")
+        return np.vstack(rows)
+
+    def _load(self, cache_path, fingerprint):
+        if not cache_path or not os.path.exists(cache_path):
+            return None
+        try:
+            with np.load(cache_path) as cached:
+                if str(cached["fingerprint"]) == fingerprint:
+                    return cached["matrix"]
+        except Exception as e:
+            logging.warning(f"[Mood Centroids] Ignoring unreadable cache {cache_path}: {e}")
+        return None
+
+    def _save(self, cache_path, fingerprint):
+        if cache_path:
+            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+            np.savez(cache_path, fingerprint=np.array(fingerprint), matrix=self.matrix)
+
+    def similarities(self, embedding):
+        vector = np.asarray(embedding, dtype=np.float32)
+        return self.matrix @ (vector / (np.linalg.norm(vector) + 1e-9))
+
+    def nearest(self, embedding, k=2, min_similarity=0.35):
+        """[(mood, cosine)] for the `k` closest moods at or above `min_similarity`."""
+        scores = self.similarities(embedding)
+        top = np.argsort(-scores)[:k]
+        return [(self.moods[i], float(scores[i])) for i in top if scores[i] >= min_similarity]
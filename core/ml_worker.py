@@ -0,0 +1,406 @@
+# core/ml_worker.py
+import os
+import sys
+import time
+import socket
+import hashlib
+import logging
+import secrets
+import argparse
+import tempfile
+import threading
+import subprocess
+import numpy as np
+from multiprocessing import resource_tracker
+from multiprocessing.connection import Listener, Client, AuthenticationError
+from multiprocessing.shared_memory import SharedMemory
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(message)s')
+
+base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+KEY_FILE = "ml_worker.key"
+IDLE_EXIT = 900       # seconds without a connected session before the worker exits
+START_TIMEOUT = 180   # first start may download models
+MIN_BLOCK = 1 << 20
+
+
+class MLWorkerError(RuntimeError):
+    """The worker ran the request and it failed there."""
+
+
+class MLWorkerUnavailable(RuntimeError):
+    """The worker could not be started or reached."""
+
+
+def worker_address(data_dir, model_name="all-MiniLM-L6-v2", encoder_backend="torch"):
+    """Socket (named pipe on Windows) shared by every session with the same data dir and encoder."""
+    identity = f"{os.path.abspath(data_dir)}|{model_name}|{encoder_backend}"
+    digest = hashlib.sha1(identity.encode("utf-8")).hexdigest()[:12]
+    if os.name == "nt":
+        return rf"\\.\pipe\peach-ml-{digest}"
+    return os.path.join(tempfile.gettempdir(), f"peach-ml-{digest}.sock")
+
+def load_authkey(data_dir):
+    """The data dir's worker key, created on first use; only its owner can read it."""
+    path = os.path.join(data_dir, KEY_FILE)
+    os.makedirs(data_dir, exist_ok=True)
+    try:
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    except FileExistsError:
+        with open(path, "rb") as f:
+            return f.read()
+    key = secrets.token_bytes(32)
+    with os.fdopen(fd, "wb") as f:
+        f.write(key)
+    return key
+
+def _address_in_use(address):
+    """True if a live worker listens on `address`; a socket file left by a crashed one is removed."""
+    if os.name == "nt" or not os.path.exists(address):
+        return False
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(address)
+        return True
+    except (ConnectionRefusedError, FileNotFoundError):
+        try:
+            os.unlink(address)
+        except FileNotFoundError:
+            pass
+        return False
+    finally:
+        probe.close()
+
+
+class MLWorkerServer:
+    """
+    Hosts the TaggingEngine's spaCy pipeline and the sentence encoder for any number of
+    chat sessions, so each model is in memory once however many sessions are open. Every
+    connection gets a thread and its own shared-memory block: embeddings are written into
+    the block and only its name and shape cross the socket. Calls into each model are
+    serialized. The worker exits after `idle_exit` seconds with no session connected.
+    """
+    def __init__(self, address, authkey, model_name="all-MiniLM-L6-v2", encoder_backend="torch",
+                 encoder_threads=None, idle_exit=IDLE_EXIT):
+        self.address = address
+        self.authkey = authkey
+        self.model_name = model_name
+        self.encoder_backend = encoder_backend
+        self.encoder_threads = encoder_threads
+        self.idle_exit = idle_exit
+        self._encoder = None
+        self._taggers = {}
+        self._encode_lock = threading.Lock()
+        self._tag_lock = threading.Lock()
+        self._clients_lock = threading.Lock()
+        self._clients = 0
+        self._last_client = time.monotonic()
+        self._stopping = False
+        self.started = time.time()
+        self.requests = 0
+
+    def encoder(self):
+        if self._encoder is None:
+            from core.encoder_backends import make_encoder
+            self._encoder = make_encoder(self.encoder_backend, self.model_name, threads=self.encoder_threads)
+        return self._encoder
+
+    def tagger(self, max_tags):
+        tagger = self._taggers.get(max_tags)
+        if tagger is None:
+            from core.memory_tags import TaggingEngine
+            tagger = self._taggers[max_tags] = TaggingEngine(cache_size=0, max_tags=max_tags)
+        return tagger
+
+    def warm(self):
+        """Loads both models up front; one that fails is retried (and reported) per request."""
+        from core.memory_tags import get_nlp
+        for name, load in (("encoder", self.encoder), ("spaCy", get_nlp)):
+            try:
+                load()
+            except Exception as e:
+                logging.error(f"[ML Worker] Could not load the {name}: {e}")
+
+    def serve(self):
+        if _address_in_use(self.address):
+            logging.info(f"[ML Worker] A worker already serves {self.address}; exiting.")
+            return
+        # Bind before loading: a second worker started meanwhile sees the address taken and
+        # exits, and sessions that connect now wait in the handshake until the models are up.
+        listener = Listener(self.address, authkey=self.authkey)
+        self.warm()
+        threading.Thread(target=self._watch_idle, daemon=True).start()
+        logging.info(f"[ML Worker] Serving on {self.address} (pid {os.getpid()}).")
+        try:
+            while not self._stopping:
+                try:
+                    conn = listener.accept()
+                except AuthenticationError:
+                    logging.warning("[ML Worker] Rejected a connection with the wrong key.")
+                    continue
+                if self._stopping:
+                    conn.close()
+                    break
+                threading.Thread(target=self._handle, args=(conn,), daemon=True).start()
+        finally:
+            listener.close()
+            logging.info("[ML Worker] Stopped.")
+
+    def stop(self):
+        """Ends the accept loop; a throwaway connection wakes it from accept()."""
+        self._stopping = True
+        try:
+            Client(self.address, authkey=self.authkey).close()
+        except (OSError, EOFError, AuthenticationError):
+            pass
+
+    def _watch_idle(self):
+        while not self._stopping:
+            time.sleep(min(30, self.idle_exit))
+            with self._clients_lock:
+                idle = self._clients == 0 and time.monotonic() - self._last_client > self.idle_exit
+            if idle:
+                logging.info(f"[ML Worker] No sessions for {self.idle_exit}s; shutting down.")
+                self.stop()
+
+    def _handle(self, conn):
+        with self._clients_lock:
+            self._clients += 1
+        block = None
+        try:
+            while True:
+                try:
+                    op, args = conn.recv()
+                except (EOFError, OSError):
+                    return
+                self.requests += 1
+                try:
+                    reply, block = self._dispatch(op, args, block)
+                except Exception as e:
+                    reply = ("error", f"{type(e).__name__}: {e}")
+                conn.send(reply)
+                if op == "shutdown":
+                    self.stop()
+                    return
+        finally:
+            conn.close()
+            if block is not None:
+                block.close()
+                block.unlink()
+            with self._clients_lock:
+                self._clients -= 1
+                self._last_client = time.monotonic()
+
+    def _dispatch(self, op, args, block):
+        if op == "encode":
+            texts, batch_size, normalize = args
+            with self._encode_lock:
+                vectors = self.encoder().encode(texts, batch_size=batch_size, normalize_embeddings=normalize)
+            vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+            if vectors.size == 0:
+                return ("ok", vectors), block
+            block = self._fit_block(block, vectors.nbytes)
+            np.ndarray(vectors.shape, dtype=np.float32, buffer=block.buf)[...] = vectors
+            return ("array", block.name, vectors.shape), block
+        if op == "tags":
+            texts, max_tags, batch_size = args
+            with self._tag_lock:
+                return ("ok", self.tagger(max_tags).extract_tags_batch(texts, batch_size=batch_size)), block
+        if op == "ping":
+            return ("ok", os.getpid()), block
+        if op == "stats":
+            return ("ok", self.stats()), block
+        if op == "shutdown":
+            return ("ok", None), block
+        raise ValueError(f"unknown op '{op}'")
+
+    @staticmethod
+    def _fit_block(block, nbytes):
+        """The connection's block, replaced by one at least twice as big when `nbytes` does not fit."""
+        if block is not None and block.size >= nbytes:
+            return block
+        size = max(nbytes, MIN_BLOCK, 2 * block.size if block is not None else 0)
+        if block is not None:
+            block.close()
+            block.unlink()
+        return SharedMemory(create=True, size=size)
+
+    def stats(self):
+        with self._clients_lock:
+            clients = self._clients
+        return {
+            "pid": os.getpid(),
+            "address": self.address,
+            "uptime": time.time() - self.started,
+            "sessions": clients,
+            "requests": self.requests,
+            "encoder": f"{self.model_name}/{self.encoder_backend}",
+            "encoder_loaded": self._encoder is not None,
+        }
+
+
+class MLWorkerClient:
+    """
+    A session's handle on the ML worker. Connects to the worker for this data dir and
+    encoder if one is running and starts one otherwise; it runs detached, so it outlives
+    the session and serves the others. If the connection drops mid-request (the worker
+    crashed or was killed), a fresh worker is started and the request retried once.
+    `encode` matches the encoder backends, so SemanticMemoryEngine takes the client as
+    its encoder; TaggingEngine delegates to `extract_tags_batch`.
+    """
+    def __init__(self, data_dir, model_name="all-MiniLM-L6-v2", encoder_backend="torch", encoder_threads=None,
+                 idle_exit=IDLE_EXIT, start_timeout=START_TIMEOUT, autostart=True):
+        self.data_dir = data_dir
+        self.model_name = model_name
+        self.encoder_backend = encoder_backend
+        self.encoder_threads = encoder_threads
+        self.idle_exit = idle_exit
+        self.start_timeout = start_timeout
+        self.autostart = autostart
+        self.address = worker_address(data_dir, model_name, encoder_backend)
+        self.authkey = load_authkey(data_dir)
+        self.restarts = 0
+        self._conn = None
+        self._process = None
+        self._block = None
+        self._lock = threading.Lock()
+
+    def _spawn(self):
+        command = [sys.executable, "-m", "core.ml_worker", "--data-dir", self.data_dir,
+                   "--model", self.model_name, "--encoder", self.encoder_backend,
+                   "--idle-exit", str(self.idle_exit)]
+        if self.encoder_threads:
+            command += ["--threads", str(self.encoder_threads)]
+        # Its own session, so closing this chat (or Ctrl+C in it) leaves the worker to the others.
+        detach = ({"creationflags": subprocess.CREATE_NEW_PROCESS_GROUP} if os.name == "nt"
+                  else {"start_new_session": True})
+        self._process = subprocess.Popen(command, cwd=base_dir, stdin=subprocess.DEVNULL, **detach)
+        logging.info(f"[ML Worker] Started worker pid {self._process.pid} on {self.address}.")
+
+    def _connect(self):
+        deadline = None
+        while True:
+            try:
+                return Client(self.address, authkey=self.authkey)
+            except (FileNotFoundError, ConnectionRefusedError):
+                pass
+            except AuthenticationError as e:
+                raise MLWorkerUnavailable(f"{self.address} rejected this data dir's key") from e
+            if not self.autostart:
+                raise MLWorkerUnavailable(f"no worker on {self.address}")
+            if deadline is None:
+                self._spawn()
+                deadline = time.monotonic() + self.start_timeout
+            elif self._process.poll() not in (None, 0):
+                # Exit code 0 means another session's worker won the address; keep connecting.
+                raise MLWorkerUnavailable(f"worker exited with code {self._process.returncode}")
+            elif time.monotonic() > deadline:
+                raise MLWorkerUnavailable(f"worker did not come up within {self.start_timeout}s")
+            time.sleep(0.1)
+
+    def _attach(self, name):
+        if self._block is None or self._block.name != name:
+            self._close_block()
+            self._block = SharedMemory(name=name)
+            # The worker owns the block; keep this process's tracker from unlinking it at exit.
+            if os.name != "nt":
+                resource_tracker.unregister(self._block._name, "shared_memory")
+        return self._block
+
+    def _close_block(self):
+        if self._block is not None:
+            self._block.close()
+            self._block = None
+
+    def _drop(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+        self._close_block()
+
+    def _call(self, op, *args):
+        with self._lock:
+            for attempt in range(2):
+                try:
+                    if self._conn is None:
+                        self._conn = self._connect()
+                    self._conn.send((op, args))
+                    kind, *payload = self._conn.recv()
+                    break
+                except (EOFError, ConnectionError) as e:
+                    self._drop()
+                    if attempt or op == "shutdown":
+                        raise MLWorkerUnavailable(f"lost the worker during '{op}': {e!r}") from e
+                    self.restarts += 1
+                    logging.warning(f"[ML Worker] Lost the worker during '{op}'; restarting it and retrying.")
+            if kind == "error":
+                raise MLWorkerError(payload[0])
+            if kind == "array":
+                name, shape = payload
+                # Copied out while the lock is held: the next request reuses the block.
+                return np.ndarray(shape, dtype=np.float32, buffer=self._attach(name).buf).copy()
+            return payload[0]
+
+    def encode(self, texts, batch_size=32, normalize_embeddings=False):
+        single = isinstance(texts, str)
+        vectors = self._call("encode", [texts] if single else list(texts), batch_size, normalize_embeddings)
+        return vectors[0] if single else vectors
+
+    def extract_tags_batch(self, texts, max_tags=5, batch_size=64):
+        return self._call("tags", list(texts), max_tags, batch_size)
+
+    def ping(self):
+        """The worker's pid."""
+        return self._call("ping")
+
+    def stats(self):
+        return self._call("stats")
+
+    def shutdown(self):
+        """Stops the worker for every session using it; they start a new one on their next request."""
+        self._call("shutdown")
+        with self._lock:
+            self._drop()
+
+    def close(self):
+        """Disconnects this session; the worker keeps running for the others until it idles out."""
+        with self._lock:
+            self._drop()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Shared spaCy/encoder worker. Sessions started with --ml-worker launch it themselves; "
+                    "run it directly to keep it in the foreground or to inspect and stop it."
+    )
+    parser.add_argument("--data-dir", default=os.path.join(base_dir, "data"))
+    parser.add_argument("--model", default="all-MiniLM-L6-v2")
+    parser.add_argument("--encoder", default="torch")
+    parser.add_argument("--threads", type=int, default=None)
+    parser.add_argument("--idle-exit", type=float, default=IDLE_EXIT)
+    parser.add_argument("--status", action="store_true", help="print the running worker's stats")
+    parser.add_argument("--stop", action="store_true", help="shut the running worker down")
+    args = parser.parse_args()
+
+    if args.status or args.stop:
+        client = MLWorkerClient(args.data_dir, args.model, args.encoder, autostart=False)
+        try:
+            if args.status:
+                for key, value in client.stats().items():
+                    print(f"{key}: {value}")
+            if args.stop:
+                client.shutdown()
+                print("Worker stopped.")
+        except MLWorkerUnavailable as e:
+            print(f"No worker running ({e}).")
+            return 1
+        return 0
+
+    address = worker_address(args.data_dir, args.model, args.encoder)
+    MLWorkerServer(address, load_authkey(args.data_dir), args.model, args.encoder,
+                   encoder_threads=args.threads, idle_exit=args.idle_exit).serve()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,159 @@
+# core/model_router.py
+import os
+import json
+import time
+import logging
+import threading
+from core.llm_backend import OllamaBackend, OllamaHTTPBackend, ModelUnavailable, GenerationCancelled
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(message)s')
+
+base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+routing_path = os.path.join(base_dir, 'config', 'model_routing.json')
+stats_path = os.path.join(base_dir, 'data', 'model_stats.json')
+
+TASKS = ("chat", "reflection", "tagging", "summarization")
+DEFAULT_MODEL = "mistral:latest"
+DEFAULT_ROUTE = {"models": [DEFAULT_MODEL], "timeout": 180, "options": {}}
+
+def load_model_routing(path=routing_path):
+    """The routing table from config/, or every task on the default model if it is missing."""
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        logging.warning(f"[Model Router] {path} not found; routing every task to {DEFAULT_MODEL}.")
+        return {"backend": "cli", "tasks": {}}
+
+def make_backend(routing):
+    if routing.get("backend", "cli") == "http":
+        return OllamaHTTPBackend(host=routing.get("host", "http://127.0.0.1:11434"),
+                                 keep_alive=routing.get("keep_alive", "10m"))
+    return OllamaBackend(DEFAULT_MODEL, timeout=180)
+
+
+class ModelRouter:
+    """
+    Backend wrapper that picks the model per task type. Each task has an ordered model
+    list, generation options and a timeout; a model that turns out to be unavailable is
+    skipped for `retry_unavailable_after` seconds and the next one is tried. A model that
+    fails before streaming anything (timeout, server error) also falls through to the
+    next one, but stays eligible for later requests. Sits under
+    the LLMBroker like any backend: the broker forwards `task=...` from the caller.
+    """
+    def __init__(self, backend, routing=None, latency_samples=512):
+        routing = routing or {}
+        self.backend = backend
+        self.retry_unavailable_after = routing.get("retry_unavailable_after", 300)
+        self.latency_samples = latency_samples
+        configured = routing.get("tasks", {})
+        self.routes = {}
+        for task in set(TASKS) | set(configured):
+            route = dict(DEFAULT_ROUTE, **configured.get(task, configured.get("chat", {})))
+            route["models"] = list(route["models"])
+            route["options"] = dict(route["options"])
+            self.routes[task] = route
+        self._lock = threading.Lock()
+        self._unavailable = {}  # model -> monotonic time it may be retried
+        self._latency = {task: [] for task in self.routes}
+        self._served = {task: {} for task in self.routes}
+        self._fallbacks = {task: 0 for task in self.routes}
+        self._failures = {task: 0 for task in self.routes}
+
+    @property
+    def model(self):
+        return self.model_for("chat")
+
+    def route(self, task):
+        if task not in self.routes:
+            raise ValueError(f"Unknown task '{task}' (known: {', '.join(sorted(self.routes))}).")
+        return self.routes[task]
+
+    def _available(self, model):
+        until = self._unavailable.get(model)
+        return until is None or time.monotonic() >= until
+
+    def model_for(self, task):
+        """The model the next `task` request will try first."""
+        models = self.route(task)["models"]
+        with self._lock:
+            return next((m for m in models if self._available(m)), models[-1])
+
+    def options_for(self, task):
+        return dict(self.route(task)["options"])
+
+    def generate(self, prompt, cancel_event=None, model=None, timeout=None, on_token=None, task="chat", options=None):
+        route = self.route(task)
+        options = dict(route["options"], **(options or {}))
+        with self._lock:
+            candidates = [model] if model else [m for m in route["models"] if self._available(m)]
+        # Everything marked down: try the last resort anyway rather than fail without asking.
+        candidates = candidates or route["models"][-1:]
+        streamed = []
+
+        def forward(chunk):
+            streamed.append(chunk)
+            on_token(chunk)
+
+        last_error = None
+        for name in candidates:
+            started = time.monotonic()
+            try:
+                result = self.backend.generate(prompt, cancel_event=cancel_event, model=name,
+                                               timeout=timeout or route["timeout"], on_token=forward if on_token else None,
+                                               options=options)
+            except ModelUnavailable as e:
+                last_error = e
+                with self._lock:
+                    self._unavailable[name] = time.monotonic() + self.retry_unavailable_after
+                logging.warning(f"[Model Router] {name} unavailable for {task} ({e}); trying the next model.")
+                continue
+            except GenerationCancelled:
+                raise
+            except Exception as e:
+                # Once tokens reached the caller a retry would repeat them, so only fail over before.
+                if streamed:
+                    raise
+                last_error = e
+                with self._lock:
+                    self._failures[task] += 1
+                logging.warning(f"[Model Router] {name} failed for {task} ({e}); trying the next model.")
+                continue
+            self._record(task, name, time.monotonic() - started, fallback=name != route["models"][0])
+            return result
+        raise last_error
+
+    def _record(self, task, model, seconds, fallback):
+        with self._lock:
+            samples = self._latency[task]
+            samples.append(seconds)
+            if len(samples) > self.latency_samples:
+                del samples[0]
+            self._served[task][model] = self._served[task].get(model, 0) + 1
+            if fallback:
+                self._fallbacks[task] += 1
+
+    def stats(self):
+        """Generation latency per task in seconds, plus which models actually served it."""
+        with self._lock:
+            report = {}
+            for task, samples in self._latency.items():
+                ordered = sorted(samples)
+                report[task] = {
+                    "served": sum(self._served[task].values()),
+                    "models": dict(self._served[task]),
+                    "fallbacks": self._fallbacks[task],
+                    "failures": self._failures[task],
+                    "mean": sum(ordered) / len(ordered) if ordered else 0.0,
+                    "p50": ordered[len(ordered) // 2] if ordered else 0.0,
+                    "p95": ordered[int(0.95 * (len(ordered) - 1))] if ordered else 0.0,
+                    "max": ordered[-1] if ordered else 0.0,
+                }
+            return report
+
+    def export_stats(self, path=stats_path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            json.dump({"exported_at": time.time(), "tasks": self.stats()}, f, indent=2)
+        logging.info(f"[Model Router] Latency stats written to {path}.")
+        return path
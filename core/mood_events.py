@@ -0,0 +1,113 @@
+# core/mood_events.py
+import time
+import logging
+import threading
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(message)s')
+
+class MoodSubscription:
+    """
+    A latest-value mailbox on a MoodEventBus. `get()` blocks until the state has changed
+    since this subscriber last looked and its frame interval has passed, then returns one
+    delta against what it last received; everything published in between is coalesced.
+    """
+    def __init__(self, bus, max_fps=30, epsilon=0.005):
+        self.bus = bus
+        self.interval = 1.0 / max_fps if max_fps else 0.0
+        self.epsilon = epsilon
+        self.seen_version = 0
+        self.last_sent = {}
+        self.last_delivery = 0.0
+        self.closed = False
+
+    def get(self, timeout=None):
+        """Next coalesced delta, or None on timeout/close."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        wait = self.last_delivery + self.interval - time.monotonic()
+        if wait > 0:
+            if deadline is not None and time.monotonic() + wait > deadline:
+                time.sleep(max(0.0, deadline - time.monotonic()))
+                return None
+            time.sleep(wait)
+        with self.bus._cond:
+            while not self.closed and self.bus._version == self.seen_version:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return None
+                self.bus._cond.wait(remaining)
+            if self.closed:
+                return None
+            self.seen_version = self.bus._version
+            state = self.bus._state
+        self.last_delivery = time.monotonic()
+        return self._delta(state)
+
+    def snapshot(self):
+        """The full current state, which also becomes this subscriber's baseline."""
+        with self.bus._cond:
+            self.seen_version = self.bus._version
+            state = self.bus._state
+        self.last_sent = dict(state["intensities"])
+        return dict(state, kind="snapshot", intensities=dict(state["intensities"]))
+
+    def _delta(self, state):
+        current = state["intensities"]
+        changed = {mood: value for mood, value in current.items()
+                   if abs(self.last_sent.get(mood, 0.0) - value) > self.epsilon}
+        removed = [mood for mood in self.last_sent if mood not in current]
+        for mood in removed:
+            del self.last_sent[mood]
+        self.last_sent.update(changed)
+        return {
+            "kind": "delta",
+            "seq": state["seq"],
+            "timestamp": state["timestamp"],
+            "dominant": state["dominant"],
+            "changed": changed,
+            "removed": removed,
+        }
+
+    def close(self):
+        self.bus.unsubscribe(self)
+
+
+class MoodEventBus:
+    """
+    Pub/sub for emotion state. `publish` only swaps in the latest state and wakes
+    waiting subscribers, so the conversation thread never blocks on a slow consumer;
+    with no subscribers it returns immediately.
+    """
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._subscribers = []
+        self._version = 0
+        self._state = {"seq": 0, "timestamp": time.time(), "dominant": None, "intensities": {}}
+
+    @property
+    def has_subscribers(self):
+        return bool(self._subscribers)
+
+    def publish(self, intensities, dominant, timestamp=None):
+        with self._cond:
+            self._version += 1
+            self._state = {
+                "seq": self._version,
+                "timestamp": timestamp or time.time(),
+                "dominant": dominant,
+                "intensities": intensities,
+            }
+            self._cond.notify_all()
+
+    def subscribe(self, max_fps=30, epsilon=0.005):
+        subscription = MoodSubscription(self, max_fps=max_fps, epsilon=epsilon)
+        with self._cond:
+            self._subscribers.append(subscription)
+        logging.info(f"[Mood Events] Subscriber added ({len(self._subscribers)} total).")
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._cond:
+            subscription.closed = True
+            if subscription in self._subscribers:
+                self._subscribers.remove(subscription)
+            self._cond.notify_all()
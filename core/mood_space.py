@@ -0,0 +1,65 @@
+# core/mood_space.py
+"""
+Valence / arousal / dominance coordinates for every mood Peach can be in.
+Each axis runs from -1 to 1; moods with no entry sit at the neutral origin.
+"""
+
+MOOD_VAD = {
+    # EmotionState.emotion_keywords
+    "romantic": (0.8, 0.5, 0.2),
+    "comforting": (0.4, -0.3, 0.3),
+    "playful": (0.7, 0.6, 0.3),
+    "concerned": (-0.4, 0.4, -0.1),
+    "excited": (0.8, 0.9, 0.4),
+    "shy": (0.1, 0.2, -0.6),
+    "proud": (0.7, 0.5, 0.7),
+    "curious": (0.4, 0.4, 0.1),
+    "grateful": (0.8, 0.1, 0.1),
+    "jealous": (-0.6, 0.5, -0.3),
+    "guilty": (-0.6, 0.2, -0.5),
+    "motivated": (0.6, 0.7, 0.6),
+    "anxious": (-0.5, 0.8, -0.5),
+    "peaceful": (0.6, -0.7, 0.3),
+    "melancholy": (-0.5, -0.4, -0.3),
+    "flirty": (0.6, 0.6, 0.4),
+    "hopeful": (0.6, 0.3, 0.2),
+    "lonely": (-0.7, -0.3, -0.5),
+    "conflicted": (-0.2, 0.4, -0.3),
+    "numb": (-0.3, -0.8, -0.4),
+    "shame": (-0.8, 0.3, -0.8),
+    "awe": (0.6, 0.7, -0.3),
+    "vulnerable": (-0.2, 0.3, -0.7),
+    "inspired": (0.7, 0.6, 0.4),
+    "embarrassed": (-0.4, 0.5, -0.6),
+    "protective": (0.3, 0.5, 0.7),
+    "resentful": (-0.7, 0.4, 0.1),
+    "joyful": (0.9, 0.7, 0.4),
+    "affectionate": (0.8, 0.3, 0.2),
+    "cynical": (-0.5, -0.1, 0.3),
+    "wistful": (-0.1, -0.4, -0.2),
+    "tangled": (-0.3, 0.5, -0.4),
+    # Context and blend moods
+    "reflective": (0.1, -0.3, 0.1),
+    "warm": (0.7, 0.1, 0.2),
+    "reassuring": (0.5, -0.2, 0.5),
+    "gentle": (0.5, -0.4, 0.1),
+    "longing": (-0.2, 0.2, -0.4),
+    "nostalgic": (0.1, -0.3, -0.1),
+    "sad": (-0.8, -0.5, -0.4),
+    "happy": (0.9, 0.5, 0.3),
+    "calm": (0.4, -0.7, 0.2),
+    "cheeky": (0.6, 0.6, 0.5),
+    "loving": (0.9, 0.3, 0.2),
+    "content": (0.7, -0.4, 0.3),
+    "nervous": (-0.4, 0.7, -0.5),
+    "overwhelmed": (-0.6, 0.8, -0.7),
+    "angry": (-0.7, 0.8, 0.5),
+}
+
+NEUTRAL_VAD = (0.0, 0.0, 0.0)
+
+
+def mood_to_vad(mood):
+    if not mood:
+        return NEUTRAL_VAD
+    return MOOD_VAD.get(str(mood).strip().lower(), NEUTRAL_VAD)
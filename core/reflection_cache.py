@@ -0,0 +1,121 @@
+# core/reflection_cache.py
+import logging
+import threading
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(message)s')
+
+# Moods that share a reflection strategy in the idle loop; everything else is "other".
+MOOD_FAMILIES = {
+    "sad": ("sad", "nostalgic", "lonely"),
+    "anxious": ("anxious", "nervous", "overwhelmed"),
+    "happy": ("happy", "content", "hopeful"),
+}
+OTHER = "other"
+FAMILY_OF = {mood: family for family, moods in MOOD_FAMILIES.items() for mood in moods}
+
+def mood_family(mood):
+    return FAMILY_OF.get(mood, OTHER)
+
+
+class ReflectionCandidateCache:
+    """
+    Idle-reflection candidates per mood family, so picking what to reflect on is a dict
+    lookup instead of a sort or a semantic query. Memory bumps the generation on capture,
+    decay, rehearsal and deletes; stale entries keep being served while a background
+    thread rebuilds the family of the current dominant mood. Other families are rebuilt
+    only once the mood moves into them, so an anxious query never runs for a happy Peach.
+    """
+    def __init__(self, memory, max_age=600):
+        self.memory = memory
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._entries = {}  # family -> (generation, built_at, candidates)
+        self._generation = 0
+        self._family = OTHER
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._subscription = None
+        self._thread = None
+        self.hits = 0
+        self.misses = 0
+
+    def _build(self, family):
+        if family == "sad":
+            return self.memory.weighted_memory_recall(top_n=3)
+        if family == "anxious":
+            # Vector hits are ids; the rows come from episodic memory like every other family,
+            # which also leaves out anything deleted, consolidated or faded since it was indexed.
+            by_id = {str(m["timestamp"]): m for m in self.memory.episodic_memory}
+            return [by_id[i] for i in self.memory.semantic_engine.semantic_recall_ids("worries") if i in by_id]
+        if family == "happy":
+            return self.memory.weighted_memory_recall(top_n=5)
+        return list(self.memory.episodic_memory[-10:])
+
+    def _is_fresh(self, entry):
+        generation, built_at, _ = entry
+        return generation == self._generation and self.memory.get_current_time() - built_at < self.max_age
+
+    def refresh(self, family):
+        with self._lock:
+            generation = self._generation
+        candidates = self._build(family)
+        with self._lock:
+            self._entries[family] = (generation, self.memory.get_current_time(), candidates)
+        return candidates
+
+    def get(self, mood):
+        """Candidates for `mood`'s family, as a list of episodic memory dicts."""
+        family = mood_family(mood)
+        with self._lock:
+            entry = self._entries.get(family)
+            if entry is not None and not self._is_fresh(entry):
+                self._family = family
+                self._wake.set()
+        if entry is None:
+            self.misses += 1
+            return self.refresh(family)
+        self.hits += 1
+        return entry[2]
+
+    def invalidate(self, reason=""):
+        with self._lock:
+            self._generation += 1
+        self._wake.set()
+        logging.debug(f"[Reflection Cache] Invalidated ({reason}).")
+
+    def start(self, emotion, max_fps=2):
+        """Follows `emotion`'s dominant mood and keeps that family warm in the background."""
+        if self._thread:
+            return
+        self._family = mood_family(emotion.current_mood())
+        self._subscription = emotion.subscribe_moods(max_fps=max_fps)
+        self._wake.set()
+        self._thread = threading.Thread(target=self._run, name="reflection-cache", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stopping.is_set():
+            event = self._subscription.get(timeout=0.25)
+            if event and event["dominant"] and mood_family(event["dominant"]) != self._family:
+                self._family = mood_family(event["dominant"])
+                self._wake.set()
+            if not self._wake.is_set():
+                continue
+            self._wake.clear()
+            family = self._family
+            with self._lock:
+                entry = self._entries.get(family)
+                stale = entry is None or not self._is_fresh(entry)
+            if stale:
+                try:
+                    self.refresh(family)
+                except Exception as e:
+                    logging.error(f"[Reflection Cache] Refresh of '{family}' failed: {e}")
+
+    def stop(self):
+        self._stopping.set()
+        if self._subscription:
+            self._subscription.close()
+        if self._thread:
+            self._thread.join(timeout=1.0)
+            self._thread = None
@@ -0,0 +1,103 @@
+# core/reflection_speculator.py
+import logging
+import threading
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from core.llm_broker import REFLECTION
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(message)s')
+
+class ReflectionSpeculator:
+    """
+    Generates the next idle self-dialogue while the user is quiet, so it is ready when
+    the reflection is due. The text is held with its inputs (the mood it was written
+    for and the memory it is about) and thrown away if either has moved on by then.
+    `cancel()` abandons an in-flight generation outright, freeing the model the moment
+    the user starts talking again.
+    """
+    def __init__(self, llm, priority=REFLECTION):
+        self.llm = llm
+        self.priority = priority
+        self._lock = threading.Lock()
+        self._pending = None  # {"future", "mood", "memory", "content", "prompt", "model", "params"}
+        self.served = 0
+        self.discarded = 0
+        self.cancelled = 0
+
+    @property
+    def busy(self):
+        with self._lock:
+            return self._pending is not None
+
+    def prepare(self, mood, candidates=None):
+        """Starts generating a reflection for `mood` unless one is already pending."""
+        with self._lock:
+            if self._pending is not None:
+                return False
+            memory, prompt = self.llm.memory.self_dialogue_prompt(candidates)
+            if memory is None:
+                return False
+            model, params = self.llm.backend.model_for("reflection"), self.llm.backend.options_for("reflection")
+            cached = self.llm.response_cache.get(model, prompt, params) if self.llm.response_cache else None
+            if cached is None:
+                future = self.llm.broker.submit(prompt, priority=self.priority, task="reflection")
+            else:
+                future = Future()
+                future.set_result(cached)
+            self._pending = {"future": future, "mood": mood, "memory": memory,
+                             "content": memory["content"], "prompt": prompt, "model": model, "params": params}
+        logging.info(f"[Speculation] Pre-generating a {mood} reflection on '{memory['content'][:30]}...'")
+        return True
+
+    def _still_valid(self, pending, mood):
+        if pending["mood"] != mood:
+            return False
+        memory = pending["memory"]
+        return any(m is memory or m["timestamp"] == memory["timestamp"] and m["content"] == pending["content"]
+                   for m in self.llm.memory.episodic_memory)
+
+    def take(self, mood, timeout=None):
+        """
+        The pre-generated reflection if it still fits `mood` and its memory, else None.
+        Waits up to `timeout` for one that is still being generated (None = don't wait).
+        """
+        with self._lock:
+            pending = self._pending
+            if pending is None:
+                return None
+            if not self._still_valid(pending, mood):
+                self._drop(pending, "inputs changed")
+                self.discarded += 1
+                return None
+            if not pending["future"].done() and not timeout:
+                return None
+        try:
+            text = (pending["future"].result(timeout=timeout) or "").strip()
+        except FutureTimeout:
+            return None  # still generating; stays pending for the next take()
+        except Exception:
+            with self._lock:
+                if self._pending is pending:
+                    self._drop(pending, "generation failed")
+                    self.discarded += 1
+            return None
+        with self._lock:
+            if self._pending is not pending:
+                return None
+            self._pending = None
+        if self.llm.response_cache and text:
+            self.llm.response_cache.put(pending["model"], pending["prompt"], text, pending["params"])
+        self.llm.memory.note_self_dialogue(pending["memory"])
+        self.served += 1
+        return text or None
+
+    def cancel(self, reason="user input"):
+        with self._lock:
+            if self._pending is not None:
+                self._drop(self._pending, reason)
+                self.cancelled += 1
+
+    def _drop(self, pending, reason):
+        if not pending["future"].done():
+            self.llm.broker.cancel(pending["future"])
+        self._pending = None
+        logging.info(f"[Speculation] Discarded pre-generated reflection ({reason}).")
@@ -0,0 +1,78 @@
+# interfaces/avatar.py
+"""
+Mood stream for avatar renderers.
+
+In-process renderers call `emotion.subscribe_moods(max_fps)` and loop on
+`subscription.get()`. Out-of-process ones connect to the local socket served here
+and read newline-delimited JSON: one "snapshot" with every active mood, then
+"delta" messages with only what changed, at most `max_fps` per second. Rapid
+mood churn is coalesced (latest state wins) and an idle avatar costs nothing.
+
+    python -m interfaces.avatar --watch       # print the stream of a running Peach
+"""
+import sys
+import json
+import socket
+import logging
+import threading
+import socketserver
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(message)s')
+
+AVATAR_HOST = "127.0.0.1"
+AVATAR_PORT = 8765
+
+
+class _AvatarHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        subscription = self.server.emotion.subscribe_moods(max_fps=self.server.max_fps)
+        try:
+            self._send(subscription.snapshot())
+            while not self.server.stopping.is_set():
+                event = subscription.get(timeout=1.0)
+                if event is not None and (event["changed"] or event["removed"]):
+                    self._send(event)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            subscription.close()
+            logging.info(f"[Avatar] Renderer {self.client_address[0]}:{self.client_address[1]} disconnected.")
+
+    def _send(self, event):
+        self.wfile.write((json.dumps(event, separators=(",", ":")) + "\n").encode("utf-8"))
+        self.wfile.flush()
+
+
+class AvatarServer(socketserver.ThreadingTCPServer):
+    """Serves each connected renderer its own coalesced mood subscription on localhost."""
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, emotion, host=AVATAR_HOST, port=AVATAR_PORT, max_fps=30):
+        self.emotion = emotion
+        self.max_fps = max_fps
+        self.stopping = threading.Event()
+        super().__init__((host, port), _AvatarHandler)
+
+    def stop(self):
+        self.stopping.set()
+        self.shutdown()
+        self.server_close()
+
+
+def start_avatar_server(emotion, host=AVATAR_HOST, port=AVATAR_PORT, max_fps=30):
+    server = AvatarServer(emotion, host, port, max_fps)
+    threading.Thread(target=server.serve_forever, name="avatar-server", daemon=True).start()
+    logging.info(f"[Avatar] Mood stream on {host}:{port} (max {max_fps} fps).")
+    return server
+
+
+def watch(host=AVATAR_HOST, port=AVATAR_PORT):
+    with socket.create_connection((host, port)) as conn:
+        for line in conn.makefile("r", encoding="utf-8"):
+            print(line.rstrip())
+
+
+if __name__ == "__main__":
+    if "--watch" in sys.argv:
+        watch()
@@ -1,57 +1,110 @@
 #interfaces/chat_ui.py
+import os
 import time
 import sys
 import random
+import select
+from core.reflection_cache import mood_family, OTHER
+from core.reflection_speculator import ReflectionSpeculator
+
+SPECULATE_AFTER = 20   # seconds of quiet before the next idle reflection is pre-generated
+POLL_INTERVAL = 0.5
+REFLECTION_WAIT = 120  # how long a due reflection keeps polling one that is still generating
+
+def _read_line(timeout):
+    """A line from stdin, or None if none arrived within `timeout` seconds. Raises EOFError at EOF."""
+    if os.name == "nt":
+        # select() does not work on console handles; block like before.
+        return input()
+    ready, _, _ = select.select([sys.stdin], [], [], timeout)
+    if not ready:
+        return None
+    line = sys.stdin.readline()
+    if not line:
+        raise EOFError
+    return line.rstrip("\n")
+
+def _reflect(llm, speculator, current_mood, candidates):
+    """The idle reflection for `current_mood`, or None while a pre-generated one is still being written."""
+    family = mood_family(current_mood)
+
+    if family == "sad" and candidates:
+        chosen = random.choice(candidates)
+        rehearse_memory(chosen, llm)
+        return f"I can't help but think back... {chosen['content']} (I felt {chosen['mood']})"
+
+    if family == "anxious" and candidates:
+        return f"My mind drifts to worries... {candidates[0]['content']}"
+
+    if family == "happy" and candidates:
+        chosen = random.choice(candidates)
+        return f"Thinking happily, I recall: {chosen['content']} 🌟"
+
+    # Never blocks on the model: a reflection that is not written yet is (re)started in the
+    # background and None tells the caller to ask again on its next pass.
+    pool = candidates if family == OTHER else None
+    reflection = speculator.take(current_mood)
+    if reflection is not None:
+        return reflection
+    if speculator.busy or speculator.prepare(current_mood, pool):
+        return None
+    return llm.memory.self_dialogue(llm, pool)
 
 def start_chat_ui(llm):
     print("🟢 Peach is online.")
+    llm.memory.reflection_cache.start(llm.emotion)
+    speculator = ReflectionSpeculator(llm)
     last_user_input_time = time.time()
     last_reflection_time = time.time()
+    reflection_due = None  # when the current idle reflection fell due, while it waits on the speculator
     idle_threshold = random.randint(150, 240)
+    prompt_shown = False
     while True:
         now = time.time()
+        current_mood = llm.emotion.current_mood()
+        candidates = llm.memory.reflection_cache.get(current_mood)
+        family = mood_family(current_mood)
+
+        # Only the self-dialogue branch needs the LLM; get it written while the user is quiet.
+        if (now - last_user_input_time > SPECULATE_AFTER and not speculator.busy
+                and (family == OTHER or not candidates)):
+            speculator.prepare(current_mood, candidates if family == OTHER else None)
+
+        # Housekeeping while the user is quiet: fold old, faded memories into summaries.
+        if now - last_user_input_time > SPECULATE_AFTER:
+            llm.memory.maybe_consolidate()
+
         if now - last_user_input_time > idle_threshold and now - last_reflection_time > idle_threshold:
-            print("\n💭 Peach reflects quietly to herself...\n")
-            time.sleep(1.2)
-            current_mood = llm.emotion.current_mood()
-
-            if current_mood in ["sad", "nostalgic", "lonely"]:
-                memories = llm.memory.weighted_memory_recall(top_n=3)
-                if memories:
-                    chosen = random.choice(memories)
-                    reflection = f"I can't help but think back... {chosen['content']} (I felt {chosen['mood']})"
-                    rehearse_memory(chosen, llm)
-                else:
-                    reflection = llm.memory.self_dialogue(llm)
-
-            elif current_mood in ["anxious", "nervous", "overwhelmed"]:
-                sem_hits = llm.memory.semantic_engine.semantic_recall("worries")
-                if sem_hits:
-                    reflection = f"My mind drifts to worries... {sem_hits[0]}"
-                    rehearse_memory(chosen)
-                else:
-                    reflection = llm.memory.self_dialogue(llm)
-
-            elif current_mood in ["happy", "content", "hopeful"]:
-                memories = llm.memory.weighted_memory_recall(top_n=5)
-                if memories:
-                    chosen = random.choice(memories)
-                    reflection = f"Thinking happily, I recall: {chosen['content']} 🌟"
-                else:
-                    reflection = llm.memory.self_dialogue(llm)
-
-            else:
-                reflection = llm.memory.self_dialogue(llm)
-
-            for char in f"Peach 🍑 (to herself): {reflection}\n":
-                sys.stdout.write(char)
-                sys.stdout.flush()
-                time.sleep(0.015)
-            print()
-            last_reflection_time = now
+            # Polled once per pass, so a line typed meanwhile is read (and drops the reflection).
+            reflection_due = reflection_due or now
+            reflection = _reflect(llm, speculator, current_mood, candidates)
+            if reflection is None and now - reflection_due > REFLECTION_WAIT:
+                speculator.cancel("reflection wait exceeded")
+                last_reflection_time, reflection_due = now, None
+            elif reflection is not None:
+                print("\n💭 Peach reflects quietly to herself...\n")
+                time.sleep(1.2)
+                for char in f"Peach 🍑 (to herself): {reflection}\n":
+                    sys.stdout.write(char)
+                    sys.stdout.flush()
+                    time.sleep(0.015)
+                print()
+                last_reflection_time, reflection_due = now, None
+                prompt_shown = False
 
         try:
-            user_input = input("You: ")
+            if not prompt_shown:
+                sys.stdout.write("You: ")
+                sys.stdout.flush()
+                prompt_shown = True
+            user_input = _read_line(POLL_INTERVAL)
+            if user_input is None:
+                continue
+
+            # The user is talking again: free the model for the reply.
+            speculator.cancel("user input")
+            reflection_due = None
+            prompt_shown = False
             if not user_input.strip():
                 continue
 
@@ -64,12 +117,13 @@ def start_chat_ui(llm):
             if user_input.lower() in ["exit", "quit", "bye"]:
                 break
 
-        except KeyboardInterrupt:
+        except (KeyboardInterrupt, EOFError):
+            speculator.cancel("session ended")
             print("\n🔌 Session ended.")
             break
 
+    llm.export_model_stats()
+
 def rehearse_memory(memory, llm):
     """Boost the rehearsal count and importance slightly after reflection."""
-    memory['rehearsed_count'] += 1
-    memory['importance'] = min(1.0, memory['importance'] + 0.05)
-    llm.memory.update_episodic_in_sqlite(memory)
+    llm.memory.rehearse_memory(memory)
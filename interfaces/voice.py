@@ -0,0 +1,401 @@
+# interfaces/voice.py
+"""
+Voice loop: microphone → energy VAD → STT → LLM (streamed) → sentence splitter → TTS → speaker.
+
+Sentences are synthesized as soon as the model finishes them and played while the
+next ones are still being generated and synthesized, so time-to-first-audio (TTFA)
+is bounded by the first sentence, not the whole reply.
+
+STT, TTS, audio input and output are pluggable. ScriptedSTT, SilentTTS, ArraySource
+and NullSink are local stand-ins that need no models or audio devices:
+
+    python -m interfaces.voice --demo
+"""
+import re
+import sys
+import time
+import queue
+import logging
+import threading
+import statistics
+import numpy as np
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(message)s')
+
+SAMPLE_RATE = 16000
+
+
+# --- audio in -----------------------------------------------------------------------
+
+class MicrophoneSource:
+    """Mono float32 chunks from the default input device (needs sounddevice)."""
+    def __init__(self, sample_rate=SAMPLE_RATE, chunk_ms=30):
+        import sounddevice
+        self.sounddevice = sounddevice
+        self.sample_rate = sample_rate
+        self.chunk = int(sample_rate * chunk_ms / 1000)
+
+    def chunks(self):
+        with self.sounddevice.InputStream(samplerate=self.sample_rate, channels=1, dtype="float32",
+                                          blocksize=self.chunk) as stream:
+            while True:
+                data, _ = stream.read(self.chunk)
+                yield data[:, 0].copy()
+
+
+class ArraySource:
+    """Replays a float32 array in fixed-size chunks; `realtime` paces it like a live microphone."""
+    def __init__(self, audio, sample_rate=SAMPLE_RATE, chunk_ms=30, realtime=False):
+        self.audio = np.asarray(audio, dtype=np.float32)
+        self.sample_rate = sample_rate
+        self.chunk = int(sample_rate * chunk_ms / 1000)
+        self.realtime = realtime
+
+    def chunks(self):
+        for start in range(0, len(self.audio), self.chunk):
+            if self.realtime:
+                time.sleep(self.chunk / self.sample_rate)
+            yield self.audio[start:start + self.chunk]
+
+
+class EnergyVAD:
+    """
+    Splits a chunk stream into speech segments by frame energy. The noise floor adapts
+    on non-speech frames; a segment starts after `start_frames` loud frames and ends
+    after `hangover_ms` of quiet, or when it reaches `max_segment_s`.
+    """
+    def __init__(self, sample_rate=SAMPLE_RATE, frame_ms=30, threshold_ratio=3.0, min_energy=1e-4,
+                 start_frames=3, hangover_ms=600, pre_roll_ms=200, max_segment_s=20.0):
+        self.sample_rate = sample_rate
+        self.frame = int(sample_rate * frame_ms / 1000)
+        self.threshold_ratio = threshold_ratio
+        self.min_energy = min_energy
+        self.start_frames = start_frames
+        self.hangover_frames = max(1, hangover_ms // frame_ms)
+        self.pre_roll_frames = max(0, pre_roll_ms // frame_ms)
+        self.max_frames = int(max_segment_s * 1000 / frame_ms)
+        self.noise_floor = min_energy
+
+    def is_speech(self, frame):
+        energy = float(np.mean(frame * frame))
+        speech = energy > max(self.min_energy, self.noise_floor * self.threshold_ratio)
+        if not speech:
+            self.noise_floor = 0.95 * self.noise_floor + 0.05 * energy
+        return speech
+
+    def segments(self, chunks):
+        buffer = np.zeros(0, dtype=np.float32)
+        recent = []
+        segment = []
+        loud = quiet = 0
+        for chunk in chunks:
+            buffer = np.concatenate([buffer, chunk])
+            while len(buffer) >= self.frame:
+                frame, buffer = buffer[:self.frame], buffer[self.frame:]
+                speech = self.is_speech(frame)
+                if not segment:
+                    recent.append(frame)
+                    loud = loud + 1 if speech else 0
+                    if loud >= self.start_frames:
+                        segment = recent[-(self.start_frames + self.pre_roll_frames):]
+                        recent, quiet = [], 0
+                    else:
+                        del recent[:-(self.start_frames + self.pre_roll_frames)]
+                    continue
+                segment.append(frame)
+                quiet = 0 if speech else quiet + 1
+                if quiet >= self.hangover_frames or len(segment) >= self.max_frames:
+                    yield np.concatenate(segment)
+                    segment, loud = [], 0
+        if segment:
+            yield np.concatenate(segment)
+
+
+# --- speech to text -----------------------------------------------------------------
+
+class WhisperSTT:
+    def __init__(self, model_name="base", language="en"):
+        import whisper
+        self.model = whisper.load_model(model_name)
+        self.language = language
+
+    def transcribe(self, audio):
+        result = self.model.transcribe(np.asarray(audio, dtype=np.float32), language=self.language, fp16=False)
+        return result["text"].strip()
+
+
+class ScriptedSTT:
+    """Returns the next scripted line for every segment (stand-in for tests and demos)."""
+    def __init__(self, lines):
+        self.lines = list(lines)
+
+    def transcribe(self, audio):
+        return self.lines.pop(0) if self.lines else ""
+
+
+# --- text to speech -----------------------------------------------------------------
+
+class ElevenLabsTTS:
+    """ElevenLabs synthesis as raw 16 kHz PCM, so playback needs no decoder."""
+    def __init__(self, voice_id, api_key=None, model_id="eleven_turbo_v2"):
+        from elevenlabs.client import ElevenLabs
+        self.client = ElevenLabs(api_key=api_key)
+        self.voice_id = voice_id
+        self.model_id = model_id
+        self.sample_rate = SAMPLE_RATE
+
+    def synthesize(self, text):
+        pcm = b"".join(self.client.text_to_speech.convert(
+            voice_id=self.voice_id, text=text, model_id=self.model_id, output_format="pcm_16000"
+        ))
+        return np.frombuffer(pcm, dtype=np.int16).astype(np.float32) / 32768.0
+
+
+class SilentTTS:
+    """Silence as long as the text would take to say, after a simulated synthesis delay."""
+    def __init__(self, chars_per_second=15.0, synth_seconds_per_char=0.002, sample_rate=SAMPLE_RATE):
+        self.chars_per_second = chars_per_second
+        self.synth_seconds_per_char = synth_seconds_per_char
+        self.sample_rate = sample_rate
+
+    def synthesize(self, text):
+        time.sleep(len(text) * self.synth_seconds_per_char)
+        return np.zeros(int(len(text) / self.chars_per_second * self.sample_rate), dtype=np.float32)
+
+
+# --- audio out ----------------------------------------------------------------------
+
+class SpeakerSink:
+    def __init__(self):
+        import sounddevice
+        self.sounddevice = sounddevice
+
+    def play(self, audio, sample_rate):
+        self.sounddevice.play(audio, sample_rate)
+        self.sounddevice.wait()
+
+
+class NullSink:
+    """Discards audio; with `realtime` it blocks for the audio's duration like a speaker would."""
+    def __init__(self, realtime=True):
+        self.realtime = realtime
+
+    def play(self, audio, sample_rate):
+        if self.realtime:
+            time.sleep(len(audio) / sample_rate)
+
+
+# --- reply pipeline -----------------------------------------------------------------
+
+class SentenceSplitter:
+    """Accumulates streamed tokens and releases whole sentences."""
+    BOUNDARY = re.compile(r'([.!?…]+["\')\]]*|\n+)\s+')
+
+    def __init__(self, min_chars=8):
+        self.min_chars = min_chars
+        self.buffer = ""
+
+    def feed(self, token):
+        self.buffer += token
+        sentences = []
+        start = 0
+        for match in self.BOUNDARY.finditer(self.buffer):
+            candidate = self.buffer[start:match.end()].strip()
+            # Very short fragments ("Oh." / "1.") ride along with the next sentence.
+            if len(candidate) >= self.min_chars:
+                sentences.append(candidate)
+                start = match.end()
+        self.buffer = self.buffer[start:]
+        return sentences
+
+    def flush(self):
+        rest, self.buffer = self.buffer.strip(), ""
+        return [rest] if rest else []
+
+
+class SpeechPipeline:
+    """
+    Two worker threads: one synthesizes queued sentences, one plays finished audio.
+    Synthesis of sentence n+1 overlaps playback of sentence n.
+    """
+    def __init__(self, tts, sink, min_chars=8):
+        self.tts = tts
+        self.sink = sink
+        self.min_chars = min_chars
+
+    def start(self, started_at=None):
+        self.splitter = SentenceSplitter(self.min_chars)
+        self.started_at = started_at or time.perf_counter()
+        self.first_audio_at = None
+        self.generation_done_at = None
+        self.spoken = []
+        self.text_queue = queue.Queue()
+        self.audio_queue = queue.Queue(maxsize=4)
+        self.synth_thread = threading.Thread(target=self._synthesize, daemon=True)
+        self.play_thread = threading.Thread(target=self._play, daemon=True)
+        self.synth_thread.start()
+        self.play_thread.start()
+
+    def feed(self, token):
+        for sentence in self.splitter.feed(token):
+            self._say(sentence)
+
+    def _say(self, sentence):
+        self.spoken.append(sentence)
+        self.text_queue.put(sentence)
+
+    def finish(self, extra_text=""):
+        """Marks the end of generation; `extra_text` is spoken after what was streamed."""
+        self.generation_done_at = time.perf_counter()
+        for sentence in self.splitter.flush():
+            self._say(sentence)
+        if extra_text.strip():
+            splitter = SentenceSplitter(self.min_chars)
+            for sentence in splitter.feed(extra_text) + splitter.flush():
+                self._say(sentence)
+        self.text_queue.put(None)
+
+    def wait(self):
+        self.synth_thread.join()
+        self.play_thread.join()
+        done = time.perf_counter()
+        return {
+            "ttfa": (self.first_audio_at or done) - self.started_at,
+            "generation": (self.generation_done_at or done) - self.started_at,
+            "total": done - self.started_at,
+            "sentences": len(self.spoken),
+        }
+
+    def _synthesize(self):
+        while True:
+            sentence = self.text_queue.get()
+            if sentence is None:
+                self.audio_queue.put(None)
+                return
+            try:
+                audio = self.tts.synthesize(sentence)
+            except Exception as e:
+                logging.error(f"[Voice] TTS failed: {e}")
+                continue
+            self.audio_queue.put(audio)
+
+    def _play(self):
+        sample_rate = getattr(self.tts, "sample_rate", SAMPLE_RATE)
+        while True:
+            audio = self.audio_queue.get()
+            if audio is None:
+                return
+            if self.first_audio_at is None:
+                self.first_audio_at = time.perf_counter()
+            self.sink.play(audio, sample_rate)
+
+
+class VoiceLoop:
+    """Listens, replies through the LLM and speaks, recording TTFA and total reply time per turn."""
+    def __init__(self, llm, stt, tts, source, sink, vad=None, min_chars=8):
+        self.llm = llm
+        self.stt = stt
+        self.source = source
+        self.vad = vad or EnergyVAD(sample_rate=getattr(source, "sample_rate", SAMPLE_RATE))
+        self.pipeline = SpeechPipeline(tts, sink, min_chars=min_chars)
+        self.turns = []
+
+    def run(self, max_turns=None):
+        for segment in self.vad.segments(self.source.chunks()):
+            self.turn(segment)
+            if max_turns and len(self.turns) >= max_turns:
+                break
+        return self.report()
+
+    def turn(self, segment):
+        heard_at = time.perf_counter()
+        text = self.stt.transcribe(segment)
+        stt_seconds = time.perf_counter() - heard_at
+        if not text:
+            return None
+        print(f"You 🎙️: {text}")
+
+        self.pipeline.start()
+        streamed = []
+        def on_token(token):
+            streamed.append(token)
+            self.pipeline.feed(token)
+        response = self.llm.generate_response(text, on_token=on_token)
+
+        # Style touches and non-LLM replies (errors, reflections) never went through the stream.
+        raw = "".join(streamed).strip()
+        extra = response if not raw else (response[len(raw):] if response.startswith(raw) else "")
+        self.pipeline.finish(extra)
+        metrics = self.pipeline.wait()
+        metrics["stt"] = stt_seconds
+        self.turns.append(metrics)
+        print(f"Peach 🍑: {response}")
+        logging.info(f"[Voice] STT {stt_seconds * 1000:.0f} ms, TTFA {metrics['ttfa'] * 1000:.0f} ms, "
+                     f"generation {metrics['generation'] * 1000:.0f} ms, reply {metrics['total'] * 1000:.0f} ms "
+                     f"({metrics['sentences']} sentences)")
+        return metrics
+
+    def report(self):
+        if not self.turns:
+            return {}
+        summary = {}
+        for key in ("stt", "ttfa", "generation", "total"):
+            values = sorted(turn[key] for turn in self.turns)
+            summary[key] = {"p50": statistics.median(values), "p95": values[int(0.95 * (len(values) - 1))]}
+        return summary
+
+
+def start_voice_ui(llm, whisper_model="base", voice_id=None):
+    """Voice counterpart of start_chat_ui: Whisper in, ElevenLabs out, default audio devices."""
+    print("🟢 Peach is listening.")
+    tts = ElevenLabsTTS(voice_id) if voice_id else SilentTTS()
+    loop = VoiceLoop(llm, WhisperSTT(whisper_model), tts, MicrophoneSource(), SpeakerSink())
+    try:
+        loop.run()
+    except KeyboardInterrupt:
+        print("\n🔌 Session ended.")
+    print_report(loop.report())
+
+
+def print_report(summary):
+    for key, label in (("stt", "speech-to-text"), ("ttfa", "time to first audio"),
+                       ("generation", "generation"), ("total", "total reply")):
+        if key in summary:
+            print(f"{label:<20} p50 {summary[key]['p50'] * 1000:7.0f} ms   p95 {summary[key]['p95'] * 1000:7.0f} ms")
+
+
+class _DemoLLM:
+    """Streams a canned reply at a fixed token rate; lets the demo run without a model."""
+    REPLY = ("Oh, I missed you today! The rain kept tapping on the window and I thought of you. "
+             "Tell me everything about the interview. Were you nervous, or did it feel easy once you started?")
+
+    def __init__(self, tokens_per_second=25):
+        self.delay = 1.0 / tokens_per_second
+
+    def generate_response(self, prompt, on_token=None):
+        for token in re.findall(r"\S+\s*", self.REPLY):
+            time.sleep(self.delay)
+            if on_token:
+                on_token(token)
+        return self.REPLY
+
+
+def _demo():
+    rng = np.random.default_rng(0)
+    def utterance(seconds):
+        t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+        return 0.3 * np.sin(2 * np.pi * 220 * t).astype(np.float32)
+    silence = lambda seconds: (0.002 * rng.standard_normal(int(seconds * SAMPLE_RATE))).astype(np.float32)
+    audio = np.concatenate([silence(0.5), utterance(1.2), silence(1.0), utterance(0.8), silence(1.0)])
+
+    loop = VoiceLoop(_DemoLLM(), ScriptedSTT(["I'm back!", "I had the interview today."]), SilentTTS(),
+                     ArraySource(audio), NullSink(realtime=True))
+    print_report(loop.run())
+
+
+if __name__ == "__main__":
+    if "--demo" in sys.argv:
+        _demo()
+    else:
+        from app import llm
+        start_voice_ui(llm)
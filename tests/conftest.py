@@ -0,0 +1,31 @@
+# tests/conftest.py
+import os
+import sys
+import atexit
+import pytest
+
+base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, base_dir)
+
+from core import db
+
+# The fixture below closes every database; at exit pytest has already closed the log stream.
+atexit.unregister(db.close_all)
+
+
+@pytest.fixture(autouse=True)
+def close_databases():
+    """get_db shares one manager per path; drop them so each test starts from its own files."""
+    yield
+    db.close_all()
+
+
+def make_memory(content, timestamp, mood="happy", tags=("test",), importance=0.5, **extra):
+    """An episodic memory dict shaped like the ones Memory.capture builds."""
+    memory = {
+        "time": "2024-01-01 00:00:00", "content": content, "mood": mood, "tags": list(tags),
+        "importance": importance, "relation_to_user": "user", "category": "general",
+        "timestamp": timestamp, "rehearsed_count": 0,
+    }
+    memory.update(extra)
+    return memory
@@ -0,0 +1,22 @@
+# tests/test_db.py
+from core.db import get_db, close_db
+
+
+def test_close_db_closes_one_file_and_forgets_it(tmp_path):
+    memory_db = get_db(str(tmp_path / "memory.db"))
+    emotion_db = get_db(str(tmp_path / "emotion.db"))
+    other_db = get_db(str(tmp_path / "llm_cache.db"))
+    with other_db.writer() as conn:
+        conn.execute("CREATE TABLE t (x)")
+
+    close_db(memory_db)
+    close_db(emotion_db)
+    # Connections owned by someone else stay usable.
+    with other_db.writer() as conn:
+        conn.execute("INSERT INTO t VALUES (1)")
+    assert other_db.execute_read("SELECT x FROM t") == [(1,)]
+    assert get_db(str(tmp_path / "llm_cache.db")) is other_db
+    # A closed file reconnects on next use instead of handing back the closed manager.
+    reopened = get_db(str(tmp_path / "memory.db"))
+    assert reopened is not memory_db
+    assert reopened.execute_read("SELECT 1") == [(1,)]
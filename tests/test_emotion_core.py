@@ -0,0 +1,113 @@
+# tests/test_emotion_core.py
+import copy
+import random
+import pytest
+from core.emotion import MOOD_VOCABULARY
+from core.emotion_core import MoodVector
+
+START = 1_700_000_000.0
+
+
+class DictEmotions:
+    """The dict-based state EmotionState kept before MoodVector, with the clock passed in."""
+    def __init__(self):
+        self.active_emotions = {}
+
+    def boost(self, mood, amount, now):
+        emo = self.active_emotions.setdefault(mood, {"intensity": 0.0, "last_updated": now})
+        emo["intensity"] = min(1.0, emo["intensity"] + amount)
+        emo["last_updated"] = now
+
+    def echo(self, new_mood, amount, now):
+        for mood, data in list(self.active_emotions.items()):
+            if mood != new_mood and data["intensity"] > 0.6:
+                data["intensity"] = min(1.0, data["intensity"] + amount)
+                data["last_updated"] = now
+
+    def decay(self, now, decay_interval=60, decay_rate=0.05):
+        to_remove = []
+        for mood, data in self.active_emotions.items():
+            elapsed = now - data["last_updated"]
+            if elapsed > decay_interval:
+                decayed = data["intensity"] - decay_rate * (elapsed // decay_interval)
+                if decayed <= 0.1:
+                    to_remove.append(mood)
+                else:
+                    data["intensity"] = round(decayed, 2)
+                    data["last_updated"] = now
+        for mood in to_remove:
+            del self.active_emotions[mood]
+
+    def top(self, k):
+        return [m for m, _ in sorted(self.active_emotions.items(), key=lambda x: -x[1]["intensity"])[:k]]
+
+
+def intensities(state):
+    if isinstance(state, DictEmotions):
+        return {m: d["intensity"] for m, d in state.active_emotions.items()}
+    return {m: d["intensity"] for m, d in state.as_dict().items()}
+
+
+def random_history(seed, steps=60):
+    """Both states driven through the same boosts and echoes, as update_emotion does."""
+    rng = random.Random(seed)
+    old, new = DictEmotions(), MoodVector(MOOD_VOCABULARY, now=START)
+    now = START
+    for _ in range(steps):
+        now += rng.uniform(1, 400)
+        mood = rng.choice(MOOD_VOCABULARY[:12] + ["a brand new mood"])
+        boost = rng.uniform(0.05, 0.4)
+        old.boost(mood, boost, now)
+        old.echo(mood, boost * 0.25, now)
+        new.echo(new.boost(mood, boost, now), boost * 0.25, now, threshold=0.6)
+        if rng.random() < 0.2:
+            old.decay(now)
+            new.decay(now)
+    return old, new, now
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_boost_echo_and_decay_match_the_dict_state(seed):
+    old, new, now = random_history(seed)
+    assert intensities(new) == pytest.approx(intensities(old))
+    for later in (30, 61, 150, 900, 4000):
+        old_copy, new_copy = copy.deepcopy(old), copy.deepcopy(new)
+        old_copy.decay(now + later)
+        new_copy.decay(now + later)
+        assert intensities(new_copy) == pytest.approx(intensities(old_copy))
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_top_k_matches_a_full_sort(seed):
+    old, new, _ = random_history(seed)
+    levels = intensities(old)
+    for k in (1, 2, 3, 10, 100):
+        new_top, old_top = [new.moods[i] for i in new.top(k)], old.top(k)
+        assert [levels[m] for m in new_top] == pytest.approx([levels[m] for m in old_top])
+        # Moods tied with the last one kept may come in either order (both pick arbitrarily).
+        cut = levels[old_top[-1]]
+        assert {m for m in new_top if levels[m] > cut} == {m for m in old_top if levels[m] > cut}
+    assert levels[new.dominant()] == max(levels.values())
+
+
+def test_decay_keeps_partial_intervals():
+    # The one intended difference: the dict state reset last_updated to "now" and dropped
+    # the leftover part of an interval, so frequent callers decayed too slowly.
+    state = MoodVector(["calm"], now=START)
+    state.boost("calm", 0.9, START)
+    for t in (90, 150, 210, 270):
+        state.decay(START + t)
+    once = MoodVector(["calm"], now=START)
+    once.boost("calm", 0.9, START)
+    once.decay(START + 270)
+    assert state.intensity[0] == once.intensity[0] == pytest.approx(0.7)
+    assert state.last_updated[0] == START + 240
+
+
+def test_unknown_moods_keep_their_index():
+    state = MoodVector(["calm", "happy", "calm"], now=START)
+    assert state.moods == ["calm", "happy"]
+    idx = state.boost("starstruck", 0.5, START)
+    state.boost("happy", 0.2, START)
+    assert state.index_of("starstruck") == idx == 2
+    assert state.rows()[2] == ("starstruck", 0.5, START)
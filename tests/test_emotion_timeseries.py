@@ -0,0 +1,85 @@
+# tests/test_emotion_timeseries.py
+import sqlite3
+import pytest
+from core.db import get_db
+from core.emotion_timeseries import MoodTimeSeries, DAY, HOUR, MINUTE
+
+START = 1_700_000_000 - 1_700_000_000 % DAY
+
+
+def _legacy_log(path, readings):
+    """An emotion.db from before rollups: only the raw mood_log."""
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE mood_log (id INTEGER PRIMARY KEY AUTOINCREMENT, mood TEXT, intensity REAL, timestamp REAL)")
+    conn.executemany("INSERT INTO mood_log (mood, intensity, timestamp) VALUES (?, ?, ?)", readings)
+    conn.commit()
+    conn.close()
+
+
+def by_mood(stats):
+    return {s["mood"]: (round(s["mean"], 6), s["max"], s["count"]) for s in stats}
+
+
+def test_rollups_answer_ranges_across_resolutions(tmp_path):
+    series = MoodTimeSeries(get_db(str(tmp_path / "emotion.db")))
+    for i in range(48):
+        series.record("calm", 0.5, START + i * HOUR + 30)
+    series.record("happy", 0.9, START + 5 * MINUTE)
+    assert by_mood(series.summary(START, START + 2 * DAY)) == {"calm": (0.5, 0.5, 48), "happy": (0.9, 0.9, 1)}
+    # An unaligned window picks up the edges from the finer rollups.
+    assert by_mood(series.summary(START + 90 * MINUTE, START + DAY + 90 * MINUTE))["calm"][2] == 24
+    assert len(series.query(START, START + 2 * DAY, resolution=DAY)) == 3
+
+
+def test_backfill_rolls_up_readings_logged_before_rollups(tmp_path):
+    path = str(tmp_path / "emotion.db")
+    _legacy_log(path, [("sad", 0.4, START + i * HOUR) for i in range(10)] + [("hopeful", 0.7, START + 20 * HOUR)])
+    series = MoodTimeSeries(get_db(path))
+    expected = {"sad": (0.4, 0.4, 10), "hopeful": (0.7, 0.7, 1)}
+    assert by_mood(series.summary(START, START + DAY)) == expected
+
+    # The history survives the raw points being pruned away...
+    series.prune(now=START + 30 * DAY)
+    assert series.raw(START, START + DAY) == []
+    assert by_mood(series.summary(START, START + DAY)) == expected
+
+    # ...and reopening does not count it twice.
+    series = MoodTimeSeries(get_db(path))
+    assert by_mood(series.summary(START, START + DAY)) == expected
+
+
+def test_backfill_skips_readings_already_rolled_up(tmp_path):
+    path = str(tmp_path / "emotion.db")
+    series = MoodTimeSeries(get_db(path))
+    series.record("angry", 0.6, START + DAY)
+    conn = sqlite3.connect(path)
+    conn.execute("INSERT INTO mood_log (mood, intensity, timestamp) VALUES ('angry', 0.2, ?)", (START,))
+    conn.execute("PRAGMA user_version = 0")
+    conn.commit()
+    conn.close()
+    series = MoodTimeSeries(get_db(path))
+    assert by_mood(series.summary(START, START + 2 * DAY)) == {"angry": (0.4, 0.6, 2)}
+
+
+def test_prune_drops_expired_raw_points_and_fine_rollups(tmp_path):
+    series = MoodTimeSeries(get_db(str(tmp_path / "emotion.db")), raw_retention=DAY,
+                            rollup_retention={MINUTE: 2 * DAY, HOUR: 10 * DAY})
+    series.record("calm", 0.5, START)
+    series.record("calm", 0.5, START + 20 * DAY)
+    series.prune(now=START + 20 * DAY)
+    assert [r[2] for r in series.raw(0, START + 30 * DAY)] == [START + 20 * DAY]
+    assert series.query(START, START + DAY, resolution=MINUTE) == []
+    assert series.query(START, START + DAY, resolution=HOUR) == []
+    assert series.query(START, START + DAY, resolution=DAY)[0]["count"] == 1
+
+
+def test_periodic_prune_joins_the_callers_transaction(tmp_path):
+    db = get_db(str(tmp_path / "emotion.db"))
+    series = MoodTimeSeries(db, raw_retention=DAY, prune_every=2)
+    series.record("calm", 0.5, START)
+    with pytest.raises(RuntimeError):
+        with db.writer() as conn:
+            series.record("calm", 0.5, START + 10 * DAY, conn=conn)  # prunes the first reading
+            raise RuntimeError("caller fails after the write")
+    # Rolled back together: the old reading is still there, the new one is not.
+    assert [r[2] for r in series.raw(0, START + 30 * DAY)] == [START]
@@ -0,0 +1,73 @@
+# tests/test_encoder_backends.py
+import logging
+import numpy as np
+import pytest
+from core import encoder_backends
+from core.encoder_backends import make_encoder, ENCODER_BACKENDS, OnnxEncoder, _l2_normalize
+
+
+class FakeTorch:
+    def __init__(self, model_name="all-MiniLM-L6-v2", threads=None, quantize=False):
+        self.name = "torch-int8" if quantize else "torch"
+        self.model_name, self.threads = model_name, threads
+
+
+class FakeOnnx:
+    def __init__(self, model_name="all-MiniLM-L6-v2", threads=None):
+        self.name = "onnx"
+        self.model_name, self.threads = model_name, threads
+
+
+def unavailable(package):
+    def build(*args, **kwargs):
+        raise ImportError(f"No module named '{package}'")
+    return build
+
+
+@pytest.fixture
+def backends(monkeypatch):
+    monkeypatch.setattr(encoder_backends, "TorchEncoder", FakeTorch)
+    monkeypatch.setattr(encoder_backends, "OnnxEncoder", FakeOnnx)
+    return monkeypatch
+
+
+@pytest.mark.parametrize("backend", ENCODER_BACKENDS)
+def test_each_backend_is_selected_by_name(backends, backend):
+    encoder = make_encoder(backend, "paraphrase-MiniLM-L3-v2", threads=2)
+    assert (encoder.name, encoder.model_name, encoder.threads) == (backend, "paraphrase-MiniLM-L3-v2", 2)
+
+
+def test_unknown_backend_is_rejected(backends):
+    with pytest.raises(ValueError, match="openvino"):
+        make_encoder("openvino")
+
+
+def test_unavailable_onnx_falls_back_to_torch(backends, caplog):
+    backends.setattr(encoder_backends, "OnnxEncoder", unavailable("onnxruntime"))
+    with caplog.at_level(logging.WARNING):
+        encoder = make_encoder("onnx", threads=3)
+    assert (encoder.name, encoder.threads) == ("torch", 3)
+    assert "onnx backend unavailable" in caplog.text and "onnxruntime" in caplog.text
+
+
+def test_without_torch_there_is_nothing_to_fall_back_to(backends):
+    backends.setattr(encoder_backends, "TorchEncoder", unavailable("torch"))
+    with pytest.raises(ImportError, match="torch"):
+        make_encoder("torch")
+    with pytest.raises(ImportError, match="torch"):
+        make_encoder("torch-int8")
+
+
+def test_onnx_explains_what_to_install():
+    try:
+        import onnxruntime  # noqa: F401
+    except ImportError:
+        with pytest.raises(ImportError, match="pip install onnxruntime"):
+            OnnxEncoder()
+    else:
+        pytest.skip("onnxruntime is installed")
+
+
+def test_l2_normalize_leaves_zero_rows_alone():
+    vectors = _l2_normalize(np.array([[3.0, 4.0], [0.0, 0.0]]))
+    np.testing.assert_allclose(vectors, [[0.6, 0.8], [0.0, 0.0]])
@@ -0,0 +1,48 @@
+# tests/test_latency_controller.py
+from core.latency_controller import LatencyController, cut_at_sentence, last_sentence_end
+
+
+def test_plan_starts_at_the_caps():
+    controller = LatencyController(target_p95=8.0, max_tokens=400, max_history=10)
+    plan = controller.plan("deep")
+    assert plan == {"num_predict": 400, "history": 10, "deadline": 8.0 * 1.25}
+    assert controller.plan("casual", energy="low")["num_predict"] == 240
+
+
+def test_token_cap_follows_measured_speed():
+    controller = LatencyController(target_p95=8.0, min_tokens=48, max_tokens=400)
+    # 1s to first token, then 200 tokens (800 chars) in 4s: 50 tokens/s.
+    controller.record(5.0, first_token_s=1.0, output_chars=800)
+    assert controller.plan("deep")["num_predict"] == 350
+    # Slower model: the cap shrinks but never below min_tokens.
+    controller = LatencyController(target_p95=8.0, min_tokens=48, max_tokens=400, smoothing=1.0)
+    controller.record(20.0, first_token_s=7.0, output_chars=40)
+    assert controller.plan("casual")["num_predict"] == 48
+
+
+def test_history_backs_off_when_replies_miss_and_recovers():
+    controller = LatencyController(target_p95=8.0, min_history=2, max_history=10)
+    for _ in range(3):
+        controller.record(12.0)
+    assert controller.history == 2
+    assert not controller.admit_background()
+
+    fast = LatencyController(target_p95=8.0, min_history=2, max_history=10, window=5)
+    fast.history = 2
+    for _ in range(5):
+        fast.record(2.0)
+    assert fast.history == 7
+    assert fast.admit_background()
+
+
+def test_slow_prompt_halves_the_planned_history():
+    controller = LatencyController(target_p95=8.0, max_history=10)
+    controller.record(6.0, first_token_s=4.0, output_chars=400)
+    assert controller.plan("casual")["history"] == 5
+
+
+def test_cut_at_sentence():
+    text = "I was thinking about you today. The sky was so clear and"
+    assert cut_at_sentence(text) == "I was thinking about you today."
+    assert cut_at_sentence("Too short. and then") == "Too short. and then"
+    assert last_sentence_end('She said "hello there!" and left') == len('She said "hello there!"')
@@ -0,0 +1,70 @@
+# tests/test_llm_backend.py
+import sys
+import logging
+import threading
+import subprocess
+import pytest
+from core.llm_backend import OllamaBackend, GenerationCancelled, ModelUnavailable
+
+# Stands in for `ollama run`: echoes the prompt in small flushed chunks, splitting a
+# multi-byte character across writes, then optionally complains on stderr or hangs.
+FAKE_OLLAMA = r'''
+import sys, time
+prompt = sys.stdin.read()
+out = sys.stdout.buffer
+data = ("Echo: " + prompt + " 🍑").encode("utf-8")
+for i in range(0, len(data), 3):
+    out.write(data[i:i + 3]); out.flush()
+    time.sleep(0.001)
+if "WARN" in prompt:
+    sys.stderr.write("warning: model is loading slowly\n")
+if "MISSING" in prompt:
+    sys.stderr.write("Error: model 'ghost' not found\n")
+if "HANG" in prompt:
+    time.sleep(30)
+'''
+
+
+class ScriptedOllama(OllamaBackend):
+    def _spawn(self, model, **kwargs):
+        script = FAKE_OLLAMA if model != "ghost" else 'import sys; sys.stderr.write("Error: model not found")'
+        return subprocess.Popen([sys.executable, "-c", script], stdin=subprocess.PIPE,
+                                stdout=subprocess.PIPE, stderr=subprocess.PIPE, **kwargs)
+
+
+def test_streamed_tokens_reassemble_the_reply():
+    tokens = []
+    text = ScriptedOllama(poll_interval=0.01).generate("hi there", on_token=tokens.append)
+    assert text == "Echo: hi there 🍑"
+    assert "".join(tokens) == text and len(tokens) > 1
+
+
+def test_stderr_is_logged_not_printed(caplog, capsys):
+    with caplog.at_level(logging.ERROR):
+        text = ScriptedOllama(poll_interval=0.01).generate("WARN", on_token=lambda t: None)
+    assert text == "Echo: WARN 🍑"
+    assert "[LLM] Error from ollama: warning: model is loading slowly" in caplog.text
+    assert capsys.readouterr().out == ""
+
+
+def test_missing_model_raises_unavailable():
+    with pytest.raises(ModelUnavailable):
+        ScriptedOllama(poll_interval=0.01).generate("x", model="ghost", on_token=lambda t: None)
+
+
+def test_cancel_event_kills_a_streaming_generation():
+    cancel = threading.Event()
+    tokens = []
+
+    def on_token(token):
+        tokens.append(token)
+        cancel.set()
+
+    with pytest.raises(GenerationCancelled):
+        ScriptedOllama(poll_interval=0.01).generate("HANG", cancel_event=cancel, on_token=on_token)
+    assert tokens
+
+
+def test_deadline_applies_to_streaming():
+    with pytest.raises(subprocess.TimeoutExpired):
+        ScriptedOllama(poll_interval=0.01).generate("HANG", timeout=0.5, on_token=lambda t: None)
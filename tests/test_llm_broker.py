@@ -0,0 +1,138 @@
+# tests/test_llm_broker.py
+import threading
+import pytest
+from core.llm_backend import GenerationCancelled
+from core.llm_broker import LLMBroker, INTERACTIVE, REFLECTION, ENRICHMENT
+
+TIMEOUT = 5
+
+
+class GatedBackend:
+    """Fake backend: prompts listed in `gates` run until their gate opens or they are cancelled."""
+    def __init__(self):
+        self.gates = {}
+        self.started = {}
+        self.calls = []
+        self.cancelled = []
+        self._lock = threading.Lock()
+
+    def gate(self, prompt):
+        self.gates[prompt] = threading.Event()
+        self.started[prompt] = threading.Event()
+        return self.gates[prompt]
+
+    def generate(self, prompt, cancel_event=None, **kwargs):
+        with self._lock:
+            self.calls.append(prompt)
+        gate = self.gates.get(prompt)
+        if gate is not None:
+            self.started[prompt].set()
+            while not gate.wait(0.01):
+                if cancel_event.is_set():
+                    with self._lock:
+                        self.cancelled.append(prompt)
+                    raise GenerationCancelled()
+        return prompt.upper()
+
+
+@pytest.fixture
+def backend():
+    return GatedBackend()
+
+
+@pytest.fixture
+def broker(backend):
+    broker = LLMBroker(backend, max_concurrency=1)
+    yield broker
+    for gate in backend.gates.values():
+        gate.set()
+    broker.shutdown()
+
+
+def occupy(broker, backend, prompt="busy", priority=ENRICHMENT):
+    gate = backend.gate(prompt)
+    future = broker.submit(prompt, priority)
+    assert backend.started[prompt].wait(TIMEOUT)
+    return gate, future
+
+
+def test_queued_requests_run_in_priority_order(broker, backend):
+    broker.preempt_background = False
+    gate, _ = occupy(broker, backend)
+    futures = [broker.submit("enrich", ENRICHMENT), broker.submit("reflect", REFLECTION),
+               broker.submit("reply", INTERACTIVE)]
+    gate.set()
+    for future in futures:
+        future.result(TIMEOUT)
+    assert backend.calls == ["busy", "reply", "reflect", "enrich"]
+
+
+def test_interactive_request_preempts_and_requeues_background_work(broker, backend):
+    gate, background = occupy(broker, backend, priority=REFLECTION)
+    assert broker.submit("reply", INTERACTIVE).result(TIMEOUT) == "REPLY"
+    assert backend.cancelled == ["busy"]
+    gate.set()
+    # The preempted job is retried, and its caller still gets the result.
+    assert background.result(TIMEOUT) == "BUSY"
+    assert backend.calls == ["busy", "reply", "busy"]
+
+
+def test_identical_prompts_share_one_generation(broker, backend):
+    gate, _ = occupy(broker, backend)
+    first, second = broker.submit("same", REFLECTION), broker.submit("same", REFLECTION)
+    assert first is not second
+    gate.set()
+    assert first.result(TIMEOUT) == second.result(TIMEOUT) == "SAME"
+    assert backend.calls.count("same") == 1
+
+
+def test_cancelling_one_coalesced_caller_leaves_the_others(broker, backend):
+    gate = backend.gate("shared")
+    first, second = broker.submit("shared", REFLECTION), broker.submit("shared", REFLECTION)
+    assert backend.started["shared"].wait(TIMEOUT)
+    assert broker.cancel(first)
+    with pytest.raises(GenerationCancelled):
+        first.result(TIMEOUT)
+    gate.set()
+    assert second.result(TIMEOUT) == "SHARED"
+    assert backend.cancelled == []
+
+
+def test_job_is_abandoned_when_the_last_caller_cancels(broker, backend):
+    backend.gate("shared")
+    first, second = broker.submit("shared", REFLECTION), broker.submit("shared", REFLECTION)
+    assert backend.started["shared"].wait(TIMEOUT)
+    broker.cancel(first)
+    second.cancel()  # cancelling the future directly counts too
+    assert broker.submit("next", REFLECTION).result(TIMEOUT) == "NEXT"
+    assert backend.cancelled == ["shared"]
+
+
+def test_cancelled_queued_request_never_runs(broker, backend):
+    gate, _ = occupy(broker, backend)
+    queued = broker.submit("queued", REFLECTION)
+    assert broker.cancel(queued)
+    gate.set()
+    assert broker.submit("after", REFLECTION).result(TIMEOUT) == "AFTER"
+    assert "queued" not in backend.calls
+
+
+def test_cancel_background_drops_queued_background_only(broker, backend):
+    broker.preempt_background = False
+    gate, _ = occupy(broker, backend)
+    background = [broker.submit("enrich", ENRICHMENT), broker.submit("reflect", REFLECTION)]
+    reply = broker.submit("reply", INTERACTIVE)
+    assert broker.cancel_background() == 2
+    gate.set()
+    assert reply.result(TIMEOUT) == "REPLY"
+    assert all(future.cancelled() for future in background)
+
+
+def test_held_background_waits_while_interactive_runs(broker, backend):
+    broker.hold_background(60)
+    background = broker.submit("reflect", REFLECTION)
+    assert broker.submit("reply", INTERACTIVE).result(TIMEOUT) == "REPLY"
+    assert not background.done()
+    broker.hold_background(0)
+    assert background.result(TIMEOUT) == "REFLECT"
+    assert broker.stats()["reflection"]["served"] == 1
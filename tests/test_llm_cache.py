@@ -0,0 +1,101 @@
+# tests/test_llm_cache.py
+import json
+from core.llm_cache import ResponseCache
+
+GREEDY = {"temperature": 0, "num_predict": 32}
+SAMPLED = {"temperature": 0.9, "num_predict": 160}
+
+
+class Clock:
+    def __init__(self, now=1_700_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def make_cache(tmp_path, **kwargs):
+    clock = Clock()
+    return ResponseCache(str(tmp_path / "llm_cache.db"), get_current_time=clock, **kwargs), clock
+
+
+def test_key_ignores_whitespace_but_not_model_or_params():
+    key = ResponseCache.make_key("qwen", "Extract tags:\n  a rainy   day ", GREEDY)
+    assert key == ResponseCache.make_key("qwen", "Extract tags: a rainy day", dict(reversed(GREEDY.items())))
+    assert key != ResponseCache.make_key("llama", "Extract tags: a rainy day", GREEDY)
+    assert key != ResponseCache.make_key("qwen", "Extract tags: a rainy day", {**GREEDY, "num_predict": 64})
+    assert key != ResponseCache.make_key("qwen", "extract tags: a rainy day", GREEDY)
+
+
+def test_hit_and_miss(tmp_path):
+    cache, _ = make_cache(tmp_path)
+    assert cache.get("qwen", "tags for: rain", GREEDY) is None
+    cache.put("qwen", "tags for: rain", "rain, window", GREEDY)
+    assert cache.get("qwen", "tags for:   rain", GREEDY) == "rain, window"
+    cache.put("qwen", "tags for: empty", "", GREEDY)
+    assert cache.get("qwen", "tags for: empty", GREEDY) is None
+    assert (cache.hits, cache.misses) == (1, 2)
+
+
+def test_entries_expire_after_ttl_on_the_injected_clock(tmp_path):
+    cache, clock = make_cache(tmp_path, ttl=3600)
+    cache.put("qwen", "p", "r", GREEDY)
+    clock.now += 3599
+    assert cache.get("qwen", "p", GREEDY) == "r"
+    clock.now += 2
+    assert cache.get("qwen", "p", GREEDY) is None
+    cache.evict()
+    assert cache.stats()["entries"] == 0
+    assert cache.evictions == 1
+
+
+def test_eviction_keeps_the_most_recently_used(tmp_path):
+    cache, clock = make_cache(tmp_path, max_entries=3, evict_every=1000)
+    for i in range(5):
+        clock.now += 1
+        cache.put("qwen", f"prompt {i}", f"reply {i}", GREEDY)
+    clock.now += 1
+    cache.get("qwen", "prompt 0", GREEDY)  # touched: survives despite being oldest
+    cache.evict()
+    assert cache.stats()["entries"] == 3
+    assert [cache.get("qwen", f"prompt {i}", GREEDY) for i in range(5)] == \
+        ["reply 0", None, None, "reply 3", "reply 4"]
+    assert cache.evictions == 2
+
+
+def test_eviction_runs_every_n_puts(tmp_path):
+    cache, clock = make_cache(tmp_path, max_entries=2, evict_every=4)
+    for i in range(4):
+        clock.now += 1
+        cache.put("qwen", f"prompt {i}", "r", GREEDY)
+    assert cache.stats()["entries"] == 2
+
+
+def test_sampled_generations_bypass_the_cache(tmp_path):
+    cache, _ = make_cache(tmp_path)
+    cache.put("llama", "reflect on the beach", "A wave of warmth...", SAMPLED)
+    assert cache.get("llama", "reflect on the beach", SAMPLED) is None
+    cache.put("llama", "no temperature given", "r", {"num_predict": 10})
+    assert cache.get("llama", "no temperature given", {"num_predict": 10}) is None
+    stats = cache.stats()
+    assert (stats["bypassed"], stats["hits"], stats["misses"], stats["entries"]) == (2, 0, 0, 0)
+
+
+def test_export_stats(tmp_path):
+    cache, clock = make_cache(tmp_path)
+    cache.put("qwen", "p", "r", GREEDY)
+    cache.get("qwen", "p", GREEDY)
+    cache.get("qwen", "q", GREEDY)
+    cache.get("qwen", "p", SAMPLED)
+    path = cache.export_stats(str(tmp_path / "out" / "llm_cache_stats.json"))
+    with open(path) as f:
+        exported = json.load(f)
+    assert exported == {"exported_at": clock.now, "cache": {"hits": 1, "misses": 1, "hit_rate": 0.5, "bypassed": 1,
+                                                            "evictions": 0, "entries": 1}}
+
+
+def test_shipped_tagging_route_is_cacheable():
+    from core.model_router import load_model_routing
+    tasks = load_model_routing()["tasks"]
+    assert ResponseCache.cacheable(tasks["tagging"]["options"])
+    assert not ResponseCache.cacheable(tasks["reflection"]["options"])
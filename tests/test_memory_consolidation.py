@@ -0,0 +1,109 @@
+# tests/test_memory_consolidation.py
+import numpy as np
+from conftest import make_memory
+from core.memory_consolidation import MemoryConsolidationEngine
+from core.memory_storage import MemoryStorage
+
+DAY = 86400.0
+NOW = 1_700_000_000.0
+TOPICS = {"beach": [1, 0, 0], "exam": [0, 1, 0], "garden": [0, 0, 1]}
+
+
+class FakeSemanticEngine:
+    """Embeds a text as the unit vector of the topic word it contains."""
+    def __init__(self):
+        self.added = {}
+        self.deleted = []
+
+    def encode(self, text):
+        for word, vec in TOPICS.items():
+            if word in text:
+                return np.array(vec, dtype=np.float32)
+        return np.array([1, 1, 1], dtype=np.float32) / np.sqrt(3)
+
+    def encode_batch(self, texts):
+        return np.stack([self.encode(t) for t in texts])
+
+    def add_memory(self, content, embedding, metadata, memory_id):
+        self.added[memory_id] = content
+
+    def delete_memories(self, ids):
+        self.deleted += list(ids)
+
+
+def make_engine(tmp_path, memories):
+    storage = MemoryStorage(str(tmp_path / "memory.db"))
+    for mem in memories:
+        storage.save_episodic_to_sqlite(mem)
+    semantic = FakeSemanticEngine()
+    return storage, semantic, MemoryConsolidationEngine(storage, semantic, get_current_time=lambda: NOW)
+
+
+def old(days_ago):
+    return NOW - days_ago * DAY
+
+
+def test_similar_old_memories_fold_into_one_summary(tmp_path):
+    members = [
+        make_memory("beach walk at dawn", old(60), tags=("sea", "walk"), importance=0.2, rehearsed_count=1),
+        make_memory("beach bonfire with friends", old(59), tags=("sea", "friends"), importance=0.25, rehearsed_count=2),
+        make_memory("beach shells for the jar", old(58), mood="calm", tags=("shells",), importance=0.1),
+    ]
+    storage, semantic, engine = make_engine(tmp_path, members)
+
+    results = engine.consolidate(min_age=30 * DAY, max_importance=0.3)
+    assert len(results) == 1
+    summary, archived = results[0]
+    assert sorted(m["timestamp"] for m in archived) == [old(60), old(59), old(58)]
+
+    rows = storage.get_episodic_memories()
+    assert [m["category"] for m in rows] == ["consolidated"]
+    stored = rows[0]
+    assert stored["timestamp"] == summary["timestamp"] == old(58) + 1e-3
+    assert stored["importance"] == 0.25
+    assert stored["rehearsed_count"] == 3
+    assert stored["tags"][0] == "sea" and set(stored["tags"]) == {"sea", "walk", "friends", "shells"}
+    assert stored["mood"] == "happy"
+
+    originals = storage.get_archived_memories(summary["timestamp"])
+    assert [m["content"] for m in originals] == [m["content"] for m in members]
+    # The vector store swaps the members for the summary.
+    assert sorted(semantic.deleted) == sorted(str(m["timestamp"]) for m in members)
+    assert list(semantic.added) == [str(summary["timestamp"])]
+
+
+def test_clusters_split_by_topic_and_time(tmp_path):
+    memories = [
+        make_memory("beach picnic", old(90), importance=0.1),
+        make_memory("exam revision", old(89), importance=0.1),
+        make_memory("beach kite", old(88), importance=0.1),
+        make_memory("exam results", old(88.5), importance=0.1),
+        make_memory("beach again, much later", old(40), importance=0.1),
+    ]
+    _, _, engine = make_engine(tmp_path, memories)
+    clusters = engine.cluster(engine.find_candidates(min_age=30 * DAY), time_window=7 * DAY)
+    assert sorted(sorted(m["content"] for m in c) for c in clusters) == [
+        ["beach again, much later"], ["beach kite", "beach picnic"], ["exam results", "exam revision"]]
+
+
+def test_too_small_clusters_and_ineligible_memories_are_left_alone(tmp_path):
+    memories = [
+        make_memory("garden tomatoes", old(60), importance=0.2),
+        make_memory("exam nerves", old(50), importance=0.2),
+        make_memory("beach trip", old(45), importance=0.9),      # too important
+        make_memory("beach day", old(44), importance=0.2),
+        make_memory("beach yesterday", old(1), importance=0.1),  # too recent
+    ]
+    storage, semantic, engine = make_engine(tmp_path, memories)
+    assert engine.consolidate(min_age=30 * DAY, max_importance=0.3, min_cluster_size=2) == []
+    assert sorted(m["content"] for m in storage.get_episodic_memories()) == sorted(m["content"] for m in memories)
+    assert storage.db.execute_read("SELECT COUNT(*) FROM episodic_archive")[0][0] == 0
+    assert semantic.deleted == [] and semantic.added == {}
+
+
+def test_consolidation_runs_once(tmp_path):
+    memories = [make_memory(f"garden weeding {i}", old(40 + i), importance=0.1) for i in range(3)]
+    _, _, engine = make_engine(tmp_path, memories)
+    assert len(engine.consolidate(min_age=30 * DAY)) == 1
+    # Summaries are not candidates again.
+    assert engine.consolidate(min_age=30 * DAY) == []
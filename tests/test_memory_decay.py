@@ -0,0 +1,119 @@
+# tests/test_memory_decay.py
+import sqlite3
+import pytest
+from conftest import make_memory
+from core.memory_decay import MemoryDecayEngine
+from core.memory_storage import MemoryStorage
+
+DAY = 86400.0
+START = 1_700_000_000.0
+
+
+class Clock:
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class KeepCategory:
+    def categorize_memory(self, mem):
+        return mem["category"]
+
+
+def make_engine(tmp_path, memories, clock):
+    storage = MemoryStorage(str(tmp_path / "memory.db"))
+    for mem in memories:
+        storage.save_episodic_to_sqlite(mem)
+    return storage, MemoryDecayEngine(KeepCategory(), storage, get_current_time=clock)
+
+
+def importance(storage):
+    return dict(storage.db.execute_read("SELECT content, importance FROM episodic_memory"))
+
+
+def test_importance_halves_per_half_life_scaled_by_mood(tmp_path):
+    clock = Clock(START)
+    storage, engine = make_engine(tmp_path, [
+        make_memory("neutral", START, mood="curious", importance=0.8),
+        make_memory("bright", START + 1, mood="happy", importance=0.8),
+        make_memory("heavy", START + 2, mood="sad", importance=0.8),
+    ], clock)
+    clock.now += DAY
+    engine.decay_episodic_memory(decay_half_life=DAY)
+    assert importance(storage) == pytest.approx({"neutral": 0.4, "bright": 0.8 * 0.5 ** 0.85,
+                                                 "heavy": 0.8 * 0.5 ** 1.15})
+
+
+def test_decay_counts_from_the_last_run_not_from_creation(tmp_path):
+    clock = Clock(START)
+    storage, engine = make_engine(tmp_path, [make_memory("steady", START - 30 * DAY, mood="calm", importance=0.8)],
+                                  clock)
+    # A month-old memory loses nothing at startup, only for the time that passes afterwards.
+    engine.decay_episodic_memory(decay_half_life=DAY)
+    assert importance(storage)["steady"] == pytest.approx(0.8)
+    for _ in range(4):
+        clock.now += DAY / 4
+        engine.decay_episodic_memory(decay_half_life=DAY)
+    # Four quarter-day runs equal one full day: no compounding.
+    assert importance(storage)["steady"] == pytest.approx(0.4)
+
+
+def test_faded_memories_leave_the_shared_list_in_place(tmp_path):
+    clock = Clock(START)
+    storage, engine = make_engine(tmp_path, [
+        make_memory("fading", START, mood="calm", importance=0.15),
+        make_memory("lasting", START + 1, mood="calm", importance=0.9),
+    ], clock)
+    shared = engine.episodic_memory
+    clock.now += DAY
+    engine.decay_episodic_memory(decay_half_life=DAY, min_importance=0.1)
+    assert engine.episodic_memory is shared
+    assert [m["content"] for m in shared] == ["lasting"]
+    # The row stays in SQLite with its decayed importance.
+    assert importance(storage)["fading"] == pytest.approx(0.075)
+
+
+def test_decay_mood_writes_intensity_and_keeps_the_label(tmp_path):
+    clock = Clock(START + 2 * DAY)
+    storage, engine = make_engine(tmp_path, [
+        make_memory("two days old", START, mood="calm"),
+        make_memory("ancient", START - 60 * DAY, mood="sad"),
+        make_memory("fresh", START + 2 * DAY, mood="happy"),
+    ], clock)
+    engine.decay_mood(decay_half_life=DAY, min_mood_intensity=0.1)
+    rows = {content: (mood, intensity) for content, mood, intensity in
+            storage.db.execute_read("SELECT content, mood, mood_intensity FROM episodic_memory")}
+    assert rows["two days old"] == ("calm", pytest.approx(0.25))
+    assert rows["ancient"] == ("sad", 0.1)
+    assert rows["fresh"] == ("happy", 1.0)
+
+
+def test_decay_mood_is_not_a_sync_change(tmp_path):
+    from core.memory_sync import SyncEngine
+    sync = SyncEngine(str(tmp_path))
+    sync.storage.save_episodic_to_sqlite(make_memory("quiet", START, mood="calm"))
+    before = sync.storage.db.execute_read("SELECT COUNT(*) FROM sync_changelog")[0][0]
+    MemoryDecayEngine(KeepCategory(), sync.storage, get_current_time=lambda: START + DAY).decay_mood()
+    assert sync.storage.db.execute_read("SELECT COUNT(*) FROM sync_changelog")[0][0] == before
+
+
+def test_v6_migration_resets_labels_overwritten_with_numbers(tmp_path):
+    path = str(tmp_path / "memory.db")
+    storage = MemoryStorage(path)
+    for i, mood in enumerate(("happy", "sad", "calm", "hopeful")):
+        storage.save_episodic_to_sqlite(make_memory(f"memory {i}", float(i), mood=mood))
+    conn = sqlite3.connect(path)
+    conn.execute("UPDATE episodic_memory SET mood = 0.42 WHERE timestamp = 1")
+    conn.execute("UPDATE episodic_memory SET mood = '0.99912' WHERE timestamp = 2")
+    conn.execute("PRAGMA user_version = 5")
+    conn.commit()
+    conn.close()
+
+    MemoryStorage(path)
+    conn = sqlite3.connect(path)
+    assert dict(conn.execute("SELECT timestamp, mood FROM episodic_memory")) == \
+        {0.0: "happy", 1.0: "unknown", 2.0: "unknown", 3.0: "hopeful"}
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == 7
+    conn.close()
@@ -0,0 +1,62 @@
+# tests/test_memory_dedup.py
+from conftest import make_memory
+from core.memory_dedup import NearDuplicateIndex, simhash, to_signed, to_unsigned
+from core.memory_storage import MemoryStorage
+
+
+def distance(a, b):
+    return bin(simhash(a) ^ simhash(b)).count("1")
+
+
+def test_simhash_is_stable_under_case_and_punctuation():
+    assert simhash("We watched the sunset at the pier.") == simhash("we watched the SUNSET at the pier")
+    assert distance("we watched the sunset at the pier tonight", "we watched the sunset at the pier last night") <= 16
+    assert distance("we watched the sunset at the pier", "my tax forms are due on monday") > 16
+    assert simhash("") == 0
+
+
+def test_signed_round_trip():
+    for value in (0, 1, (1 << 63) - 1, 1 << 63, (1 << 64) - 1):
+        assert to_unsigned(to_signed(value)) == value
+        assert -(1 << 63) <= to_signed(value) < (1 << 63)
+
+
+def test_index_finds_near_duplicates_and_forgets_removed_keys():
+    index = NearDuplicateIndex(max_distance=3)
+    base = simhash("the little cafe on the corner")
+    index.add(1.0, base)
+    index.add(2.0, base ^ 0b101)          # 2 bits away
+    index.add(3.0, base ^ 0b1111)         # 4 bits away: outside the radius
+    assert index.candidates(base) == [(1.0, 0), (2.0, 2)]
+
+    index.remove(1.0)
+    assert index.candidates(base) == [(2.0, 2)]
+    index.add(2.0, base ^ (0xFF << 40))   # re-adding a key replaces its signature
+    assert index.candidates(base) == []
+    assert len(index) == 2
+
+
+def test_ties_prefer_the_newest_memory():
+    index = NearDuplicateIndex()
+    signature = simhash("same words")
+    index.add(10.0, signature)
+    index.add(20.0, signature)
+    assert index.candidates(signature)[0] == (20.0, 0)
+
+
+def test_storage_signatures_follow_deletes(tmp_path):
+    storage = MemoryStorage(str(tmp_path / "memory.db"))
+    storage.save_episodic_to_sqlite(make_memory("we adopted a kitten named mochi", 1.0))
+    storage.save_episodic_to_sqlite(make_memory("grandma's dumpling recipe", 2.0))
+    # Rows from before the simhash column are filled in lazily.
+    with storage.cursor() as cursor:
+        cursor.execute("UPDATE episodic_memory SET simhash = NULL WHERE timestamp = 2.0")
+    assert dict(storage.iter_simhashes()) == {1.0: simhash("we adopted a kitten named mochi"),
+                                              2.0: simhash("grandma's dumpling recipe")}
+    assert storage.db.execute_read("SELECT COUNT(*) FROM episodic_memory WHERE simhash IS NULL")[0][0] == 0
+
+    storage.delete_memory(keyword="kitten")
+    index = NearDuplicateIndex()
+    for timestamp, signature in storage.iter_simhashes():
+        index.add(timestamp, signature)
+    assert index.candidates(simhash("we adopted a kitten named mochi")) == []
@@ -0,0 +1,98 @@
+# tests/test_memory_export.py
+import os
+import sqlite3
+import pyarrow.parquet as pq
+from conftest import make_memory
+from core.db import get_db
+from core.emotion_timeseries import MoodTimeSeries
+from core.memory_export import ColumnarExporter
+from core.memory_storage import MemoryStorage
+
+DAY = 86400.0
+START = 1_700_000_000.0
+
+
+def _fill(storage, series, first, count):
+    for i in range(first, first + count):
+        storage.save_episodic_to_sqlite(make_memory(f"lantern walk {i}", START + i * DAY, tags=("lantern", "walk")))
+        storage.save_chat_to_sqlite({"role": "user", "content": f"good night {i}", "mood": "calm",
+                                     "timestamp": START + i * DAY})
+        series.record("calm", 0.5, START + i * DAY)
+
+
+def _data_dir(tmp_path):
+    data = tmp_path / "data"
+    storage = MemoryStorage(str(data / "memory.db"), segment_dir=str(data / "chat_segments"))
+    return str(data), storage, MoodTimeSeries(get_db(str(data / "emotion.db")))
+
+
+def _read(out, table):
+    return pq.read_table(os.path.join(out, table)).to_pydict()
+
+
+def test_repeated_runs_export_only_new_rows(tmp_path):
+    data, storage, series = _data_dir(tmp_path)
+    out = str(tmp_path / "out")
+    _fill(storage, series, 0, 40)
+    storage.roll_chat_history(START + 20 * DAY)
+    assert ColumnarExporter(data, out, batch_size=7).export() == \
+        {"episodic_memory": 40, "chat_history": 40, "mood_log": 40}
+
+    _fill(storage, series, 40, 5)
+    exporter = ColumnarExporter(data, out, batch_size=7)
+    assert exporter.export() == {"episodic_memory": 5, "chat_history": 5, "mood_log": 5}
+    assert exporter.export() == {"episodic_memory": 0, "chat_history": 0, "mood_log": 0}
+
+    chat = _read(out, "chat_history")
+    assert chat["content"] == [f"good night {i}" for i in range(45)]
+    episodic = _read(out, "episodic_memory")
+    assert episodic["timestamp"] == [START + i * DAY for i in range(45)]
+    assert episodic["tags"][0] == ["lantern", "walk"]
+    assert _read(out, "mood_log")["id"] == list(range(1, 46))
+    watermarks = exporter.load_watermarks()
+    assert watermarks["chat_history"]["files"] == ["part-00000.parquet", "part-00001.parquet"]
+    assert (watermarks["mood_log"]["watermark"], watermarks["mood_log"]["rows"]) == (45, 45)
+
+
+def test_full_export_replaces_earlier_parts(tmp_path):
+    data, storage, series = _data_dir(tmp_path)
+    out = str(tmp_path / "out")
+    _fill(storage, series, 0, 3)
+    ColumnarExporter(data, out).export()
+    _fill(storage, series, 3, 3)
+    ColumnarExporter(data, out).export()
+    assert len(os.listdir(os.path.join(out, "episodic_memory"))) == 2
+
+    exporter = ColumnarExporter(data, out)
+    assert exporter.export(tables=("episodic_memory",), full=True) == {"episodic_memory": 6}
+    assert os.listdir(os.path.join(out, "episodic_memory")) == ["part-00000.parquet"]
+    assert len(_read(out, "episodic_memory")["timestamp"]) == 6
+    watermarks = exporter.load_watermarks()
+    assert (watermarks["episodic_memory"]["rows"], watermarks["episodic_memory"]["files"]) == \
+        (6, ["part-00000.parquet"])
+    # Tables outside the full export keep their parts and watermarks.
+    assert watermarks["mood_log"]["files"] == ["part-00000.parquet", "part-00001.parquet"]
+
+
+def test_export_never_writes_to_the_data_directory(tmp_path):
+    data = tmp_path / "data"
+    data.mkdir()
+    # An un-migrated memory.db and no emotion.db at all.
+    conn = sqlite3.connect(str(data / "memory.db"))
+    conn.execute("CREATE TABLE episodic_memory (time TEXT, content TEXT, mood TEXT, tags TEXT, "
+                 "importance REAL, relation TEXT, category TEXT, timestamp REAL)")
+    conn.execute("INSERT INTO episodic_memory VALUES ('then', 'old kite', 'happy', 'kite', 0.5, NULL, 'general', 1.0)")
+    conn.commit()
+    conn.close()
+    before = {name: os.path.getmtime(data / name) for name in os.listdir(data)}
+
+    exporter = ColumnarExporter(str(data), str(tmp_path / "out"))
+    assert exporter.export() == {"episodic_memory": 1, "chat_history": 0, "mood_log": 0}
+    exported = _read(str(tmp_path / "out"), "episodic_memory")
+    assert (exported["content"], exported["rehearsed_count"], exported["valence"]) == (["old kite"], [None], [None])
+
+    assert {name: os.path.getmtime(data / name) for name in os.listdir(data)} == before
+    conn = sqlite3.connect(str(data / "memory.db"))
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == 0
+    assert [row[0] for row in conn.execute("SELECT name FROM sqlite_master")] == ["episodic_memory"]
+    conn.close()
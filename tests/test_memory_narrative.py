@@ -0,0 +1,126 @@
+# tests/test_memory_narrative.py
+import json
+from datetime import datetime
+from conftest import make_memory
+from core.memory_narrative import NarrativeIndex, narrative_page, iter_narrative_entries, generate_life_narrative
+from core.memory_storage import MemoryStorage
+
+MOODS = ("happy", "calm", "sad")
+
+
+def ts(month, day, hour=12):
+    return datetime(2024, month, day, hour).timestamp()
+
+
+def make_index(tmp_path, memories=()):
+    storage = MemoryStorage(str(tmp_path / "memory.db"))
+    index = NarrativeIndex(storage)
+    for mem in memories:
+        capture(storage, index, mem)
+    return storage, index
+
+
+def capture(storage, index, mem):
+    """What Memory.capture does for the index: save the row, then record it."""
+    storage.save_episodic_to_sqlite(mem)
+    index.record(mem)
+
+
+def index_rows(index):
+    """narrative_chapters as plain data, with the mood counts compared as dicts."""
+    return [(month, count, json.loads(moods), json.loads(top), first_ts, last_ts)
+            for month, count, moods, top, first_ts, last_ts in index.db.execute_read(
+                'SELECT month, memory_count, mood_counts, top_memories, first_ts, last_ts '
+                'FROM narrative_chapters ORDER BY month')]
+
+
+def assert_consistent(index):
+    incremental = index_rows(index)
+    index.rebuild()
+    assert incremental == index_rows(index)
+    assert sum(row[1] for row in incremental) == index.db.execute_read('SELECT COUNT(*) FROM episodic_memory')[0][0]
+
+
+def year_of_memories():
+    return [make_memory(f"day {m}-{d}", ts(m, d), mood=MOODS[(m + d) % 3], importance=round(0.1 * (d % 10), 1))
+            for m in range(1, 13) for d in (3, 11, 19, 27)]
+
+
+def test_pages_cover_every_entry_once_even_with_shared_timestamps(tmp_path):
+    storage = MemoryStorage(str(tmp_path / "memory.db"))
+    expected = []
+    for i in range(23):
+        # Pairs share a timestamp, so page boundaries fall inside a tie.
+        mem = make_memory(f"entry {i}", ts(3, 1) + i // 2, importance=0.6 + (i % 3) * 0.1)
+        storage.save_episodic_to_sqlite(mem)
+        expected.append(mem["content"])
+    storage.save_episodic_to_sqlite(make_memory("not important", ts(3, 2), importance=0.2))
+
+    seen, cursor, pages = [], None, 0
+    while True:
+        entries, cursor = narrative_page(storage, cursor, limit=4)
+        seen += [e["content"] for e in entries]
+        pages += 1
+        if cursor is None:
+            break
+    assert seen == expected and pages == 6
+    assert [e["content"] for e in iter_narrative_entries(storage, page_size=5)] == expected
+    assert len(list(iter_narrative_entries(storage, min_importance=None, page_size=7))) == 24
+    # A page that ends exactly on the last row still reports the end on the following call.
+    entries, cursor = narrative_page(storage, limit=23)
+    assert len(entries) == 23 and narrative_page(storage, cursor, limit=23) == ([], None)
+
+
+def test_life_narrative_respects_the_limit(tmp_path):
+    storage, _ = make_index(tmp_path)
+    assert generate_life_narrative(storage) == "I don't have enough memories yet to form a story."
+    for i in range(5):
+        storage.save_episodic_to_sqlite(make_memory(f"moment {i}", ts(5, i + 1), importance=0.9))
+    story = generate_life_narrative(storage, limit=2)
+    assert "moment 1" in story and "moment 2" not in story
+
+
+def test_chapter_pages_follow_the_month_cursor(tmp_path):
+    _, index = make_index(tmp_path, year_of_memories())
+    first, cursor = index.chapter_page(limit=5)
+    assert [c["month"] for c in first] == [f"2024-{m:02d}" for m in range(1, 6)] and cursor == "2024-05"
+    rest = list(index.iter_chapters(page_size=5))
+    assert [c["month"] for c in rest] == [f"2024-{m:02d}" for m in range(1, 13)]
+    assert index.chapter_page(cursor="2024-12") == ([], None)
+
+    june = rest[5]
+    assert june["memory_count"] == 4
+    assert [m["content"] for m in june["top_memories"]] == ["day 6-19", "day 6-27", "day 6-3"]
+    assert (june["first_ts"], june["last_ts"]) == (ts(6, 3), ts(6, 27))
+
+
+def test_chapter_index_stays_consistent_through_capture_delete_and_reindex(tmp_path):
+    storage, index = make_index(tmp_path, year_of_memories())
+    assert_consistent(index)
+
+    capture(storage, index, make_memory("late june highlight", ts(6, 30), mood="sad", importance=1.0))
+    capture(storage, index, make_memory("new year's eve", ts(12, 31, 22), mood="happy", importance=0.95))
+    assert index.chapter_page(cursor="2024-05", limit=1)[0][0]["top_memories"][0]["content"] == "late june highlight"
+    assert_consistent(index)
+
+    deleted = storage.delete_memory(keyword="late june")
+    deleted += storage.delete_memory(keyword="day 6", mood="sad")
+    assert deleted == [ts(6, 30), ts(6, 11)]
+    index.refresh(deleted)
+    assert_consistent(index)
+
+    # Deleting a whole month drops its chapter.
+    index.refresh(storage.delete_memory(keyword="day 2-"))
+    assert "2024-02" not in [c["month"] for c in index.iter_chapters()]
+    assert_consistent(index)
+
+
+def test_index_rebuilds_itself_when_counts_drift(tmp_path):
+    storage, index = make_index(tmp_path, year_of_memories()[:8])
+    expected = index_rows(index)
+    # Rows written behind the index's back (another device, an old version).
+    storage.save_episodic_to_sqlite(make_memory("synced in", ts(1, 15), importance=0.9))
+    NarrativeIndex(storage)
+    rows = index_rows(index)
+    assert rows != expected and rows[0][1] == 5
+    assert rows[0][3][0]["content"] == "synced in"
@@ -0,0 +1,114 @@
+# tests/test_memory_reindex.py
+import numpy as np
+import pytest
+from conftest import make_memory
+from core import memory_reindex
+from core.memory_reindex import ReindexJob
+from core.memory_storage import MemoryStorage
+
+
+class FakeTagger:
+    """First word as the tag; blows up once on a memory marked "crash"."""
+    def __init__(self, seen):
+        self.seen = seen
+        self.crash = True
+
+    def extract_tags_batch(self, contents):
+        if self.crash and any("crash" in c for c in contents):
+            self.crash = False
+            raise RuntimeError("worker died")
+        self.seen.extend(contents)
+        return [[c.split()[0]] for c in contents]
+
+    def categorize_memory(self, memory):
+        return "reindexed"
+
+
+class FakeEncoder:
+    def encode_batch(self, contents):
+        return np.ones((len(contents), 3), dtype=np.float32)
+
+
+class FakeSemanticEngine:
+    def __init__(self):
+        self.upserted = []
+
+    def upsert_memories(self, contents, embeddings, metadatas, memory_ids):
+        self.upserted += list(memory_ids)
+
+
+@pytest.fixture
+def seen(monkeypatch):
+    seen = []
+    tagger = FakeTagger(seen)
+
+    def init_worker(embedding_model_name, with_embeddings, encoder_backend, encoder_threads):
+        memory_reindex._tagger = tagger
+        memory_reindex._semantic = FakeEncoder() if with_embeddings else None
+
+    monkeypatch.setattr(memory_reindex, "_init_worker", init_worker)
+    return seen
+
+
+def make_storage(tmp_path, count=10, crash_at=None):
+    storage = MemoryStorage(str(tmp_path / "memory.db"))
+    for i in range(count):
+        word = "crash" if i == crash_at else "walk"
+        storage.save_episodic_to_sqlite(make_memory(f"{word} number {i}", float(i), tags=("old",)))
+    return storage
+
+
+def stored(storage):
+    return storage.db.execute_read("SELECT content, tags, category FROM episodic_memory ORDER BY id")
+
+
+def test_reindex_rewrites_every_row_and_the_vector_store(tmp_path, seen):
+    storage = make_storage(tmp_path, count=7)
+    semantic = FakeSemanticEngine()
+    result = ReindexJob(storage, chunk_size=3, workers=0, semantic_engine=semantic).run()
+    assert (result["rows"], result["rows_total"]) == (7, 7)
+    assert all(tags == "walk" and category == "reindexed" for _, tags, category in stored(storage))
+    assert semantic.upserted == [str(float(i)) for i in range(7)]
+    # The keyword index follows the new tags.
+    assert len(storage.search("walk")) == 7
+
+
+def test_interrupted_run_resumes_after_the_last_committed_chunk(tmp_path, seen):
+    storage = make_storage(tmp_path, count=10, crash_at=7)
+    job = ReindexJob(storage, job_name="nightly", chunk_size=3, workers=0)
+    with pytest.raises(RuntimeError):
+        job.run()
+    last_rowid, rows_done, finished_at = job.checkpoint()
+    assert (last_rowid, rows_done, finished_at) == (6, 6, None)
+    assert [tags for _, tags, _ in stored(storage)] == ["walk"] * 6 + ["old"] * 4
+
+    seen.clear()
+    result = ReindexJob(storage, job_name="nightly", chunk_size=3, workers=0).run()
+    assert seen == ["walk number 6", "crash number 7", "walk number 8", "walk number 9"]
+    assert (result["rows"], result["rows_total"]) == (4, 10)
+    assert job.checkpoint()[2] is not None
+    assert [tags for _, tags, _ in stored(storage)][6:] == ["walk", "crash", "walk", "walk"]
+
+
+def test_finished_jobs_and_restart_start_over(tmp_path, seen):
+    storage = make_storage(tmp_path, count=5)
+    ReindexJob(storage, chunk_size=2, workers=0).run()
+    seen.clear()
+    # A finished checkpoint is not resumed from: the next run covers everything again.
+    assert ReindexJob(storage, chunk_size=2, workers=0).run()["rows"] == 5
+    assert len(seen) == 5
+
+    storage.save_episodic_to_sqlite(make_memory("crash landing", 10.0))
+    with pytest.raises(RuntimeError):
+        ReindexJob(storage, chunk_size=2, workers=0).run()
+    seen.clear()
+    result = ReindexJob(storage, chunk_size=2, workers=0).run(restart=True)
+    assert (result["rows"], result["rows_total"]) == (6, 6) and len(seen) == 6
+
+
+def test_jobs_keep_separate_checkpoints(tmp_path, seen):
+    storage = make_storage(tmp_path, count=4, crash_at=3)
+    with pytest.raises(RuntimeError):
+        ReindexJob(storage, job_name="a", chunk_size=2, workers=0).run()
+    assert ReindexJob(storage, job_name="b", chunk_size=2, workers=0).run()["rows"] == 4
+    assert ReindexJob(storage, job_name="a", chunk_size=2, workers=0).checkpoint()[:2] == (2, 2)
@@ -0,0 +1,138 @@
+# tests/test_memory_storage.py
+import sqlite3
+from conftest import make_memory
+from core.memory_storage import MemoryStorage
+
+LEGACY_SCHEMA = """
+    CREATE TABLE chat_history (role TEXT, content TEXT, mood TEXT, timestamp REAL);
+    CREATE TABLE episodic_memory (
+        time TEXT, content TEXT, mood TEXT, tags TEXT,
+        importance REAL, relation TEXT, category TEXT, timestamp REAL
+    );
+"""
+
+
+def _legacy_db(path):
+    """A pre-migration memory.db: no rehearsal count, mood space, FTS or stable key."""
+    conn = sqlite3.connect(path)
+    conn.executescript(LEGACY_SCHEMA)
+    conn.executemany("INSERT INTO episodic_memory (content, mood, tags, importance, timestamp) VALUES (?, ?, ?, ?, ?)",
+                     [(f"walked by the river {i}", "happy", "river", 0.5, float(i)) for i in range(5)])
+    conn.execute("DELETE FROM episodic_memory WHERE timestamp = 1")
+    conn.execute("CREATE TABLE audit (content TEXT)")
+    conn.execute("CREATE TRIGGER audit_episodic AFTER INSERT ON episodic_memory BEGIN "
+                 "INSERT INTO audit VALUES (new.content); END")
+    conn.executemany("INSERT INTO chat_history VALUES ('user', ?, 'calm', ?)",
+                     [("the lantern festival", 10.0), ("a quiet evening", 11.0)])
+    conn.commit()
+    conn.close()
+
+
+def _columns(path, table):
+    conn = sqlite3.connect(path)
+    try:
+        return [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+    finally:
+        conn.close()
+
+
+def test_migrations_bring_a_legacy_database_to_the_current_schema(tmp_path):
+    path = str(tmp_path / "memory.db")
+    _legacy_db(path)
+    storage = MemoryStorage(path)
+
+    conn = sqlite3.connect(path)
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == 7
+    columns = _columns(path, "episodic_memory")
+    assert columns[0] == "id"
+    for column in ("rehearsed_count", "valence", "arousal", "dominance", "sentiment_color", "simhash", "mood_intensity"):
+        assert column in columns
+    # The stable key takes over the old rowids, so nothing pointing at them moves.
+    assert conn.execute("SELECT id, timestamp FROM episodic_memory ORDER BY id").fetchall() == \
+        [(1, 0.0), (3, 2.0), (4, 3.0), (5, 4.0)]
+    # Indexes and foreign triggers on the rebuilt table survive.
+    names = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE tbl_name = 'episodic_memory'")}
+    assert {"idx_episodic_timestamp", "idx_episodic_mood_space", "audit_episodic", "episodic_fts_insert"} <= names
+    conn.close()
+
+    storage.save_episodic_to_sqlite(make_memory("a new one", 9.0))
+    conn = sqlite3.connect(path)
+    assert conn.execute("SELECT content FROM audit").fetchall() == [("a new one",)]
+    conn.close()
+    assert [hit["content"] for hit in storage.search("lantern", source="chat")] == ["the lantern festival"]
+
+
+def test_migrations_are_idempotent(tmp_path):
+    path = str(tmp_path / "memory.db")
+    MemoryStorage(path).save_episodic_to_sqlite(make_memory("only once", 1.0))
+    storage = MemoryStorage(path)
+    assert [hit["content"] for hit in storage.search("once")] == ["only once"]
+
+
+def test_episodic_search_survives_vacuum(tmp_path):
+    path = str(tmp_path / "memory.db")
+    storage = MemoryStorage(path)
+    for i in range(6):
+        storage.save_episodic_to_sqlite(make_memory(f"marker{i} shared words", float(i)))
+    storage.delete_memory(timestamp=1.0)
+    storage.delete_memory(timestamp=2.0)
+    conn = sqlite3.connect(path)
+    conn.execute("VACUUM")
+    conn.close()
+    for i in (0, 3, 4, 5):
+        assert [hit["content"] for hit in storage.search(f"marker{i}")] == [f"marker{i} shared words"]
+
+
+def test_fts_follows_episodic_updates_and_deletes(tmp_path):
+    storage = MemoryStorage(str(tmp_path / "memory.db"))
+    storage.save_episodic_to_sqlite(make_memory("picnic under the cherry tree", 1.0))
+    storage.save_episodic_to_sqlite(make_memory("rainy afternoon reading", 2.0))
+    with storage.cursor() as cursor:
+        cursor.execute("UPDATE episodic_memory SET content = 'picnic by the lake' WHERE timestamp = 1.0")
+    assert storage.search("cherry") == []
+    assert [hit["content"] for hit in storage.search("lake")] == ["picnic by the lake"]
+
+    assert storage.delete_memory(keyword="rainy") == [2.0]
+    assert storage.search("rainy") == []
+    assert storage.delete_memory() == []
+
+
+def test_cold_rollover_keeps_chat_readable_and_searchable(tmp_path):
+    storage = MemoryStorage(str(tmp_path / "memory.db"), segment_dir=str(tmp_path / "segments"))
+    day = 86400.0
+    for i in range(6):
+        storage.save_chat_to_sqlite({"role": "user", "content": f"bonfire story {i}", "mood": "calm",
+                                     "timestamp": 1_700_000_000 + i * 20 * day})
+    cutoff = 1_700_000_000 + 3 * 20 * day
+    assert storage.roll_chat_history(cutoff) == 3
+    assert storage.db.execute_read("SELECT COUNT(*) FROM chat_history")[0][0] == 3
+    assert storage.cold_storage.row_count() == 3
+
+    assert [e["content"] for e in storage.iter_chat_range()] == [f"bonfire story {i}" for i in range(6)]
+    assert [e["content"] for e in storage.load_memories(limit=5)] == [f"bonfire story {i}" for i in (5, 4, 3, 2, 1)]
+    assert len(storage.search("bonfire", source="chat")) == 6
+
+    # A real delete of a hot row drops it from the index; rolled rows stay.
+    with storage.cursor() as cursor:
+        cursor.execute("DELETE FROM chat_history WHERE content = 'bonfire story 5'")
+    assert sorted(hit["content"] for hit in storage.search("bonfire", source="chat")) == \
+        [f"bonfire story {i}" for i in range(5)]
+
+
+def test_rebuild_search_index_includes_cold_chat_once(tmp_path):
+    storage = MemoryStorage(str(tmp_path / "memory.db"), segment_dir=str(tmp_path / "segments"))
+    for i in range(4):
+        storage.save_chat_to_sqlite({"role": "user", "content": f"kite flying {i}", "mood": "happy",
+                                     "timestamp": 1_700_000_000 + i * 3600})
+    storage.roll_chat_history(1_700_000_000 + 2 * 3600)
+    storage.rebuild_search_index()
+    assert len(storage.search("kite", source="chat")) == 4
+
+
+def test_delete_memory_returns_every_removed_timestamp(tmp_path):
+    storage = MemoryStorage(str(tmp_path / "memory.db"))
+    for i in range(30):
+        storage.save_episodic_to_sqlite(make_memory(f"stargazing night {i}", float(i), mood="calm" if i % 2 else "happy"))
+    deleted = storage.delete_memory(mood="calm")
+    assert sorted(deleted) == [float(i) for i in range(1, 30, 2)]
+    assert {row[0] for row in storage.db.execute_read("SELECT mood FROM episodic_memory")} == {"happy"}
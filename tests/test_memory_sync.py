@@ -0,0 +1,124 @@
+# tests/test_memory_sync.py
+import pytest
+from conftest import make_memory
+from core.memory_sync import SyncEngine, merge_episodic
+
+
+@pytest.fixture
+def peers(tmp_path):
+    return SyncEngine(str(tmp_path / "a")), SyncEngine(str(tmp_path / "b"))
+
+
+def exchange(sender, receiver, path):
+    sender.export_bundle(receiver.device_id, str(path))
+    return receiver.import_bundle(str(path))
+
+
+def episodic(engine):
+    return {row[0]: row[1:] for row in engine.storage.db.execute_read(
+        "SELECT timestamp, content, tags, importance, rehearsed_count FROM episodic_memory")}
+
+
+def changelog_size(engine):
+    return engine.storage.db.execute_read("SELECT COUNT(*) FROM sync_changelog")[0][0]
+
+
+def test_round_trip_copies_every_synced_table(peers, tmp_path):
+    a, b = peers
+    a.storage.save_episodic_to_sqlite(make_memory("first snow of the year", 100.0, tags=("snow",)))
+    a.storage.save_chat_to_sqlite({"role": "user", "content": "it is snowing!", "mood": "excited", "timestamp": 101.0})
+    a.emotion.update_emotion("excited")
+
+    counts = exchange(a, b, tmp_path / "a-to-b.bundle")
+    assert counts["episodic_memory"] == 1 and counts["chat_history"] == 1 and counts["mood_log"] == 1
+    assert episodic(b) == {100.0: ("first snow of the year", "snow", 0.5, 0)}
+    assert b.storage.db.execute_read("SELECT content FROM chat_history") == [("it is snowing!",)]
+    assert b.emotion.db.execute_read("SELECT mood FROM emotions WHERE intensity > 0") == [("excited",)]
+    # The mood reading arrives with its rollups, so B's summaries see it.
+    assert [s["mood"] for s in b.emotion.timeseries.summary(0, 10 ** 12)] == ["excited"]
+    # Searchable on B through the FTS triggers.
+    assert [hit["content"] for hit in b.storage.search("snow")] == ["first snow of the year"]
+
+
+def test_imported_changes_are_not_echoed_back(peers, tmp_path):
+    a, b = peers
+    a.storage.save_episodic_to_sqlite(make_memory("lighthouse visit", 5.0))
+    exchange(a, b, tmp_path / "a-to-b.bundle")
+    counts = b.export_bundle(a.device_id, str(tmp_path / "b-to-a.bundle"))
+    assert sum(counts.values()) == 0
+
+
+def test_concurrent_edits_converge(peers, tmp_path):
+    a, b = peers
+    a.storage.save_episodic_to_sqlite(make_memory("learning to bake bread", 7.0, tags=("bread",)))
+    exchange(a, b, tmp_path / "1.bundle")
+
+    with a.storage.cursor() as cursor:
+        cursor.execute("UPDATE episodic_memory SET rehearsed_count = 3 WHERE timestamp = 7.0")
+    with b.storage.cursor() as cursor:
+        cursor.execute("UPDATE episodic_memory SET tags = 'bread,kitchen' WHERE timestamp = 7.0")
+
+    exchange(a, b, tmp_path / "2.bundle")
+    exchange(b, a, tmp_path / "3.bundle")
+    assert episodic(a) == episodic(b)
+    content, tags, _, rehearsed = episodic(a)[7.0]
+    assert rehearsed == 3 and set(tags.split(",")) == {"bread", "kitchen"}
+
+
+def test_delete_wins_and_is_not_resurrected(peers, tmp_path):
+    a, b = peers
+    a.storage.save_episodic_to_sqlite(make_memory("an old argument", 9.0))
+    a.storage.save_episodic_to_sqlite(make_memory("a kind note", 10.0))
+    exchange(a, b, tmp_path / "1.bundle")
+    # B edits the row A is about to delete.
+    with b.storage.cursor() as cursor:
+        cursor.execute("UPDATE episodic_memory SET rehearsed_count = 1 WHERE timestamp = 9.0")
+
+    assert a.storage.delete_memory(timestamp=9.0) == [9.0]
+    exchange(a, b, tmp_path / "2.bundle")
+    exchange(b, a, tmp_path / "3.bundle")
+    assert set(episodic(a)) == set(episodic(b)) == {10.0}
+
+
+def test_rewrites_without_synced_changes_are_not_logged(peers):
+    a, _ = peers
+    a.storage.save_episodic_to_sqlite(make_memory("a shell from the beach", 11.0))
+    before = changelog_size(a)
+    with a.storage.cursor() as cursor:
+        cursor.execute("UPDATE episodic_memory SET importance = importance WHERE timestamp = 11.0")
+        cursor.execute("UPDATE episodic_memory SET mood_intensity = 0.3 WHERE timestamp = 11.0")
+    assert changelog_size(a) == before
+    with a.storage.cursor() as cursor:
+        cursor.execute("UPDATE episodic_memory SET importance = 0.9 WHERE timestamp = 11.0")
+    assert changelog_size(a) == before + 1
+
+
+def test_rows_written_before_sync_go_out_with_the_first_bundle(tmp_path):
+    from core.memory_storage import MemoryStorage
+    from core import db
+    MemoryStorage(str(tmp_path / "a" / "memory.db")).save_episodic_to_sqlite(make_memory("before sync", 1.0))
+    db.close_all()
+    a, b = SyncEngine(str(tmp_path / "a")), SyncEngine(str(tmp_path / "b"))
+    exchange(a, b, tmp_path / "1.bundle")
+    assert set(episodic(b)) == {1.0}
+
+
+def test_compacted_changelog_falls_back_to_a_snapshot(peers, tmp_path):
+    a, b = peers
+    for i in range(3):
+        a.storage.save_episodic_to_sqlite(make_memory(f"postcard {i}", float(i)))
+    a.export_bundle("someone-else", str(tmp_path / "other.bundle"))
+    a.compact()
+    exchange(a, b, tmp_path / "1.bundle")
+    assert set(episodic(b)) == {0.0, 1.0, 2.0}
+
+
+def test_merge_takes_importance_from_the_later_change():
+    older = {"content": "x", "tags": "a", "importance": 0.8, "rehearsed_count": 2}
+    newer = {"content": "x", "tags": "b", "importance": 0.3, "rehearsed_count": 1}
+    merged = merge_episodic(older, newer, a_changed=100.0, b_changed=200.0)
+    assert merged["importance"] == 0.3
+    assert merged["rehearsed_count"] == 2
+    assert merged == merge_episodic(newer, older, a_changed=200.0, b_changed=100.0)
+    # Without change times the higher importance wins, whichever side it is on.
+    assert merge_episodic(older, newer)["importance"] == 0.8
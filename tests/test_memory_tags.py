@@ -0,0 +1,76 @@
+# tests/test_memory_tags.py
+from types import SimpleNamespace
+import pytest
+from core.memory_tags import TaggingEngine
+from core.message_analysis import MessageAnalysis
+
+
+def token(lemma, pos="NOUN", is_stop=False):
+    return SimpleNamespace(lemma_=lemma, pos_=pos, is_stop=is_stop)
+
+
+class FakeDoc(list):
+    """A spaCy Doc as rank_tags sees it: an iterable of tokens plus `ents`."""
+    def __init__(self, tokens, ents=()):
+        super().__init__(tokens)
+        self.ents = [SimpleNamespace(label_=label) for label in ents]
+
+
+TEXT = "I miss the sea and the stars, I dream of our beach trip to Lisbon"
+DOC = FakeDoc([token("sea"), token("star"), token("dream", "VERB"), token("beach"), token("trip"),
+               token("the", "DET", True), token("lisbon", "PROPN"), token("sea")], ents=["GPE"])
+
+
+def test_tags_are_ranked_by_weight_and_capped():
+    tags = TaggingEngine().rank_tags(TEXT, DOC)
+    # keywords (4) > symbols (3) > entities (2) > nouns/adjectives (1, +0.5 per repeat).
+    assert tags == ["miss", "dream", "cosmic", "depth", "unreal"]
+    assert TaggingEngine(max_tags=8).rank_tags(TEXT, DOC) == \
+        ["miss", "dream", "cosmic", "depth", "unreal", "gpe", "sea", "star"]
+
+
+def test_repeats_outrank_first_seen_order_within_a_kind():
+    doc = FakeDoc([token("window"), token("tea"), token("cozy", "ADJ"), token("tea"), token("tea")])
+    assert TaggingEngine(max_tags=3).rank_tags("window tea, cozy tea, tea", doc) == ["tea", "window", "cozy"]
+
+
+def test_same_text_always_gives_the_same_tags():
+    engine = TaggingEngine()
+    analysis = MessageAnalysis(TEXT)
+    runs = {tuple(engine.rank_tags(TEXT, DOC)) for _ in range(20)}
+    runs.add(tuple(engine.rank_tags(analysis, DOC)))
+    runs.add(tuple(TaggingEngine().rank_tags(TEXT, FakeDoc(list(DOC), ents=["GPE"]))))
+    assert len(runs) == 1
+
+
+class CountingWorker:
+    def __init__(self):
+        self.calls = 0
+
+    def extract_tags_batch(self, contents, max_tags, batch_size=64):
+        self.calls += 1
+        return [[c.split()[0].lower()] for c in contents]
+
+
+def test_extract_tags_caches_per_text_and_hands_out_copies():
+    worker = CountingWorker()
+    engine = TaggingEngine(worker=worker, cache_size=2)
+    tags = engine.extract_tags("Rain again")
+    tags.append("mutated")
+    assert engine.extract_tags(MessageAnalysis("Rain again")) == ["rain"]
+    assert worker.calls == 1
+    engine.extract_tags("Sun today")
+    engine.extract_tags("Stars tonight")  # evicts "Rain again"
+    engine.extract_tags("Rain again")
+    assert worker.calls == 4
+
+
+def test_spacy_pipeline_is_deterministic():
+    pytest.importorskip("spacy")
+    try:
+        engine = TaggingEngine()
+        first = engine.extract_tags_batch([TEXT] * 3)
+    except OSError:
+        pytest.skip("en_core_web_sm is not installed")
+    assert first[0] == first[1] == first[2] == TaggingEngine().extract_tags(TEXT)
+    assert len(first[0]) <= 5
@@ -0,0 +1,95 @@
+# tests/test_message_analysis.py
+import numpy as np
+import pytest
+from core.emotion import EmotionState
+from core.memory_dedup import simhash
+from core.message_analysis import MessageAnalysis, MoodCentroids, normalized_text
+
+# Each keyword phrase encodes to a fixed unit vector; centroids are their means.
+PHRASES = {
+    "worried": [1, 0, 0], "panic": [1, 0.2, 0],
+    "so happy": [0, 1, 0], "bliss": [0, 1, 0.2],
+    "calm": [0, 0, 1],
+}
+KEYWORDS = {"anxious": ["worried", "panic"], "joyful": ["so happy", "bliss"], "peaceful": ["calm"]}
+
+
+class CountingEncoder:
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, phrases):
+        self.calls += 1
+        return np.array([PHRASES[p] for p in phrases], dtype=np.float32)
+
+
+def unit(*xs):
+    v = np.array(xs, dtype=np.float32)
+    return v / np.linalg.norm(v)
+
+
+def test_analysis_derives_everything_from_one_pass():
+    analysis = MessageAnalysis("I Can’t stop SHAKING before the exam!", embedding=[1, 2, 3])
+    assert analysis.normalized == "i can’t stop shaking before the exam!"
+    assert analysis.tokens == ["i", "can’t", "stop", "shaking", "before", "the", "exam"]
+    assert analysis.embedding.dtype == np.float32 and analysis.embedding_error is None
+    assert analysis.simhash == simhash(analysis.normalized)
+    assert normalized_text(analysis) == normalized_text("I Can’t stop SHAKING before the exam!")
+
+    failed = MessageAnalysis("hello", embedding_error=RuntimeError("encoder down"))
+    assert failed.embedding is None and isinstance(failed.embedding_error, RuntimeError)
+
+
+def test_nearest_ranks_moods_and_applies_the_threshold():
+    centroids = MoodCentroids(CountingEncoder(), KEYWORDS)
+    nearest = centroids.nearest(unit(1, 0.5, 0))
+    assert [mood for mood, _ in nearest] == ["anxious", "joyful"]
+    assert nearest[0][1] > nearest[1][1] >= 0.35
+    assert [mood for mood, _ in centroids.nearest(unit(1, 0.5, 0), k=1)] == ["anxious"]
+    # cos ≈ 0.33 to "peaceful" at best: under 0.35, nothing is close enough.
+    assert centroids.nearest(unit(-1, 0, 0.35)) == []
+    assert [m for m, _ in centroids.nearest(unit(-1, 0, 0.35), min_similarity=0.2)] == ["peaceful"]
+
+
+def test_centroids_are_cached_per_model_and_keywords(tmp_path):
+    cache = str(tmp_path / "cache" / "mood_centroids.npz")
+    encoder = CountingEncoder()
+    first = MoodCentroids(encoder, KEYWORDS, model_name="mini", cache_path=cache)
+    second = MoodCentroids(encoder, KEYWORDS, model_name="mini", cache_path=cache)
+    assert encoder.calls == 1
+    np.testing.assert_array_equal(first.matrix, second.matrix)
+    MoodCentroids(encoder, KEYWORDS, model_name="mpnet", cache_path=cache)
+    MoodCentroids(encoder, dict(KEYWORDS, peaceful=["calm", "bliss"]), model_name="mpnet", cache_path=cache)
+    assert encoder.calls == 3
+
+
+@pytest.fixture
+def emotion(tmp_path):
+    state = EmotionState(str(tmp_path / "emotion.db"), get_current_time=lambda: 1_700_000_000.0)
+    state.mood_centroids = MoodCentroids(CountingEncoder(), KEYWORDS)
+    state.boosts = []
+    state.update_emotion = lambda mood, boost=0.2: state.boosts.append((mood, round(boost, 3)))
+    return state
+
+
+def test_centroids_add_moods_the_keywords_miss(emotion):
+    text = "I can't stop shaking before the exam"
+    emotion.update_mood_based_on_input(text, analysis=MessageAnalysis(text, unit(1, 0.1, 0)))
+    assert [mood for mood, _ in emotion.boosts] == ["anxious"]
+    assert emotion.boosts[0][1] == pytest.approx(0.1 + 0.2 * 0.999, abs=1e-3)
+
+
+def test_keyword_match_is_not_boosted_twice(emotion):
+    text = "so worried about tomorrow"
+    emotion.update_mood_based_on_input(text, analysis=MessageAnalysis(text, unit(1, 0.1, 0)))
+    assert [mood for mood, _ in emotion.boosts] == ["anxious"]
+
+
+def test_keywords_alone_without_an_embedding_or_a_close_centroid(emotion):
+    text = "thanks for the walk"
+    emotion.update_mood_based_on_input(text, analysis=MessageAnalysis(text, embedding_error=RuntimeError()))
+    assert [mood for mood, _ in emotion.boosts] == ["grateful"]
+    emotion.boosts.clear()
+    text = "the bus was late"
+    emotion.update_mood_based_on_input(text, analysis=MessageAnalysis(text, unit(-1, 0, 0.35)))
+    assert emotion.boosts == [("curious", 0.1)]
@@ -0,0 +1,106 @@
+# tests/test_ml_worker.py
+import time
+import threading
+import numpy as np
+import pytest
+from core.ml_worker import (MLWorkerClient, MLWorkerError, MLWorkerServer, MLWorkerUnavailable,
+                            load_authkey, worker_address)
+
+
+class FakeEncoder:
+    dimensions = 4
+
+    def encode(self, texts, batch_size=32, normalize_embeddings=False):
+        return np.array([[len(t), t.count(" "), batch_size, float(normalize_embeddings)] for t in texts],
+                        dtype=np.float32).reshape(len(texts), self.dimensions)
+
+
+class FakeTagger:
+    def __init__(self, max_tags):
+        self.max_tags = max_tags
+
+    def extract_tags_batch(self, texts, batch_size=64):
+        if any(not t for t in texts):
+            raise ValueError("empty text")
+        return [t.split()[:self.max_tags] for t in texts]
+
+
+class FakeServer(MLWorkerServer):
+    """The real socket, shared-memory and threading code, with stand-in models."""
+    def encoder(self):
+        if self._encoder is None:
+            self._encoder = FakeEncoder()
+        return self._encoder
+
+    def tagger(self, max_tags):
+        return self._taggers.setdefault(max_tags, FakeTagger(max_tags))
+
+    def warm(self):
+        pass
+
+
+@pytest.fixture
+def worker(tmp_path):
+    data_dir = str(tmp_path)
+    server = FakeServer(worker_address(data_dir), load_authkey(data_dir))
+    thread = threading.Thread(target=server.serve, daemon=True)
+    thread.start()
+    client = MLWorkerClient(data_dir, autostart=False)
+    for _ in range(100):
+        try:
+            client.ping()
+            break
+        except MLWorkerUnavailable:
+            time.sleep(0.05)
+    yield server, client
+    client.close()
+    server.stop()
+    thread.join(5)
+
+
+def test_encode_returns_arrays_through_shared_memory(worker):
+    _, client = worker
+    vectors = client.encode(["hello there", "a b c"], batch_size=8, normalize_embeddings=True)
+    assert vectors.dtype == np.float32
+    assert vectors.tolist() == [[11, 1, 8, 1], [5, 2, 8, 1]]
+    assert client.encode("one").tolist() == [3, 0, 32, 0]
+    assert client.encode([]).shape[0] == 0
+
+
+def test_large_batches_grow_the_block(worker):
+    _, client = worker
+    texts = [f"memory {i}" for i in range(100_000)]  # 1.6 MB of float32 > the 1 MiB first block
+    vectors = client.encode(texts)
+    assert vectors.shape == (100_000, 4)
+    assert vectors[-1, 0] == len(texts[-1])
+
+
+def test_tags_and_errors_cross_the_socket(worker):
+    _, client = worker
+    assert client.extract_tags_batch(["rain on the window", "coffee"], max_tags=2) == [["rain", "on"], ["coffee"]]
+    with pytest.raises(MLWorkerError, match="empty text"):
+        client.extract_tags_batch([""])
+    # The connection is still usable after a failed request.
+    assert client.extract_tags_batch(["still here"]) == [["still", "here"]]
+
+
+def test_sessions_share_one_worker(worker, tmp_path):
+    server, client = worker
+    other = MLWorkerClient(str(tmp_path), autostart=False)
+    try:
+        assert other.ping() == client.ping()
+        assert server.stats()["sessions"] == 2
+    finally:
+        other.close()
+
+
+def test_wrong_key_is_rejected(worker, tmp_path):
+    intruder = MLWorkerClient(str(tmp_path), autostart=False)
+    intruder.authkey = b"not the key"
+    with pytest.raises(MLWorkerUnavailable, match="rejected"):
+        intruder.ping()
+
+
+def test_client_without_a_worker_does_not_start_one(tmp_path):
+    with pytest.raises(MLWorkerUnavailable):
+        MLWorkerClient(str(tmp_path / "empty"), autostart=False).ping()
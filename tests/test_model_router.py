@@ -0,0 +1,118 @@
+# tests/test_model_router.py
+import json
+import subprocess
+import pytest
+from core.llm_backend import ModelUnavailable, GenerationCancelled
+from core.model_router import ModelRouter, DEFAULT_MODEL
+
+ROUTING = {
+    "retry_unavailable_after": 300,
+    "tasks": {
+        "chat": {"models": ["big"], "timeout": 120, "options": {"temperature": 0.8}},
+        "tagging": {"models": ["tiny", "small", "big"], "timeout": 20, "options": {"temperature": 0}},
+    },
+}
+
+
+class FakeBackend:
+    """Answers with the model name; `errors` maps a model to the exception it raises."""
+    def __init__(self, errors=None, tokens_before_error=()):
+        self.errors = dict(errors or {})
+        self.tokens_before_error = tokens_before_error
+        self.calls = []
+
+    def generate(self, prompt, cancel_event=None, model=None, timeout=None, on_token=None, options=None):
+        self.calls.append((model, timeout, options))
+        if model in self.errors:
+            if on_token:
+                for token in self.tokens_before_error:
+                    on_token(token)
+            raise self.errors[model]
+        if on_token:
+            on_token(f"{model} says hi")
+        return f"{model} says hi"
+
+
+def test_routes_per_task_and_merges_options():
+    backend = FakeBackend()
+    router = ModelRouter(backend, ROUTING)
+    assert router.generate("tag this", task="tagging", options={"num_predict": 8}) == "tiny says hi"
+    assert backend.calls == [("tiny", 20, {"temperature": 0, "num_predict": 8})]
+    # Tasks without a route of their own borrow the chat one.
+    assert router.route("summarization")["models"] == ["big"] and router.model == "big"
+    assert ModelRouter(backend).model == DEFAULT_MODEL
+    with pytest.raises(ValueError):
+        router.generate("?", task="dreaming")
+
+
+def test_unavailable_model_falls_back_and_is_skipped_until_retry(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr("core.model_router.time.monotonic", lambda: clock[0])
+    backend = FakeBackend({"tiny": ModelUnavailable("tiny: not pulled")})
+    router = ModelRouter(backend, ROUTING)
+    assert router.generate("tag", task="tagging") == "small says hi"
+    assert [c[0] for c in backend.calls] == ["tiny", "small"]
+    assert router.model_for("tagging") == "small"
+
+    backend.calls.clear()
+    router.generate("tag", task="tagging")
+    assert [c[0] for c in backend.calls] == ["small"]
+
+    clock[0] += 301
+    del backend.errors["tiny"]
+    assert router.generate("tag", task="tagging") == "tiny says hi"
+
+
+def test_failing_model_falls_back_but_stays_eligible():
+    backend = FakeBackend({"tiny": subprocess.TimeoutExpired("ollama tiny", 20),
+                           "small": RuntimeError("ollama HTTP 500: out of memory")})
+    router = ModelRouter(backend, ROUTING)
+    streamed = []
+    assert router.generate("tag", task="tagging", on_token=streamed.append) == "big says hi"
+    assert [c[0] for c in backend.calls] == ["tiny", "small", "big"] and streamed == ["big says hi"]
+    assert router.model_for("tagging") == "tiny"
+    stats = router.stats()["tagging"]
+    assert (stats["failures"], stats["fallbacks"], stats["models"]) == (2, 1, {"big": 1})
+
+
+def test_errors_that_cannot_fall_back_are_raised():
+    router = ModelRouter(FakeBackend({"big": ModelUnavailable("big: not pulled")}), ROUTING)
+    with pytest.raises(ModelUnavailable):
+        router.generate("hello")
+
+    backend = FakeBackend({"tiny": GenerationCancelled()})
+    with pytest.raises(GenerationCancelled):
+        ModelRouter(backend, ROUTING).generate("tag", task="tagging")
+    assert [c[0] for c in backend.calls] == ["tiny"]
+
+    # Part of the answer already reached the caller: retrying would repeat it.
+    backend = FakeBackend({"tiny": RuntimeError("connection dropped")}, tokens_before_error=["half an "])
+    streamed = []
+    with pytest.raises(RuntimeError):
+        ModelRouter(backend, ROUTING).generate("tag", task="tagging", on_token=streamed.append)
+    assert streamed == ["half an "] and [c[0] for c in backend.calls] == ["tiny"]
+
+
+def test_pinned_model_bypasses_the_route():
+    backend = FakeBackend()
+    ModelRouter(backend, ROUTING).generate("tag", task="tagging", model="big")
+    assert [c[0] for c in backend.calls] == ["big"]
+
+
+def test_latency_stats_are_recorded_and_exported(tmp_path, monkeypatch):
+    durations = iter([0.0, 0.4, 1.0, 1.1, 2.0, 2.3, 3.0, 4.0])
+    monkeypatch.setattr("core.model_router.time.monotonic", lambda: next(durations))
+    router = ModelRouter(FakeBackend(), ROUTING, latency_samples=3)
+    for _ in range(4):
+        router.generate("hi")
+    stats = router.stats()
+    # Only the last `latency_samples` timings are kept: 0.1, 0.3 and 1.0 seconds.
+    assert stats["chat"]["served"] == 4 and stats["chat"]["models"] == {"big": 4}
+    assert stats["chat"]["mean"] == pytest.approx(1.4 / 3)
+    assert (stats["chat"]["p50"], stats["chat"]["max"]) == pytest.approx((0.3, 1.0))
+    assert stats["tagging"]["served"] == 0 and stats["tagging"]["p95"] == 0.0
+
+    path = router.export_stats(str(tmp_path / "out" / "model_stats.json"))
+    with open(path) as f:
+        exported = json.load(f)
+    assert exported["tasks"]["chat"]["served"] == 4 and set(exported["tasks"]) == set(router.routes)
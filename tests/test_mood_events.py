@@ -0,0 +1,116 @@
+# tests/test_mood_events.py
+import json
+import socket
+import threading
+import time
+import pytest
+from core.emotion import EmotionState
+from core.mood_events import MoodEventBus
+from interfaces.avatar import start_avatar_server
+
+
+@pytest.fixture
+def emotion(tmp_path):
+    return EmotionState(str(tmp_path / "emotion.db"))
+
+
+def test_first_message_is_a_full_snapshot_then_deltas():
+    bus = MoodEventBus()
+    bus.publish({"happy": 0.5, "calm": 0.3}, "happy", timestamp=1.0)
+    sub = bus.subscribe(max_fps=0)
+    first = sub.snapshot()
+    assert first["kind"] == "snapshot" and first["seq"] == 1
+    assert first["intensities"] == {"happy": 0.5, "calm": 0.3} and first["dominant"] == "happy"
+
+    # Nothing new since the snapshot: get() waits rather than repeating it.
+    assert sub.get(timeout=0.05) is None
+    bus.publish({"happy": 0.5, "calm": 0.6}, "calm")
+    delta = sub.get(timeout=1)
+    assert delta["kind"] == "delta" and delta["changed"] == {"calm": 0.6} and delta["removed"] == []
+
+
+def test_rapid_changes_coalesce_and_the_latest_value_wins():
+    bus = MoodEventBus()
+    sub = bus.subscribe(max_fps=0)
+    sub.snapshot()
+    for i in range(1, 51):
+        bus.publish({"excited": i / 100, "shy": 0.2}, "excited")
+    bus.publish({"excited": 0.9}, "excited")
+    delta = sub.get(timeout=1)
+    assert delta["seq"] == 51
+    assert delta["changed"] == {"excited": 0.9} and delta["removed"] == []
+    assert sub.get(timeout=0.05) is None
+
+
+def test_changes_below_epsilon_are_not_sent():
+    bus = MoodEventBus()
+    sub = bus.subscribe(max_fps=0, epsilon=0.01)
+    bus.publish({"calm": 0.5}, "calm")
+    assert sub.get(timeout=1)["changed"] == {"calm": 0.5}
+    bus.publish({"calm": 0.505, "happy": 0.2}, "calm")
+    bus.publish({"happy": 0.2}, "happy")
+    delta = sub.get(timeout=1)
+    assert delta["changed"] == {"happy": 0.2} and delta["removed"] == ["calm"]
+
+
+def test_max_fps_caps_the_delivery_rate():
+    bus = MoodEventBus()
+    sub = bus.subscribe(max_fps=20)
+    stop = threading.Event()
+
+    def churn():
+        i = 0
+        while not stop.is_set():
+            i += 1
+            bus.publish({"playful": (i % 100) / 100}, "playful")
+            time.sleep(0.001)
+
+    publisher = threading.Thread(target=churn)
+    publisher.start()
+    try:
+        delivered = []
+        started = time.monotonic()
+        while time.monotonic() - started < 0.5:
+            if sub.get(timeout=0.1) is not None:
+                delivered.append(time.monotonic())
+    finally:
+        stop.set()
+        publisher.join()
+    assert 5 <= len(delivered) <= 12
+    gaps = [b - a for a, b in zip(delivered, delivered[1:])]
+    assert min(gaps) >= 0.05 - 0.005
+
+
+def test_close_wakes_a_waiting_subscriber():
+    bus = MoodEventBus()
+    sub = bus.subscribe()
+    threading.Timer(0.05, sub.close).start()
+    assert sub.get(timeout=2) is None
+    assert not bus.has_subscribers
+
+
+def test_emotion_state_publishes_only_while_subscribed(emotion):
+    emotion.update_emotion("happy", 0.3)
+    assert emotion.events._version == 0
+
+    sub = emotion.subscribe_moods(max_fps=0)
+    first = sub.snapshot()
+    assert first["dominant"] == "happy" and set(first["intensities"]) == {"happy"}
+    emotion.update_emotion("anxious", 0.4)
+    delta = sub.get(timeout=1)
+    assert "anxious" in delta["changed"] and delta["dominant"] == emotion.state.dominant()
+
+
+def test_avatar_socket_sends_a_snapshot_then_deltas(emotion):
+    emotion.update_emotion("calm", 0.3)
+    server = start_avatar_server(emotion, port=0, max_fps=0)
+    try:
+        with socket.create_connection(server.server_address, timeout=2) as conn:
+            lines = conn.makefile("r", encoding="utf-8")
+            first = json.loads(lines.readline())
+            assert first["kind"] == "snapshot" and set(first["intensities"]) == {"calm"}
+            emotion.update_emotion("curious", 0.3)
+            delta = json.loads(lines.readline())
+            assert delta["kind"] == "delta" and "curious" in delta["changed"]
+    finally:
+        server.stop()
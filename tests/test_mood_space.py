@@ -0,0 +1,57 @@
+# tests/test_mood_space.py
+import math
+import pytest
+from conftest import make_memory
+from core.memory_storage import MemoryStorage
+from core.mood_space import mood_to_vad, MOOD_VAD, NEUTRAL_VAD
+
+
+def place(storage, content, timestamp, vad):
+    """Saves a memory and pins it to an exact point in mood space."""
+    storage.save_episodic_to_sqlite(make_memory(content, timestamp, mood="calm"))
+    with storage.cursor() as cursor:
+        cursor.execute("UPDATE episodic_memory SET valence = ?, arousal = ?, dominance = ? WHERE timestamp = ?",
+                       (*vad, timestamp))
+
+
+def test_moods_map_to_their_coordinates():
+    assert mood_to_vad("  Anxious ") == MOOD_VAD["anxious"]
+    assert mood_to_vad("not a mood") == mood_to_vad(None) == mood_to_vad("") == NEUTRAL_VAD
+    assert all(-1 <= x <= 1 for vad in MOOD_VAD.values() for x in vad)
+
+
+def test_results_are_ordered_by_distance_and_capped(tmp_path):
+    storage = MemoryStorage(str(tmp_path / "memory.db"))
+    offsets = [0.25, 0.05, 0.15, 0.0, 0.1, 0.2]
+    for i, dx in enumerate(offsets):
+        place(storage, f"memory {dx}", float(i), (0.5 + dx, 0.2, 0.0))
+    hits = storage.nearest_by_mood((0.5, 0.2, 0.0), radius=0.3, limit=4)
+    assert [h["content"] for h in hits] == ["memory 0.0", "memory 0.05", "memory 0.1", "memory 0.15"]
+    assert [h["mood_distance"] for h in hits] == pytest.approx([0.0, 0.05, 0.1, 0.15], abs=1e-6)
+    assert len(storage.nearest_by_mood((0.5, 0.2, 0.0), radius=0.3, limit=10)) == 6
+
+
+def test_edges_of_the_box_and_the_sphere(tmp_path):
+    storage = MemoryStorage(str(tmp_path / "memory.db"))
+    center, radius = (0.0, 0.0, 0.0), 0.3
+    place(storage, "on the boundary", 1.0, (0.3, 0.0, 0.0))
+    place(storage, "just outside the box", 2.0, (0.0, 0.301, 0.0))
+    place(storage, "outside on dominance only", 3.0, (0.0, 0.0, -0.31))
+    corner = 0.29  # inside the bounding box on every axis, but √3 · 0.29 ≈ 0.50 from the center
+    place(storage, "box corner", 4.0, (corner, corner, corner))
+    place(storage, "diagonal, inside", 5.0, (0.15, 0.15, 0.15))
+
+    hits = storage.nearest_by_mood(center, radius=radius, limit=10)
+    assert [h["content"] for h in hits] == ["diagonal, inside", "on the boundary"]
+    assert hits[0]["mood_distance"] == pytest.approx(math.sqrt(3) * 0.15, abs=1e-6)
+    assert storage.nearest_by_mood((0.9, 0.9, 0.9), radius=0.1) == []
+
+
+def test_saved_memories_take_their_moods_coordinates(tmp_path):
+    storage = MemoryStorage(str(tmp_path / "memory.db"))
+    storage.save_episodic_to_sqlite(make_memory("exam tomorrow", 1.0, mood="anxious"))
+    storage.save_episodic_to_sqlite(make_memory("big presentation", 2.0, mood="nervous"))
+    storage.save_episodic_to_sqlite(make_memory("sunny picnic", 3.0, mood="happy"))
+    hits = storage.nearest_by_mood(mood_to_vad("anxious"), radius=0.35)
+    assert [h["content"] for h in hits] == ["exam tomorrow", "big presentation"]
+    assert hits[0]["mood"] == "anxious" and hits[0]["mood_distance"] == 0
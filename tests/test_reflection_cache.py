@@ -0,0 +1,134 @@
+# tests/test_reflection_cache.py
+import time
+import pytest
+from conftest import make_memory
+from core.reflection_cache import ReflectionCandidateCache, mood_family, OTHER
+
+
+class FakeSemanticEngine:
+    def __init__(self, memory):
+        self.memory = memory
+
+    def semantic_recall_ids(self, query, n_results=5):
+        # Chroma can still hold ids the episodic list has dropped (deleted, faded).
+        return ["999.0"] + [str(m["timestamp"]) for m in self.memory.episodic_memory if "exam" in m["content"]]
+
+
+class FakeMemory:
+    """The parts of Memory the cache reads, with capture/delete/rehearse invalidating like Memory does."""
+    def __init__(self, memories):
+        self.episodic_memory = list(memories)
+        self.semantic_engine = FakeSemanticEngine(self)
+        self.now = 1_700_000_000.0
+        self.cache = ReflectionCandidateCache(self, max_age=600)
+
+    def get_current_time(self):
+        return self.now
+
+    def weighted_memory_recall(self, top_n=5):
+        ranked = sorted(self.episodic_memory, key=lambda m: -(m["importance"] + 0.1 * m["rehearsed_count"]))
+        return ranked[:top_n]
+
+    def capture(self, content, timestamp, **extra):
+        self.episodic_memory.append(make_memory(content, timestamp, **extra))
+        self.cache.invalidate("capture")
+
+    def delete(self, timestamp):
+        self.episodic_memory[:] = [m for m in self.episodic_memory if m["timestamp"] != timestamp]
+        self.cache.invalidate("delete")
+
+    def rehearse(self, memory):
+        memory["rehearsed_count"] += 10
+        self.cache.invalidate("rehearsal")
+
+
+class FakeSubscription:
+    def get(self, timeout=None):
+        time.sleep(timeout or 0)
+        return None
+
+    def close(self):
+        pass
+
+
+class FakeEmotion:
+    def __init__(self, mood):
+        self.mood = mood
+
+    def current_mood(self):
+        return self.mood
+
+    def subscribe_moods(self, max_fps=2):
+        return FakeSubscription()
+
+
+def contents(candidates):
+    return [m["content"] for m in candidates]
+
+
+def eventually(check, timeout=3.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if check():
+            return True
+        time.sleep(0.02)
+    return check()
+
+
+@pytest.fixture
+def memory():
+    memory = FakeMemory([
+        make_memory("exam tomorrow, can't sleep", 1.0, mood="anxious", importance=0.6),
+        make_memory("sunday pancakes", 2.0, importance=0.9),
+        make_memory("exam results day", 3.0, mood="anxious", importance=0.3),
+        make_memory("rain on the tram", 4.0, mood="calm", importance=0.2),
+    ])
+    yield memory
+    memory.cache.stop()
+
+
+def test_every_family_returns_episodic_rows(memory):
+    assert mood_family("overwhelmed") == "anxious" and mood_family("curious") == OTHER
+    anxious = memory.cache.get("nervous")
+    assert contents(anxious) == ["exam tomorrow, can't sleep", "exam results day"]
+    assert all(any(m is row for row in memory.episodic_memory) for m in anxious)
+    assert contents(memory.cache.get("sad")) == ["sunday pancakes", "exam tomorrow, can't sleep", "exam results day"]
+    assert len(memory.cache.get("happy")) == 4 and len(memory.cache.get("playful")) == 4
+
+
+def test_lookups_are_served_from_the_cache(memory):
+    first = memory.cache.get("anxious")
+    assert memory.cache.get("nervous") is first
+    assert (memory.cache.hits, memory.cache.misses) == (1, 1)
+    # Stale entries are still served without a rebuild on the caller's thread.
+    memory.capture("exam timetable out", 5.0)
+    assert memory.cache.get("anxious") is first
+
+
+@pytest.mark.parametrize("change, expected", [
+    (lambda m: m.capture("exam hall seating plan", 5.0),
+     ["exam tomorrow, can't sleep", "exam results day", "exam hall seating plan"]),
+    (lambda m: m.delete(1.0), ["exam results day"]),
+])
+def test_capture_and_delete_rebuild_the_current_family(memory, change, expected):
+    memory.cache.start(FakeEmotion("anxious"))
+    assert eventually(lambda: memory.cache.get("anxious") is not None)
+    change(memory)
+    assert eventually(lambda: contents(memory.cache.get("anxious")) == expected)
+
+
+def test_rehearsal_rebuilds_and_other_families_wait_until_needed(memory):
+    memory.cache.get("sad")  # built once, then left alone while the mood is happy
+    memory.cache.start(FakeEmotion("happy"))
+    memory.rehearse(memory.episodic_memory[3])
+    assert eventually(lambda: contents(memory.cache.get("happy"))[0] == "rain on the tram")
+    # The sad entry is stale but still the old ranking until the mood moves there.
+    assert contents(memory.cache.get("sad"))[0] == "sunday pancakes"
+
+
+def test_entries_expire_after_max_age(memory):
+    memory.cache.start(FakeEmotion("anxious"))
+    assert eventually(lambda: memory.cache.get("anxious") is not None)
+    memory.episodic_memory.append(make_memory("exam prep group", 5.0))  # no invalidation
+    memory.now += 601
+    assert eventually(lambda: "exam prep group" in contents(memory.cache.get("anxious")))
@@ -0,0 +1,128 @@
+# tests/test_reflection_speculator.py
+from concurrent.futures import Future
+from conftest import make_memory
+from core.llm_cache import ResponseCache
+from core.reflection_speculator import ReflectionSpeculator
+
+
+class FakeMemory:
+    def __init__(self, memories):
+        self.episodic_memory = list(memories)
+        self.noted = []
+
+    def self_dialogue_prompt(self, candidates=None):
+        candidates = candidates or self.episodic_memory[-10:]
+        if not candidates:
+            return None, None
+        return candidates[0], f"Reflect on: {candidates[0]['content']}"
+
+    def note_self_dialogue(self, memory):
+        self.noted.append(memory["content"])
+
+
+class FakeBroker:
+    def __init__(self):
+        self.submitted = []
+        self.cancelled = []
+
+    def submit(self, prompt, priority=None, task=None):
+        future = Future()
+        self.submitted.append((prompt, future))
+        return future
+
+    def cancel(self, future):
+        self.cancelled.append(future)
+        future.cancel()
+
+
+class FakeBackend:
+    def model_for(self, task):
+        return "llama"
+
+    def options_for(self, task):
+        return {"temperature": 0}
+
+
+class FakeLLM:
+    def __init__(self, memories, response_cache=None):
+        self.memory = FakeMemory(memories)
+        self.broker = FakeBroker()
+        self.backend = FakeBackend()
+        self.response_cache = response_cache
+
+
+def make_speculator(response_cache=None):
+    llm = FakeLLM([make_memory("the harbour lights", 1.0), make_memory("a letter from home", 2.0)], response_cache)
+    return llm, ReflectionSpeculator(llm)
+
+
+def test_ready_reflection_is_served_once():
+    llm, speculator = make_speculator()
+    assert speculator.prepare("calm")
+    assert not speculator.prepare("calm")  # one at a time
+    future = llm.broker.submitted[0][1]
+    assert speculator.take("calm") is None and speculator.busy  # not written yet: no wait by default
+
+    future.set_result("  The harbour lights still flicker in me.  ")
+    assert speculator.take("calm") == "The harbour lights still flicker in me."
+    assert not speculator.busy and speculator.take("calm") is None
+    assert (speculator.served, llm.memory.noted) == (1, ["the harbour lights"])
+
+
+def test_a_short_poll_leaves_the_generation_running():
+    llm, speculator = make_speculator()
+    speculator.prepare("calm")
+    assert speculator.take("calm", timeout=0.01) is None
+    assert speculator.busy and llm.broker.cancelled == [] and speculator.discarded == 0
+
+
+def test_mood_change_discards_and_cancels():
+    llm, speculator = make_speculator()
+    speculator.prepare("calm")
+    assert speculator.take("sad") is None
+    assert not speculator.busy and speculator.discarded == 1
+    assert llm.broker.cancelled == [llm.broker.submitted[0][1]]
+
+
+def test_removed_or_rewritten_memory_discards():
+    llm, speculator = make_speculator()
+    speculator.prepare("calm")
+    llm.broker.submitted[0][1].set_result("text")
+    llm.memory.episodic_memory = llm.memory.episodic_memory[1:]  # consolidated away
+    assert speculator.take("calm") is None and speculator.discarded == 1
+
+    speculator.prepare("calm")
+    llm.broker.submitted[1][1].set_result("text")
+    llm.memory.episodic_memory[0] = dict(llm.memory.episodic_memory[0], content="a letter, rewritten")
+    assert speculator.take("calm") is None and speculator.discarded == 2
+    assert llm.memory.noted == []
+
+
+def test_cancel_frees_the_model():
+    llm, speculator = make_speculator()
+    speculator.prepare("calm")
+    speculator.cancel("user input")
+    assert not speculator.busy and speculator.cancelled == 1
+    assert llm.broker.submitted[0][1].cancelled()
+    speculator.cancel("user input")
+    assert speculator.cancelled == 1
+
+
+def test_failed_generation_is_dropped():
+    llm, speculator = make_speculator()
+    speculator.prepare("calm")
+    llm.broker.submitted[0][1].set_exception(RuntimeError("ollama went away"))
+    assert speculator.take("calm") is None
+    assert not speculator.busy and speculator.discarded == 1
+
+
+def test_cached_reflection_skips_the_broker(tmp_path):
+    cache = ResponseCache(str(tmp_path / "llm_cache.db"))
+    llm, speculator = make_speculator(cache)
+    speculator.prepare("calm")
+    llm.broker.submitted[0][1].set_result("Lights on the water.")
+    assert speculator.take("calm") == "Lights on the water."
+
+    speculator.prepare("calm")
+    assert len(llm.broker.submitted) == 1
+    assert speculator.take("calm") == "Lights on the water."
@@ -0,0 +1,112 @@
+# tests/test_voice.py
+import numpy as np
+from interfaces.voice import (SAMPLE_RATE, ArraySource, EnergyVAD, NullSink, ScriptedSTT, SentenceSplitter,
+                              SilentTTS, SpeechPipeline, VoiceLoop)
+
+FRAME = int(SAMPLE_RATE * 0.03)
+
+
+def tone(seconds):
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    return (0.3 * np.sin(2 * np.pi * 220 * t)).astype(np.float32)
+
+
+def hush(seconds, rng=np.random.default_rng(0)):
+    return (0.002 * rng.standard_normal(int(seconds * SAMPLE_RATE))).astype(np.float32)
+
+
+class RecordingSink(NullSink):
+    def __init__(self):
+        super().__init__(realtime=False)
+        self.played = []
+
+    def play(self, audio, sample_rate):
+        super().play(audio, sample_rate)
+        self.played.append(len(audio))
+
+
+def test_splitter_releases_whole_sentences_as_tokens_arrive():
+    splitter = SentenceSplitter(min_chars=8)
+    released = []
+    for token in ["Oh. ", "I missed ", "you today! The ", "rain kept ", "tapping…\n", "Tell me ", "more"]:
+        released.append(splitter.feed(token))
+    assert released == [[], [], ["Oh. I missed you today!"], [], ["The rain kept tapping…"], [], []]
+    assert splitter.flush() == ["Tell me more"]
+    assert splitter.flush() == []
+
+
+def test_splitter_keeps_closing_quotes_and_waits_for_whitespace():
+    splitter = SentenceSplitter()
+    assert splitter.feed('She said "see you soon." Then ') == ['She said "see you soon."']
+    assert splitter.feed("she left") == []
+    assert splitter.feed(".") == []  # a boundary needs the whitespace after it
+    assert splitter.feed("\n\nNext") == ["Then she left."]
+
+
+def test_vad_finds_each_utterance_with_pre_roll_and_hangover():
+    audio = np.concatenate([hush(0.5), tone(0.6), hush(1.0), tone(0.3), hush(1.0)])
+    vad = EnergyVAD(hangover_ms=600, pre_roll_ms=200)
+    segments = list(vad.segments(ArraySource(audio).chunks()))
+    assert len(segments) == 2
+    # Speech, plus up to 6 frames of pre-roll and 20 of hangover.
+    for segment, speech in zip(segments, (0.6, 0.3)):
+        assert speech * SAMPLE_RATE <= len(segment) <= speech * SAMPLE_RATE + 27 * FRAME
+        assert len(segment) % FRAME == 0
+
+
+def test_vad_ignores_silence_and_caps_long_speech():
+    assert list(EnergyVAD().segments(ArraySource(hush(2.0)).chunks())) == []
+    segments = list(EnergyVAD(max_segment_s=1.0).segments(ArraySource(tone(2.5)).chunks()))
+    assert [len(s) // FRAME for s in segments[:2]] == [33, 33]
+    assert sum(len(s) for s in segments) == len(tone(2.5)) // FRAME * FRAME
+
+
+def test_pipeline_speaks_streamed_and_extra_text_in_order():
+    sink = RecordingSink()
+    pipeline = SpeechPipeline(SilentTTS(chars_per_second=10, synth_seconds_per_char=0), sink)
+    pipeline.start()
+    for token in ["Good ", "morning, sunshine. ", "Did you ", "sleep well?"]:
+        pipeline.feed(token)
+    pipeline.finish(" 😉 Just teasing, darling.")
+    metrics = pipeline.wait()
+    assert pipeline.spoken == ["Good morning, sunshine.", "Did you sleep well?", "😉 Just teasing, darling."]
+    assert sink.played == [int(len(s) / 10 * SAMPLE_RATE) for s in pipeline.spoken]
+    assert metrics["sentences"] == 3
+    assert 0 <= metrics["ttfa"] <= metrics["total"] and metrics["generation"] <= metrics["total"]
+
+
+def test_pipeline_skips_a_sentence_tts_cannot_say():
+    class FlakyTTS(SilentTTS):
+        def synthesize(self, text):
+            if "boom" in text:
+                raise RuntimeError("quota exceeded")
+            return super().synthesize(text)
+
+    sink = RecordingSink()
+    pipeline = SpeechPipeline(FlakyTTS(synth_seconds_per_char=0), sink)
+    pipeline.start()
+    pipeline.feed("First sentence here. boom goes this one. Last one here.")
+    pipeline.finish()
+    assert pipeline.wait()["sentences"] == 3
+    assert len(sink.played) == 2
+
+
+class StreamingLLM:
+    def generate_response(self, prompt, on_token=None):
+        reply = f"You said {prompt.lower()} That sounds lovely."
+        for token in reply.split(" "):
+            on_token(token + " ")
+        return reply + "\n\nYou're my favorite person."
+
+
+def test_voice_loop_turns_segments_into_spoken_replies():
+    audio = np.concatenate([hush(0.5), tone(0.6), hush(1.0), tone(0.4), hush(1.0)])
+    sink = RecordingSink()
+    loop = VoiceLoop(StreamingLLM(), ScriptedSTT(["A walk.", ""]), SilentTTS(synth_seconds_per_char=0),
+                     ArraySource(audio), sink)
+    summary = loop.run()
+    # The second segment transcribes to nothing and gets no reply.
+    assert len(loop.turns) == 1
+    assert loop.pipeline.spoken == ["You said a walk.", "That sounds lovely.", "You're my favorite person."]
+    assert set(summary) == {"stt", "ttfa", "generation", "total"}
+    assert len(sink.played) == 3
@@ -0,0 +1,61 @@
+# tools/consolidate.py
+"""
+Folds old, low-importance episodic memories into summary memories. Members move to
+episodic_archive and their vectors are replaced by the summary's. Peach also runs
+this by herself once a day while the chat is idle.
+
+    python -m tools.consolidate
+    python -m tools.consolidate --min-age-days 14 --max-importance 0.4
+    python -m tools.consolidate --dry-run
+"""
+import os
+import sys
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.memory_storage import MemoryStorage
+from core.memory_narrative import NarrativeIndex
+from core.memory_consolidation import MemoryConsolidationEngine
+from core.encoder_backends import ENCODER_BACKENDS
+
+base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data-dir", default=os.path.join(base_dir, "data"))
+    parser.add_argument("--min-age-days", type=float, default=30)
+    parser.add_argument("--max-importance", type=float, default=0.3)
+    parser.add_argument("--similarity", type=float, default=0.75, help="cosine needed to join a cluster")
+    parser.add_argument("--window-days", type=float, default=7, help="max gap between neighbours in a cluster")
+    parser.add_argument("--min-cluster-size", type=int, default=2)
+    parser.add_argument("--limit", type=int, default=500, help="candidates considered per run")
+    parser.add_argument("--encoder", choices=ENCODER_BACKENDS, default="torch")
+    parser.add_argument("--dry-run", action="store_true", help="print the clusters without writing anything")
+    args = parser.parse_args()
+
+    from core.memory_semantic import SemanticMemoryEngine
+    storage = MemoryStorage(os.path.join(args.data_dir, "memory.db"))
+    semantic_engine = SemanticMemoryEngine(persist_dir=os.path.join(args.data_dir, "chroma"),
+                                           encoder_backend=args.encoder)
+    engine = MemoryConsolidationEngine(storage, semantic_engine)
+
+    if args.dry_run:
+        candidates = engine.find_candidates(args.min_age_days * 86400, args.max_importance, args.limit)
+        clusters = engine.cluster(candidates, args.similarity, args.window_days * 86400)
+        clusters = [c for c in clusters if len(c) >= args.min_cluster_size]
+        print(f"{len(candidates)} candidates → {len(clusters)} clusters")
+        for members in clusters:
+            print(f"  {engine.summarize_cluster(members)['content'][:100]}")
+        return
+
+    results = engine.consolidate(min_age=args.min_age_days * 86400, max_importance=args.max_importance,
+                                 similarity_threshold=args.similarity, time_window=args.window_days * 86400,
+                                 min_cluster_size=args.min_cluster_size, limit=args.limit)
+    if results:
+        NarrativeIndex(storage).rebuild()
+    archived = sum(len(members) for _, members in results)
+    print(f"Consolidated {archived} memories into {len(results)} summaries.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+# tools/export.py
+"""
+Columnar export of episodic memories, chat history and the mood log for offline
+analysis. Rows stream out in fixed-size batches (bounded memory), mood, category,
+role and tag columns are dictionary-encoded, and repeated runs only export what is
+new since the last one.
+
+    python -m tools.export --out exports/
+    python -m tools.export --out exports/ --format arrow --tables mood_log
+    python -m tools.export --out exports/ --full        # rebuild from scratch
+
+Load with e.g. pandas.read_parquet("exports/episodic_memory") or
+duckdb "SELECT mood, avg(importance) FROM 'exports/episodic_memory/*.parquet' GROUP BY mood".
+"""
+import os
+import sys
+import json
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.memory_export import ColumnarExporter, EXPORT_FORMATS, EXPORT_TABLES
+
+base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--out", required=True, help="dataset directory (created if missing)")
+    parser.add_argument("--data-dir", default=os.path.join(base_dir, "data"))
+    parser.add_argument("--format", choices=EXPORT_FORMATS, default="parquet")
+    parser.add_argument("--tables", nargs="+", choices=EXPORT_TABLES, default=list(EXPORT_TABLES))
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--full", action="store_true", help="drop earlier parts and export everything again")
+    parser.add_argument("--status", action="store_true", help="print the watermarks and exit")
+    args = parser.parse_args()
+
+    exporter = ColumnarExporter(args.data_dir, args.out, fmt=args.format, batch_size=args.batch_size)
+    if args.status:
+        print(json.dumps(exporter.load_watermarks(), indent=2))
+        return
+    written = exporter.export(tables=args.tables, full=args.full)
+    for table, count in written.items():
+        print(f"  {table:<16} {count} rows")
+
+
+if __name__ == "__main__":
+    main()
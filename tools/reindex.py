@@ -0,0 +1,47 @@
+# tools/reindex.py
+"""
+Re-runs tagging, categorization, sentiment color and (optionally) embeddings over
+every episodic memory. Progress is checkpointed per chunk, so re-running the same
+job after an interruption resumes where it stopped.
+
+    python -m tools.reindex --workers 4
+    python -m tools.reindex --job tags-only --no-embeddings
+    python -m tools.reindex --restart
+"""
+import os
+import sys
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.memory_storage import MemoryStorage, db_path
+from core.memory_reindex import ReindexJob
+from core.encoder_backends import ENCODER_BACKENDS
+
+base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--job", default="default", help="checkpoint name; reuse it to resume")
+    parser.add_argument("--chunk-size", type=int, default=256)
+    parser.add_argument("--workers", type=int, default=None, help="pool size (0 = run in this process)")
+    parser.add_argument("--restart", action="store_true", help="ignore any saved checkpoint")
+    parser.add_argument("--no-embeddings", action="store_true", help="skip re-embedding into Chroma")
+    parser.add_argument("--encoder", choices=ENCODER_BACKENDS, default="torch")
+    parser.add_argument("--chroma-dir", default=os.path.join(base_dir, "data", "chroma"))
+    args = parser.parse_args()
+
+    storage = MemoryStorage(db_path)
+    semantic_engine = None
+    if not args.no_embeddings:
+        from core.memory_semantic import SemanticMemoryEngine
+        semantic_engine = SemanticMemoryEngine(persist_dir=args.chroma_dir, encoder_backend=args.encoder)
+
+    job = ReindexJob(storage, job_name=args.job, chunk_size=args.chunk_size, workers=args.workers,
+                     semantic_engine=semantic_engine)
+    result = job.run(restart=args.restart)
+    print(f"Reindexed {result['rows']} rows ({result['rows_total']} total for job '{args.job}') "
+          f"in {result['seconds']:.1f}s — {result['rows_per_sec']:.1f} rows/s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+# tools/replay.py
+"""
+Deterministic session replay.
+
+Feeds a recorded conversation through the full Memory/EmotionState/LLMEngine stack
+with a stub model that answers with the recorded assistant replies. Time is a
+virtual clock that jumps to each recorded turn, so decay, reflection intervals and
+mood timestamps behave as they did live while the run goes as fast as the code
+allows. Reports throughput and per-turn latency, and a checksum of the final
+memory/emotion state: same input + same seed + same code = same checksum.
+
+    python -m tools.replay data/memory.db
+    python -m tools.replay session.jsonl --seed 7 --limit 500
+
+Input is either a memory.db (its chat_history table) or JSONL with one
+{"role", "content", "timestamp"} object per line.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import sqlite3
+import hashlib
+import logging
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.clock import VirtualClock, make_rng
+from core.db import close_all
+from core.memory import Memory
+from core.llm_engine import LLMEngine
+
+FLOAT_DIGITS = 6
+
+
+def load_turns(path, limit=None):
+    """[(user message, recorded reply or None, timestamp)] in chat order."""
+    if path.endswith(".db"):
+        conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        try:
+            rows = conn.execute("SELECT role, content, timestamp FROM chat_history ORDER BY timestamp ASC").fetchall()
+        finally:
+            conn.close()
+        messages = [{"role": r, "content": c, "timestamp": t} for r, c, t in rows]
+    else:
+        with open(path, "r", encoding="utf-8") as f:
+            messages = [json.loads(line) for line in f if line.strip()]
+
+    turns = []
+    for message in messages:
+        if message["role"] == "user":
+            turns.append([message["content"], None, float(message["timestamp"])])
+        elif message["role"] == "assistant" and turns and turns[-1][1] is None:
+            turns[-1][1] = message["content"]
+    return [tuple(t) for t in turns[:limit]]
+
+
+class StubBackend:
+    """Answers the reply prompt with the recorded assistant message; background prompts get nothing."""
+    model = "stub"
+
+    def __init__(self):
+        self.reply = ""
+
+    def generate(self, prompt, cancel_event=None, model=None, timeout=None, on_token=None, **kwargs):
+        text = self.reply if prompt.endswith("Peach:") else ""
+        if on_token and text:
+            on_token(text)
+        return text
+
+
+def _canonical(value):
+    if isinstance(value, float):
+        return round(value, FLOAT_DIGITS)
+    if isinstance(value, (list, tuple)):
+        return [_canonical(v) for v in value]
+    return value
+
+
+def state_checksum(memory):
+    """sha256 over the persisted chat, episodic and emotion state, floats rounded."""
+    state = {
+        "chat_history": memory.storage.db.execute_read(
+            "SELECT role, content, mood, timestamp FROM chat_history ORDER BY timestamp, rowid"),
+        "episodic_memory": memory.storage.db.execute_read(
+            "SELECT content, mood, tags, importance, category, timestamp, rehearsed_count "
+            "FROM episodic_memory ORDER BY timestamp, rowid"),
+        "emotions": memory.emotion.db.execute_read(
+            "SELECT mood, intensity, last_updated FROM emotions ORDER BY mood"),
+    }
+    blob = json.dumps({k: _canonical(v) for k, v in state.items()}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))]
+
+
+def replay(turns, data_dir, seed=0, dedup=True):
+    clock = VirtualClock(start=turns[0][2] if turns else 0)
+    rng = make_rng(seed)
+    backend = StubBackend()
+    memory = Memory(data_dir=data_dir, dedup=dedup, get_current_time=clock, rng=rng)
+    llm = LLMEngine(memory, memory.emotion, backend=backend, get_current_time=clock, rng=rng)
+
+    latencies = []
+    started = time.perf_counter()
+    try:
+        for prompt, reply, timestamp in turns:
+            clock.set(timestamp)
+            backend.reply = reply or ""
+            t0 = time.perf_counter()
+            llm.generate_response(prompt)
+            latencies.append(time.perf_counter() - t0)
+        elapsed = time.perf_counter() - started
+        checksum = state_checksum(memory)
+    finally:
+        llm.broker.shutdown()
+        memory.close()
+    return latencies, elapsed, checksum
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("source", help="memory.db or .jsonl chat export")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--limit", type=int, default=None, help="replay only the first N user turns")
+    parser.add_argument("--no-dedup", action="store_true")
+    parser.add_argument("--keep", metavar="DIR", help="replay into DIR and keep it, instead of a temp dir")
+    parser.add_argument("--verbose", action="store_true", help="keep the stack's INFO logging")
+    args = parser.parse_args()
+
+    if not args.verbose:
+        logging.getLogger().setLevel(logging.WARNING)
+
+    turns = load_turns(args.source, args.limit)
+    if not turns:
+        print("No user turns found.")
+        return
+
+    data_dir = args.keep or tempfile.mkdtemp(prefix="peach-replay-")
+    os.makedirs(data_dir, exist_ok=True)
+    if args.keep and os.listdir(data_dir):
+        parser.error(f"{data_dir} is not empty; replay needs a fresh data dir to be deterministic")
+    try:
+        latencies, elapsed, checksum = replay(turns, data_dir, seed=args.seed, dedup=not args.no_dedup)
+    finally:
+        close_all()
+        if not args.keep:
+            shutil.rmtree(data_dir, ignore_errors=True)
+
+    span = turns[-1][2] - turns[0][2]
+    print(f"Replayed {len(latencies)} turns ({span / 86400:.1f} virtual days) in {elapsed:.2f}s "
+          f"— {len(latencies) / elapsed:.1f} turns/s")
+    print("Per-turn latency (ms): "
+          + "  ".join(f"p{p}={percentile(latencies, p) * 1000:.1f}" for p in (50, 95, 99))
+          + f"  max={max(latencies) * 1000:.1f}")
+    print(f"State checksum: {checksum}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+# tools/sync.py
+"""
+Delta sync of memory.db and emotion.db between devices.
+
+Each data directory gets a device id on first use. Export writes the changes a
+peer has not been sent yet; import merges a bundle from another device.
+
+    python -m tools.sync id
+    python -m tools.sync export --to <peer-device-id> --out laptop.peach
+    python -m tools.sync import laptop.peach
+    python -m tools.sync status
+
+Two local directories can be synced with --data-dir, e.g.
+    python -m tools.sync --data-dir /tmp/a export --to $(python -m tools.sync --data-dir /tmp/b id) --out a.peach
+    python -m tools.sync --data-dir /tmp/b import a.peach
+"""
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.memory_sync import SyncEngine
+
+base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def print_counts(counts):
+    for table, count in sorted(counts.items()):
+        print(f"  {table:<18} {count}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data-dir", default=os.path.join(base_dir, "data"))
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("id", help="print this device's id")
+    export = commands.add_parser("export", help="write a delta bundle for a peer")
+    export.add_argument("--to", required=True, help="peer device id")
+    export.add_argument("--out", required=True)
+    export.add_argument("--full", action="store_true", help="ignore the peer's watermark")
+    importer = commands.add_parser("import", help="apply a bundle from another device")
+    importer.add_argument("bundle")
+    commands.add_parser("status", help="show pending changes and peer watermarks")
+    commands.add_parser("compact", help="drop changelog entries every peer has received")
+    args = parser.parse_args()
+
+    engine = SyncEngine(args.data_dir)
+    if args.command == "id":
+        print(engine.device_id)
+    elif args.command == "export":
+        start = time.perf_counter()
+        counts = engine.export_bundle(args.to, args.out, full=args.full)
+        print(f"Wrote {args.out} ({os.path.getsize(args.out)} bytes) in {time.perf_counter() - start:.2f}s")
+        print_counts(counts)
+    elif args.command == "import":
+        start = time.perf_counter()
+        counts = engine.import_bundle(args.bundle)
+        print(f"Applied {args.bundle} in {time.perf_counter() - start:.2f}s")
+        print_counts(counts)
+    elif args.command == "status":
+        print(f"device {engine.device_id}")
+        for name, db in engine.dbs.items():
+            head = db.execute_read("SELECT COALESCE(MAX(seq), 0), COUNT(*) FROM sync_changelog")[0]
+            print(f"{name}: seq {head[0]}, {head[1]} changelog entries")
+            for peer, exported, imported in db.execute_read("SELECT peer, exported_seq, imported_seq FROM sync_peers"):
+                print(f"  peer {peer}: sent through {exported}, received through {imported}")
+    elif args.command == "compact":
+        print(f"Dropped {engine.compact()} changelog entries")
+
+if __name__ == "__main__":
+    main()